@@ -0,0 +1,250 @@
+"""
+音频拼接用的信号处理函数
+供 main.py 与 routers/processing.py 两个拼接接口共用：基于音量的静音移除、首尾淡入淡出、时间轴重新规划
+"""
+import os
+from typing import Dict, List
+
+import numpy as np
+import soundfile as sf
+
+
+def window_rms_db(audio_data: np.ndarray, window_samples: int, floor_db: float = -100.0) -> np.ndarray:
+    """
+    计算不重叠窗口的 dBFS（相对于满量程）
+
+    使用 reshape 得到窗口视图，逐窗口平方和由 einsum 一次完成，不为每个窗口单独分配内存；
+    末尾不足一个窗口的样本不参与计算。
+
+    Args:
+        audio_data: 一维音频数据
+        window_samples: 窗口长度（样本数）
+        floor_db: RMS 接近 0 时使用的 dB 值
+
+    Returns:
+        每个窗口的 dBFS (num_windows,)
+    """
+    num_windows = len(audio_data) // window_samples
+    frames = audio_data[:num_windows * window_samples].reshape(num_windows, window_samples)
+    if not np.issubdtype(frames.dtype, np.floating):
+        frames = frames.astype(np.float64)
+    rms = np.sqrt(np.einsum('ij,ij->i', frames, frames) / window_samples)
+
+    db = np.full(num_windows, floor_db, dtype=np.float64)
+    audible = rms > 1e-10  # 避免log(0)
+    db[audible] = 20 * np.log10(rms[audible])
+    return db
+
+
+def remove_silence_by_volume(
+    audio_data: np.ndarray,
+    sample_rate: int,
+    window_ms: int = 50,
+    db_threshold: float = -50.0,
+    min_silence_windows: int = 2
+) -> np.ndarray:
+    """
+    基于音量检测并移除静音段
+
+    从某个窗口开始连续 min_silence_windows 个窗口都低于阈值时，该窗口视为静音并移除；
+    末尾不足一个窗口的样本始终保留。
+
+    Args:
+        audio_data: 音频数据
+        sample_rate: 采样率
+        window_ms: 窗口长度（毫秒）
+        db_threshold: dBFS阈值，低于此值视为静音
+        min_silence_windows: 连续多少个窗口低于阈值才视为静音
+
+    Returns:
+        移除静音后的音频数据（无可移除内容时返回原数组）
+    """
+    if len(audio_data) == 0:
+        return audio_data
+
+    # 计算窗口大小（样本数）
+    window_samples = int(sample_rate * window_ms / 1000.0)
+
+    if window_samples == 0 or len(audio_data) < window_samples:
+        return audio_data
+
+    db_values = window_rms_db(audio_data, window_samples)
+    num_windows = len(db_values)
+
+    # 窗口 i 为静音：窗口 i..i+m-1 都存在且都低于阈值（用前缀和统计连续静音窗口数）
+    below = np.concatenate(([0], np.cumsum(db_values < db_threshold)))
+    is_silence = np.zeros(num_windows, dtype=bool)
+    last_start = num_windows - min_silence_windows
+    if last_start >= 0:
+        run_counts = below[min_silence_windows:] - below[:last_start + 1]
+        is_silence[:last_start + 1] = run_counts == min_silence_windows
+
+    if not is_silence.any():
+        return audio_data
+
+    # 一次构建保留掩码：语音窗口展开到样本，末尾剩余样本保留
+    keep = np.ones(len(audio_data), dtype=bool)
+    keep[:num_windows * window_samples] = np.repeat(~is_silence, window_samples)
+    if not keep.any():
+        return audio_data
+
+    result = audio_data[keep]
+    reduction_ratio = (1 - len(result) / len(audio_data)) * 100
+    print(f"  [静音移除] 移除 {reduction_ratio:.1f}% 的静音段")
+    return result
+
+
+def apply_fade_in_out(
+    audio_data: np.ndarray,
+    sample_rate: int,
+    fade_ms: int = 10,
+    in_place: bool = False
+) -> np.ndarray:
+    """
+    在音频首尾应用线性淡入淡出效果
+
+    Args:
+        audio_data: 音频数据
+        sample_rate: 采样率
+        fade_ms: 淡入淡出时长（毫秒）
+        in_place: 是否直接修改传入的数组（仅对可写的浮点数组生效，否则仍会复制）
+
+    Returns:
+        应用淡入淡出后的音频数据
+    """
+    if len(audio_data) == 0:
+        return audio_data
+
+    # 计算淡入淡出的样本数，不超过音频长度的一半
+    fade_samples = int(sample_rate * fade_ms / 1000.0)
+    fade_samples = min(fade_samples, len(audio_data) // 2)
+
+    if fade_samples == 0:
+        return audio_data
+
+    can_modify = (
+        in_place
+        and np.issubdtype(audio_data.dtype, np.floating)
+        and audio_data.flags.writeable
+    )
+    result = audio_data if can_modify else audio_data.copy()
+
+    curve = np.linspace(0, 1, fade_samples, dtype=result.dtype if can_modify else np.float64)
+    result[:fade_samples] *= curve
+    result[-fade_samples:] *= curve[::-1]
+
+    return result
+
+
+def replan_audio_timeline(
+    cloned_results: List[Dict],
+    cloned_audio_dir: str,
+    optimized_files: Dict[int, str]
+) -> Dict[int, Dict]:
+    """
+    重新规划音频时间轴，为超长片段借用相邻空闲时间
+
+    片段时长只读取文件头（sf.info），不解码音频。
+
+    Args:
+        cloned_results: 克隆结果列表
+        cloned_audio_dir: 克隆音频目录
+        optimized_files: 已优化的文件字典
+
+    Returns:
+        {segment_index: {'actual_start': float, 'actual_end': float, 'borrowed_before': float, 'borrowed_after': float}}
+    """
+    replanned = {}
+
+    # 构建所有片段的时间信息
+    segments_info = []
+    for idx, result in enumerate(cloned_results):
+        # 优先使用优化后的文件
+        if idx in optimized_files:
+            audio_file_path = optimized_files[idx]
+        else:
+            audio_file_path = os.path.join(cloned_audio_dir, f"segment_{idx}.wav")
+
+        if not os.path.exists(audio_file_path):
+            continue
+
+        try:
+            info = sf.info(audio_file_path)
+            actual_duration = info.frames / info.samplerate
+
+            start_time = result.get("start_time", 0)
+            end_time = result.get("end_time", 0)
+
+            segments_info.append({
+                'index': idx,
+                'start_time': start_time,
+                'end_time': end_time,
+                'target_duration': end_time - start_time,
+                'actual_duration': actual_duration,
+                'audio_file_path': audio_file_path,
+                'sr': info.samplerate
+            })
+        except Exception as e:
+            print(f"[时间轴规划] 读取片段 {idx} 失败: {e}")
+            continue
+
+    # 按时间排序
+    segments_info.sort(key=lambda x: x['start_time'])
+
+    # 为每个超长片段计算可借用的时间
+    for i, seg in enumerate(segments_info):
+        excess = seg['actual_duration'] - seg['target_duration']
+
+        # 使用小阈值判断，避免浮点误差导致不必要的调整
+        if excess <= 0.001:
+            continue
+
+        idx = seg['index']
+
+        # 最大可借用时间（原字幕时长的50%）
+        max_borrow = seg['target_duration'] * 0.5
+
+        # 计算前后的可用空闲时间
+        gap_before = 0
+        if i > 0:
+            gap_before = seg['start_time'] - segments_info[i - 1]['end_time']
+
+        gap_after = 0
+        if i < len(segments_info) - 1:
+            gap_after = segments_info[i + 1]['start_time'] - seg['end_time']
+
+        # 先尝试前后平均分配
+        half_excess = excess / 2
+        borrow_before = min(gap_before, max_borrow, half_excess)
+        borrow_after = min(gap_after, max_borrow, half_excess)
+
+        # 总借用不够时，从有剩余空间的一侧多借
+        total_borrowed = borrow_before + borrow_after
+        if total_borrowed < excess:
+            remaining_needed = excess - total_borrowed
+            can_borrow_more_before = min(gap_before - borrow_before, max_borrow - borrow_before)
+            can_borrow_more_after = min(gap_after - borrow_after, max_borrow - borrow_after)
+
+            if can_borrow_more_before > 0:
+                extra_before = min(can_borrow_more_before, remaining_needed)
+                borrow_before += extra_before
+                remaining_needed -= extra_before
+
+            if remaining_needed > 0 and can_borrow_more_after > 0:
+                borrow_after += min(can_borrow_more_after, remaining_needed)
+
+        # 记录调整后的实际时间（只有真正借用了时间才记录）
+        if borrow_before > 0.001 or borrow_after > 0.001:
+            actual_start = seg['start_time'] - borrow_before
+            actual_end = seg['end_time'] + borrow_after
+            replanned[idx] = {
+                'actual_start': actual_start,
+                'actual_end': actual_end,
+                'actual_duration': actual_end - actual_start,
+                'borrowed_before': borrow_before,
+                'borrowed_after': borrow_after,
+                'original_start': seg['start_time'],
+                'original_end': seg['end_time']
+            }
+
+    return replanned
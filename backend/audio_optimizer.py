@@ -10,6 +10,7 @@ import torch
 import librosa
 import os
 from typing import List, Dict, Tuple, Optional
+from model_registry import model_registry
 
 # 配置 rubberband 路径（Windows）
 RUBBERBAND_PATH = os.path.join(
@@ -27,6 +28,48 @@ if os.path.exists(RUBBERBAND_PATH):
         print(f"[音频优化] 添加 rubberband 到 PATH: {RUBBERBAND_PATH}")
 
 
+def _load_silero_vad():
+    """导入并加载 Silero VAD，返回 (模型, get_speech_timestamps)"""
+    print("[音频优化] 加载 Silero VAD 模型...")
+    import sys
+
+    # 尝试多个可能的路径
+    possible_paths = [
+        # 方法1: 尝试直接导入（如果已安装在当前环境）
+        None,
+        # 方法2: ../../../silero-vad/src (从 LocalClip-Editor/backend)
+        os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'silero-vad', 'src')),
+        # 方法3: ../../silero-vad/src (从 workspace/LocalClip-Editor/backend)
+        os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'silero-vad', 'src')),
+    ]
+
+    imported = False
+    for path in possible_paths:
+        try:
+            if path is None:
+                # 直接导入
+                from silero_vad import load_silero_vad, get_speech_timestamps
+                print("[音频优化] 从已安装的包中导入 silero_vad")
+                imported = True
+                break
+            elif os.path.exists(path):
+                if path not in sys.path:
+                    sys.path.insert(0, path)
+                    print(f"[音频优化] 添加 silero-vad/src 路径: {path}")
+                from silero_vad import load_silero_vad, get_speech_timestamps
+                imported = True
+                break
+        except ImportError:
+            continue
+
+    if not imported:
+        raise ImportError("无法导入 silero_vad，请确保已安装或本地路径存在")
+
+    model = load_silero_vad()
+    print("[音频优化] VAD 模型加载成功")
+    return model, get_speech_timestamps
+
+
 class AudioOptimizer:
     """音频优化器，用于缩短过长的克隆音频"""
 
@@ -86,47 +129,12 @@ class AudioOptimizer:
             return audio_data
 
     def _load_vad_model(self):
-        """加载 Silero VAD 模型（只加载一次）"""
+        """加载 Silero VAD 模型（通过模型注册表在进程内共享，只加载一次）"""
         if self.vad_model is None:
-            print("[音频优化] 加载 Silero VAD 模型...")
             try:
-                import sys
-
-                # 尝试多个可能的路径
-                possible_paths = [
-                    # 方法1: 尝试直接导入（如果已安装在当前环境）
-                    None,
-                    # 方法2: ../../../silero-vad/src (从 LocalClip-Editor/backend)
-                    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'silero-vad', 'src')),
-                    # 方法3: ../../silero-vad/src (从 workspace/LocalClip-Editor/backend)
-                    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'silero-vad', 'src')),
-                ]
-
-                imported = False
-                for path in possible_paths:
-                    try:
-                        if path is None:
-                            # 直接导入
-                            from silero_vad import load_silero_vad, get_speech_timestamps
-                            print("[音频优化] 从已安装的包中导入 silero_vad")
-                            imported = True
-                            break
-                        elif os.path.exists(path):
-                            if path not in sys.path:
-                                sys.path.insert(0, path)
-                                print(f"[音频优化] 添加 silero-vad/src 路径: {path}")
-                            from silero_vad import load_silero_vad, get_speech_timestamps
-                            imported = True
-                            break
-                    except ImportError:
-                        continue
-
-                if not imported:
-                    raise ImportError("无法导入 silero_vad，请确保已安装或本地路径存在")
-
-                self.vad_model = load_silero_vad()
-                self.get_speech_timestamps = get_speech_timestamps
-                print("[音频优化] VAD 模型加载成功")
+                self.vad_model, self.get_speech_timestamps = model_registry.get(
+                    "silero_vad", _load_silero_vad, device="cpu"
+                )
             except Exception as e:
                 print(f"[音频优化] 警告: 无法加载 Silero VAD 模型: {e}")
                 print("[音频优化] 将使用基于音量的静音检测")
@@ -37,20 +37,22 @@ class AudioSilenceTrimmer:
         self.min_silence_duration = min_silence_duration
         self.min_speech_duration = min_speech_duration
 
-    def detect_speech_segments(
+    def compute_rms_db(
         self,
         audio_data: np.ndarray,
         sampling_rate: int
-    ) -> List[Dict]:
+    ) -> np.ndarray:
         """
-        使用RMS能量检测语音段
+        计算逐帧 RMS 能量（dB，以最大值为参考）
+
+        可预先计算后传给 detect_speech_segments，避免同一段音频重复计算
 
         Args:
             audio_data: 音频数据
             sampling_rate: 采样率
 
         Returns:
-            语音段列表 [{'start': float, 'end': float}, ...]
+            每帧的 dB 值
         """
         # 计算帧长度和步长（样本数）
         frame_length = int(self.frame_length_ms / 1000 * sampling_rate)
@@ -68,61 +70,80 @@ class AudioSilenceTrimmer:
         )[0]
 
         # 转换为 dB
-        rms_db = librosa.amplitude_to_db(rms, ref=np.max)
+        return librosa.amplitude_to_db(rms, ref=np.max)
+
+    def detect_speech_segments(
+        self,
+        audio_data: Optional[np.ndarray],
+        sampling_rate: int,
+        rms_db: Optional[np.ndarray] = None
+    ) -> List[Dict]:
+        """
+        使用RMS能量检测语音段
+
+        对语音/静音帧做游程编码：语音游程之间的静音游程不短于 min_silence_duration 时切分，
+        较短的静音并入语音段；最终丢弃短于 min_speech_duration 的语音段。
+
+        Args:
+            audio_data: 音频数据（提供 rms_db 时可为 None）
+            sampling_rate: 采样率
+            rms_db: 预先计算的逐帧 dB 值（compute_rms_db 的结果），为 None 时自动计算
+
+        Returns:
+            语音段列表 [{'start': float, 'end': float}, ...]
+        """
+        if rms_db is None:
+            rms_db = self.compute_rms_db(audio_data, sampling_rate)
+
+        hop_length = int(self.hop_length_ms / 1000 * sampling_rate)
 
         # 检测语音帧（高于阈值）
-        is_speech = rms_db > self.threshold_db
+        is_speech = np.asarray(rms_db) > self.threshold_db
+        num_frames = len(is_speech)
+        if num_frames == 0 or not is_speech.any():
+            return []
 
         # 转换为时间戳
         frame_times = librosa.frames_to_time(
-            np.arange(len(is_speech)),
+            np.arange(num_frames),
             sr=sampling_rate,
             hop_length=hop_length
         )
 
-        # 合并连续的语音帧
-        speech_segments = []
-        in_speech = False
-        speech_start = 0
-
-        for i, (is_s, t) in enumerate(zip(is_speech, frame_times)):
-            if is_s and not in_speech:
-                # 语音开始
-                in_speech = True
-                speech_start = t
-            elif not is_s and in_speech:
-                # 检查静音是否足够长
-                silence_start = t
-                silence_end = t
-
-                # 向前查找静音结束点
-                for j in range(i, len(is_speech)):
-                    if is_speech[j]:
-                        break
-                    silence_end = frame_times[j] if j < len(frame_times) else frame_times[-1]
-
-                silence_duration = silence_end - silence_start
-
-                if silence_duration >= self.min_silence_duration:
-                    # 静音足够长，结束当前语音段
-                    speech_end = t
-                    if speech_end - speech_start >= self.min_speech_duration:
-                        speech_segments.append({
-                            'start': speech_start,
-                            'end': speech_end
-                        })
-                    in_speech = False
-
-        # 处理最后一个语音段
-        if in_speech:
-            speech_end = frame_times[-1] if len(frame_times) > 0 else len(audio_data) / sampling_rate
-            if speech_end - speech_start >= self.min_speech_duration:
-                speech_segments.append({
-                    'start': speech_start,
-                    'end': speech_end
-                })
-
-        return speech_segments
+        # 语音游程 [run_starts[k], run_ends[k])
+        padded = np.concatenate(([False], is_speech, [False])).astype(np.int8)
+        edges = np.diff(padded)
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+
+        # 每个语音游程之后的静音时长（从静音首帧到静音末帧），末尾无静音时为 -inf
+        next_speech = np.append(run_starts[1:], num_frames)
+        has_silence = run_ends < num_frames
+        silence_last = np.where(has_silence, next_speech - 1, 0)
+        silence_first = np.minimum(run_ends, num_frames - 1)
+        silence_duration = np.where(
+            has_silence,
+            frame_times[silence_last] - frame_times[silence_first],
+            -np.inf
+        )
+        splits = silence_duration >= self.min_silence_duration
+
+        # 长静音处切分：每组第一个游程的起点为段起点，最后一个游程的终点为段终点
+        group_last = np.flatnonzero(splits)
+        group_first = np.concatenate(([0], group_last + 1))
+        ends = frame_times[run_ends[group_last]]
+        if splits[-1]:
+            group_first = group_first[:-1]
+        else:
+            # 最后一组延续到音频末尾
+            ends = np.append(ends, frame_times[-1])
+        starts = frame_times[run_starts[group_first]]
+
+        keep = (ends - starts) >= self.min_speech_duration
+        return [
+            {'start': float(start), 'end': float(end)}
+            for start, end in zip(starts[keep], ends[keep])
+        ]
 
     def trim_silence(
         self,
@@ -312,6 +333,50 @@ class AudioSilenceTrimmer:
             # 没有可保留的片段，返回原音频
             return audio_data
 
+    def trim_audio_for_gender_classification(
+        self,
+        audio_data: np.ndarray,
+        sampling_rate: int,
+        min_final_duration: float = 1.5
+    ) -> Optional[np.ndarray]:
+        """
+        内存版音频预处理流程：检测 → 切割 → 验证时长（不读写文件）
+
+        Args:
+            audio_data: 音频数据
+            sampling_rate: 采样率
+            min_final_duration: 最小可接受的最终时长（秒）
+
+        Returns:
+            处理后的音频数据，或 None（时长不足）
+        """
+        original_duration = len(audio_data) / sampling_rate
+
+        # 检测语音段
+        speech_segments = self.detect_speech_segments(audio_data, sampling_rate)
+
+        if not speech_segments:
+            print(f"  [处理音频] 未检测到语音段，使用原音频")
+            # 没有检测到语音，检查原音频时长
+            if original_duration >= min_final_duration:
+                return audio_data
+            return None
+
+        print(f"  [处理音频] 检测到 {len(speech_segments)} 个语音段")
+
+        # 切割非语音段
+        trimmed_audio = self.trim_silence(audio_data, sampling_rate, speech_segments)
+        trimmed_duration = len(trimmed_audio) / sampling_rate
+
+        print(f"  [处理音频] 切割后时长: {trimmed_duration:.2f}s")
+
+        # 验证时长
+        if trimmed_duration < min_final_duration:
+            print(f"  [处理音频] 时长不足 {min_final_duration}s，丢弃此片段")
+            return None
+
+        return trimmed_audio
+
     def process_audio_for_gender_classification(
         self,
         audio_path: str,
@@ -336,31 +401,19 @@ class AudioSilenceTrimmer:
 
             print(f"  [处理音频] {os.path.basename(audio_path)}, 原始时长: {original_duration:.2f}s")
 
-            # 检测语音段
-            speech_segments = self.detect_speech_segments(audio_data, sr)
+            trimmed_audio = self.trim_audio_for_gender_classification(
+                audio_data, sr, min_final_duration
+            )
 
-            if not speech_segments:
-                print(f"  [处理音频] 未检测到语音段，使用原音频")
-                # 没有检测到语音，检查原音频时长
-                if original_duration >= min_final_duration:
-                    # 直接返回原音频路径
-                    return audio_path, original_duration
-                else:
-                    return None
+            if trimmed_audio is None:
+                return None
 
-            print(f"  [处理音频] 检测到 {len(speech_segments)} 个语音段")
+            if trimmed_audio is audio_data:
+                # 未检测到语音段，直接返回原音频路径
+                return audio_path, original_duration
 
-            # 切割非语音段
-            trimmed_audio = self.trim_silence(audio_data, sr, speech_segments)
             trimmed_duration = len(trimmed_audio) / sr
 
-            print(f"  [处理音频] 切割后时长: {trimmed_duration:.2f}s")
-
-            # 验证时长
-            if trimmed_duration < min_final_duration:
-                print(f"  [处理音频] 时长不足 {min_final_duration}s，丢弃此片段")
-                return None
-
             # 保存临时文件
             if temp_dir is None:
                 temp_dir = tempfile.gettempdir()
@@ -384,6 +437,37 @@ class AudioSilenceTrimmer:
             traceback.print_exc()
             return None
 
+    def concatenate_audio_arrays(
+        self,
+        audio_arrays: List[np.ndarray],
+        sampling_rate: int = 16000,
+        silence_duration: float = 0.2
+    ) -> np.ndarray:
+        """
+        在内存中拼接多个音频数组，中间插入短暂静音
+
+        Args:
+            audio_arrays: 音频数据列表
+            sampling_rate: 采样率
+            silence_duration: 音频之间的静音时长（秒）
+
+        Returns:
+            拼接后的音频数据
+        """
+        if not audio_arrays:
+            raise ValueError("没有音频数据可拼接")
+
+        silence = np.zeros(int(silence_duration * sampling_rate), dtype=np.float32)
+
+        parts = []
+        for i, audio_data in enumerate(audio_arrays):
+            parts.append(np.asarray(audio_data, dtype=np.float32))
+            # 除了最后一个片段，都添加静音
+            if i < len(audio_arrays) - 1:
+                parts.append(silence)
+
+        return np.concatenate(parts)
+
     def concatenate_multiple_audios(
         self,
         audio_paths: List[str],
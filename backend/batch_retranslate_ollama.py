@@ -1,7 +1,7 @@
 """
 基于 Ollama 的批量重新翻译脚本
 使用异步并发，充分利用 GPU 性能
-在 ui 环境中运行
+在 ui 环境中运行；翻译逻辑由进程内翻译引擎（translation_engine）执行，本脚本只是命令行入口
 """
 import sys
 import os
@@ -9,9 +9,10 @@ import asyncio
 import json
 import time
 import subprocess
-import psutil
 from typing import List, Dict, Any
-from openai import AsyncOpenAI
+
+import batch_translate_ollama
+from llm_residency import llm_residency
 
 # 强制 UTF-8 输出
 if sys.stdout.encoding != 'utf-8':
@@ -20,6 +21,10 @@ if sys.stderr.encoding != 'utf-8':
     sys.stderr.reconfigure(encoding='utf-8', errors='replace')
 
 
+# 重新翻译提示词版本（写入翻译记忆的键，修改 build_retranslate_prompt 时需递增）
+RETRANSLATE_PROMPT_VERSION = "retranslate-v1"
+
+
 def check_ollama_running() -> bool:
     """
     检查 Ollama 服务是否在运行
@@ -27,6 +32,9 @@ def check_ollama_running() -> bool:
     Returns:
         bool: True 如果运行中，False 如果未运行
     """
+    # 仅命令行入口需要检查进程，延迟导入以便翻译引擎在后端进程内直接复用本模块
+    import psutil
+
     for proc in psutil.process_iter(['name']):
         try:
             if 'ollama' in proc.info['name'].lower():
@@ -92,85 +100,65 @@ def ensure_ollama_running():
         return True
 
 
-def unload_ollama_model(model: str = "qwen2.5:32b"):
-    """
-    卸载 Ollama 模型，释放 GPU 显存
-
-    Args:
-        model: 要卸载的模型名称
-    """
-    print(f"\n[Ollama] 正在卸载模型 {model}，释放 GPU 显存...", flush=True)
-
-    try:
-        # 使用 ollama 命令行工具卸载模型
-        result = subprocess.run(
-            ['ollama', 'stop', model],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-
-        if result.returncode == 0:
-            print(f"[Ollama] ✓ 模型 {model} 已卸载", flush=True)
-        else:
-            # 即使失败也继续，因为模型可能已经卸载
-            print(f"[Ollama] ⚠️  卸载命令返回: {result.returncode}", flush=True)
+def build_retranslate_prompt(sentence: str, target_language: str) -> str:
+    """构建单句重新翻译的 prompt（JSON 格式输出，针对日语/韩语要求不含汉字）"""
+    if '日' in target_language or 'ja' in target_language.lower():
+        return f'你是配音字幕压缩专家。翻译成{target_language}。要求：汉字强制用假名、最口语的缩略形式、输出极简、字数极少、宁可漏译也不要长译。返回 JSON 对象，Key 为 "tr"：\n\n{sentence}'
+    elif '韩' in target_language or 'ko' in target_language.lower():
+        return f'你是配音字幕压缩专家。翻译成{target_language}。要求：不含汉字、最口语的缩略形式、输出极简、字数极少、宁可漏译也不要长译。返回 JSON 对象，Key 为 "tr"：\n\n{sentence}'
+    else:
+        return f'你是配音字幕压缩专家。翻译成{target_language}。要求：最口语的缩略形式、输出极简、字数极少、宁可漏译也不要长译。返回 JSON 对象，Key 为 "tr"：\n\n{sentence}'
 
-    except FileNotFoundError:
-        print("[Ollama] ⚠️  找不到 ollama 命令", flush=True)
-    except subprocess.TimeoutExpired:
-        print("[Ollama] ⚠️  卸载超时", flush=True)
-    except Exception as e:
-        print(f"[Ollama] ⚠️  卸载时出错: {e}", flush=True)
 
-    # 额外等待确保 GPU 内存释放
-    print("[Ollama] 等待 GPU 内存释放...", flush=True)
-    time.sleep(2)
-    print("[Ollama] ✓ GPU 清理完成\n", flush=True)
+def request_retranslation(
+    sentence: str,
+    target_language: str,
+    model: str = "qwen2.5:32b",
+    timeout: float = batch_translate_ollama.TRANSLATION_TIMEOUT
+) -> str:
+    """发送一次单句重新翻译请求（线程安全），失败时抛出异常；返回模型原始输出"""
+    response = batch_translate_ollama._get_session().post(
+        batch_translate_ollama.OLLAMA_API_URL,
+        json={
+            'model': model,
+            'messages': [{"role": "user", "content": build_retranslate_prompt(sentence, target_language)}],
+            'temperature': 0.3,  # 低随机性，保证翻译准确
+            'stream': False,
+            'keep_alive': llm_residency.keep_alive()
+        },
+        timeout=timeout
+    )
+    response.raise_for_status()
+    llm_residency.touch(model)
+    return response.json()['choices'][0]['message']['content'].strip()
 
 
 async def translate_sentence(
-    client: AsyncOpenAI,
     sentence: str,
     target_language: str,
     task_id: str,
-    model: str = "qwen2.5:32b"
+    model: str = "qwen2.5:32b",
+    timeout: float = batch_translate_ollama.TRANSLATION_TIMEOUT
 ) -> Dict[str, Any]:
     """
-    单个翻译任务（异步）
+    单个翻译任务（异步，请求在线程中执行）
 
     Args:
-        client: OpenAI 客户端
         sentence: 源文本
         target_language: 目标语言
         task_id: 任务ID
         model: 模型名称
+        timeout: 请求超时（秒）
 
     Returns:
         dict: 翻译结果
     """
-    # 构建 prompt - 使用 JSON 格式输出
-    # 针对日语添加特殊要求：使用假名
-    if '日' in target_language or 'ja' in target_language.lower():
-        prompt = f'你是配音字幕压缩专家。翻译成{target_language}。要求：汉字强制用假名、最口语的缩略形式、输出极简、字数极少、宁可漏译也不要长译。返回 JSON 对象，Key 为 "tr"：\n\n{sentence}'
-    elif '韩' in target_language or 'ko' in target_language.lower():
-        prompt = f'你是配音字幕压缩专家。翻译成{target_language}。要求：不含汉字、最口语的缩略形式、输出极简、字数极少、宁可漏译也不要长译。返回 JSON 对象，Key 为 "tr"：\n\n{sentence}'
-    else:
-        prompt = f'你是配音字幕压缩专家。翻译成{target_language}。要求：最口语的缩略形式、输出极简、字数极少、宁可漏译也不要长译。返回 JSON 对象，Key 为 "tr"：\n\n{sentence}'
-
     try:
         start_time = time.time()
 
-        response = await client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,  # 低随机性，保证翻译准确
-        )
+        result = await asyncio.to_thread(request_retranslation, sentence, target_language, model, timeout)
 
         elapsed = time.time() - start_time
-        result = response.choices[0].message.content.strip()
 
         # 提取 JSON 中的翻译结果
         translation = extract_translation_from_json(result, sentence)
@@ -265,60 +253,40 @@ async def batch_translate(
     model: str = "qwen2.5:32b"
 ) -> List[Dict[str, Any]]:
     """
-    批量翻译（异步并发）
+    批量翻译（异步并发，由进程内翻译引擎执行）
 
     Args:
         tasks: 任务列表，每个任务包含 task_id, source, target_language
         model: 模型名称
 
     Returns:
-        list: 翻译结果列表
+        list: 翻译结果列表（按完成顺序）
     """
-    # 创建 OpenAI 客户端（连接到本地 Ollama）
-    client = AsyncOpenAI(
-        base_url='http://localhost:11434/v1',
-        api_key='ollama'
-    )
+    from translation_engine import TranslationEngine
+
+    engine = TranslationEngine(model=model)
 
     print(f"\n{'='*60}", flush=True)
     print(f"[批量翻译] 开始批量翻译", flush=True)
     print(f"  任务数量: {len(tasks)}", flush=True)
     print(f"  模型: {model}", flush=True)
-    print(f"  并发模式: 异步", flush=True)
+    print(f"  并发模式: 异步（最多 {engine.concurrency} 个请求）", flush=True)
     print(f"{'='*60}\n", flush=True)
 
-    # 创建所有异步任务
     start_time = time.time()
 
-    async_tasks = [
-        translate_sentence(
-            client,
-            task["source"],
-            task["target_language"],
-            task["task_id"],
-            model
-        )
-        for task in tasks
-    ]
-
     # 并发执行所有任务，并实时打印结果
-    print("[批量翻译] 并发执行所有翻译任务...\n", flush=True)
     print("[翻译结果] 实时输出：\n", flush=True)
 
     results = []
-    completed_count = 0
-
-    # 使用 as_completed 实现实时输出
-    for coro in asyncio.as_completed(async_tasks):
-        result = await coro
-        completed_count += 1
+    async for result in engine.retranslate(tasks):
         results.append(result)
 
         # 立即打印当前完成的结果
         status = "✓" if result["success"] else "✗"
         elapsed = result.get("elapsed", 0)
         print(
-            f"[{completed_count}/{len(async_tasks)}] {status} {result['task_id']}: "
+            f"[{len(results)}/{len(tasks)}] {status} {result['task_id']}: "
             f"{result['source']} -> {result['translation']} "
             f"({elapsed:.2f}s)",
             flush=True
@@ -330,7 +298,7 @@ async def batch_translate(
     print(f"[批量翻译] 全部完成！", flush=True)
     print(f"  总计: {len(results)} 个任务", flush=True)
     print(f"  总耗时: {total_time:.2f} 秒", flush=True)
-    print(f"  平均速度: {total_time/len(results):.2f} 秒/句", flush=True)
+    print(f"  平均速度: {total_time/max(len(results), 1):.2f} 秒/句", flush=True)
     print(f"{'='*60}\n", flush=True)
 
     return results
@@ -363,8 +331,8 @@ def retranslate_from_config(config_file: str) -> List[Dict[str, Any]]:
     # 执行异步批量翻译
     results = asyncio.run(batch_translate(tasks, model))
 
-    # 卸载模型，释放 GPU 显存
-    unload_ollama_model(model)
+    # 命令行入口在独立进程中运行，结束后卸载模型，释放 GPU 显存
+    llm_residency.release(model, reason="重新翻译脚本结束")
 
     # 输出 JSON 结果（供 main.py 解析）
     print(json.dumps(results, ensure_ascii=False))
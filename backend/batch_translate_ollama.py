@@ -1,15 +1,22 @@
 """
 基于 Ollama 的批量翻译脚本
 将中文字幕翻译为目标语言
-使用同步调用，优化性能
+按组并发请求（本地 LLM 服务可并行/流水线处理多个请求），结果按原顺序组装
+后端进程内通过 translation_engine 直接调用，命令行入口（main）供旧接口使用
 """
 import sys
 import os
 import json
 import time
-from typing import List, Dict, Any
+import asyncio
+import threading
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Optional, Tuple
 import requests
 
+from llm_residency import llm_residency
+from translation_memory import MemoryKey, TranslationMemory, neighbour_contexts, translation_memory
+
 # 强制 UTF-8 输出
 if sys.stdout.encoding != 'utf-8':
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
@@ -52,6 +59,29 @@ OLLAMA_API_URL = 'http://127.0.0.1:11434/v1/chat/completions'
 SESSION = requests.Session()
 SESSION.headers.update({'Content-Type': 'application/json'})
 
+# 并发翻译配置：同时进行的请求数（服务端并行数见 OLLAMA_NUM_PARALLEL，超出部分在服务端排队）、
+# 单次请求超时、失败重试次数与退避基数（第 n 次重试前等待 backoff * 2^(n-1) 秒）
+TRANSLATION_CONCURRENCY = int(os.environ.get("TRANSLATION_CONCURRENCY", "4"))
+TRANSLATION_TIMEOUT = float(os.environ.get("TRANSLATION_TIMEOUT", "120"))
+TRANSLATION_MAX_RETRIES = int(os.environ.get("TRANSLATION_MAX_RETRIES", "2"))
+TRANSLATION_RETRY_BACKOFF = float(os.environ.get("TRANSLATION_RETRY_BACKOFF", "1.0"))
+
+# 批量翻译提示词版本（写入翻译记忆的键，修改 build_batch_messages 时需递增）
+BATCH_PROMPT_VERSION = "batch-v1"
+
+# 并发请求在线程池中执行，每个线程使用独立的 session
+_thread_local = threading.local()
+
+
+def _get_session() -> requests.Session:
+    """获取当前线程的 session"""
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update({'Content-Type': 'application/json'})
+        _thread_local.session = session
+    return session
+
 
 def start_ollama_service():
     """
@@ -103,31 +133,32 @@ def start_ollama_service():
 
 def warm_up(model: str = "qwen2.5:32b"):
     """
-    热启动函数：发送一个空请求，确保模型从硬盘加载到了显存中。
+    热启动函数：发送一个不带 prompt 的加载请求，确保模型从硬盘加载到了显存中。
     如果 Ollama 未启动，会自动启动服务。
     """
     print(f"🔥 正在进行热启动 (加载模型 {model} 到显存)...", flush=True)
-    start = time.time()
+
+    def load():
+        # 不带 prompt 的 /api/generate 请求只加载模型，不产生一次对话补全
+        base_url = OLLAMA_API_URL.split('/v1/', 1)[0]
+        response = SESSION.post(
+            f"{base_url}/api/generate",
+            json={'model': model, 'keep_alive': llm_residency.keep_alive()},
+            timeout=300
+        )
+        response.raise_for_status()
 
     # 先尝试连接
     max_attempts = 2
     for attempt in range(max_attempts):
         try:
-            # 设置 keep_alive=-1 让模型永久保持在显存中
-            response = SESSION.post(
-                OLLAMA_API_URL,
-                json={
-                    'model': model,
-                    'messages': [{"role": "user", "content": "hi"}],
-                    'max_tokens': 1,
-                    'keep_alive': -1
-                },
-                timeout=30
-            )
-            response.raise_for_status()
-            elapsed = time.time() - start
-            print(f"✅ 热启动完成！加载耗时: {elapsed:.2f}s", flush=True)
-            print(f"✅ 模型已锁定在显存中（不会自动卸载）", flush=True)
+            # 模型驻留到空闲超过 TTL 或语音克隆阶段需要显存时（见 llm_residency）
+            elapsed = llm_residency.acquire(model, loader=load)
+            if elapsed > 0:
+                print(f"✅ 热启动完成！加载耗时: {elapsed:.2f}s", flush=True)
+            else:
+                # 上一个 LLM 阶段/上一种语言刚用过，无需重新加载
+                print(f"✅ 模型已驻留在显存中，直接复用", flush=True)
             print("-" * 60, flush=True)
             return
 
@@ -136,8 +167,6 @@ def warm_up(model: str = "qwen2.5:32b"):
                 # 第一次失败，尝试启动 Ollama
                 print(f"⚠️ 无法连接到 Ollama 服务 (尝试 {attempt+1}/{max_attempts})", flush=True)
                 if start_ollama_service():
-                    # 重新计时
-                    start = time.time()
                     continue
                 else:
                     print(f"❌ 连接 Ollama 失败，请检查服务是否开启。错误信息: {e}", flush=True)
@@ -151,24 +180,14 @@ def warm_up(model: str = "qwen2.5:32b"):
             raise
 
 
-def translate_batch_group(
-    sentences: List[str],
-    target_language: str,
-    task_id_prefix: str,
-    model: str = "qwen2.5:32b"
-) -> List[Dict[str, Any]]:
+def build_batch_messages(sentences: List[str], target_language: str) -> List[Dict[str, str]]:
     """
-    批量翻译任务，提供上下文感知能力
+    构建批量翻译的对话消息（提供上下文感知能力）
 
     Args:
         sentences: 源文本列表（有顺序的上下文）
         target_language: 目标语言
-        task_id_prefix: 任务前缀
-        model: 模型名称
     """
-    if not sentences:
-        return []
-
     # 1. 根据语言特性构建指令
     if '日' in target_language or 'ja' in target_language.lower():
         lang_rule = "全假名无汉字"
@@ -192,61 +211,347 @@ def translate_batch_group(
     for i, s in enumerate(sentences):
         user_content += f"{i}. {s}\n"
 
-    try:
-        start_time = time.time()
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
 
-        response = SESSION.post(
-            OLLAMA_API_URL,
-            json={
-                'model': model,
-                'messages': [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                'temperature': 0.3,  # 适当提升一点点随机性，有助于上下文衔接更自然
-                'response_format': {"type": "json_object"},
-                'stream': False,
-                'keep_alive': -1
-            },
-            timeout=60  # 批量翻译耗时较长，增加超时时间
-        )
 
-        response.raise_for_status()
-        result_json = response.json()
-        raw_content = result_json['choices'][0]['message']['content'].strip()
+def request_batch_translation(
+    sentences: List[str],
+    target_language: str,
+    model: str = "qwen2.5:32b",
+    timeout: float = TRANSLATION_TIMEOUT,
+    usage: Optional[Dict[str, int]] = None
+) -> List[str]:
+    """
+    发送一次批量翻译请求（线程安全），失败时抛出异常
 
-        # 解析返回的 JSON 数组
-        parsed_data = json.loads(raw_content)
-        translated_list = parsed_data.get("translations", [])
+    Args:
+        usage: 传入字典时写入服务端返回的 token 用量（prompt_tokens / completion_tokens）
 
-        # 4. 结果校验与组装
-        results = []
-        elapsed = (time.time() - start_time) / len(sentences)  # 平均单句耗时
+    Returns:
+        模型返回的译文列表（可能少于源文本数量）
+    """
+    response = _get_session().post(
+        OLLAMA_API_URL,
+        json={
+            'model': model,
+            'messages': build_batch_messages(sentences, target_language),
+            'temperature': 0.3,  # 适当提升一点点随机性，有助于上下文衔接更自然
+            'response_format': {"type": "json_object"},
+            'stream': False,
+            'keep_alive': llm_residency.keep_alive()
+        },
+        timeout=timeout  # 批量翻译耗时较长，增加超时时间
+    )
 
-        for i, original_text in enumerate(sentences):
-            # 如果模型漏译了（虽然 json_object 模式下概率低），则兜底返回原文
-            tr_text = translated_list[i] if i < len(translated_list) else original_text
+    response.raise_for_status()
+    llm_residency.touch(model)
+    result_json = response.json()
+    raw_content = result_json['choices'][0]['message']['content'].strip()
+    if usage is not None:
+        usage.update(result_json.get('usage') or {})
 
-            results.append({
-                "task_id": f"{task_id_prefix}_{i}",
-                "source": original_text,
-                "translation": tr_text,
-                "success": i < len(translated_list),
-                "elapsed": elapsed
-            })
+    # 解析返回的 JSON 数组
+    parsed_data = json.loads(raw_content)
+    return parsed_data.get("translations", [])
 
-        return results
 
-    except Exception as e:
-        print(f"[批量翻译错误] {task_id_prefix}: {e}", flush=True)
-        # 失败全量兜底
-        return [{
+def _group_results(
+    sentences: List[str],
+    translated_list: List[str],
+    task_id_prefix: str,
+    elapsed: float
+) -> List[Dict[str, Any]]:
+    """结果校验与组装（elapsed 为平均单句耗时）"""
+    results = []
+    for i, original_text in enumerate(sentences):
+        # 如果模型漏译了（虽然 json_object 模式下概率低），则兜底返回原文
+        tr_text = translated_list[i] if i < len(translated_list) else original_text
+
+        results.append({
             "task_id": f"{task_id_prefix}_{i}",
-            "source": s,
-            "translation": s,
-            "success": False,
-            "error": str(e)
-        } for i, s in enumerate(sentences)]
+            "source": original_text,
+            "translation": tr_text,
+            "success": i < len(translated_list),
+            "elapsed": elapsed
+        })
+    return results
+
+
+def _failed_group_results(sentences: List[str], task_id_prefix: str, error: Exception) -> List[Dict[str, Any]]:
+    """失败全量兜底：返回原文"""
+    return [{
+        "task_id": f"{task_id_prefix}_{i}",
+        "source": s,
+        "translation": s,
+        "success": False,
+        "error": str(error)
+    } for i, s in enumerate(sentences)]
+
+
+def _cached_result(source: str, translation: str, task_id: str) -> Dict[str, Any]:
+    """翻译记忆命中的结果"""
+    return {
+        "task_id": task_id,
+        "source": source,
+        "translation": translation,
+        "success": True,
+        "elapsed": 0.0,
+        "cached": True
+    }
+
+
+def _memory_keys(
+    memory: TranslationMemory,
+    sentences: List[str],
+    contexts: List[str],
+    target_language: str,
+    model: str
+) -> List[MemoryKey]:
+    return [
+        memory.make_key(sentence, context, target_language, model, BATCH_PROMPT_VERSION)
+        for sentence, context in zip(sentences, contexts)
+    ]
+
+
+def _merge_group_results(
+    sentences: List[str],
+    task_id_prefix: str,
+    cached: Dict[int, str],
+    miss_indices: List[int],
+    miss_results: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """将翻译记忆命中的译文与本次请求的结果按原顺序合并"""
+    miss_results_by_index = dict(zip(miss_indices, miss_results))
+    results = []
+    for i, sentence in enumerate(sentences):
+        if i in miss_results_by_index:
+            result = miss_results_by_index[i]
+            result["task_id"] = f"{task_id_prefix}_{i}"
+        else:
+            result = _cached_result(sentence, cached[i], f"{task_id_prefix}_{i}")
+        results.append(result)
+    return results
+
+
+def _store_group_results(
+    memory: TranslationMemory,
+    keys: List[MemoryKey],
+    miss_indices: List[int],
+    miss_results: List[Dict[str, Any]]
+):
+    """保存本次请求成功的译文"""
+    memory.store_many({
+        keys[i]: result["translation"]
+        for i, result in zip(miss_indices, miss_results) if result["success"]
+    })
+
+
+def translate_batch_group(
+    sentences: List[str],
+    target_language: str,
+    task_id_prefix: str,
+    model: str = "qwen2.5:32b",
+    timeout: float = TRANSLATION_TIMEOUT,
+    contexts: Optional[List[str]] = None,
+    memory: Optional[TranslationMemory] = None
+) -> List[Dict[str, Any]]:
+    """
+    批量翻译任务，提供上下文感知能力
+
+    先查询翻译记忆，只把未命中的句子发送给模型；全部命中时不发送请求。
+
+    Args:
+        sentences: 源文本列表（有顺序的上下文）
+        target_language: 目标语言
+        task_id_prefix: 任务前缀
+        model: 模型名称
+        timeout: 请求超时（秒）
+        contexts: 每句的上下文指纹（默认按组内相邻句计算）
+        memory: 翻译记忆（默认使用全局实例）
+    """
+    if not sentences:
+        return []
+
+    memory = memory or translation_memory
+    keys: List[MemoryKey] = []
+    cached: Dict[int, str] = {}
+    if memory is not None:
+        if contexts is None:
+            contexts = neighbour_contexts(sentences, memory.context_window)
+        keys = _memory_keys(memory, sentences, contexts, target_language, model)
+        found = memory.lookup_many(keys)
+        cached = {i: found[key] for i, key in enumerate(keys) if key in found}
+
+    miss_indices = [i for i in range(len(sentences)) if i not in cached]
+    miss_results: List[Dict[str, Any]] = []
+    if miss_indices:
+        miss_sentences = [sentences[i] for i in miss_indices]
+        try:
+            start_time = time.time()
+            translated_list = request_batch_translation(miss_sentences, target_language, model, timeout)
+            elapsed = (time.time() - start_time) / len(miss_sentences)  # 平均单句耗时
+            miss_results = _group_results(miss_sentences, translated_list, task_id_prefix, elapsed)
+            if memory is not None:
+                _store_group_results(memory, keys, miss_indices, miss_results)
+
+        except Exception as e:
+            print(f"[批量翻译错误] {task_id_prefix}: {e}", flush=True)
+            miss_results = _failed_group_results(miss_sentences, task_id_prefix, e)
+
+    return _merge_group_results(sentences, task_id_prefix, cached, miss_indices, miss_results)
+
+
+async def translate_groups_concurrently(
+    task_groups: List[List[Dict]],
+    model: str = "qwen2.5:32b",
+    concurrency: int = TRANSLATION_CONCURRENCY,
+    timeout: float = TRANSLATION_TIMEOUT,
+    max_retries: int = TRANSLATION_MAX_RETRIES,
+    retry_backoff: float = TRANSLATION_RETRY_BACKOFF,
+    on_group_done: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None,
+    memory: Optional[TranslationMemory] = None,
+    stats: Optional[Dict[str, Any]] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    并发翻译多组任务，最多同时进行 concurrency 个请求
+
+    先一次性查询所有句子的翻译记忆（上下文按整体台词顺序计算，与分组方式无关），每组只请求未命中的句子，
+    全部命中的组不发送请求。失败的请求按指数退避重试（等待期间不占用并发名额），重试耗尽后返回原文兜底。
+
+    Args:
+        task_groups: 分组后的任务列表（任务需包含 task_id / source / target_language）
+        model: 模型名称
+        concurrency: 最大并发请求数
+        timeout: 单次请求超时（秒）
+        max_retries: 失败后最多重试次数
+        retry_backoff: 退避基数（秒）
+        on_group_done: 每组完成时的回调 (组序号, 该组结果)，按完成顺序调用
+        memory: 翻译记忆（默认使用全局实例）
+        stats: 传入字典时写入运行统计（请求数、重试数、token 用量、耗时等）
+
+    Returns:
+        与 task_groups 顺序一致的各组结果（task_id 已映射回原始任务）
+    """
+    run_start = time.time()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    group_results: List[Optional[List[Dict[str, Any]]]] = [None] * len(task_groups)
+    run_stats = {
+        'groups': len(task_groups),
+        'requested_groups': 0,
+        'requests': 0,
+        'succeeded_requests': 0,
+        'retries': 0,
+        'failed_groups': 0,
+        'cached_groups': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'estimated_tokens': 0
+    }
+
+    # 翻译记忆：一次查询所有句子
+    memory = memory or translation_memory
+    group_keys: List[List[MemoryKey]] = [[] for _ in task_groups]
+    found: Dict[MemoryKey, str] = {}
+    if memory is not None:
+        all_tasks = [task for group in task_groups for task in group]
+        contexts = iter(neighbour_contexts([t["source"] for t in all_tasks], memory.context_window))
+        for group_idx, group in enumerate(task_groups):
+            group_keys[group_idx] = [
+                memory.make_key(t["source"], next(contexts), t["target_language"], model, BATCH_PROMPT_VERSION)
+                for t in group
+            ]
+        found = await asyncio.to_thread(memory.lookup_many, [key for keys in group_keys for key in keys])
+
+    async def request_with_retries(group_prefix: str, sentences: List[str], target_language: str):
+        """请求一组句子的译文，失败时退避重试，重试耗尽后返回原文兜底"""
+        last_error = None
+        for attempt in range(max_retries + 1):
+            if attempt > 0:
+                delay = retry_backoff * (2 ** (attempt - 1))
+                print(f"[批量翻译重试] {group_prefix}: 第 {attempt} 次重试（{delay:.1f}秒后）: {last_error}", flush=True)
+                await asyncio.sleep(delay)
+
+            async with semaphore:
+                start_time = time.time()
+                usage: Dict[str, int] = {}
+                run_stats['requests'] += 1
+                run_stats['retries'] += 1 if attempt > 0 else 0
+                try:
+                    translated_list = await asyncio.to_thread(
+                        request_batch_translation, sentences, target_language, model, timeout, usage
+                    )
+                    elapsed = (time.time() - start_time) / len(sentences)
+                    run_stats['succeeded_requests'] += 1
+                    run_stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+                    run_stats['completion_tokens'] += usage.get('completion_tokens', 0)
+                    return _group_results(sentences, translated_list, group_prefix, elapsed), True
+                except Exception as e:
+                    last_error = e
+
+        print(f"[批量翻译错误] {group_prefix}: {last_error}", flush=True)
+        run_stats['failed_groups'] += 1
+        return _failed_group_results(sentences, group_prefix, last_error), False
+
+    async def run_group(group_idx: int, group: List[Dict]):
+        sentences = [t["source"] for t in group]
+        target_language = group[0]["target_language"]  # 同一组的目标语言应该相同
+        group_prefix = f"group-{group_idx + 1}"
+        keys = group_keys[group_idx]
+        cached = {i: found[key] for i, key in enumerate(keys) if key in found}
+        miss_indices = [i for i in range(len(sentences)) if i not in cached]
+
+        miss_results = []
+        if miss_indices:
+            run_stats['requested_groups'] += 1
+            run_stats['estimated_tokens'] += estimate_group_tokens([group[i] for i in miss_indices])
+            miss_results, succeeded = await request_with_retries(
+                group_prefix, [sentences[i] for i in miss_indices], target_language
+            )
+            if succeeded and memory is not None:
+                await asyncio.to_thread(_store_group_results, memory, keys, miss_indices, miss_results)
+
+        results = _merge_group_results(sentences, group_prefix, cached, miss_indices, miss_results)
+
+        # 将结果映射回原始 task_id
+        for i, task in enumerate(group):
+            results[i]["task_id"] = task["task_id"]
+
+        group_results[group_idx] = results
+        if on_group_done:
+            on_group_done(group_idx, results)
+
+    await asyncio.gather(*(run_group(i, group) for i, group in enumerate(task_groups) if group))
+
+    if memory is not None:
+        total = sum(len(keys) for keys in group_keys)
+        hits = sum(1 for keys in group_keys for key in keys if key in found)
+        skipped = sum(1 for keys in group_keys if keys and all(key in found for key in keys))
+        run_stats['cached_groups'] = skipped
+        print(f"[翻译记忆] 命中 {hits}/{total} 句，{skipped}/{len(task_groups)} 组无需请求模型", flush=True)
+
+    run_stats['elapsed'] = time.time() - run_start
+    if stats is not None:
+        stats.update(run_stats)
+
+    return [results or [] for results in group_results]
+
+
+def format_run_stats(stats: Dict[str, Any]) -> str:
+    """格式化运行统计：请求数、平均每次请求 token 数、端到端耗时"""
+    succeeded = stats.get('succeeded_requests', 0)
+    requested_groups = stats.get('requested_groups', 0)
+    reported_tokens = stats.get('prompt_tokens', 0) + stats.get('completion_tokens', 0)
+    avg_reported = reported_tokens / succeeded if succeeded else 0
+    avg_estimated = stats.get('estimated_tokens', 0) / requested_groups if requested_groups else 0
+    return (
+        f"请求数: {stats.get('requests', 0)}（重试 {stats.get('retries', 0)}，失败 {stats.get('failed_groups', 0)} 组，"
+        f"翻译记忆跳过 {stats.get('cached_groups', 0)} 组）| "
+        f"平均 token/请求: {avg_reported:.0f}（服务端统计）/ {avg_estimated:.0f}（估算）| "
+        f"端到端耗时: {stats.get('elapsed', 0):.2f}秒"
+    )
 
 
 def translate_single(
@@ -341,9 +646,170 @@ def group_tasks_by_time(tasks: List[Dict], max_gap_seconds: float = 1.0, max_gro
     return groups
 
 
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估计文本的 token 数（Qwen 等模型中汉字/假名/谚文约 1 token/字，其他文字约 4 字符/token）
+    """
+    cjk = sum(1 for ch in text if '\u3040' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af' or '\uf900' <= ch <= '\ufaff')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+# 译文 token 数相对原文（中文）token 数的估计倍率，用于预估输出长度
+OUTPUT_TOKEN_RATIO = {
+    "英语": 1.3,
+    "日语": 1.5,
+    "韩语": 1.4,
+    "法语": 1.6,
+    "德语": 1.6,
+    "西班牙语": 1.6,
+    "印尼语": 1.6,
+}
+DEFAULT_OUTPUT_TOKEN_RATIO = 1.6
+
+# 分组预算：模型上下文长度（Ollama num_ctx）、单次请求最多输出 token 数、每组最多句数、
+# 视为场景切换的时间间隔（秒，超过时总是分组）
+TRANSLATION_CONTEXT_TOKENS = int(os.environ.get("TRANSLATION_CONTEXT_TOKENS", "4096"))
+TRANSLATION_MAX_OUTPUT_TOKENS = int(os.environ.get("TRANSLATION_MAX_OUTPUT_TOKENS", "768"))
+TRANSLATION_MAX_GROUP_LINES = int(os.environ.get("TRANSLATION_MAX_GROUP_LINES", "40"))
+TRANSLATION_SCENE_GAP_SECONDS = float(os.environ.get("TRANSLATION_SCENE_GAP_SECONDS", "5.0"))
+
+# 每句的格式开销：用户消息中的序号与换行、输出 JSON 中的引号与逗号
+_LINE_INPUT_OVERHEAD = 3
+_LINE_OUTPUT_OVERHEAD = 4
+
+
+def estimate_task_tokens(task: Dict) -> Tuple[int, int]:
+    """估计单句的 (输入 token, 输出 token)"""
+    source_tokens = estimate_tokens(task.get("source", ""))
+    ratio = OUTPUT_TOKEN_RATIO.get(task.get("target_language", ""), DEFAULT_OUTPUT_TOKEN_RATIO)
+    return source_tokens + _LINE_INPUT_OVERHEAD, int(source_tokens * ratio) + _LINE_OUTPUT_OVERHEAD
+
+
+@lru_cache(maxsize=32)
+def _prompt_tokens(target_language: str) -> int:
+    """提示词本身（不含句子）的 token 数"""
+    return sum(estimate_tokens(m["content"]) for m in build_batch_messages([], target_language))
+
+
+def estimate_group_tokens(group: List[Dict]) -> int:
+    """估计一组任务单次请求的总 token 数（提示词 + 输入 + 输出）"""
+    if not group:
+        return 0
+    return _prompt_tokens(group[0]["target_language"]) + sum(sum(estimate_task_tokens(task)) for task in group)
+
+
+def group_tasks_by_budget(
+    tasks: List[Dict],
+    context_tokens: int = TRANSLATION_CONTEXT_TOKENS,
+    max_output_tokens: int = TRANSLATION_MAX_OUTPUT_TOKENS,
+    max_group_size: int = TRANSLATION_MAX_GROUP_LINES,
+    scene_gap_seconds: float = TRANSLATION_SCENE_GAP_SECONDS
+) -> List[List[Dict]]:
+    """
+    按 token 预算对任务分组（替代固定 5 句 / 1 秒的分组）
+
+    每组在不超过模型上下文长度、单次输出 token 上限和句数上限的前提下尽量大，以减少请求次数。
+    时间间隔超过 scene_gap_seconds（场景切换）或目标语言变化时总是分组；预算用尽需要分组时，
+    优先在组内靠后的场景/说话人边界（时间间隔较大或任务的 speaker 变化处）切分，而不是在对话中间切断。
+
+    Args:
+        tasks: 任务列表（需包含 source / target_language，可选 start_time / end_time / index / speaker）
+        context_tokens: 模型上下文长度
+        max_output_tokens: 单次请求最多输出 token 数
+        max_group_size: 每组最多句数
+        scene_gap_seconds: 视为场景切换的时间间隔（秒）
+
+    Returns:
+        分组后的任务列表（按 index 顺序）
+    """
+    if not tasks:
+        return []
+
+    # 按 index 排序确保顺序正确
+    sorted_tasks = sorted(tasks, key=lambda t: t.get('index', 0))
+
+    groups = []
+    current_group: List[Dict] = []
+    # 当前组的提示词/累计输入/累计输出 token，以及每句与前一句之间的边界强度
+    prompt_tokens = input_tokens = output_tokens = 0
+    boundaries: List[float] = []
+
+    def boundary_strength(prev_task: Dict, task: Dict) -> float:
+        """两句之间作为切分点的优先程度：时间间隔（秒），说话人变化额外加 1"""
+        gap = parse_time_to_seconds(task.get('start_time', '00:00:00,000')) - \
+            parse_time_to_seconds(prev_task.get('end_time', '00:00:00,000'))
+        # 按毫秒取整，避免时间戳换算的浮点误差影响边界比较
+        strength = round(max(gap, 0.0), 3)
+        if prev_task.get('speaker') is not None and prev_task.get('speaker') != task.get('speaker'):
+            strength += 1.0
+        return strength
+
+    def start_group(group_tasks: List[Dict]):
+        nonlocal current_group, input_tokens, output_tokens, prompt_tokens, boundaries
+        current_group = list(group_tasks)
+        prompt_tokens = _prompt_tokens(current_group[0]["target_language"])
+        input_tokens = sum(estimate_task_tokens(t)[0] for t in current_group)
+        output_tokens = sum(estimate_task_tokens(t)[1] for t in current_group)
+        boundaries = [0.0] + [boundary_strength(a, b) for a, b in zip(current_group, current_group[1:])]
+
+    for task in sorted_tasks:
+        if not current_group:
+            start_group([task])
+            continue
+
+        strength = boundary_strength(current_group[-1], task)
+        task_input, task_output = estimate_task_tokens(task)
+        fits = (
+            len(current_group) < max_group_size
+            and output_tokens + task_output <= max_output_tokens
+            and prompt_tokens + input_tokens + output_tokens + task_input + task_output <= context_tokens
+        )
+        hard_boundary = (
+            strength > scene_gap_seconds
+            or task.get('target_language') != current_group[0].get('target_language')
+        )
+
+        if fits and not hard_boundary:
+            current_group.append(task)
+            boundaries.append(strength)
+            input_tokens += task_input
+            output_tokens += task_output
+            continue
+
+        if hard_boundary:
+            groups.append(current_group)
+            start_group([task])
+            continue
+
+        # 预算用尽：在组的后半部分寻找最明显的边界切分（比当前位置更明显、且剩余部分与新任务放得下时），
+        # 剩余部分带入下一组
+        split = len(current_group)
+        half = len(current_group) // 2
+        if half > 0:
+            best = max(range(half, len(current_group)), key=lambda i: (boundaries[i], i))
+            carried = current_group[best:] + [task]
+            carried_output = sum(estimate_task_tokens(t)[1] for t in carried)
+            if (
+                boundaries[best] > strength
+                and len(carried) <= max_group_size
+                and carried_output <= max_output_tokens
+                and estimate_group_tokens(carried) <= context_tokens
+            ):
+                split = best
+        groups.append(current_group[:split])
+        start_group(current_group[split:] + [task])
+
+    # 添加最后一组
+    if current_group:
+        groups.append(current_group)
+
+    return groups
+
+
 def batch_translate(
     tasks: List[Dict[str, str]],
-    model: str = "qwen2.5:32b"
+    model: str = "qwen2.5:32b",
+    concurrency: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """
     批量翻译任务（支持上下文感知分组）
@@ -358,9 +824,10 @@ def batch_translate(
             - index: 索引（用于排序）
 
         model: 使用的模型名称
+        concurrency: 最大并发请求数（默认使用 TRANSLATION_CONCURRENCY）
 
     Returns:
-        List[Dict]: 翻译结果列表
+        List[Dict]: 翻译结果列表（与分组后的任务顺序一致）
     """
     # 1. 热启动（会自动检测 Ollama 是否运行）
     try:
@@ -373,67 +840,67 @@ def batch_translate(
     total = len(tasks)
     print(f"\n[翻译] 开始翻译 {total} 条字幕...\n", flush=True)
 
-    # 2. 根据时间间隔分组
-    task_groups = group_tasks_by_time(tasks, max_gap_seconds=1.0, max_group_size=5)
-    print(f"[翻译] 分组策略: {len(task_groups)} 组（时间间隔≤1秒，每组≤5句）\n", flush=True)
+    # 2. 按 token 预算分组（场景/说话人边界优先）
+    task_groups = group_tasks_by_budget(tasks)
+    avg_group_tokens = sum(estimate_group_tokens(g) for g in task_groups) / len(task_groups) if task_groups else 0
+    print(
+        f"[翻译] 分组策略: {len(task_groups)} 组（token 预算: 上下文≤{TRANSLATION_CONTEXT_TOKENS}，"
+        f"输出≤{TRANSLATION_MAX_OUTPUT_TOKENS}，每组≤{TRANSLATION_MAX_GROUP_LINES}句；"
+        f"平均 {len(tasks) / max(len(task_groups), 1):.1f} 句/组，估算 {avg_group_tokens:.0f} token/组）\n",
+        flush=True
+    )
 
     # 记录总时长
     batch_start_time = time.time()
-    results = []
-    processed_count = 0
 
-    # 3. 按组翻译
-    for group_idx, group in enumerate(task_groups, 1):
-        # 提取该组的所有句子
-        sentences = [t["source"] for t in group]
-        target_language = group[0]["target_language"]  # 同一组的目标语言应该相同
-        group_prefix = f"group-{group_idx}"
+    def report_result(processed_count: int, result: Dict[str, Any]):
+        """每句完成后实时输出进度"""
+        status = "✓" if result["success"] else "✗"
+        elapsed = result.get("elapsed", 0)
+        source = result["source"][:20] + "..." if len(result["source"]) > 20 else result["source"]
+        translation = result["translation"][:30] + "..." if len(result["translation"]) > 30 else result["translation"]
+
+        print(
+            f"[{processed_count}/{total}] {status} {result['task_id']}: {source} -> {translation} "
+            f"({elapsed:.2f}s)",
+            flush=True
+        )
 
-        # 批量翻译该组
-        group_results = translate_batch_group(sentences, target_language, group_prefix, model)
+    # 3. 由进程内翻译引擎并发翻译各组，结果按原顺序组装
+    from translation_engine import TranslationEngine
 
-        # 将结果映射回原始 task_id
-        for i, task in enumerate(group):
-            if i < len(group_results):
-                # 保留原始 task_id
-                group_results[i]["task_id"] = task["task_id"]
-                results.append(group_results[i])
-
-                # 实时输出进度
-                processed_count += 1
-                status = "✓" if group_results[i]["success"] else "✗"
-                elapsed = group_results[i].get("elapsed", 0)
-                source = group_results[i]["source"][:20] + "..." if len(group_results[i]["source"]) > 20 else group_results[i]["source"]
-                translation = group_results[i]["translation"][:30] + "..." if len(group_results[i]["translation"]) > 30 else group_results[i]["translation"]
-
-                print(
-                    f"[{processed_count}/{total}] {status} {group_results[i]['task_id']}: {source} -> {translation} "
-                    f"({elapsed:.2f}s)",
-                    flush=True
-                )
+    engine = TranslationEngine(model=model, concurrency=concurrency)
+    print(f"[翻译] 并发请求数: {engine.concurrency}\n", flush=True)
+
+    async def collect() -> List[Dict[str, Any]]:
+        collected = []
+        async for result in engine.translate(tasks):
+            collected.append(result)
+            report_result(len(collected), result)
+        return collected
+
+    order = {group_task["task_id"]: i for i, group_task in enumerate(t for g in task_groups for t in g)}
+    results = sorted(asyncio.run(collect()), key=lambda r: order.get(r["task_id"], len(order)))
+    run_stats = engine.last_stats
 
     # 计算总时长
     total_elapsed = time.time() - batch_start_time
     avg_elapsed = total_elapsed / total if total > 0 else 0
 
     print(f"\n[翻译] ✓ 完成所有翻译", flush=True)
-    print(f"[翻译] 总耗时: {total_elapsed:.2f}秒 | 平均: {avg_elapsed:.2f}秒/条\n", flush=True)
-
-    # 卸载模型，释放GPU
-    try:
-        print(f"[翻译] 正在卸载模型 {model}，释放GPU...", flush=True)
-        unload_response = SESSION.post(
-            'http://127.0.0.1:11434/api/generate',
-            json={
-                'model': model,
-                'keep_alive': 0
-            },
-            timeout=10
+    print(f"[翻译] 总耗时: {total_elapsed:.2f}秒 | 平均: {avg_elapsed:.2f}秒/条", flush=True)
+    print(f"[翻译] {format_run_stats(run_stats)}\n", flush=True)
+
+    if translation_memory is not None:
+        stats = translation_memory.stats()
+        print(
+            f"[翻译] 翻译记忆命中率: {stats['hit_rate']:.0%} ({stats['hits']}/{stats['hits'] + stats['misses']})，"
+            f"共 {stats['entries']} 条译文\n",
+            flush=True
         )
-        if unload_response.status_code == 200:
-            print(f"[翻译] ✓ 模型已卸载，GPU已释放", flush=True)
-    except Exception as e:
-        print(f"[翻译] ⚠ 卸载模型失败: {e}", flush=True)
+
+    # 命令行入口在独立进程中运行，结束后由调用方进行语音克隆等需要显存的阶段，因此卸载模型
+    llm_residency.release(model, reason="翻译脚本结束")
 
     return results
 
@@ -451,13 +918,14 @@ def main(config_path: str):
 
     tasks = config.get("tasks", [])
     model = config.get("model", "qwen2.5:32b")
+    concurrency = config.get("concurrency")
 
     if not tasks:
         print("❌ 没有翻译任务", flush=True)
         return
 
     # 执行批量翻译
-    results = batch_translate(tasks, model=model)
+    results = batch_translate(tasks, model=model, concurrency=concurrency)
 
     # 输出结果到标准输出（JSON格式）
     print("\n" + "="*60, flush=True)
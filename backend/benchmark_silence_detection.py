@@ -0,0 +1,116 @@
+"""
+语音段检测基准测试 - 比较逐帧循环实现与游程编码实现
+
+在含噪声的合成音频上分别测量：
+1. 原逐帧循环（每次语音→静音转换都向前扫描静音长度，噪声音频下接近 O(n²)）
+2. AudioSilenceTrimmer.detect_speech_segments（numpy 游程编码）
+3. 传入预先计算的 rms_db，跳过 RMS 计算
+
+用法:
+    python benchmark_silence_detection.py --durations 10 60 300 --repeat 3
+"""
+import argparse
+import time
+from typing import Dict, List
+
+import librosa
+import numpy as np
+
+from audio_silence_trimmer import AudioSilenceTrimmer
+
+
+def legacy_detect_speech_segments(trimmer: AudioSilenceTrimmer, rms_db: np.ndarray,
+                                  sampling_rate: int, audio_length: int) -> List[Dict]:
+    """原逐帧循环实现（作为对照，输入为逐帧 dB 值）"""
+    hop_length = int(trimmer.hop_length_ms / 1000 * sampling_rate)
+    is_speech = rms_db > trimmer.threshold_db
+    frame_times = librosa.frames_to_time(
+        np.arange(len(is_speech)),
+        sr=sampling_rate,
+        hop_length=hop_length
+    )
+
+    speech_segments = []
+    in_speech = False
+    speech_start = 0
+
+    for i, (is_s, t) in enumerate(zip(is_speech, frame_times)):
+        if is_s and not in_speech:
+            in_speech = True
+            speech_start = t
+        elif not is_s and in_speech:
+            silence_start = t
+            silence_end = t
+
+            for j in range(i, len(is_speech)):
+                if is_speech[j]:
+                    break
+                silence_end = frame_times[j] if j < len(frame_times) else frame_times[-1]
+
+            silence_duration = silence_end - silence_start
+
+            if silence_duration >= trimmer.min_silence_duration:
+                speech_end = t
+                if speech_end - speech_start >= trimmer.min_speech_duration:
+                    speech_segments.append({'start': speech_start, 'end': speech_end})
+                in_speech = False
+
+    if in_speech:
+        speech_end = frame_times[-1] if len(frame_times) > 0 else audio_length / sampling_rate
+        if speech_end - speech_start >= trimmer.min_speech_duration:
+            speech_segments.append({'start': speech_start, 'end': speech_end})
+
+    return speech_segments
+
+
+def make_noisy_audio(duration: float, sr: int = 16000, seed: int = 0) -> np.ndarray:
+    """生成语音/静音频繁交替的噪声音频（静音段长短不一，最坏情况下触发大量向前扫描）"""
+    rng = np.random.default_rng(seed)
+    total = int(duration * sr)
+    audio = rng.standard_normal(total).astype(np.float32) * 0.001
+    pos = 0
+    while pos < total:
+        speech_len = int(rng.uniform(0.02, 0.6) * sr)
+        silence_len = int(rng.uniform(0.01, 1.5) * sr)
+        audio[pos:pos + speech_len] += rng.standard_normal(min(speech_len, total - pos)).astype(np.float32) * 0.3
+        pos += speech_len + silence_len
+    return audio
+
+
+def best_of(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(durations, repeat: int, sr: int = 16000):
+    trimmer = AudioSilenceTrimmer()
+    print(f"{'时长':>8} | {'逐帧循环':>10} | {'游程编码':>10} | {'预计算RMS':>10} | {'加速比':>8} | 结果一致")
+    print("-" * 72)
+
+    for duration in durations:
+        audio = make_noisy_audio(duration, sr)
+        rms_db = trimmer.compute_rms_db(audio, sr)
+
+        legacy = legacy_detect_speech_segments(trimmer, rms_db, sr, len(audio))
+        vectorized = trimmer.detect_speech_segments(audio, sr)
+        same = legacy == vectorized
+
+        legacy_time = best_of(lambda: legacy_detect_speech_segments(trimmer, rms_db, sr, len(audio)), repeat)
+        full_time = best_of(lambda: trimmer.detect_speech_segments(audio, sr), repeat)
+        precomputed_time = best_of(lambda: trimmer.detect_speech_segments(None, sr, rms_db=rms_db), repeat)
+
+        print(f"{duration:>7.0f}s | {legacy_time * 1000:>8.2f}ms | {full_time * 1000:>8.2f}ms | "
+              f"{precomputed_time * 1000:>8.2f}ms | {legacy_time / precomputed_time:>7.1f}x | {same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="语音段检测基准测试")
+    parser.add_argument("--durations", type=float, nargs="+", default=[10, 60, 300])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.durations, args.repeat)
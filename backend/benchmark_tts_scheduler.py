@@ -0,0 +1,159 @@
+"""
+TTS 任务调度基准测试 - 比较静态分配与按估算耗时的动态窃取调度
+
+使用按文本长度 sleep 的假引擎（不需要 GPU）模拟一集字幕的片段，分别测量：
+1. 按任务数对半分（原双 GPU CosyVoice 的方式）
+2. 按说话人整体分配、按片段数贪心（原多进程 Fish 的方式）
+3. tts_scheduler.run_distributed（估算耗时 LPT 规划 + 工作窃取）
+
+--daemon 时假引擎运行在 dummy 常驻工作进程中（含进程间通信开销）。dummy 引擎不区分文字、每个字符
+sleep 相同时间，拉丁字母片段的实际耗时高于估算，可以观察估算偏差时窃取的补偿效果。
+
+用法:
+    python benchmark_tts_scheduler.py --segments 120 --workers 2 --speakers 4 --scale 0.01
+    python benchmark_tts_scheduler.py --workers 4 --slow-worker 2.0 --daemon
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from tts_scheduler import estimate_cost, run_distributed
+
+
+def make_tasks(segments: int, speakers: int, seed: int, work_dir: str) -> List[Dict]:
+    """生成模拟字幕：少数主要说话人台词多，中英文混合，长度差异大"""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(speakers)]
+    tasks = []
+    for i in range(segments):
+        speaker = rng.choices(range(speakers), weights)[0]
+        length = int(rng.lognormvariate(2.7, 0.7))
+        text = ("你" if speaker % 2 == 0 else "a") * max(1, length)
+        tasks.append({
+            "segment_index": i,
+            "speaker_id": speaker,
+            "target_text": text,
+            "output_file": os.path.join(work_dir, f"segment_{i}.wav")
+        })
+    return tasks
+
+
+def sleep_runner(scale: float, speed: float) -> Callable:
+    """进程内假引擎：每个片段 sleep 估算耗时 × scale × speed"""
+    def run(batch, progress):
+        results = {}
+        for i, task in enumerate(batch):
+            time.sleep(estimate_cost(task) * scale * speed)
+            results[task["segment_index"]] = task["output_file"]
+            progress(i + 1, len(batch))
+        return results
+    return run
+
+
+def daemon_runner(manager, device: str, scale: float, speed: float) -> Callable:
+    """dummy 常驻进程：按 seconds_per_char sleep（近似估算耗时 × scale）"""
+    options = {"seconds_per_char": scale * speed / 4.5, "latency": 0.3 * scale * speed}
+
+    def run(batch, progress):
+        result = manager.run("dummy", sys.executable, batch, device=device,
+                             options=options, progress_callback=progress)
+        return result["results"]
+    return run
+
+
+def run_static(assignments: List[List[Dict]], runners: List[Callable]) -> float:
+    """每个 worker 顺序执行固定分配的任务"""
+    start = time.time()
+    threads = [threading.Thread(target=runner, args=(tasks, lambda c, t: None))
+               for tasks, runner in zip(assignments, runners) if tasks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.time() - start
+
+
+def halves(tasks: List[Dict], workers: int) -> List[List[Dict]]:
+    per_worker = (len(tasks) + workers - 1) // workers
+    return [tasks[i * per_worker:(i + 1) * per_worker] for i in range(workers)]
+
+
+def whole_speakers(tasks: List[Dict], workers: int) -> List[List[Dict]]:
+    by_speaker: Dict[int, List[Dict]] = {}
+    for task in tasks:
+        by_speaker.setdefault(task["speaker_id"], []).append(task)
+    assignments: List[List[Dict]] = [[] for _ in range(workers)]
+    loads = [0] * workers
+    for speaker_tasks in sorted(by_speaker.values(), key=len, reverse=True):
+        index = loads.index(min(loads))
+        assignments[index].extend(speaker_tasks)
+        loads[index] += len(speaker_tasks)
+    return assignments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS 任务调度基准测试")
+    parser.add_argument("--segments", type=int, default=120, help="片段数")
+    parser.add_argument("--speakers", type=int, default=4, help="说话人数")
+    parser.add_argument("--workers", type=int, default=2, help="worker 数")
+    parser.add_argument("--scale", type=float, default=0.01, help="估算耗时 1 秒对应的实际 sleep 秒数")
+    parser.add_argument("--slow-worker", type=float, default=1.0, help="最后一个 worker 的减速倍数（模拟较慢的 GPU）")
+    parser.add_argument("--batch-size", type=int, default=4, help="动态调度每批片段数")
+    parser.add_argument("--daemon", action="store_true", help="在 dummy 常驻工作进程中执行")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    speeds = [1.0] * (args.workers - 1) + [args.slow_worker]
+    manager = None
+    if args.daemon:
+        from tts_worker_client import TTSWorkerManager
+        manager = TTSWorkerManager(idle_timeout=60)
+
+    def make_runners():
+        if manager:
+            return [daemon_runner(manager, str(i), args.scale, speed) for i, speed in enumerate(speeds)]
+        return [sleep_runner(args.scale, speed) for speed in speeds]
+
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            tasks = make_tasks(args.segments, args.speakers, args.seed, work_dir)
+            if manager:
+                simulated = sum(0.3 + len(task["target_text"]) / 4.5 for task in tasks)
+            else:
+                simulated = sum(estimate_cost(task) for task in tasks)
+            ideal = simulated * args.scale / sum(1.0 / s for s in speeds)
+            print(f"{len(tasks)} 个片段, {args.speakers} 个说话人, {args.workers} 个 worker"
+                  f"{' (常驻进程)' if manager else ''}, 理想耗时 {ideal:.2f}s")
+
+            if manager:
+                # 预先启动常驻进程，避免把进程启动时间计入第一种方式
+                for runner in make_runners():
+                    runner(tasks[:1], lambda c, t: None)
+
+            timings = {
+                "对半分": run_static(halves(tasks, args.workers), make_runners()),
+                "按说话人整体分配": run_static(whole_speakers(tasks, args.workers), make_runners()),
+            }
+            start = time.time()
+            _, report = run_distributed(
+                tasks, {f"worker{i}": runner for i, runner in enumerate(make_runners())},
+                batch_size=args.batch_size, label="Benchmark"
+            )
+            timings["动态窃取调度"] = time.time() - start
+
+            print()
+            for name, elapsed in timings.items():
+                print(f"{name:<12} {elapsed:7.2f}s  (理想耗时的 {elapsed / ideal:.2f} 倍)")
+            print(f"动态调度: 窃取 {report['steals']} 次, 平均利用率 {report['utilization']:.0%}")
+    finally:
+        if manager:
+            manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -48,38 +48,8 @@ def map_language_code(language: str) -> str:
     return COSYVOICE_LANGUAGE_MAP.get(lang_lower, "en")
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("[CosyVoice] 错误: 需要提供配置文件路径", flush=True)
-        sys.exit(1)
-
-    config_file = sys.argv[1]
-
-    print(f"[CosyVoice] 读取配置: {config_file}", flush=True)
-
-    with open(config_file, 'r', encoding='utf-8') as f:
-        config = json.load(f)
-
-    use_gpu = config.get("use_gpu", True)
-    gpu_id = config.get("gpu_id", 0)
-    output_dir = config.get("output_dir", ".")
-    tasks = config.get("tasks", [])
-    target_language = config.get("target_language", "en")
-
-    if not tasks:
-        print("[CosyVoice] 没有任务", flush=True)
-        print("{}", flush=True)
-        return
-
-    print(f"[CosyVoice] 任务数: {len(tasks)}", flush=True)
-    print(f"[CosyVoice] 输出目录: {output_dir}", flush=True)
-    print(f"[CosyVoice] GPU: {'启用' if use_gpu else '禁用'} (GPU {gpu_id})", flush=True)
-
-    # 确保输出目录存在
-    os.makedirs(output_dir, exist_ok=True)
-
-    # 设置 CosyVoice 路径
-    # 默认路径，可通过环境变量覆盖
+def find_cosyvoice_dir() -> str:
+    """定位 CosyVoice 仓库目录（COSYVOICE_DIR 环境变量优先），找不到时返回 None"""
     cosyvoice_dir = os.environ.get("COSYVOICE_DIR")
 
     if not cosyvoice_dir or not os.path.exists(cosyvoice_dir):
@@ -96,12 +66,20 @@ def main():
                 break
 
     if not cosyvoice_dir or not os.path.exists(cosyvoice_dir):
-        print(f"[CosyVoice] 错误: 找不到 CosyVoice 目录", flush=True)
-        print(f"[CosyVoice] 请设置 COSYVOICE_DIR 环境变量", flush=True)
-        sys.exit(1)
+        return None
+    return cosyvoice_dir
 
-    print(f"[CosyVoice] CosyVoice 目录: {cosyvoice_dir}", flush=True)
 
+def load_model(cosyvoice_dir: str):
+    """
+    加载 CosyVoice3 模型
+
+    Args:
+        cosyvoice_dir: CosyVoice 仓库目录
+
+    Returns:
+        AutoModel 实例
+    """
     # 添加 CosyVoice 和 Matcha-TTS 路径
     sys.path.insert(0, cosyvoice_dir)
     sys.path.insert(0, os.path.join(cosyvoice_dir, "third_party", "Matcha-TTS"))
@@ -118,13 +96,97 @@ def main():
     load_start = time.time()
 
     from cosyvoice.cli.cosyvoice import AutoModel
-    import soundfile as sf
 
     cosyvoice = AutoModel(model_dir=model_dir)
 
     load_time = time.time() - load_start
     print(f"[CosyVoice] 模型加载完成，耗时: {load_time:.2f}s", flush=True)
     print(f"[CosyVoice] 采样率: {cosyvoice.sample_rate} Hz", flush=True)
+    return cosyvoice
+
+
+def generate_segment(cosyvoice, task: dict, target_language: str = "en") -> str:
+    """
+    生成一个片段（跨语言克隆），失败时抛出异常
+
+    Args:
+        cosyvoice: load_model 返回的模型
+        task: {segment_index, target_text, reference_audio, output_file, 可选 target_language}
+        target_language: 任务未指定语言时使用的目标语言
+
+    Returns:
+        str: 输出文件路径
+    """
+    import soundfile as sf
+
+    target_text = task["target_text"]
+    output_file = task["output_file"]
+    cosyvoice_lang = map_language_code(task.get("target_language") or target_language)
+
+    gen_start = time.time()
+
+    # CosyVoice3 cross_lingual 格式：需要在文本前加入 prompt prefix
+    cross_lingual_text = f"You are a helpful assistant.<|endofprompt|>{target_text}"
+
+    # 使用 inference_cross_lingual 生成（跨语言克隆）
+    for i, result in enumerate(cosyvoice.inference_cross_lingual(
+        cross_lingual_text,
+        task["reference_audio"],
+        stream=False
+    )):
+        audio_np = result['tts_speech'].squeeze().cpu().numpy()
+        sf.write(output_file, audio_np, cosyvoice.sample_rate)
+
+    gen_time = time.time() - gen_start
+
+    # 计算音频时长
+    audio, sr = sf.read(output_file)
+    audio_duration = len(audio) / sr
+    rtf = gen_time / audio_duration if audio_duration > 0 else float('inf')
+
+    print(f"[CosyVoice]   → 耗时: {gen_time:.2f}s | 时长: {audio_duration:.2f}s | RTF: {rtf:.3f} | 语言: {cosyvoice_lang}", flush=True)
+    return output_file
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("[CosyVoice] 错误: 需要提供配置文件路径", flush=True)
+        sys.exit(1)
+
+    config_file = sys.argv[1]
+
+    print(f"[CosyVoice] 读取配置: {config_file}", flush=True)
+
+    with open(config_file, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    use_gpu = config.get("use_gpu", True)
+    gpu_id = config.get("gpu_id", 0)
+    output_dir = config.get("output_dir", ".")
+    tasks = config.get("tasks", [])
+    target_language = config.get("target_language", "en")
+
+    if not tasks:
+        print("[CosyVoice] 没有任务", flush=True)
+        print("{}", flush=True)
+        return
+
+    print(f"[CosyVoice] 任务数: {len(tasks)}", flush=True)
+    print(f"[CosyVoice] 输出目录: {output_dir}", flush=True)
+    print(f"[CosyVoice] GPU: {'启用' if use_gpu else '禁用'} (GPU {gpu_id})", flush=True)
+
+    # 确保输出目录存在
+    os.makedirs(output_dir, exist_ok=True)
+
+    cosyvoice_dir = find_cosyvoice_dir()
+    if not cosyvoice_dir:
+        print(f"[CosyVoice] 错误: 找不到 CosyVoice 目录", flush=True)
+        print(f"[CosyVoice] 请设置 COSYVOICE_DIR 环境变量", flush=True)
+        sys.exit(1)
+
+    print(f"[CosyVoice] CosyVoice 目录: {cosyvoice_dir}", flush=True)
+
+    cosyvoice = load_model(cosyvoice_dir)
 
     # 处理任务
     results = {}
@@ -135,42 +197,13 @@ def main():
     for idx, task in enumerate(tasks):
         segment_index = task["segment_index"]
         target_text = task["target_text"]
-        reference_audio = task["reference_audio"]
-        lang = task.get("target_language", target_language)
-        output_file = task["output_file"]
-
-        # 映射语言代码
-        cosyvoice_lang = map_language_code(lang)
 
         # 显示进度
         display_text = target_text[:40] + "..." if len(target_text) > 40 else target_text
         print(f"[CosyVoice] 进度: {idx+1}/{total} | 片段 {segment_index}: {display_text}", flush=True)
 
         try:
-            gen_start = time.time()
-
-            # CosyVoice3 cross_lingual 格式：需要在文本前加入 prompt prefix
-            cross_lingual_text = f"You are a helpful assistant.<|endofprompt|>{target_text}"
-
-            # 使用 inference_cross_lingual 生成（跨语言克隆）
-            for i, result in enumerate(cosyvoice.inference_cross_lingual(
-                cross_lingual_text,
-                reference_audio,
-                stream=False
-            )):
-                audio_np = result['tts_speech'].squeeze().cpu().numpy()
-                sf.write(output_file, audio_np, cosyvoice.sample_rate)
-
-            gen_time = time.time() - gen_start
-
-            # 计算音频时长
-            audio, sr = sf.read(output_file)
-            audio_duration = len(audio) / sr
-            rtf = gen_time / audio_duration if audio_duration > 0 else float('inf')
-
-            print(f"[CosyVoice]   → 耗时: {gen_time:.2f}s | 时长: {audio_duration:.2f}s | RTF: {rtf:.3f}", flush=True)
-
-            results[segment_index] = output_file
+            results[segment_index] = generate_segment(cosyvoice, task, target_language)
             successful += 1
 
         except Exception as e:
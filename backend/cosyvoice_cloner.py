@@ -3,13 +3,14 @@
 CosyVoice3 语音克隆器
 基于 Fun-CosyVoice3-0.5B 模型，支持多语言语音克隆
 
-通过子进程调用 cosyvoice 环境中的脚本，类似于 xtts_cloner
+通过 cosyvoice 环境中的常驻工作进程生成（见 tts_worker_client），模型只加载一次；
+常驻进程不可用或 TTS_WORKER_DAEMON=0 时回退到每次调用脚本的子进程方式
 
 特点：
 - 无需预编码，直接使用参考音频
 - 支持 GPU 加速
 - 支持多语言（中、英、日、韩、法、德、西班牙语等）
-- 支持双 GPU 并行处理
+- 支持多 GPU 并行处理（按估算耗时动态分配片段，见 tts_scheduler）
 
 作者：Claude
 """
@@ -19,18 +20,21 @@ import subprocess
 import json
 import tempfile
 import platform
-import threading
 import math
+import threading
 from typing import Dict, List, Optional, Callable
 from loguru import logger
 
+from tts_scheduler import run_distributed
+from tts_worker_client import TTSWorkerError, tts_workers
+
 
 class CosyVoiceCloner:
     """
     CosyVoice3 语音克隆器
 
     特点：
-    - 通过子进程调用 cosyvoice 环境
+    - 在 cosyvoice 环境的常驻进程中生成（每块 GPU 一个）
     - 直接使用参考音频，无需预编码
     - 支持 GPU 加速
     - 支持双 GPU 并行处理
@@ -139,8 +143,8 @@ class CosyVoiceCloner:
                 valid_tasks, output_dir, target_language, self.gpu_ids[0], progress_callback
             )
         else:
-            # 使用双 GPU 并行处理
-            return self._generate_on_dual_gpu(
+            # 使用多 GPU 并行处理
+            return self._generate_on_multi_gpu(
                 valid_tasks, output_dir, target_language, progress_callback
             )
 
@@ -166,82 +170,126 @@ class CosyVoiceCloner:
 
         return self._run_generation_subprocess(generate_config, progress_callback)
 
-    def _generate_on_dual_gpu(
+    def _generate_on_multi_gpu(
         self,
         tasks: List[Dict],
         output_dir: str,
         target_language: str,
         progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> Dict[int, str]:
-        """在双 GPU 上并行生成音频"""
-        print(f"[CosyVoice] 使用双 GPU {self.gpu_ids} 并行生成 {len(tasks)} 个片段", flush=True)
-
-        # 将任务分成两半
-        mid = len(tasks) // 2
-        tasks_gpu0 = tasks[:mid]
-        tasks_gpu1 = tasks[mid:]
-
-        print(f"[CosyVoice] GPU {self.gpu_ids[0]}: {len(tasks_gpu0)} 个任务", flush=True)
-        print(f"[CosyVoice] GPU {self.gpu_ids[1]}: {len(tasks_gpu1)} 个任务", flush=True)
-
-        # 创建两个配置
-        config_gpu0 = {
-            "mode": "generate",
-            "use_gpu": self.use_gpu,
-            "gpu_id": self.gpu_ids[0],
-            "output_dir": os.path.abspath(output_dir),
-            "target_language": target_language,
-            "tasks": tasks_gpu0
-        }
-
-        config_gpu1 = {
-            "mode": "generate",
-            "use_gpu": self.use_gpu,
-            "gpu_id": self.gpu_ids[1],
-            "output_dir": os.path.abspath(output_dir),
-            "target_language": target_language,
-            "tasks": tasks_gpu1
-        }
-
-        # 用于存储结果
-        results = [{}, {}]
-        completed = [0, 0]
-        total_tasks = len(tasks)
-        lock = threading.Lock()
-
-        def run_on_gpu(config, result_idx):
-            def local_progress(current, total):
-                with lock:
-                    completed[result_idx] = current
-                    total_completed = sum(completed)
-                    if progress_callback:
-                        progress_callback(total_completed, total_tasks)
-
-            results[result_idx] = self._run_generation_subprocess(config, local_progress)
-
-        # 启动两个线程
-        thread0 = threading.Thread(target=run_on_gpu, args=(config_gpu0, 0))
-        thread1 = threading.Thread(target=run_on_gpu, args=(config_gpu1, 1))
-
-        thread0.start()
-        thread1.start()
-
-        thread0.join()
-        thread1.join()
+        """
+        在多个 GPU 上并行生成音频
 
-        # 合并结果
-        merged_results = {}
-        merged_results.update(results[0])
-        merged_results.update(results[1])
+        片段按估算耗时（文本长度、语言）规划到各 GPU，常驻进程模式下按小批次动态领取，
+        先完成的 GPU 从其他 GPU 的队列中窃取剩余片段；子进程模式下每批都要重新加载模型，
+        因此每个 GPU 只执行一批（按耗时均衡的静态分配）。
+        任一常驻进程不可用时所有 GPU 停止领取小批次，剩余片段整体改为子进程模式
+        """
+        print(f"[CosyVoice] 使用 GPU {self.gpu_ids} 并行生成 {len(tasks)} 个片段", flush=True)
+
+        def make_config(gpu_id: int, batch: List[Dict]) -> Dict:
+            return {
+                "mode": "generate",
+                "use_gpu": self.use_gpu,
+                "gpu_id": gpu_id,
+                "output_dir": os.path.abspath(output_dir),
+                "target_language": target_language,
+                "tasks": batch
+            }
+
+        results: Dict[int, str] = {}
+        if tts_workers.enabled:
+            failures: List[TTSWorkerError] = []
+            results_lock = threading.Lock()
+
+            def make_worker_runner(gpu_id: int):
+                def run(batch: List[Dict], batch_progress: Callable[[int, int], None]) -> Dict[int, str]:
+                    if failures:
+                        raise failures[0]
+                    try:
+                        generated = self._run_on_worker(make_config(gpu_id, batch), batch_progress)
+                    except TTSWorkerError as e:
+                        failures.append(e)
+                        raise
+                    with results_lock:
+                        results.update(generated)
+                    return generated
+                return run
 
-        return merged_results
+            try:
+                generated, report = run_distributed(
+                    tasks,
+                    {f"GPU {gpu_id}": make_worker_runner(gpu_id) for gpu_id in self.gpu_ids},
+                    progress_callback=progress_callback,
+                    label="CosyVoice"
+                )
+            except Exception:
+                if not failures:
+                    raise
+                tts_workers.record_fallback("cosyvoice", failures[0])
+            else:
+                tts_workers.record_schedule(report)
+                return generated
+
+            tasks = [task for task in tasks if task["segment_index"] not in results]
+            print(f"[CosyVoice] 剩余 {len(tasks)} 个片段改为子进程方式（每个 GPU 加载一次模型）", flush=True)
+
+        def make_subprocess_runner(gpu_id: int):
+            def run(batch: List[Dict], batch_progress: Callable[[int, int], None]) -> Dict[int, str]:
+                return self._run_generation_subprocess(make_config(gpu_id, batch), batch_progress, use_worker=False)
+            return run
+
+        done = len(results)
+        generated, report = run_distributed(
+            tasks,
+            {f"GPU {gpu_id}": make_subprocess_runner(gpu_id) for gpu_id in self.gpu_ids},
+            progress_callback=(lambda current, total: progress_callback(done + current, done + total))
+            if progress_callback else None,
+            batch_size=0,
+            label="CosyVoice"
+        )
+        tts_workers.record_schedule(report)
+        results.update(generated)
+        return results
+
+    def _run_on_worker(
+        self,
+        config: Dict,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[int, str]:
+        """在该 GPU 的 CosyVoice 常驻进程中生成（首次使用时启动并加载模型）"""
+        gpu_id = config.get("gpu_id", 0)
+        print(f"[CosyVoice] GPU {gpu_id} 使用常驻进程生成 {len(config['tasks'])} 个片段", flush=True)
+
+        result = tts_workers.run(
+            "cosyvoice",
+            self.cosyvoice_python,
+            config["tasks"],
+            device=str(gpu_id),
+            options={"use_gpu": self.use_gpu},
+            env={"CUDA_VISIBLE_DEVICES": str(gpu_id)},
+            job_options={"target_language": config.get("target_language")},
+            progress_callback=progress_callback
+        )
+
+        result_data = result["results"]
+        logger.info(f"✅ [CosyVoice] GPU {gpu_id} 完成！生成 {len(result_data)} 个音频文件（耗时 {result['elapsed']:.1f}s）")
+        print(f"✅ [CosyVoice] GPU {gpu_id} 完成！生成 {len(result_data)} 个音频文件", flush=True)
+        return result_data
 
     def _run_generation_subprocess(
         self,
         config: Dict,
-        progress_callback: Optional[Callable[[int, int], None]] = None
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        use_worker: bool = True
     ) -> Dict[int, str]:
-        """运行生成子进程"""
+        """运行生成（优先使用常驻工作进程，use_worker=False 时直接启动子进程）"""
+        if use_worker and tts_workers.enabled:
+            try:
+                return self._run_on_worker(config, progress_callback)
+            except TTSWorkerError as e:
+                tts_workers.record_fallback("cosyvoice", e)
+
         # 写入临时配置
         with tempfile.NamedTemporaryFile(
             mode='w',
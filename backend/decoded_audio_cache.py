@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+解码音频缓存 - 缓存片段文件解码重采样后的数组及其语音段检测结果
+
+说话人参考音频构建时，select_best_segments 与 concatenate_audio_segments 会对同一批片段
+各解码、检测一次，且每种语言的语音克隆都会重复。缓存按 (路径, 修改时间, 采样率) 区分，
+文件被重新生成后自动失效；总样本数超过上限时按最近最少使用淘汰。
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import librosa
+import numpy as np
+
+from audio_silence_trimmer import AudioSilenceTrimmer
+
+
+class DecodedAudioCache:
+    """按总样本数限制大小的解码音频 + 语音段 LRU 缓存"""
+
+    def __init__(self, max_samples: int = 16000 * 60 * 30):
+        """
+        初始化缓存
+
+        Args:
+            max_samples: 缓存音频的总样本数上限（默认 16kHz 下 30 分钟，约 115MB float32），0 表示不缓存
+        """
+        self.max_samples = max_samples
+        self._audio: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._speech: Dict[Tuple, List[Dict]] = {}
+        self._total_samples = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "DecodedAudioCache":
+        """从环境变量 DECODED_AUDIO_CACHE_SAMPLES 创建"""
+        return cls(max_samples=int(os.environ.get("DECODED_AUDIO_CACHE_SAMPLES", str(16000 * 60 * 30))))
+
+    @staticmethod
+    def _file_key(audio_path: str, sample_rate: int) -> Tuple:
+        stat = os.stat(audio_path)
+        return (os.path.abspath(audio_path), stat.st_mtime_ns, stat.st_size, sample_rate)
+
+    @staticmethod
+    def _trimmer_key(trimmer: AudioSilenceTrimmer) -> Tuple:
+        return (trimmer.threshold_db, trimmer.frame_length_ms, trimmer.hop_length_ms,
+                trimmer.min_silence_duration, trimmer.min_speech_duration)
+
+    def load(self, audio_path: str, sample_rate: int) -> np.ndarray:
+        """
+        读取并重采样音频（命中缓存时不再解码）
+
+        返回的数组为只读，需要修改时请先复制
+
+        Args:
+            audio_path: 音频文件路径
+            sample_rate: 目标采样率
+
+        Returns:
+            np.ndarray: float32 单声道音频
+        """
+        key = self._file_key(audio_path, sample_rate)
+        with self._lock:
+            audio = self._audio.get(key)
+            if audio is not None:
+                self._audio.move_to_end(key)
+                self.hits += 1
+                return audio
+            self.misses += 1
+
+        audio, _ = librosa.load(audio_path, sr=sample_rate)
+        audio.setflags(write=False)
+        self._put(key, audio)
+        return audio
+
+    def load_with_speech(
+        self,
+        audio_path: str,
+        sample_rate: int,
+        trimmer: AudioSilenceTrimmer
+    ) -> Tuple[np.ndarray, List[Dict]]:
+        """
+        读取音频并检测语音段（两者都会缓存，语音段按静音检测参数区分）
+
+        Args:
+            audio_path: 音频文件路径
+            sample_rate: 目标采样率
+            trimmer: 静音检测器
+
+        Returns:
+            (只读音频数组, 语音段列表)
+        """
+        audio = self.load(audio_path, sample_rate)
+        key = self._file_key(audio_path, sample_rate)
+        speech_key = key + self._trimmer_key(trimmer)
+
+        with self._lock:
+            speech_segments = self._speech.get(speech_key)
+        if speech_segments is None:
+            speech_segments = trimmer.detect_speech_segments(audio, sample_rate)
+            with self._lock:
+                # 音频仍在缓存中时才缓存语音段，随音频一起淘汰
+                if key in self._audio:
+                    self._speech[speech_key] = speech_segments
+
+        return audio, speech_segments
+
+    def _put(self, key: Tuple, audio: np.ndarray):
+        """加入缓存并按总样本数淘汰最久未使用的条目"""
+        if len(audio) > self.max_samples:
+            return
+
+        with self._lock:
+            if key in self._audio:
+                return
+            self._audio[key] = audio
+            self._total_samples += len(audio)
+            while self._total_samples > self.max_samples and self._audio:
+                old_key, old_audio = self._audio.popitem(last=False)
+                self._total_samples -= len(old_audio)
+                self._speech = {k: v for k, v in self._speech.items() if k[:len(old_key)] != old_key}
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._audio.clear()
+            self._speech.clear()
+            self._total_samples = 0
+
+    def stats(self) -> Dict:
+        """缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._audio),
+                'total_samples': self._total_samples,
+                'max_samples': self.max_samples,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+# 全局实例（跨语言、跨任务共享）
+decoded_audio_cache = DecodedAudioCache.from_env()
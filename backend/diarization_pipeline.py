@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+说话人识别流水线 - 音频切分、特征提取、NISQA 提前评分重叠执行
+
+切分线程每产出一个片段就放入有界队列，嵌入线程取出分块提取嵌入；
+同时 NISQA 线程对优先级较高的片段提前评分（聚类进行时继续运行）。
+只有聚类需要等待全部嵌入完成。进度按实际完成的片段数计算。
+"""
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from segment_buffer import SegmentBuffer
+
+# 队列结束标记
+_DONE = object()
+
+
+class StageProgress:
+    """
+    把某个阶段内的完成比例映射到 [start, end] 的整体进度
+
+    可在任意线程中调用；整体进度只增不减，百分比变化时才调用 report
+    """
+
+    def __init__(self, report: Callable[[int, str], None], start: int, end: int):
+        """
+        Args:
+            report: 线程安全的进度上报函数 (百分比, 描述)
+            start: 阶段开始时的整体进度
+            end: 阶段结束时的整体进度
+        """
+        self.report = report
+        self.start = start
+        self.end = end
+        self._last = -1
+        self._lock = threading.Lock()
+
+    def update(self, done: float, total: float, message: str):
+        """按 done/total 上报进度"""
+        fraction = min(max(done / total, 0.0), 1.0) if total > 0 else 1.0
+        percent = int(self.start + (self.end - self.start) * fraction)
+        with self._lock:
+            if percent <= self._last:
+                return
+            self._last = percent
+        self.report(percent, message)
+
+    def callback(self, message: str) -> Callable[[int, int], None]:
+        """返回 (done, total) 形式的回调，描述中附带 done/total"""
+        return lambda done, total: self.update(done, total, f"{message} {done}/{total}")
+
+
+class DiarizationPipeline:
+    """切分 → 嵌入（并发）→ NISQA 提前评分 的生产者/消费者流水线"""
+
+    def __init__(
+        self,
+        embedder,
+        prescorer=None,
+        num_embed_workers: int = 1,
+        chunk_size: int = 32,
+        queue_size: int = 256,
+        prescore_min_priority: float = 4.0,
+        progress_callback: Optional[Callable[[float, str], None]] = None
+    ):
+        """
+        Args:
+            embedder: SpeakerEmbeddingExtractor（需提供 extract_embeddings）；
+                未声明 thread_safe = True 时多个嵌入线程对它的调用串行执行
+                （共享模型和批量校验状态不能并发访问）
+            prescorer: NISQAScorer（需提供 prescore_candidates），None 表示不提前评分
+            num_embed_workers: 并发提取嵌入的线程数
+            chunk_size: 每个嵌入线程一次取出的最大片段数
+            queue_size: 切分→嵌入队列的容量（满时切分等待）
+            prescore_min_priority: 提前评分的最低片段优先级
+            progress_callback: 进度回调 (完成比例 0~1, 描述)，按切分和嵌入的完成片段数加权
+                （提前评分不在关键路径上，不计入进度）
+        """
+        self.embedder = embedder
+        self.prescorer = prescorer
+        self.num_embed_workers = max(1, num_embed_workers)
+        self.chunk_size = max(1, chunk_size)
+        self.queue_size = queue_size
+        self.prescore_min_priority = prescore_min_priority
+        self.progress_callback = progress_callback
+
+        self.timings: Dict[str, float] = {}
+        self._known_features: Dict[str, Dict[str, float]] = {}
+        self._known_scores: Dict[str, float] = {}
+        self._prescore_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._embed_lock = None if getattr(embedder, 'thread_safe', False) else threading.Lock()
+        self._counts = {'total': 0, 'extracted': 0, 'embedded': 0}
+
+    def run(self, extract: Callable[[Callable[[SegmentBuffer, int], None]], List[SegmentBuffer]]
+            ) -> Tuple[List[SegmentBuffer], List[Optional[np.ndarray]]]:
+        """
+        执行切分和嵌入提取，全部嵌入完成后返回（提前评分在后台继续，用 wait_prescores 获取结果）
+
+        Args:
+            extract: 切分函数，接收 on_segment 回调并返回全部片段
+                （如 lambda cb: extractor.extract_segment_buffers(video, srt, on_segment=cb)）
+
+        Returns:
+            (片段列表, 与片段一一对应的嵌入列表)
+        """
+        start = time.time()
+        embed_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        prescore_queue: Optional["queue.Queue"] = queue.Queue() if self.prescorer is not None else None
+        embeddings_by_index: Dict[int, Optional[np.ndarray]] = {}
+        errors: List[BaseException] = []
+        embed_seconds = [0.0]
+
+        def on_segment(buffer: SegmentBuffer, total: int):
+            with self._lock:
+                self._counts['total'] = total
+                self._counts['extracted'] += 1
+            embed_queue.put(buffer)
+            if prescore_queue is not None:
+                prescore_queue.put(buffer)
+            self._report()
+
+        def embed_worker():
+            while True:
+                chunk = self._take_chunk(embed_queue)
+                if chunk is None:
+                    return
+                if errors:
+                    continue  # 出错后只清空队列，避免切分线程阻塞
+                chunk_start = time.time()
+                try:
+                    with self._embed_lock or nullcontext():
+                        embeddings = self.embedder.extract_embeddings(chunk, save_cache=False)
+                except BaseException as e:
+                    errors.append(e)
+                    continue
+                with self._lock:
+                    for buffer, embedding in zip(chunk, embeddings):
+                        embeddings_by_index[buffer.index] = embedding
+                    self._counts['embedded'] += len(chunk)
+                    embed_seconds[0] += time.time() - chunk_start
+                self._report()
+
+        workers = [
+            threading.Thread(target=embed_worker, name=f"diarization-embed-{i}", daemon=True)
+            for i in range(self.num_embed_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        if prescore_queue is not None:
+            self._prescore_thread = threading.Thread(
+                target=self._prescore_worker, args=(prescore_queue,), name="diarization-prescore", daemon=True
+            )
+            self._prescore_thread.start()
+
+        # 切分在当前线程执行；结束（含失败）后通知所有消费者退出
+        try:
+            buffers = extract(on_segment)
+            self.timings['extract_seconds'] = time.time() - start
+        finally:
+            for _ in workers:
+                embed_queue.put(_DONE)
+            if prescore_queue is not None:
+                prescore_queue.put(_DONE)
+            for worker in workers:
+                worker.join()
+
+        if errors:
+            raise errors[0]
+
+        # 回退提取等情况下可能缺少回调，补齐未提取嵌入的片段
+        missing = [buffer for buffer in buffers if buffer.index not in embeddings_by_index]
+        if missing:
+            for buffer, embedding in zip(missing, self.embedder.extract_embeddings(missing, save_cache=False)):
+                embeddings_by_index[buffer.index] = embedding
+
+        if getattr(self.embedder, 'cache', None) is not None:
+            try:
+                self.embedder.cache.save()
+            except Exception as e:
+                print(f"[嵌入缓存] 保存缓存失败: {e}")
+
+        self.timings['embed_seconds'] = embed_seconds[0]
+        self.timings['front_seconds'] = time.time() - start
+        print(f"[流水线] 切分+嵌入完成: {len(buffers)} 个片段, 总耗时 {self.timings['front_seconds']:.2f}s "
+              f"(切分 {self.timings['extract_seconds']:.2f}s, 嵌入累计 {embed_seconds[0]:.2f}s, "
+              f"{self.num_embed_workers} 个嵌入线程)", flush=True)
+
+        return buffers, [embeddings_by_index.get(buffer.index) for buffer in buffers]
+
+    def wait_prescores(self) -> Tuple[Dict[str, Dict[str, float]], Dict[str, float]]:
+        """
+        等待提前评分完成
+
+        Returns:
+            ({片段key: 廉价特征}, {片段key: MOS分数})，可直接传给 NISQAScorer.score_speaker_audios
+        """
+        if self._prescore_thread is not None:
+            self._prescore_thread.join()
+            self._prescore_thread = None
+        return self._known_features, self._known_scores
+
+    def _take_chunk(self, source: "queue.Queue") -> Optional[List[SegmentBuffer]]:
+        """阻塞取出一个片段，再取出队列中已有的片段凑成一块；收到结束标记且没有片段时返回 None"""
+        item = source.get()
+        if item is _DONE:
+            return None
+        chunk = [item]
+        while len(chunk) < self.chunk_size:
+            try:
+                item = source.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                # 放回结束标记，由本线程下一次取出后退出
+                source.put(_DONE)
+                break
+            chunk.append(item)
+        return chunk
+
+    def _prescore_worker(self, source: "queue.Queue"):
+        """对切分出的片段计算廉价特征并提前评分，失败时停止评分（不影响主流程）"""
+        start = time.time()
+        failed = False
+        while True:
+            chunk = self._take_chunk(source)
+            if chunk is None:
+                break
+            if not failed:
+                try:
+                    features, scores = self.prescorer.prescore_candidates(chunk, self.prescore_min_priority)
+                    with self._lock:
+                        self._known_features.update(features)
+                        self._known_scores.update(scores)
+                except Exception as e:
+                    print(f"[流水线] NISQA 提前评分失败，改为聚类后评分: {e}", flush=True)
+                    failed = True
+
+        self.timings['prescore_seconds'] = time.time() - start
+        print(f"[流水线] NISQA 提前评分完成: {len(self._known_scores)} 个片段, "
+              f"耗时 {self.timings['prescore_seconds']:.2f}s", flush=True)
+
+    def _report(self):
+        """按切分 1 : 嵌入 2 的权重汇报完成比例"""
+        if self.progress_callback is None:
+            return
+        with self._lock:
+            counts = dict(self._counts)
+        total = counts['total']
+        if total <= 0:
+            return
+
+        fraction = (min(counts['extracted'], total) + 2 * min(counts['embedded'], total)) / (3 * total)
+        message = f"音频切分 {counts['extracted']}/{total}，特征提取 {counts['embedded']}/{total}"
+        self.progress_callback(fraction, message)
@@ -1,7 +1,8 @@
 """
-多进程批量生成脚本 - 按说话人并行处理
-充分利用多GPU或单GPU的显存，每个进程处理一个说话人
-在 fish-speech 环境中运行
+多进程批量生成脚本 - 多个 worker 并行处理
+充分利用多GPU或单GPU的显存；片段按估算耗时分配给 worker（见 tts_scheduler.plan_assignments），
+同一说话人尽量在同一个 worker，工作量过大的说话人拆到多个 worker
+在 fish-speech 环境中运行（常驻工作进程不可用时由 SimpleFishCloner 调用）
 """
 import os
 import sys
@@ -200,7 +201,7 @@ def get_gpu_info():
     return gpu_count, gpu_memory
 
 
-def calculate_worker_count(gpu_count: int, gpu_memory: List[float], speaker_count: int):
+def calculate_worker_count(gpu_count: int, gpu_memory: List[float], max_workers: int):
     """
     计算可以并行的 worker 数量
 
@@ -208,6 +209,7 @@ def calculate_worker_count(gpu_count: int, gpu_memory: List[float], speaker_coun
     - 每个 GPU 根据显存大小运行多个 worker
     - 模型大约需要 6-8 GB 显存
     - 自动计算每个 GPU 可以容纳的 worker 数量
+    - 总数不超过 max_workers（片段数；说话人可以拆分，不再受说话人数量限制）
     """
     if gpu_count == 0:
         return 1, [0]  # CPU 模式，只用 1 个进程，返回 (worker_count, gpu_assignment)
@@ -227,10 +229,10 @@ def calculate_worker_count(gpu_count: int, gpu_memory: List[float], speaker_coun
         total_workers += max_workers_on_gpu
         print(f"[GPU {i}] Can run {max_workers_on_gpu} workers (Available: {available_memory:.2f} GB)", file=sys.stderr)
 
-    # 限制总 worker 数不超过说话人数量
-    if total_workers > speaker_count:
+    # 限制总 worker 数不超过 max_workers
+    if total_workers > max_workers:
         # 按比例缩减
-        scale_factor = speaker_count / total_workers
+        scale_factor = max_workers / total_workers
         workers_per_gpu = [max(1, int(w * scale_factor)) for w in workers_per_gpu]
         total_workers = sum(workers_per_gpu)
 
@@ -239,8 +241,8 @@ def calculate_worker_count(gpu_count: int, gpu_memory: List[float], speaker_coun
     for gpu_id, num_workers in enumerate(workers_per_gpu):
         gpu_assignment.extend([gpu_id] * num_workers)
 
-    # 限制到说话人数量
-    gpu_assignment = gpu_assignment[:speaker_count]
+    # 限制到 max_workers
+    gpu_assignment = gpu_assignment[:max_workers]
     actual_workers = len(gpu_assignment)
 
     return actual_workers, gpu_assignment
@@ -276,7 +278,7 @@ def main():
     print(f"[Main] Speakers: {speaker_count}", file=sys.stderr)
 
     # 计算 worker 数量和 GPU 分配
-    worker_count, gpu_assignment = calculate_worker_count(gpu_count, gpu_memory, speaker_count)
+    worker_count, gpu_assignment = calculate_worker_count(gpu_count, gpu_memory, len(tasks))
     print(f"[Main] Using {worker_count} parallel workers across {gpu_count} GPU(s)", file=sys.stderr)
 
     # 显示 GPU 分配详情
@@ -288,67 +290,37 @@ def main():
 
     # 创建结果队列
     result_queue = mp.Queue()
-
-    # 创建进程池
-    processes = []
     all_results = {}
 
-    speaker_items = list(tasks_by_speaker.items())
-
-    # 按工作量（文本数量）智能分配说话人给 workers
-    # 两级负载均衡：先按 GPU 均衡，再按 worker 均衡
-    worker_assignments = [[] for _ in range(worker_count)]
-    worker_loads = [0] * worker_count  # 每个 worker 的总文本数
-
-    # 先按文本数量降序排序说话人（大任务优先分配）
-    speaker_items_sorted = sorted(speaker_items, key=lambda x: len(x[1]), reverse=True)
+    # 按估算耗时（文本长度、语言）分配片段：同一说话人尽量在同一个 worker（prompt 只加载一次），
+    # 工作量超过平均负载的说话人拆给多个 worker
+    from tts_scheduler import estimate_cost, plan_assignments
 
     print(f"\n[Main] Speaker workload analysis:", file=sys.stderr)
-    for speaker_id, speaker_tasks in speaker_items_sorted:
-        print(f"  Speaker {speaker_id}: {len(speaker_tasks)} texts", file=sys.stderr)
-
-    # 构建 GPU -> workers 映射
-    gpu_to_workers = defaultdict(list)
-    for worker_idx, gpu_id in enumerate(gpu_assignment):
-        gpu_to_workers[gpu_id].append(worker_idx)
-
-    # 计算每个 GPU 的当前负载
-    gpu_loads = {gpu_id: 0 for gpu_id in gpu_to_workers.keys()}
-
-    print(f"\n[Main] GPU to workers mapping:", file=sys.stderr)
-    for gpu_id, workers in sorted(gpu_to_workers.items()):
-        print(f"  GPU {gpu_id}: Workers {workers}", file=sys.stderr)
-
-    # 两级贪心分配：
-    # 1. 先选择负载最少的 GPU
-    # 2. 再在该 GPU 的 workers 中选择负载最少的 worker
-    for speaker_id, speaker_tasks in speaker_items_sorted:
-        task_count = len(speaker_tasks)
-
-        # 第一级：找到当前负载最少的 GPU
-        min_load_gpu = min(gpu_loads.keys(), key=lambda g: gpu_loads[g])
-
-        # 第二级：在该 GPU 的 workers 中找到负载最少的 worker
-        candidate_workers = gpu_to_workers[min_load_gpu]
-        min_load_worker = min(candidate_workers, key=lambda w: worker_loads[w])
-
-        # 分配给该 worker
-        worker_assignments[min_load_worker].append((speaker_id, speaker_tasks))
-        worker_loads[min_load_worker] += task_count
-        gpu_loads[min_load_gpu] += task_count
-
-    # 显示 GPU 级别负载统计
-    print(f"\n[Main] GPU load distribution:", file=sys.stderr)
-    for gpu_id in sorted(gpu_loads.keys()):
-        print(f"  GPU {gpu_id}: {gpu_loads[gpu_id]} texts total", file=sys.stderr)
+    for speaker_id, speaker_tasks in sorted(tasks_by_speaker.items(), key=lambda x: len(x[1]), reverse=True):
+        speaker_cost = sum(estimate_cost(task) for task in speaker_tasks)
+        print(f"  Speaker {speaker_id}: {len(speaker_tasks)} texts, est. {speaker_cost:.0f}s", file=sys.stderr)
+
+    worker_assignments = []
+    for worker_tasks in plan_assignments(tasks, worker_count):
+        # 转换为 [(speaker_id, speaker_tasks), ...]（plan 中同一说话人的片段相邻）
+        assigned = []
+        for task in worker_tasks:
+            if assigned and assigned[-1][0] == task["speaker_id"]:
+                assigned[-1][1].append(task)
+            else:
+                assigned.append((task["speaker_id"], [task]))
+        worker_assignments.append(assigned)
 
     # 显示 Worker 分配详情
-    print(f"\n[Main] Speaker assignment (GPU-balanced):", file=sys.stderr)
+    print(f"\n[Main] Speaker assignment (cost-balanced):", file=sys.stderr)
     for worker_idx, assigned in enumerate(worker_assignments):
         gpu_id = gpu_assignment[worker_idx] if worker_idx < len(gpu_assignment) else 0
         speaker_ids = [sid for sid, _ in assigned]
         total_texts = sum(len(tasks) for _, tasks in assigned)
-        print(f"  Worker {worker_idx} (GPU {gpu_id}): {len(assigned)} speakers (IDs: {speaker_ids}), {total_texts} texts", file=sys.stderr)
+        total_cost = sum(estimate_cost(task) for _, tasks in assigned for task in tasks)
+        print(f"  Worker {worker_idx} (GPU {gpu_id}): {len(assigned)} speakers (IDs: {speaker_ids}), "
+              f"{total_texts} texts, est. {total_cost:.0f}s", file=sys.stderr)
 
     # 启动所有 worker 进程
     print(f"\n[Main] Launching {worker_count} workers...", file=sys.stderr)
@@ -12,6 +12,7 @@ from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Dict, List
 from loguru import logger
 from fish_worker_process import worker_process_main, init_worker_process
+from tts_scheduler import plan_assignments
 
 
 # fish-speech 仓库路径
@@ -235,13 +236,15 @@ class ParallelFishCloner:
         num_workers: int
     ) -> List[List[int]]:
         """
-        负载均衡算法 - 贪心策略
+        负载均衡算法 - 按估算耗时的贪心策略（LPT）
 
-        目标：将说话人分配给各个 worker，使各 worker 的任务数尽量均衡
+        目标：将说话人分配给各个 worker，使各 worker 的估算生成耗时尽量均衡
+        （按目标文本长度和语言估算，见 tts_scheduler.estimate_cost；片段数相同的说话人耗时可能相差数倍）
 
         策略：
-        1. 按任务数量对说话人降序排序
-        2. 每次将任务最多的说话人分配给当前负载最小的 worker
+        1. 按估算总耗时对说话人降序排序
+        2. 每次将耗时最多的说话人分配给当前负载最小的 worker
+        （worker 以说话人为单位加载 prompt，这里不拆分说话人）
 
         Args:
             tasks_by_speaker: 按说话人分组的任务
@@ -250,27 +253,19 @@ class ParallelFishCloner:
         Returns:
             分配方案 [[speaker_id1, speaker_id2], [speaker_id3], ...]
         """
-        # 按任务数量降序排序说话人
-        sorted_speakers = sorted(
-            tasks_by_speaker.keys(),
-            key=lambda sid: len(tasks_by_speaker[sid]),
-            reverse=True
-        )
-
-        # 初始化 worker 分配和负载统计
-        worker_assignments = [[] for _ in range(num_workers)]
-        worker_loads = [0] * num_workers
-
-        # 贪心分配
-        for speaker_id in sorted_speakers:
-            task_count = len(tasks_by_speaker[speaker_id])
-
-            # 找到当前负载最小的 worker
-            min_load_worker = worker_loads.index(min(worker_loads))
-
-            # 分配给该 worker
-            worker_assignments[min_load_worker].append(speaker_id)
-            worker_loads[min_load_worker] += task_count
+        tasks = [dict(task, speaker_id=speaker_id)
+                 for speaker_id, speaker_tasks in tasks_by_speaker.items()
+                 for task in speaker_tasks]
+        plan = plan_assignments(tasks, num_workers, split_groups=False)
+
+        # 转换为每个 worker 的说话人列表
+        worker_assignments = []
+        for worker_tasks in plan:
+            speaker_ids = []
+            for task in worker_tasks:
+                if task["speaker_id"] not in speaker_ids:
+                    speaker_ids.append(task["speaker_id"])
+            worker_assignments.append(speaker_ids)
 
         return worker_assignments
 
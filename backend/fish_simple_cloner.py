@@ -3,8 +3,10 @@
 完全参照 batch_inference.py 的实现方式
 
 支持两种模式：
-1. 单进程模式（默认）：模型只加载一次，逐个处理
-2. 多进程模式：按说话人并行处理，充分利用显存
+1. 单进程模式（默认）：在 fish-speech 环境的常驻工作进程中生成（见 tts_worker_client），模型只加载一次，
+   常驻进程不可用或 TTS_WORKER_DAEMON=0 时回退到每次调用脚本的子进程方式
+2. 多进程模式：每块 GPU 按显存运行多个常驻工作进程，片段按估算耗时动态分配（见 tts_scheduler），
+   同一说话人尽量留在同一个进程；常驻进程不可用时回退到 fish_multiprocess_generate.py
 
 作者：Claude
 """
@@ -17,6 +19,9 @@ from pathlib import Path
 from typing import Dict, List
 from loguru import logger
 
+from tts_scheduler import run_distributed
+from tts_worker_client import TTSWorkerError, tts_workers
+
 
 class SimpleFishCloner:
     """
@@ -255,6 +260,67 @@ class SimpleFishCloner:
             except:
                 pass
 
+    def _worker_gpu_slots(self, task_count: int) -> List[int]:
+        """
+        多进程模式下每个常驻进程所在的 GPU（每块 GPU 按显存容纳 FISH_MODEL_MEMORY_GB 大小的模型若干个）
+
+        Returns:
+            GPU ID 列表（各 GPU 交错排列，数量不超过片段数），没有 GPU 时为 [0]
+        """
+        try:
+            import torch
+
+            gpu_count = torch.cuda.device_count() if torch.cuda.is_available() else 0
+            if gpu_count == 0:
+                return [0]
+            model_memory_gb = float(os.environ.get("FISH_MODEL_MEMORY_GB", "8.0"))
+            per_gpu = []
+            for gpu_id in range(gpu_count):
+                memory_gb = torch.cuda.get_device_properties(gpu_id).total_memory / 1024**3
+                per_gpu.append(max(1, int(memory_gb * 0.9 / model_memory_gb)))
+        except Exception as e:
+            logger.warning(f"[多进程] GPU检测失败: {e}，使用 1 个进程")
+            return [0]
+
+        slots = [gpu_id for round_index in range(max(per_gpu))
+                 for gpu_id, count in enumerate(per_gpu) if round_index < count]
+        return slots[:max(1, task_count)]
+
+    def _generate_on_workers(self, tasks: List[Dict], progress_callback=None) -> Dict[int, str]:
+        """多个 Fish 常驻进程并行生成，片段按估算耗时动态分配，同一说话人尽量在同一进程（复用 prompt）"""
+        slots = self._worker_gpu_slots(len(tasks))
+        logger.info(f"多进程模式：{len(slots)} 个常驻进程 (GPU {slots})")
+
+        def make_runner(device_key: str, options: Dict):
+            def run(batch: List[Dict], batch_progress) -> Dict[int, str]:
+                return tts_workers.run(
+                    "fish",
+                    self.fish_python,
+                    batch,
+                    device=device_key,
+                    options=options,
+                    cwd=self.fish_speech_dir,
+                    progress_callback=batch_progress
+                )["results"]
+            return run
+
+        base_options = {"fish_speech_dir": self.fish_speech_dir, "checkpoint_dir": self.checkpoint_dir}
+        runners = {}
+        for slot, gpu_id in enumerate(slots):
+            nth = slots[:slot].count(gpu_id)
+            if gpu_id == 0 and nth == 0:
+                # 与单进程模式共用同一个常驻进程
+                runners["GPU 0"] = make_runner("0", base_options)
+            else:
+                runners[f"GPU {gpu_id}#{nth}"] = make_runner(
+                    f"{gpu_id}.{nth}", dict(base_options, device=f"cuda:{gpu_id}")
+                )
+
+        results, report = run_distributed(tasks, runners, progress_callback=progress_callback, label="Fish")
+        tts_workers.record_schedule(report)
+        logger.info(f"✅ 生成完成！生成 {len(results)} 个音频文件（{len(runners)} 个常驻进程）")
+        return results
+
     def batch_generate_audio(
         self,
         tasks: List[Dict],
@@ -316,6 +382,26 @@ class SimpleFishCloner:
                 )
             })
 
+        if tts_workers.enabled and self.use_multiprocess and generate_config["tasks"]:
+            try:
+                return self._generate_on_workers(generate_config["tasks"], progress_callback)
+            except TTSWorkerError as e:
+                tts_workers.record_fallback("fish", e)
+        elif tts_workers.enabled and generate_config["tasks"]:
+            try:
+                result = tts_workers.run(
+                    "fish",
+                    self.fish_python,
+                    generate_config["tasks"],
+                    options={"fish_speech_dir": self.fish_speech_dir, "checkpoint_dir": self.checkpoint_dir},
+                    cwd=self.fish_speech_dir,
+                    progress_callback=progress_callback
+                )
+                logger.info(f"✅ 生成完成！生成 {len(result['results'])} 个音频文件（常驻进程）")
+                return result["results"]
+            except TTSWorkerError as e:
+                tts_workers.record_fallback("fish", e)
+
         # 写入临时配置
         with tempfile.NamedTemporaryFile(
             mode='w',
@@ -3,11 +3,17 @@
 使用Wav2Vec2模型对音频进行男女声识别
 """
 import os
+import numpy as np
 import torch
 import librosa
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional, Union
 from transformers import Wav2Vec2ForSequenceClassification, Wav2Vec2FeatureExtractor
 from audio_silence_trimmer import AudioSilenceTrimmer
+from segment_buffer import SegmentBuffer, load_audio
+from model_registry import model_registry
+
+# 女声概率 >= 该阈值即判定为女声（对女声识别更宽松）
+FEMALE_THRESHOLD = 0.4
 
 
 class GenderClassifier:
@@ -60,25 +66,33 @@ class GenderClassifier:
         return "prithivMLmods/Common-Voice-Geneder-Detection"
 
     def load_model(self):
-        """懒加载模型"""
+        """懒加载模型（通过模型注册表在进程内共享）"""
         if self.model is None:
-            print(f"加载性别识别模型: {self.model_name}")
-            self.model = Wav2Vec2ForSequenceClassification.from_pretrained(
-                self.model_name,
-                local_files_only=os.path.exists(self.model_name) and os.path.isdir(self.model_name)
-            )
-            self.processor = Wav2Vec2FeatureExtractor.from_pretrained(
-                self.model_name,
-                local_files_only=os.path.exists(self.model_name) and os.path.isdir(self.model_name)
+            self.model, self.processor = model_registry.get(
+                f"gender:{self.model_name}", self._load_from_pretrained, device="cpu"
             )
-            print("性别识别模型加载完成")
 
-    def classify_audio(self, audio_path: str) -> Dict[str, float]:
+    def _load_from_pretrained(self) -> Tuple[Wav2Vec2ForSequenceClassification, Wav2Vec2FeatureExtractor]:
+        """从模型目录加载模型和特征提取器"""
+        print(f"加载性别识别模型: {self.model_name}")
+        local_only = os.path.exists(self.model_name) and os.path.isdir(self.model_name)
+        model = Wav2Vec2ForSequenceClassification.from_pretrained(self.model_name, local_files_only=local_only)
+        processor = Wav2Vec2FeatureExtractor.from_pretrained(self.model_name, local_files_only=local_only)
+        model.eval()
+        print("性别识别模型加载完成")
+        return model, processor
+
+    def classify_audio(
+        self,
+        audio_path: Union[str, np.ndarray, SegmentBuffer],
+        sample_rate: int = 16000
+    ) -> Dict[str, float]:
         """
-        对音频文件进行性别分类
+        对音频进行性别分类
 
         Args:
-            audio_path: 音频文件路径
+            audio_path: 音频文件路径、音频数组或内存片段
+            sample_rate: 音频数组的采样率（仅当传入数组时使用）
 
         Returns:
             Dict[str, float]: 性别预测结果，格式: {"female": 0.123, "male": 0.877}
@@ -86,7 +100,13 @@ class GenderClassifier:
         self.load_model()
 
         # 加载并重采样音频到16kHz
-        speech, sample_rate = librosa.load(audio_path, sr=16000)
+        if isinstance(audio_path, np.ndarray):
+            speech = np.asarray(audio_path, dtype=np.float32)
+            if sample_rate != 16000:
+                speech = librosa.resample(speech, orig_sr=sample_rate, target_sr=16000)
+            sample_rate = 16000
+        else:
+            speech, sample_rate = load_audio(audio_path, sample_rate=16000)
 
         # 处理音频
         inputs = self.processor(
@@ -107,6 +127,80 @@ class GenderClassifier:
 
         return prediction
 
+    def classify_audio_batch(
+        self,
+        audios: List[Union[str, np.ndarray, SegmentBuffer]],
+        sample_rate: int = 16000,
+        max_batch_seconds: float = 120.0
+    ) -> List[Optional[Dict[str, float]]]:
+        """
+        批量性别分类：按长度排序分桶，补零并使用 attention mask，每个桶一次前向推理
+
+        模型的特征提取器不支持 attention mask 时（补零会影响归一化结果），每条音频单独推理
+
+        Args:
+            audios: 音频文件路径、音频数组或内存片段列表
+            sample_rate: 音频数组的采样率（仅当传入数组时使用）
+            max_batch_seconds: 每个桶补零后的总时长上限（秒）
+
+        Returns:
+            List[Optional[Dict[str, float]]]: 与输入顺序一致的预测结果，读取或推理失败时为 None
+        """
+        self.load_model()
+
+        # 加载并重采样音频到16kHz
+        speeches = []
+        for audio in audios:
+            try:
+                if isinstance(audio, np.ndarray):
+                    speech = np.asarray(audio, dtype=np.float32)
+                    if sample_rate != 16000:
+                        speech = librosa.resample(speech, orig_sr=sample_rate, target_sr=16000)
+                else:
+                    speech, _ = load_audio(audio, sample_rate=16000)
+                speeches.append(speech if len(speech) > 0 else None)
+            except Exception as e:
+                print(f"  读取音频失败: {e}")
+                speeches.append(None)
+
+        # 按长度排序后分桶：桶内最长音频 × 条数 不超过预算
+        supports_mask = bool(getattr(self.processor, "return_attention_mask", False))
+        max_batch_samples = int(max_batch_seconds * 16000)
+        order = sorted((i for i, s in enumerate(speeches) if s is not None), key=lambda i: len(speeches[i]))
+        buckets = []
+        current = []
+        for i in order:
+            if current and (not supports_mask or len(speeches[i]) * (len(current) + 1) > max_batch_samples):
+                buckets.append(current)
+                current = []
+            current.append(i)
+        if current:
+            buckets.append(current)
+
+        predictions = [None] * len(audios)
+        for bucket in buckets:
+            try:
+                inputs = self.processor(
+                    [speeches[i] for i in bucket],
+                    sampling_rate=16000,
+                    return_tensors="pt",
+                    padding=True,
+                    return_attention_mask=supports_mask
+                )
+                with torch.no_grad():
+                    logits = self.model(**inputs).logits
+                    probs = torch.nn.functional.softmax(logits, dim=-1).tolist()
+            except Exception as e:
+                print(f"  批量性别识别失败（{len(bucket)} 条）: {e}")
+                continue
+
+            for i, row in zip(bucket, probs):
+                predictions[i] = {
+                    self.id2label[str(j)]: round(row[j], 3) for j in range(len(row))
+                }
+
+        return predictions
+
     def get_gender(self, audio_path: str) -> str:
         """
         获取音频的性别标签（male或female）
@@ -120,7 +214,7 @@ class GenderClassifier:
         prediction = self.classify_audio(audio_path)
         # 如果女声概率 >= 0.4，识别为女声，否则识别为男声
         # 这样设计是为了让模型对女声的识别更加宽松
-        return "female" if prediction["female"] >= 0.4 else "male"
+        return "female" if prediction["female"] >= FEMALE_THRESHOLD else "male"
 
     def select_best_audio_for_gender_classification(
         self,
@@ -356,6 +450,92 @@ class GenderClassifier:
                 min_duration=min_duration
             )
 
+    def select_best_audio_in_memory(
+        self,
+        scored_segments: List[Tuple[str, float]],
+        segment_buffers: Dict[str, SegmentBuffer],
+        min_duration: float = 2.0,
+        min_final_duration: float = 1.5
+    ) -> np.ndarray:
+        """
+        内存版最佳音频选择：与 select_best_audio_with_silence_trimming 的累积规则相同，
+        但直接使用内存片段，不写临时文件
+
+        Args:
+            scored_segments: MOS评分后的片段列表，每个元素为(音频路径, MOS分数)
+            segment_buffers: 片段key到内存片段的映射，未命中的片段从磁盘读取
+            min_duration: 原始音频的最小时长阈值（秒）
+            min_final_duration: 切割后音频的最小可接受时长（秒）
+
+        Returns:
+            np.ndarray: 选中并处理后的16kHz音频数据
+        """
+        if not scored_segments:
+            raise ValueError("没有可用的音频片段")
+
+        print(f"\n[音频选择] 开始累积式选择并预处理音频（内存模式），共 {len(scored_segments)} 个候选片段")
+        print(f"[音频选择] 目标累计时长: ≥{min_final_duration}s")
+
+        sorted_segments = sorted(scored_segments, key=lambda x: x[1], reverse=True)
+
+        trimmer = AudioSilenceTrimmer(
+            threshold_db=-40.0,
+            frame_length_ms=25.0,
+            hop_length_ms=10.0
+        )
+
+        # 加载候选音频（内存片段直接引用，不复制）
+        candidates = []
+        for audio_path, mos_score in sorted_segments:
+            try:
+                audio_data, sr = load_audio(segment_buffers.get(audio_path, audio_path), sample_rate=16000)
+                candidates.append((audio_path, mos_score, audio_data))
+            except Exception as e:
+                print(f"[音频选择] ✗ 加载失败 {audio_path}: {e}")
+
+        if not candidates:
+            raise ValueError("没有可加载的音频片段")
+
+        # 阶段1处理时长≥min_duration的片段，阶段2处理其余片段
+        long_candidates = [c for c in candidates if len(c[2]) / 16000 >= min_duration]
+        short_candidates = [c for c in candidates if len(c[2]) / 16000 < min_duration]
+
+        accumulated_audios = []
+        accumulated_duration = 0.0
+
+        for audio_path, mos_score, audio_data in long_candidates + short_candidates:
+            print(f"\n[音频选择] 尝试片段 {len(accumulated_audios)+1}: {os.path.basename(audio_path)} "
+                  f"(时长: {len(audio_data) / 16000:.2f}s, MOS: {mos_score:.3f})")
+
+            trimmed = trimmer.trim_audio_for_gender_classification(audio_data, 16000, min_final_duration=0.0)
+            if trimmed is None or len(trimmed) == 0:
+                print(f"[音频选择] ✗ 切割后时长为0，跳过")
+                continue
+
+            accumulated_audios.append(trimmed)
+            accumulated_duration += len(trimmed) / 16000
+            print(f"[音频选择] ✓ 已累积: {len(trimmed) / 16000:.2f}s，总计: {accumulated_duration:.2f}s")
+
+            if accumulated_duration >= min_final_duration:
+                print(f"\n[音频选择] ✓ 达到目标时长 {accumulated_duration:.2f}s ≥ {min_final_duration}s")
+                break
+
+        if not accumulated_audios:
+            # 完全没有可用的片段：优先时长≥min_duration且MOS最高的原始音频
+            print(f"\n[音频选择] 警告: 没有任何可用的切割后片段，使用原始音频fallback")
+            fallback = long_candidates[0] if long_candidates else candidates[0]
+            return np.asarray(fallback[2], dtype=np.float32)
+
+        if accumulated_duration < min_final_duration:
+            print(f"\n[音频选择] 警告: 所有片段累计时长 {accumulated_duration:.2f}s < {min_final_duration}s")
+
+        if len(accumulated_audios) == 1:
+            return np.asarray(accumulated_audios[0], dtype=np.float32)
+
+        concatenated = trimmer.concatenate_audio_arrays(accumulated_audios, 16000, silence_duration=0.2)
+        print(f"[音频选择] 已拼接 {len(accumulated_audios)} 个片段，最终时长: {len(concatenated) / 16000:.2f}s")
+        return concatenated
+
     def classify_speakers(
         self,
         scored_segments_dict: Dict[int, List[Tuple[str, float]]],
@@ -363,7 +543,9 @@ class GenderClassifier:
         use_silence_trimming: bool = True,
         min_final_duration: float = 1.5,
         temp_dir: Optional[str] = None,
-        auto_rebalance: bool = True
+        auto_rebalance: bool = True,
+        segment_buffers: Optional[Dict[str, SegmentBuffer]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> Tuple[Dict[int, str], Dict[int, Dict[str, float]]]:
         """
         对所有说话人进行性别分类
@@ -375,6 +557,8 @@ class GenderClassifier:
             min_final_duration: 切割后的最小可接受时长
             temp_dir: 临时文件目录
             auto_rebalance: 是否自动重平衡性别分配（处理异常分布）
+            segment_buffers: 片段key到内存片段的映射；提供时在内存中完成选择和切割，不写临时文件
+            progress_callback: 进度回调 (已完成步数, 总步数)，每个说话人的音频选择算一步，批量识别算一步
 
         Returns:
             Tuple[Dict[int, str], Dict[int, Dict[str, float]]]:
@@ -384,12 +568,24 @@ class GenderClassifier:
         gender_results = {}
         prob_results = {}
 
-        for speaker_id, scored_segments in scored_segments_dict.items():
-            print(f"\n对说话人 {speaker_id} 进行性别识别...")
+        # 1. 为每个说话人选择用于识别的音频
+        selected_audios = {}
+        total_steps = len(scored_segments_dict) + 1
+        for position, (speaker_id, scored_segments) in enumerate(scored_segments_dict.items()):
+            if progress_callback is not None and position > 0:
+                progress_callback(position, total_steps)
+            print(f"\n为说话人 {speaker_id} 选择性别识别音频...")
 
             try:
                 # 选择最佳音频
-                if use_silence_trimming:
+                if use_silence_trimming and segment_buffers is not None:
+                    best_audio = self.select_best_audio_in_memory(
+                        scored_segments,
+                        segment_buffers,
+                        min_duration=min_duration,
+                        min_final_duration=min_final_duration
+                    )
+                elif use_silence_trimming:
                     best_audio = self.select_best_audio_with_silence_trimming(
                         scored_segments,
                         min_duration=min_duration,
@@ -403,30 +599,57 @@ class GenderClassifier:
                     )
 
                 # 打印用于性别识别的音频文件信息
-                try:
-                    audio_duration = librosa.get_duration(path=best_audio)
-                    print(f"  用于识别的音频: {os.path.basename(best_audio)}")
-                    print(f"  音频时长: {audio_duration:.2f}s")
-                except Exception as e:
-                    print(f"  用于识别的音频: {best_audio}")
-
-                # 进行性别识别
-                prediction = self.classify_audio(best_audio)
-                # 如果女声概率 >= 0.4，识别为女声，否则识别为男声
-                gender = "female" if prediction["female"] >= 0.4 else "male"
+                if isinstance(best_audio, np.ndarray):
+                    print(f"  用于识别的音频: 内存音频")
+                    print(f"  音频时长: {len(best_audio) / 16000:.2f}s")
+                else:
+                    try:
+                        audio_duration = librosa.get_duration(path=best_audio)
+                        print(f"  用于识别的音频: {os.path.basename(best_audio)}")
+                        print(f"  音频时长: {audio_duration:.2f}s")
+                    except Exception as e:
+                        print(f"  用于识别的音频: {best_audio}")
 
-                print(f"  识别结果: {gender} (male: {prediction['male']:.3f}, female: {prediction['female']:.3f})")
-                print(f"  判定逻辑: female({prediction['female']:.3f}) >= 0.4 ? {'是' if prediction['female'] >= 0.4 else '否'} -> {gender}")
-                gender_results[speaker_id] = gender
-                prob_results[speaker_id] = prediction
+                selected_audios[speaker_id] = best_audio
 
             except Exception as e:
-                print(f"  识别失败: {str(e)}")
+                print(f"  选择音频失败: {str(e)}")
                 import traceback
                 traceback.print_exc()
-                # 默认为male，概率设为0.5表示不确定
+
+        # 2. 所有说话人的音频一起批量识别
+        speaker_ids = list(selected_audios.keys())
+        try:
+            predictions = self.classify_audio_batch([selected_audios[sid] for sid in speaker_ids])
+        except Exception as e:
+            print(f"批量性别识别失败: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            predictions = [None] * len(speaker_ids)
+
+        if progress_callback is not None:
+            progress_callback(total_steps, total_steps)
+
+        # 3. 按阈值判定性别；识别失败的默认为male，概率设为0.5表示不确定
+        predictions_by_speaker = dict(zip(speaker_ids, predictions))
+        for speaker_id in scored_segments_dict:
+            prediction = predictions_by_speaker.get(speaker_id)
+
+            print(f"\n说话人 {speaker_id} 性别识别:")
+            if prediction is None:
+                print(f"  识别失败，默认为 male")
                 gender_results[speaker_id] = "male"
                 prob_results[speaker_id] = {"male": 0.5, "female": 0.5}
+                continue
+
+            # 如果女声概率 >= 0.4，识别为女声，否则识别为男声
+            is_female = prediction["female"] >= FEMALE_THRESHOLD
+            gender = "female" if is_female else "male"
+
+            print(f"  识别结果: {gender} (male: {prediction['male']:.3f}, female: {prediction['female']:.3f})")
+            print(f"  判定逻辑: female({prediction['female']:.3f}) >= {FEMALE_THRESHOLD} ? {'是' if is_female else '否'} -> {gender}")
+            gender_results[speaker_id] = gender
+            prob_results[speaker_id] = prediction
 
         # 自动重平衡性别分配
         if auto_rebalance:
@@ -99,6 +99,57 @@ def load_model(model_dir: str, device: str):
         os.chdir(original_dir)
 
 
+def generate_segment(synthesizer, task: Dict, device: str) -> Dict:
+    """
+    生成一个印尼语片段
+
+    Args:
+        synthesizer: TTS Synthesizer 对象
+        task: {segment_index, speaker_name, target_text, output_file}
+        device: 设备
+
+    Returns:
+        结果字典（status 为 success 或 error）
+    """
+    segment_index = task["segment_index"]
+    output_file = task["output_file"]
+
+    # 确保输出目录存在
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    try:
+        # 生成语音
+        inference_start = time.time()
+        wav = synthesizer.tts(text=task["target_text"], speaker_name=task["speaker_name"])
+        inference_time = time.time() - inference_start
+
+        # 保存音频
+        synthesizer.save_wav(wav, output_file)
+
+        # 清理显存
+        del wav
+        if device == "cuda":
+            torch.cuda.empty_cache()
+
+        return {
+            "segment_index": segment_index,
+            "status": "success",
+            "output_file": output_file,
+            "inference_time": round(inference_time, 3)
+        }
+
+    except Exception as e:
+        print(f"[ERROR] Segment {segment_index} failed: {e}", file=sys.stderr)
+        return {
+            "segment_index": segment_index,
+            "status": "error",
+            "error_message": str(e),
+            "inference_time": 0
+        }
+
+
 def batch_generate(
     synthesizer,
     tasks: List[Dict],
@@ -130,48 +181,13 @@ def batch_generate(
 
         for task in speaker_tasks:
             current_task += 1
-            segment_index = task["segment_index"]
-            target_text = task["target_text"]
-            output_file = task["output_file"]
-
-            # 确保输出目录存在
-            output_dir = os.path.dirname(output_file)
-            if output_dir:
-                os.makedirs(output_dir, exist_ok=True)
-
-            try:
-                # 生成语音
-                inference_start = time.time()
-                wav = synthesizer.tts(text=target_text, speaker_name=speaker_name)
-                inference_time = time.time() - inference_start
-
-                # 保存音频
-                synthesizer.save_wav(wav, output_file)
-
-                # 清理显存
-                del wav
-                if device == "cuda":
-                    torch.cuda.empty_cache()
-
-                results.append({
-                    "segment_index": segment_index,
-                    "status": "success",
-                    "output_file": output_file,
-                    "inference_time": round(inference_time, 3)
-                })
+            result = generate_segment(synthesizer, task, device)
+            results.append(result)
 
+            if result["status"] == "success":
                 # 输出进度
                 print(f"[BatchGen] 进度: {current_task}/{total_tasks}", file=sys.stderr)
 
-            except Exception as e:
-                results.append({
-                    "segment_index": segment_index,
-                    "status": "error",
-                    "error_message": str(e),
-                    "inference_time": 0
-                })
-                print(f"[ERROR] Segment {segment_index} failed: {e}", file=sys.stderr)
-
     return results
 
 
@@ -1,6 +1,9 @@
 """
 印尼语TTS调用器
 封装印尼语TTS批量生成逻辑（类似 SimpleFishCloner）
+
+优先使用 tts-id 环境中的常驻工作进程（见 tts_worker_client），模型只加载一次；
+常驻进程不可用或 TTS_WORKER_DAEMON=0 时回退到每次调用脚本的子进程方式
 """
 import os
 import subprocess
@@ -8,6 +11,8 @@ import json
 import re
 from typing import List, Dict, Optional, Callable
 
+from tts_worker_client import TTSWorkerError, tts_workers
+
 
 class IndonesianTTSCloner:
     """印尼语TTS批量克隆器"""
@@ -56,6 +61,20 @@ class IndonesianTTSCloner:
         """
         print(f"\n[IndonesianTTS] 开始批量生成 {len(tasks)} 个音频片段...")
 
+        if tts_workers.enabled:
+            try:
+                result = tts_workers.run(
+                    "indonesian",
+                    self.tts_id_env_python,
+                    tasks,
+                    options={"model_dir": self.model_dir},
+                    progress_callback=progress_callback
+                )
+                print(f"[IndonesianTTS] 批量生成完成（常驻进程）: 成功 {len(result['results'])} 个, 失败 {len(result['failed'])} 个")
+                return result["results"]
+            except TTSWorkerError as e:
+                tts_workers.record_fallback("indonesian", e)
+
         # 1. 写入配置文件
         config = {
             "model_dir": self.model_dir,
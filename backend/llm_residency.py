@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 模型驻留管理 - 统一管理 Ollama 大模型（qwen2.5:32b）的加载与卸载
+
+此前每次翻译结束、每次汉字/英文替换请求后都会用 keep_alive=0 或 `ollama stop` 卸载模型，
+同一任务的多个 LLM 阶段、同一批次的多种语言会反复加载 32B 模型。现在：
+
+- 请求统一携带 keep_alive=空闲 TTL，连续的 LLM 阶段之间模型保持驻留，空闲超过 TTL 后由 Ollama 自动卸载
+- 只有语音克隆等需要显存的阶段开始前才调用 release() 主动卸载
+- 反过来，需要加载模型时先调用注册的加载前回调（如关闭空闲的 TTS 常驻进程），释放其他模型占用的显存
+- 记录加载次数、加载耗时、复用次数和卸载次数，供 /api/system/llm 查看
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+DEFAULT_OLLAMA_BASE_URL = "http://127.0.0.1:11434"
+
+
+class _ResidentModel:
+    """一个驻留中的模型"""
+
+    def __init__(self, model: str, load_seconds: float):
+        self.model = model
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.uses = 0
+
+
+class LLMResidencyManager:
+    """Ollama 模型驻留管理（线程安全）"""
+
+    def __init__(self, base_url: str = DEFAULT_OLLAMA_BASE_URL, idle_ttl_seconds: float = 600):
+        """
+        Args:
+            base_url: Ollama 服务地址
+            idle_ttl_seconds: 模型空闲多久后卸载（秒），<= 0 表示一直驻留直到 release()
+        """
+        self.base_url = base_url.rstrip('/')
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._models: Dict[str, _ResidentModel] = {}
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._before_load_hooks: List[Callable[[str], None]] = []
+        self._counters = {
+            'loads': 0,
+            'reuses': 0,
+            'releases': 0,
+            'idle_expirations': 0,
+            'load_failures': 0,
+            'load_seconds_total': 0.0
+        }
+
+    @classmethod
+    def from_env(cls) -> "LLMResidencyManager":
+        """从环境变量创建：OLLAMA_BASE_URL / LLM_IDLE_TTL_SECONDS"""
+        return cls(
+            base_url=os.environ.get("OLLAMA_BASE_URL", DEFAULT_OLLAMA_BASE_URL),
+            idle_ttl_seconds=float(os.environ.get("LLM_IDLE_TTL_SECONDS", "600"))
+        )
+
+    def keep_alive(self):
+        """请求中使用的 keep_alive 值（Ollama 在最后一次请求后保持模型驻留的时长）"""
+        if self.idle_ttl_seconds <= 0:
+            return -1
+        return f"{int(self.idle_ttl_seconds)}s"
+
+    def _expired(self, entry: _ResidentModel, now: float) -> bool:
+        return self.idle_ttl_seconds > 0 and now - entry.last_used > self.idle_ttl_seconds
+
+    def _default_loader(self, model: str):
+        """不带 prompt 的生成请求只加载模型"""
+        response = requests.post(
+            f"{self.base_url}/api/generate",
+            json={'model': model, 'keep_alive': self.keep_alive()},
+            timeout=300
+        )
+        response.raise_for_status()
+
+    def add_before_load_hook(self, hook: Callable[[str], None]):
+        """注册加载模型前的回调 hook(model)（复用已驻留的模型时不调用）"""
+        with self._lock:
+            self._before_load_hooks.append(hook)
+
+    def _run_before_load_hooks(self, model: str):
+        with self._lock:
+            hooks = list(self._before_load_hooks)
+        for hook in hooks:
+            try:
+                hook(model)
+            except Exception as e:
+                print(f"[LLM驻留] ⚠ 加载前回调失败: {e}", flush=True)
+
+    def is_resident(self, model: str) -> bool:
+        with self._lock:
+            entry = self._models.get(model)
+            return entry is not None and not self._expired(entry, time.time())
+
+    def acquire(self, model: str, loader: Optional[Callable[[], None]] = None) -> float:
+        """
+        确保模型已加载（已驻留时直接复用）
+
+        Args:
+            model: 模型名称
+            loader: 加载函数（默认发送不带 prompt 的 /api/generate 请求），失败时抛出异常
+
+        Returns:
+            float: 本次加载耗时（秒），复用时为 0
+        """
+        with self._load_lock:
+            with self._lock:
+                entry = self._models.get(model)
+                now = time.time()
+                if entry is not None and self._expired(entry, now):
+                    # Ollama 已按 keep_alive 自动卸载
+                    del self._models[model]
+                    self._counters['idle_expirations'] += 1
+                    entry = None
+                if entry is not None:
+                    entry.last_used = now
+                    entry.uses += 1
+                    self._counters['reuses'] += 1
+                    return 0.0
+
+            self._run_before_load_hooks(model)
+            start = time.time()
+            try:
+                if loader is not None:
+                    loader()
+                else:
+                    self._default_loader(model)
+            except Exception:
+                with self._lock:
+                    self._counters['load_failures'] += 1
+                raise
+            load_seconds = time.time() - start
+
+            with self._lock:
+                entry = _ResidentModel(model, load_seconds)
+                entry.uses = 1
+                self._models[model] = entry
+                self._counters['loads'] += 1
+                self._counters['load_seconds_total'] += load_seconds
+            print(f"[LLM驻留] 已加载 {model}（耗时 {load_seconds:.2f}s，累计加载 {self._counters['loads']} 次）", flush=True)
+            return load_seconds
+
+    def touch(self, model: str):
+        """记录一次使用（请求已携带 keep_alive，服务端的空闲计时同时重置）"""
+        with self._lock:
+            entry = self._models.get(model)
+            if entry is not None:
+                entry.last_used = time.time()
+
+    def release(self, model: Optional[str] = None, reason: str = "") -> int:
+        """
+        卸载模型，释放显存
+
+        Args:
+            model: 要卸载的模型，None 表示卸载所有驻留中的模型；指定模型时即使未记录为驻留也会发送卸载请求
+                   （可能由其他进程加载）
+            reason: 卸载原因（用于日志）
+
+        Returns:
+            int: 卸载的模型数量
+        """
+        with self._lock:
+            now = time.time()
+            if model is None:
+                models = [name for name, entry in self._models.items() if not self._expired(entry, now)]
+                self._models.clear()
+            else:
+                models = [model]
+                self._models.pop(model, None)
+
+        released = 0
+        for name in models:
+            try:
+                response = requests.post(
+                    f"{self.base_url}/api/generate",
+                    json={'model': name, 'keep_alive': 0},
+                    timeout=10
+                )
+                if response.status_code == 200:
+                    released += 1
+                    print(f"[LLM驻留] 已卸载 {name}{'（' + reason + '）' if reason else ''}", flush=True)
+            except Exception as e:
+                print(f"[LLM驻留] ⚠ 卸载 {name} 失败: {e}", flush=True)
+
+        with self._lock:
+            self._counters['releases'] += released
+        return released
+
+    def stats(self) -> Dict:
+        """驻留统计：驻留中的模型和计数器"""
+        now = time.time()
+        with self._lock:
+            models = [
+                {
+                    'model': entry.model,
+                    'load_seconds': round(entry.load_seconds, 3),
+                    'uses': entry.uses,
+                    'idle_seconds': round(now - entry.last_used, 1),
+                    'loaded_seconds_ago': round(now - entry.loaded_at, 1)
+                }
+                for entry in self._models.values() if not self._expired(entry, now)
+            ]
+            return {
+                'models': models,
+                'idle_ttl_seconds': self.idle_ttl_seconds,
+                **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in self._counters.items()}
+            }
+
+
+# 全局实例
+llm_residency = LLMResidencyManager.from_env()
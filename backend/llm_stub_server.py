@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+本地 LLM 桩服务 - 模拟 Ollama 的 OpenAI 兼容接口，用于测试和压测翻译并发
+
+/v1/chat/completions 按用户消息中的 "序号. 原文" 行返回 {"translations": [...]}（译文为 "[目标语言]原文"），
+单句重新翻译（"翻译成X。...\n\n原文"）返回 {"tr": "[X]原文"}，
+可设置人工延迟、服务端并行槽位数和前若干次请求失败。也提供 /api/tags 和 /api/generate。
+
+用法: python llm_stub_server.py [--port 11435] [--latency 0.5] [--parallel 4]
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+
+class LLMStubServer:
+    """在后台线程中运行的桩服务"""
+
+    def __init__(self, latency: float = 0.1, parallel: int = 1, fail_first: int = 0, port: int = 0):
+        """
+        Args:
+            latency: 每个请求的处理耗时（秒）
+            parallel: 服务端同时处理的请求数，超出的请求排队（模拟 OLLAMA_NUM_PARALLEL）
+            fail_first: 前若干个翻译请求返回 500
+            port: 监听端口，0 表示自动分配
+        """
+        self.latency = latency
+        self.fail_first = fail_first
+        self._slots = threading.Semaphore(max(1, parallel))
+        self._lock = threading.Lock()
+        self.requests: List[Dict] = []
+        self.active = 0
+        self.max_active = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端已超时断开
+                    pass
+
+            def do_GET(self):
+                if self.path == '/api/tags':
+                    self._send_json(200, {'models': []})
+                else:
+                    self._send_json(404, {'error': 'not found'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                status, response = stub.handle(self.path, payload)
+                self._send_json(status, response)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    def handle(self, path: str, payload: Dict):
+        """处理一个请求，返回 (状态码, 响应 JSON)"""
+        if path == '/api/generate':
+            with self._lock:
+                self.requests.append({'path': path, 'payload': payload})
+            return 200, {'model': payload.get('model'), 'done': True, 'response': ''}
+        if path != '/v1/chat/completions':
+            return 404, {'error': 'not found'}
+
+        with self._lock:
+            self.requests.append({'path': path, 'payload': payload})
+            chat_count = sum(1 for r in self.requests if r['path'] == path)
+        if chat_count <= self.fail_first:
+            return 500, {'error': 'stub failure'}
+
+        with self._slots:
+            with self._lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            try:
+                time.sleep(self.latency)
+            finally:
+                with self._lock:
+                    self.active -= 1
+
+        messages = payload.get('messages', [])
+        system = next((m['content'] for m in messages if m['role'] == 'system'), '')
+        user = next((m['content'] for m in messages if m['role'] == 'user'), '')
+        single = re.search(r'翻译成(.+?)。', user)
+        if single and not system:
+            # 单句重新翻译：原文在最后一个空行之后，返回 {"tr": 译文}
+            sentence = user.rsplit('\n\n', 1)[-1]
+            content = json.dumps({'tr': f'[{single.group(1)}]{sentence}'}, ensure_ascii=False)
+        else:
+            target = re.search(r'翻译为(.+?)。', system)
+            target = target.group(1) if target else ''
+            sentences = re.findall(r'^\d+\. (.*)$', user, re.MULTILINE)
+            content = json.dumps({'translations': [f'[{target}]{s}' for s in sentences]}, ensure_ascii=False)
+        return 200, {
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': len(user), 'completion_tokens': len(content)}
+        }
+
+    def chat_requests(self) -> List[Dict]:
+        """已收到的翻译请求"""
+        with self._lock:
+            return [r for r in self.requests if r['path'] == '/v1/chat/completions']
+
+    def start(self) -> "LLMStubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地 LLM 桩服务')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--parallel', type=int, default=4)
+    args = parser.parse_args()
+
+    server = LLMStubServer(latency=args.latency, parallel=args.parallel, port=args.port)
+    print(f'LLM 桩服务已启动: {server.base_url}（延迟 {args.latency}s，并行 {args.parallel}）', flush=True)
+    server._server.serve_forever()
@@ -22,13 +22,14 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import StreamingResponse, FileResponse
 import uuid
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, Dict
 import json
 import re
 import time
 
 from video_processor import VideoProcessor
 from srt_parser import SRTParser
+from audio_dsp import remove_silence_by_volume, apply_fade_in_out, replan_audio_timeline
 
 # 导入批量任务管理相关模块
 from database import init_db
@@ -3926,256 +3927,6 @@ async def regenerate_segment(request: RegenerateSegmentRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def _remove_silence_by_volume(
-    audio_data,
-    sample_rate: int,
-    window_ms: int = 50,
-    db_threshold: float = -50.0,
-    min_silence_windows: int = 2
-):
-    """
-    基于音量检测并移除静音段
-
-    Args:
-        audio_data: 音频数据
-        sample_rate: 采样率
-        window_ms: 窗口长度（毫秒）
-        db_threshold: dBFS阈值，低于此值视为静音
-        min_silence_windows: 连续多少个窗口低于阈值才视为静音
-
-    Returns:
-        移除静音后的音频数据
-    """
-    import numpy as np
-
-    if len(audio_data) == 0:
-        return audio_data
-
-    # 计算窗口大小（样本数）
-    window_samples = int(sample_rate * window_ms / 1000.0)
-
-    if window_samples == 0 or len(audio_data) < window_samples:
-        return audio_data
-
-    # 计算每个窗口的dBFS
-    num_windows = len(audio_data) // window_samples
-    db_values = []
-
-    for i in range(num_windows):
-        start = i * window_samples
-        end = start + window_samples
-        window = audio_data[start:end]
-
-        # 计算RMS
-        rms = np.sqrt(np.mean(window ** 2))
-
-        # 转换为dBFS（相对于满量程）
-        if rms > 1e-10:  # 避免log(0)
-            db = 20 * np.log10(rms)
-        else:
-            db = -100.0
-
-        db_values.append(db)
-
-    # 标记每个窗口是否为语音
-    is_speech = []
-    for i in range(len(db_values)):
-        # 检查连续的窗口
-        silence_count = 0
-        for j in range(min_silence_windows):
-            if i + j < len(db_values) and db_values[i + j] < db_threshold:
-                silence_count += 1
-
-        # 如果连续窗口都低于阈值，标记为静音
-        is_speech.append(silence_count < min_silence_windows)
-
-    # 提取语音段
-    speech_segments = []
-    for i, speech in enumerate(is_speech):
-        if speech:
-            start = i * window_samples
-            end = min((i + 1) * window_samples, len(audio_data))
-            speech_segments.append(audio_data[start:end])
-
-    # 处理剩余的样本（不足一个窗口的部分）
-    remaining_start = num_windows * window_samples
-    if remaining_start < len(audio_data):
-        speech_segments.append(audio_data[remaining_start:])
-
-    if speech_segments:
-        result = np.concatenate(speech_segments)
-        reduction_ratio = (1 - len(result) / len(audio_data)) * 100
-        print(f"  [静音移除] 移除 {reduction_ratio:.1f}% 的静音段")
-        return result
-
-    return audio_data
-
-
-def _apply_fade_in_out(
-    audio_data,
-    sample_rate: int,
-    fade_ms: int = 10
-):
-    """
-    在音频首尾应用淡入淡出效果
-
-    Args:
-        audio_data: 音频数据
-        sample_rate: 采样率
-        fade_ms: 淡入淡出时长（毫秒）
-
-    Returns:
-        应用淡入淡出后的音频数据
-    """
-    import numpy as np
-
-    if len(audio_data) == 0:
-        return audio_data
-
-    # 计算淡入淡出的样本数
-    fade_samples = int(sample_rate * fade_ms / 1000.0)
-    fade_samples = min(fade_samples, len(audio_data) // 2)  # 不超过音频长度的一半
-
-    if fade_samples == 0:
-        return audio_data
-
-    # 创建副本避免修改原数据
-    result = audio_data.copy()
-
-    # 淡入（线性）
-    fade_in_curve = np.linspace(0, 1, fade_samples)
-    result[:fade_samples] *= fade_in_curve
-
-    # 淡出（线性）
-    fade_out_curve = np.linspace(1, 0, fade_samples)
-    result[-fade_samples:] *= fade_out_curve
-
-    return result
-
-
-def _replan_audio_timeline(
-    cloned_results: List[Dict],
-    cloned_audio_dir: str,
-    optimized_files: Dict[int, str]
-) -> Dict[int, Dict]:
-    """
-    重新规划音频时间轴，为超长片段借用相邻空闲时间
-
-    Args:
-        cloned_results: 克隆结果列表
-        cloned_audio_dir: 克隆音频目录
-        optimized_files: 已优化的文件字典
-
-    Returns:
-        {segment_index: {'actual_start': float, 'actual_end': float, 'borrowed_before': float, 'borrowed_after': float}}
-    """
-    import soundfile as sf
-
-    replanned = {}
-
-    # 构建所有片段的时间信息
-    segments_info = []
-    for idx, result in enumerate(cloned_results):
-        # 优先使用优化后的文件
-        if idx in optimized_files:
-            audio_file_path = optimized_files[idx]
-        else:
-            audio_filename = f"segment_{idx}.wav"
-            audio_file_path = os.path.join(cloned_audio_dir, audio_filename)
-
-        if not os.path.exists(audio_file_path):
-            continue
-
-        try:
-            audio_data, sr = sf.read(audio_file_path)
-            actual_duration = len(audio_data) / sr
-
-            start_time = result.get("start_time", 0)
-            end_time = result.get("end_time", 0)
-            target_duration = end_time - start_time
-
-            segments_info.append({
-                'index': idx,
-                'start_time': start_time,
-                'end_time': end_time,
-                'target_duration': target_duration,
-                'actual_duration': actual_duration,
-                'audio_file_path': audio_file_path,
-                'sr': sr
-            })
-        except Exception as e:
-            print(f"[时间轴规划] 读取片段 {idx} 失败: {e}")
-            continue
-
-    # 按时间排序
-    segments_info.sort(key=lambda x: x['start_time'])
-
-    # 为每个超长片段计算可借用的时间
-    for i, seg in enumerate(segments_info):
-        excess = seg['actual_duration'] - seg['target_duration']
-
-        # 使用小阈值判断，避免浮点误差导致不必要的调整
-        if excess <= 0.001:
-            continue  # 不超长，不需要调整
-
-        idx = seg['index']
-
-        # 计算最大可借用时间（原字幕时长的30%）
-        max_borrow = seg['target_duration'] * 0.5
-
-        # 计算前后的可用空闲时间
-        gap_before = 0
-        if i > 0:
-            prev_seg = segments_info[i - 1]
-            gap_before = seg['start_time'] - prev_seg['end_time']
-
-        gap_after = 0
-        if i < len(segments_info) - 1:
-            next_seg = segments_info[i + 1]
-            gap_after = next_seg['start_time'] - seg['end_time']
-
-        # 优先策略：均匀借用，但不超过20%限制和可用间隙
-        # 1. 先尝试平均分配
-        half_excess = excess / 2
-        borrow_before = min(gap_before, max_borrow, half_excess)
-        borrow_after = min(gap_after, max_borrow, half_excess)
-
-        # 2. 如果总借用不够，尝试从有剩余空间的一侧多借
-        total_borrowed = borrow_before + borrow_after
-        if total_borrowed < excess:
-            remaining_needed = excess - total_borrowed
-
-            # 前面还有可借用空间
-            can_borrow_more_before = min(gap_before - borrow_before, max_borrow - borrow_before)
-            # 后面还有可借用空间
-            can_borrow_more_after = min(gap_after - borrow_after, max_borrow - borrow_after)
-
-            if can_borrow_more_before > 0:
-                extra_before = min(can_borrow_more_before, remaining_needed)
-                borrow_before += extra_before
-                remaining_needed -= extra_before
-
-            if remaining_needed > 0 and can_borrow_more_after > 0:
-                extra_after = min(can_borrow_more_after, remaining_needed)
-                borrow_after += extra_after
-
-        # 记录调整后的实际时间（只有真正借用了时间才记录）
-        if borrow_before > 0.001 or borrow_after > 0.001:  # 使用小阈值避免浮点误差
-            actual_start = seg['start_time'] - borrow_before
-            actual_end = seg['end_time'] + borrow_after
-            replanned[idx] = {
-                'actual_start': actual_start,
-                'actual_end': actual_end,
-                'actual_duration': actual_end - actual_start,
-                'borrowed_before': borrow_before,
-                'borrowed_after': borrow_after,
-                'original_start': seg['start_time'],
-                'original_end': seg['end_time']
-            }
-
-    return replanned
-
-
 @app.post("/voice-cloning/stitch-audio")
 async def stitch_cloned_audio(request: StitchAudioRequest):
     """
@@ -4216,7 +3967,7 @@ async def stitch_cloned_audio(request: StitchAudioRequest):
         )
 
         # 步骤2: 重新规划时间轴（为超长片段借用相邻空闲时间）
-        replanned_segments = _replan_audio_timeline(
+        replanned_segments = replan_audio_timeline(
             cloned_results,
             cloned_audio_dir,
             optimized_files
@@ -4344,7 +4095,7 @@ async def stitch_cloned_audio(request: StitchAudioRequest):
             # 步骤1: 如果音频过长，先尝试移除静音段（跳过已优化的片段）
             if idx not in optimized_files and len(audio_data) / sample_rate > target_duration * 1.05:  # 超过5%才处理
                 original_duration = len(audio_data) / sample_rate
-                audio_data = _remove_silence_by_volume(
+                audio_data = remove_silence_by_volume(
                     audio_data,
                     sample_rate,
                     window_ms=50,
@@ -4395,10 +4146,12 @@ async def stitch_cloned_audio(request: StitchAudioRequest):
                     processed_audio = np.pad(processed_audio, (0, diff), mode='constant', constant_values=0)
 
             # 步骤3: 应用淡入淡出效果（减少剪切感）
-            processed_audio = _apply_fade_in_out(
+            # 片段数据只在本次循环中使用，可直接原地修改
+            processed_audio = apply_fade_in_out(
                 processed_audio,
                 sample_rate,
-                fade_ms=10  # 10ms快速淡入淡出
+                fade_ms=10,  # 10ms快速淡入淡出
+                in_place=True
             )
 
             # 调整音量以匹配原视频
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+模型注册表 - 进程内共享的分析模型（性别识别、NISQA、说话人嵌入、Silero VAD 等）
+
+- 按 (模型标识, 设备) 缓存，首次 get 时懒加载，之后的任务直接复用已加载的模型
+- 按设备类型（内存 / 显存）限制总占用，超出预算时按最近最少使用淘汰
+- 空闲超过 TTL 的模型自动卸载
+- 记录加载耗时、命中、淘汰次数，供 /api/system/models 查看
+
+注意：淘汰只是释放注册表持有的引用，正在使用该模型的任务仍可继续使用，任务结束后内存才会真正释放。
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def estimate_model_bytes(obj: Any, _depth: int = 0) -> int:
+    """
+    估算模型占用的字节数（参数 + buffer）
+
+    支持 torch.nn.Module，以及把模型放在属性、元组或字典里的包装对象（最多向下查找两层）
+
+    Args:
+        obj: 模型或包装对象
+
+    Returns:
+        int: 估算的字节数，无法估算时为 0
+    """
+    try:
+        import torch
+    except ImportError:
+        return 0
+
+    if isinstance(obj, torch.nn.Module):
+        tensors = list(obj.parameters()) + list(obj.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    if _depth >= 2 or obj is None or isinstance(obj, (str, bytes, int, float, bool)):
+        return 0
+
+    if isinstance(obj, (tuple, list)):
+        children = obj
+    elif isinstance(obj, dict):
+        children = obj.values()
+    else:
+        children = getattr(obj, '__dict__', {}).values()
+
+    seen = set()
+    total = 0
+    for child in children:
+        if id(child) in seen:
+            continue
+        seen.add(id(child))
+        total += estimate_model_bytes(child, _depth + 1)
+    return total
+
+
+def default_device() -> str:
+    """与各模型自身的选择一致：有 CUDA 时使用 cuda，否则 cpu"""
+    try:
+        import torch
+        return 'cuda' if torch.cuda.is_available() else 'cpu'
+    except ImportError:
+        return 'cpu'
+
+
+class _ModelEntry:
+    """注册表中的一个模型"""
+
+    def __init__(self, model_id: str, device: str, model: Any, size_bytes: int,
+                 load_seconds: float, unloader: Optional[Callable[[Any], None]]):
+        self.model_id = model_id
+        self.device = device
+        self.model = model
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.unloader = unloader
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.hits = 0
+
+
+class ModelRegistry:
+    """进程内模型注册表"""
+
+    def __init__(
+        self,
+        ram_budget_mb: float = 0,
+        vram_budget_mb: float = 0,
+        idle_ttl_seconds: float = 600,
+        sweep_interval_seconds: float = 60
+    ):
+        """
+        初始化模型注册表
+
+        Args:
+            ram_budget_mb: CPU 模型总内存预算（MB），0 表示不限制
+            vram_budget_mb: GPU 模型总显存预算（MB），0 表示不限制
+            idle_ttl_seconds: 空闲多久后卸载（秒），0 表示不自动卸载
+            sweep_interval_seconds: 后台检查空闲模型的间隔（秒）
+        """
+        self.ram_budget_bytes = int(ram_budget_mb * 1024 * 1024)
+        self.vram_budget_bytes = int(vram_budget_mb * 1024 * 1024)
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+        self._entries: "OrderedDict[Tuple[str, str], _ModelEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._sweeper: Optional[threading.Thread] = None
+
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'loads': 0,
+            'load_failures': 0,
+            'evictions': 0,
+            'idle_unloads': 0,
+            'load_seconds_total': 0.0
+        }
+
+    @classmethod
+    def from_env(cls) -> "ModelRegistry":
+        """从环境变量创建：MODEL_RAM_BUDGET_MB / MODEL_VRAM_BUDGET_MB / MODEL_IDLE_TTL_SECONDS"""
+        return cls(
+            ram_budget_mb=float(os.environ.get("MODEL_RAM_BUDGET_MB", "0")),
+            vram_budget_mb=float(os.environ.get("MODEL_VRAM_BUDGET_MB", "0")),
+            idle_ttl_seconds=float(os.environ.get("MODEL_IDLE_TTL_SECONDS", "600"))
+        )
+
+    def get(
+        self,
+        model_id: str,
+        loader: Callable[[], Any],
+        device: Optional[str] = None,
+        size_bytes: Optional[int] = None,
+        unloader: Optional[Callable[[Any], None]] = None
+    ) -> Any:
+        """
+        获取共享模型，未加载时调用 loader 加载
+
+        Args:
+            model_id: 模型标识（如 "gender:<模型路径>"）
+            loader: 无参加载函数，返回模型对象（可以是包含多个组件的元组）
+            device: 设备（"cpu" / "cuda" / "cuda:1"），默认自动选择
+            size_bytes: 模型占用字节数，默认按参数估算
+            unloader: 卸载时的清理函数（可选）
+
+        Returns:
+            loader 返回的模型对象
+        """
+        device = device or default_device()
+        key = (model_id, device)
+        self._ensure_sweeper()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._touch(key, entry)
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # 同一模型只加载一次；不同模型可以并行加载
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return self._touch(key, entry)
+                self._counters['misses'] += 1
+
+            start = time.time()
+            try:
+                model = loader()
+            except Exception:
+                with self._lock:
+                    self._counters['load_failures'] += 1
+                raise
+            load_seconds = time.time() - start
+
+            if size_bytes is None:
+                size_bytes = estimate_model_bytes(model)
+
+            with self._lock:
+                self._counters['loads'] += 1
+                self._counters['load_seconds_total'] += load_seconds
+                self._make_room(device, size_bytes)
+                entry = _ModelEntry(model_id, device, model, size_bytes, load_seconds, unloader)
+                self._entries[key] = entry
+                print(f"[模型注册表] 已加载 {model_id} ({device}, {size_bytes / 1024 / 1024:.1f}MB, "
+                      f"耗时 {load_seconds:.2f}s)")
+                return entry.model
+
+    def _touch(self, key: Tuple[str, str], entry: _ModelEntry) -> Any:
+        """记录一次命中并移到 LRU 末尾（调用方持有锁）"""
+        entry.hits += 1
+        entry.last_used = time.time()
+        self._counters['hits'] += 1
+        self._entries.move_to_end(key)
+        return entry.model
+
+    def _budget_for(self, device: str) -> int:
+        return self.vram_budget_bytes if device.startswith('cuda') else self.ram_budget_bytes
+
+    def _used_bytes(self, is_gpu: bool) -> int:
+        return sum(
+            e.size_bytes for e in self._entries.values()
+            if e.device.startswith('cuda') == is_gpu
+        )
+
+    def _make_room(self, device: str, size_bytes: int):
+        """按 LRU 淘汰同类设备上的模型，直到能放下新模型（调用方持有锁）"""
+        budget = self._budget_for(device)
+        if budget <= 0:
+            return
+
+        is_gpu = device.startswith('cuda')
+        for key in list(self._entries.keys()):
+            if self._used_bytes(is_gpu) + size_bytes <= budget:
+                break
+            if self._entries[key].device.startswith('cuda') != is_gpu:
+                continue
+            self._unload(key)
+            self._counters['evictions'] += 1
+
+        if self._used_bytes(is_gpu) + size_bytes > budget:
+            print(f"[模型注册表] 警告: 模型大小 {size_bytes / 1024 / 1024:.1f}MB 超出 {device} 预算，仍然加载")
+
+    def _unload(self, key: Tuple[str, str]):
+        """从注册表移除并释放模型（调用方持有锁）"""
+        entry = self._entries.pop(key)
+        if entry.unloader is not None:
+            try:
+                entry.unloader(entry.model)
+            except Exception as e:
+                print(f"[模型注册表] 卸载 {entry.model_id} 时出错: {e}")
+        entry.model = None
+        print(f"[模型注册表] 已卸载 {entry.model_id} ({entry.device})")
+
+        gc.collect()
+        if entry.device.startswith('cuda'):
+            try:
+                import torch
+                torch.cuda.empty_cache()
+            except Exception:
+                pass
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """
+        卸载空闲超过 TTL 的模型
+
+        Returns:
+            int: 卸载的模型数量
+        """
+        if self.idle_ttl_seconds <= 0:
+            return 0
+
+        now = now or time.time()
+        with self._lock:
+            idle = [
+                key for key, entry in self._entries.items()
+                if now - entry.last_used > self.idle_ttl_seconds
+            ]
+            for key in idle:
+                self._unload(key)
+                self._counters['idle_unloads'] += 1
+        return len(idle)
+
+    def unload(self, model_id: Optional[str] = None) -> int:
+        """
+        手动卸载模型
+
+        Args:
+            model_id: 要卸载的模型标识，None 表示卸载全部
+
+        Returns:
+            int: 卸载的模型数量
+        """
+        with self._lock:
+            keys = [key for key in self._entries if model_id is None or key[0] == model_id]
+            for key in keys:
+                self._unload(key)
+        return len(keys)
+
+    def _ensure_sweeper(self):
+        """首次使用时启动后台线程，定期卸载空闲模型"""
+        if self._sweeper is not None or self.idle_ttl_seconds <= 0:
+            return
+
+        def sweep():
+            while True:
+                time.sleep(self.sweep_interval_seconds)
+                try:
+                    self.evict_idle()
+                except Exception as e:
+                    print(f"[模型注册表] 清理空闲模型失败: {e}")
+
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=sweep, name="model-registry-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def stats(self) -> Dict:
+        """注册表统计：已加载模型、预算和计数器"""
+        now = time.time()
+        with self._lock:
+            models = [
+                {
+                    'model_id': entry.model_id,
+                    'device': entry.device,
+                    'size_mb': round(entry.size_bytes / 1024 / 1024, 1),
+                    'load_seconds': round(entry.load_seconds, 3),
+                    'hits': entry.hits,
+                    'idle_seconds': round(now - entry.last_used, 1),
+                    'loaded_seconds_ago': round(now - entry.loaded_at, 1)
+                }
+                for entry in self._entries.values()
+            ]
+            return {
+                'models': models,
+                'ram_used_mb': round(self._used_bytes(False) / 1024 / 1024, 1),
+                'vram_used_mb': round(self._used_bytes(True) / 1024 / 1024, 1),
+                'ram_budget_mb': round(self.ram_budget_bytes / 1024 / 1024, 1),
+                'vram_budget_mb': round(self.vram_budget_bytes / 1024 / 1024, 1),
+                'idle_ttl_seconds': self.idle_ttl_seconds,
+                **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in self._counters.items()}
+            }
+
+
+# 全局实例
+model_registry = ModelRegistry.from_env()
@@ -5,12 +5,93 @@ NISQA MOS 评分模块
 import os
 import sys
 import glob
-import pandas as pd
 import numpy as np
+import soundfile as sf
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 import tempfile
 import json
+from segment_buffer import SegmentBuffer, AudioInput, audio_key, load_audio
+from audio_silence_trimmer import AudioSilenceTrimmer
+from model_registry import model_registry
+
+# 预算模式下未评分片段的分数标记（低于任何有效 MOS，按分数排序时排在最后）
+UNSCORED_MOS = -1.0
+
+
+def compute_nisqa_features(audio: np.ndarray, args: Dict) -> Tuple[np.ndarray, int]:
+    """
+    计算 NISQA 输入特征：mel 频谱（dB）并切分为重叠的窗口
+
+    与 NISQA 的 get_librosa_melspec + segment_specs 计算方式一致，但直接处理内存数组
+
+    Args:
+        audio: 单声道音频数据（采样率需为 args['ms_sr']）
+        args: 模型参数（来自 checkpoint 的 ms_* 配置）
+
+    Returns:
+        (窗口特征 (n_wins, 1, n_mels, seg_length), 窗口数)
+    """
+    import librosa
+
+    sr = int(args.get('ms_sr', 48000))
+    spec = librosa.feature.melspectrogram(
+        y=np.asarray(audio, dtype=np.float32),
+        sr=sr,
+        n_fft=int(args.get('ms_n_fft', 4096)),
+        hop_length=int(sr * args.get('ms_hop_length', 0.01)),
+        win_length=int(sr * args.get('ms_win_length', 0.02)),
+        window='hann',
+        center=True,
+        pad_mode='reflect',
+        power=1.0,
+        n_mels=int(args.get('ms_n_mels', 48)),
+        fmin=0.0,
+        fmax=args.get('ms_fmax', 20e3),
+        htk=False,
+        norm='slaney'
+    )
+    spec = librosa.amplitude_to_db(spec, ref=1.0, amin=1e-4, top_db=80.0)
+
+    seg_length = int(args.get('ms_seg_length', 15))
+    seg_hop = int(args.get('ms_seg_hop_length', 1) or 1)
+    n_wins = spec.shape[1] - (seg_length - 1)
+    if n_wins <= 0:
+        return np.zeros((0, 1, spec.shape[0], seg_length), dtype=np.float32), 0
+
+    # (n_mels, n_wins, seg_length) -> (n_wins, 1, n_mels, seg_length)
+    windows = np.lib.stride_tricks.sliding_window_view(spec, seg_length, axis=1)
+    windows = windows.transpose(1, 0, 2)[::seg_hop, None, :, :]
+    return np.ascontiguousarray(windows, dtype=np.float32), len(windows)
+
+
+class _NISQAArrayDataset:
+    """内存音频数组数据集，特征在 DataLoader worker 中计算"""
+
+    def __init__(self, arrays: List[np.ndarray], args: Dict):
+        self.arrays = arrays
+        self.args = args
+
+    def __len__(self):
+        return len(self.arrays)
+
+    def __getitem__(self, index):
+        features, n_wins = compute_nisqa_features(self.arrays[index], self.args)
+        return index, features, n_wins
+
+
+def _collate_nisqa_batch(items):
+    """按批内最大窗口数补零，返回 (序号, 特征, 窗口数)"""
+    import torch
+
+    indices = [index for index, _, _ in items]
+    n_wins = [n for _, _, n in items]
+    max_wins = max(n_wins)
+    _, channels, n_mels, seg_length = items[0][1].shape
+    batch = np.zeros((len(items), max_wins, channels, n_mels, seg_length), dtype=np.float32)
+    for i, (_, features, n) in enumerate(items):
+        batch[i, :n] = features
+    return indices, torch.from_numpy(batch), torch.tensor(n_wins, dtype=torch.long)
 
 
 class NISQAScorer:
@@ -21,7 +102,7 @@ class NISQAScorer:
         nisqa_dir: str = None,
         pretrained_model: str = None,
         num_workers: int = 0,
-        batch_size: int = 1
+        batch_size: int = 16
     ):
         """
         初始化 NISQA 评分器
@@ -69,6 +150,10 @@ class NISQAScorer:
         # 延迟加载模型（第一次调用时加载）
         self._model = None
 
+        # 预算模式下计算有效语音时长用的静音检测器，以及最近一次预算评分的统计
+        self.trimmer = AudioSilenceTrimmer(threshold_db=-40.0, frame_length_ms=25.0, hop_length_ms=10.0)
+        self.last_budget_stats = None
+
     def _get_model_args(self, data_dir: str = None):
         """获取模型参数"""
         # 如果没有提供 data_dir，使用临时目录
@@ -93,19 +178,33 @@ class NISQAScorer:
             'tr_parallel': False
         }
 
-    def _ensure_model_loaded(self, data_dir: str = None):
+    def _ensure_model_loaded(self):
         """
-        确保模型已加载（只加载一次）
+        确保模型已加载（通过模型注册表按模型路径在进程内共享，只加载一次）
 
-        注意：NISQA 模型初始化时需要 data_dir，所以第一次调用时必须提供
+        只加载模型权重，不需要 data_dir，也不构建 NISQA 的数据集
         """
-        if self._model is None:
-            print("[NISQA] 加载 NISQA 模型...")
-            from nisqa.NISQA_model import nisqaModel
-
-            args = self._get_model_args(data_dir)
-            self._model = nisqaModel(args)
-            print("[NISQA] 模型加载完成")
+        if self._model is not None:
+            return
+
+        import torch
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self._model = model_registry.get(f"nisqa:{self.pretrained_model}", self._load_model, device=device)
+
+    def _load_model(self):
+        """加载 NISQA 模型权重"""
+        print("[NISQA] 加载 NISQA 模型...")
+        from nisqa.NISQA_model import nisqaModel
+
+        # 跳过 nisqaModel.__init__ 中的数据集加载，只初始化设备和模型
+        model = nisqaModel.__new__(nisqaModel)
+        model.args = self._get_model_args()
+        model.runinfos = {}
+        model._getDevice()
+        model._loadModel()
+        model.model.eval()
+        print("[NISQA] 模型加载完成")
+        return model
 
     def score_audio(self, audio_path: str) -> float:
         """
@@ -123,24 +222,141 @@ class NISQAScorer:
             return results[0][1]
         return 0.0
 
+    def score_arrays(
+        self,
+        arrays: List[np.ndarray],
+        sample_rate: int,
+        batch_size: Optional[int] = None,
+        num_workers: Optional[int] = None
+    ) -> List[Optional[float]]:
+        """
+        对内存音频数组批量打分（进程内推理，不落盘）
+
+        Args:
+            arrays: 单声道音频数组列表
+            sample_rate: 音频采样率（会重采样到模型的 ms_sr）
+            batch_size: 批大小，默认使用初始化时的 batch_size
+            num_workers: 计算特征的 DataLoader worker 数，默认使用初始化时的 num_workers
+
+        Returns:
+            List[Optional[float]]: 与输入顺序一致的 MOS 分数，音频过短无法评分时为 None
+        """
+        import torch
+        from torch.utils.data import DataLoader
+
+        if not arrays:
+            return []
+
+        self._ensure_model_loaded()
+        model_args = self._model.args
+        model_sr = int(model_args.get('ms_sr', 48000))
+
+        if sample_rate != model_sr:
+            import librosa
+            arrays = [
+                librosa.resample(np.asarray(a, dtype=np.float32), orig_sr=sample_rate, target_sr=model_sr)
+                for a in arrays
+            ]
+
+        loader = DataLoader(
+            _NISQAArrayDataset(arrays, model_args),
+            batch_size=batch_size or self.batch_size,
+            shuffle=False,
+            num_workers=self.num_workers if num_workers is None else num_workers,
+            collate_fn=_collate_nisqa_batch
+        )
+
+        max_segments = model_args.get('ms_max_segments')
+        scores = [None] * len(arrays)
+        network = self._model.model
+        device = self._model.dev
+
+        with torch.no_grad():
+            for indices, features, n_wins in loader:
+                valid = n_wins > 0
+                if not valid.any():
+                    continue
+                features, n_wins = features[valid], n_wins[valid]
+                if max_segments and features.shape[1] > max_segments:
+                    features = features[:, :max_segments]
+                    n_wins = n_wins.clamp(max=max_segments)
+
+                predictions = network(features.to(device), n_wins.to(device))
+                predictions = predictions.reshape(len(n_wins), -1)[:, 0].cpu().numpy()
+                valid_indices = [index for index, ok in zip(indices, valid.tolist()) if ok]
+                for index, mos in zip(valid_indices, predictions):
+                    scores[index] = float(mos)
+
+        return scores
+
     def score_audio_batch(
         self,
-        audio_paths: List[str],
+        audio_paths: List[AudioInput],
         temp_dir: Optional[str] = None
     ) -> List[Tuple[str, float]]:
         """
-        批量对多个音频文件进行 MOS 打分（核心优化方法）
+        批量对多个音频进行 MOS 打分（核心优化方法）
+
+        优先在进程内对音频数组直接推理；NISQA 版本不兼容等原因失败时，回退到临时目录 + predict_dir 方式
 
         Args:
-            audio_paths: 音频文件路径列表
-            temp_dir: 临时目录，用于存放符号链接（如果需要）
+            audio_paths: 音频文件路径或内存片段（SegmentBuffer）列表
+            temp_dir: 回退方式使用的临时目录，用于存放符号链接（如果需要）
 
         Returns:
-            List[Tuple[str, float]]: 列表，每个元素为 (音频路径, MOS分数)
+            List[Tuple[str, float]]: 列表，每个元素为 (音频路径或片段key, MOS分数)，顺序与输入一致
         """
         if not audio_paths:
             return []
 
+        try:
+            return self._score_audio_batch_in_process(audio_paths)
+        except Exception as e:
+            print(f"[NISQA] 进程内评分失败: {e}，回退到目录评分")
+            return self._score_audio_batch_dir(audio_paths, temp_dir)
+
+    def _score_audio_batch_in_process(self, audio_paths: List[AudioInput]) -> List[Tuple[str, float]]:
+        """读取音频后调用 score_arrays，跳过不存在或为空的音频"""
+        self._ensure_model_loaded()
+        model_sr = int(self._model.args.get('ms_sr', 48000))
+
+        keys = []
+        arrays = []
+        for audio_item in audio_paths:
+            key = audio_key(audio_item)
+            if not isinstance(audio_item, SegmentBuffer) and not os.path.exists(audio_item):
+                print(f"[NISQA] 警告：音频文件不存在: {audio_item}")
+                continue
+            try:
+                audio, _ = load_audio(audio_item, sample_rate=model_sr)
+            except Exception as e:
+                print(f"[NISQA] 警告：无法读取音频 {key}: {e}")
+                continue
+            if len(audio) == 0:
+                print(f"[NISQA] 警告：音频片段为空: {key}")
+                continue
+            keys.append(key)
+            arrays.append(audio)
+
+        if not arrays:
+            print("[NISQA] 没有有效的音频文件可以评分")
+            return []
+
+        print(f"[NISQA] 准备评分 {len(arrays)} 个音频...")
+        scores = self.score_arrays(arrays, model_sr)
+
+        results = [(key, score) for key, score in zip(keys, scores) if score is not None]
+        print(f"[NISQA] 完成评分，共 {len(results)} 个音频")
+        return results
+
+    def _score_audio_batch_dir(
+        self,
+        audio_paths: List[AudioInput],
+        temp_dir: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        回退方式：把音频链接到临时目录，用 NISQA 的 predict_dir 模式评分，再按文件名匹配结果
+        """
         try:
             # 创建临时目录，存放所有音频文件的符号链接或拷贝
             # NISQA 需要所有音频在同一个目录下
@@ -153,7 +369,21 @@ class NISQAScorer:
                 # 必须在加载模型之前完成，因为 NISQA 初始化时会检查目录
                 audio_map = {}  # {临时文件名: 原始路径}
 
-                for i, audio_path in enumerate(audio_paths):
+                for i, audio_item in enumerate(audio_paths):
+                    # 未落盘的内存片段直接写入临时目录
+                    if isinstance(audio_item, SegmentBuffer) and not audio_item.has_file():
+                        if len(audio_item.audio) == 0:
+                            print(f"[NISQA] 警告：音频片段为空: {audio_item.name}")
+                            continue
+                        temp_name = f"{i:05d}_{audio_item.name}"
+                        try:
+                            sf.write(os.path.join(temp_dir, temp_name), audio_item.audio, audio_item.sample_rate)
+                            audio_map[temp_name] = audio_item.key
+                        except Exception as e:
+                            print(f"[NISQA] 警告：无法写入片段 {audio_item.name}: {e}")
+                        continue
+
+                    audio_path = audio_item.path if isinstance(audio_item, SegmentBuffer) else audio_item
                     if not os.path.exists(audio_path):
                         print(f"[NISQA] 警告：音频文件不存在: {audio_path}")
                         continue
@@ -194,16 +424,12 @@ class NISQAScorer:
                     print("[NISQA] 没有有效的音频文件可以评分")
                     return []
 
-                # 加载模型（在文件链接完成后）
-                self._ensure_model_loaded(temp_dir)
-
                 print(f"[NISQA] 准备评分 {len(audio_map)} 个音频文件...")
 
-                # 更新模型的 data_dir
-                self._model.args['data_dir'] = temp_dir
-
-                # 执行批量预测
-                results_df = self._model.predict()
+                # predict_dir 模式在初始化时加载目录数据集，因此每次都针对本次的临时目录创建
+                from nisqa.NISQA_model import nisqaModel
+                dir_model = nisqaModel(self._get_model_args(temp_dir))
+                results_df = dir_model.predict()
 
                 # 解析结果
                 results = []
@@ -241,66 +467,282 @@ class NISQAScorer:
     def score_speaker_audios(
         self,
         audio_dir: str,
-        speaker_segments: Dict[int, List[str]]
+        speaker_segments: Dict[int, List[AudioInput]],
+        budget_seconds: Optional[float] = None,
+        min_mos: float = 3.0,
+        round_size: int = 8,
+        known_scores: Optional[Dict[str, float]] = None,
+        known_features: Optional[Dict[str, Dict[str, float]]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> Dict[int, List[Tuple[str, float]]]:
         """
         对每个说话人的音频片段进行 MOS 打分（批量优化版）
 
+        设置 budget_seconds 时使用预算模式：先按时长、语音占比、音量等廉价特征对每个说话人的片段排序，
+        再按该顺序分轮批量评分；某个说话人 MOS >= min_mos 的片段累计有效语音达到预算后停止为其评分。
+        未评分的片段仍保留在结果中，分数为 UNSCORED_MOS。
+
         Args:
             audio_dir: 音频片段所在目录（可以为None，如果segment_files已经是完整路径）
-            speaker_segments: 字典，key为说话人ID，value为该说话人的音频文件路径列表
+            speaker_segments: 字典，key为说话人ID，value为该说话人的音频文件路径或内存片段列表
+            budget_seconds: 每个说话人的有效语音预算（秒），None 表示评分全部片段
+            min_mos: 预算模式下计入预算的最低 MOS 分数
+            round_size: 预算模式下每轮每个说话人评分的片段数
+            known_scores: 已提前评分的片段 {片段key: MOS}（见 prescore_candidates），直接使用不再推理
+            known_features: 已计算的廉价特征 {片段key: 特征}，预算模式下不再重新计算
+            progress_callback: 进度回调 (已完成片段数, 片段总数)
 
         Returns:
             Dict[int, List[Tuple[str, float]]]: 字典，key为说话人ID，
-                value为列表，每个元素为(音频路径, MOS分数)
+                value为列表，每个元素为(音频路径, MOS分数)，按分数从高到低排序
         """
         results = {}
 
-        # 收集所有音频文件路径
-        all_audio_paths = []
-        path_to_speaker = {}  # {音频路径: 说话人ID}
-
+        # 收集每个说话人的音频（路径或内存片段）
+        speaker_items = {}
         for speaker_id, segment_files in speaker_segments.items():
+            # 内存片段直接使用
+            if segment_files and isinstance(segment_files[0], SegmentBuffer):
+                speaker_items[speaker_id] = list(segment_files)
+                continue
+
             # 检查segment_files是否已经是完整路径
             first_path = segment_files[0] if segment_files else ""
             has_dir_separator = '/' in first_path or '\\' in first_path
 
             if segment_files and (Path(first_path).is_absolute() or has_dir_separator):
                 # 已经是完整路径
-                full_paths = segment_files
+                speaker_items[speaker_id] = list(segment_files)
             else:
                 # 需要拼接audio_dir
-                full_paths = [str(Path(audio_dir) / f) for f in segment_files]
-
-            for path in full_paths:
-                all_audio_paths.append(path)
-                path_to_speaker[path] = speaker_id
+                speaker_items[speaker_id] = [str(Path(audio_dir) / f) for f in segment_files]
 
-        if not all_audio_paths:
+        total = sum(len(items) for items in speaker_items.values())
+        if total == 0:
             print("[NISQA] 没有音频文件需要评分")
             return results
 
-        print(f"[NISQA] 开始批量评分 {len(all_audio_paths)} 个音频文件...")
+        known_scores = known_scores or {}
 
-        # 批量评分（一次性处理所有音频，模型只加载一次）
-        all_scores = self.score_audio_batch(all_audio_paths)
+        if budget_seconds is None:
+            print(f"[NISQA] 开始批量评分 {total} 个音频文件...")
 
-        # 按说话人分组结果
-        for audio_path, score in all_scores:
-            speaker_id = path_to_speaker.get(audio_path)
-            if speaker_id is not None:
-                if speaker_id not in results:
-                    results[speaker_id] = []
-                results[speaker_id].append((audio_path, score))
+            # 批量评分（模型只加载一次，分块推理以便汇报进度）；已提前评分的片段直接使用
+            path_to_speaker = {}
+            all_audio_paths = []
+            for speaker_id, items in speaker_items.items():
+                for item in items:
+                    key = audio_key(item)
+                    if key in known_scores:
+                        results.setdefault(speaker_id, []).append((key, known_scores[key]))
+                        continue
+                    all_audio_paths.append(item)
+                    path_to_speaker[key] = speaker_id
+
+            done = total - len(all_audio_paths)
+            if known_scores:
+                print(f"[NISQA] 复用提前评分结果 {done} 个，需要评分 {len(all_audio_paths)} 个")
+            chunk_size = max(1, self.batch_size * 8)
+            for start in range(0, len(all_audio_paths), chunk_size):
+                chunk = all_audio_paths[start:start + chunk_size]
+                for audio_path, score in self.score_audio_batch(chunk):
+                    speaker_id = path_to_speaker.get(audio_path)
+                    if speaker_id is not None:
+                        results.setdefault(speaker_id, []).append((audio_path, score))
+                done += len(chunk)
+                if progress_callback is not None:
+                    progress_callback(done, total)
+        else:
+            results = self._score_with_budget(
+                speaker_items, budget_seconds, min_mos, round_size,
+                known_scores, known_features or {}, progress_callback
+            )
+
+        # 按分数从高到低排序（未评分的片段排在最后）
+        for speaker_id in results:
+            results[speaker_id].sort(key=lambda x: x[1], reverse=True)
 
         # 打印统计信息
         for speaker_id, scores in results.items():
-            if scores:
-                avg_score = np.mean([s for _, s in scores])
-                print(f"[NISQA] 说话人 {speaker_id}: {len(scores)} 个片段, 平均MOS分数: {avg_score:.2f}")
+            scored = [s for _, s in scores if s != UNSCORED_MOS]
+            if scored:
+                print(f"[NISQA] 说话人 {speaker_id}: {len(scored)}/{len(scores)} 个片段已评分, "
+                      f"平均MOS分数: {np.mean(scored):.2f}")
+
+        return results
+
+    def _score_with_budget(
+        self,
+        speaker_items: Dict[int, List[AudioInput]],
+        budget_seconds: float,
+        min_mos: float,
+        round_size: int,
+        known_scores: Optional[Dict[str, float]] = None,
+        known_features: Optional[Dict[str, Dict[str, float]]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[int, List[Tuple[str, float]]]:
+        """
+        预算模式评分：按廉价特征排序后分轮评分，每个说话人预算满足后停止
+
+        Returns:
+            Dict[int, List[Tuple[str, float]]]: 同 score_speaker_audios，未评分片段分数为 UNSCORED_MOS
+        """
+        known_scores = known_scores or {}
+        known_features = known_features or {}
+        total = sum(len(items) for items in speaker_items.values())
+        print(f"[NISQA] 预算模式评分 {total} 个音频片段（每个说话人 {budget_seconds:.1f}s 有效语音，MOS >= {min_mos}）")
+
+        # 1. 计算廉价特征并排序（无法读取的片段直接丢弃，与全量评分时的行为一致）
+        queues = {}
+        speech_durations = {}
+        for speaker_id, items in speaker_items.items():
+            ranked = []
+            for item in items:
+                features = known_features.get(audio_key(item)) or self._cheap_features(item)
+                if features is None:
+                    continue
+                speech_durations[audio_key(item)] = features['speech_duration']
+                ranked.append((features['priority'], item))
+            ranked.sort(key=lambda x: x[0], reverse=True)
+            queues[speaker_id] = [item for _, item in ranked]
+
+        results = {speaker_id: [] for speaker_id in queues}
+        filled = {speaker_id: 0.0 for speaker_id in queues}
+        positions = {speaker_id: 0 for speaker_id in queues}
+        rounds = 0
+        reused = 0
+
+        def report_progress():
+            # 已完成 = 已评分的片段 + 预算已满足的说话人剩余的片段
+            if progress_callback is None:
+                return
+            done = sum(
+                len(queue) if filled[speaker_id] >= budget_seconds else min(positions[speaker_id], len(queue))
+                for speaker_id, queue in queues.items()
+            )
+            progress_callback(done + total - sum(len(queue) for queue in queues.values()), total)
+
+        # 2. 分轮评分：每轮把所有未满足预算的说话人的下一批候选合并成一次批量评分
+        while True:
+            batch = []
+            batch_speaker = {}
+            scored_round = []
+            for speaker_id, queue in queues.items():
+                if filled[speaker_id] >= budget_seconds:
+                    continue
+                start = positions[speaker_id]
+                for item in queue[start:start + round_size]:
+                    key = audio_key(item)
+                    if key in known_scores:
+                        scored_round.append((key, known_scores[key]))
+                        reused += 1
+                    else:
+                        batch.append(item)
+                    batch_speaker[key] = speaker_id
+                positions[speaker_id] = start + round_size
+
+            if not batch_speaker:
+                break
+
+            rounds += 1
+            if batch:
+                scored_round.extend(self.score_audio_batch(batch))
+            for key, score in scored_round:
+                speaker_id = batch_speaker.get(key)
+                if speaker_id is None:
+                    continue
+                results[speaker_id].append((key, score))
+                if score >= min_mos:
+                    filled[speaker_id] += speech_durations.get(key, 0.0)
+            report_progress()
+
+        # 3. 未评分的片段保留在结果中并标记
+        scored_count = 0
+        for speaker_id, queue in queues.items():
+            scored_count += len(results[speaker_id])
+            for item in queue[positions[speaker_id]:]:
+                results[speaker_id].append((audio_key(item), UNSCORED_MOS))
+
+        self.last_budget_stats = {
+            'total': total,
+            'scored': scored_count,
+            'skipped': total - scored_count,
+            'rounds': rounds,
+            'reused': reused
+        }
+        print(f"[NISQA] 预算模式完成: 评分 {scored_count}/{total} 个片段（复用提前评分 {reused} 个），"
+              f"跳过 {total - scored_count} 个，共 {rounds} 轮")
+        if progress_callback is not None:
+            progress_callback(total, total)
 
         return results
 
+    def prescore_candidates(
+        self,
+        items: List[AudioInput],
+        min_priority: float = 4.0
+    ) -> Tuple[Dict[str, Dict[str, float]], Dict[str, float]]:
+        """
+        聚类完成前的提前评分：计算所有片段的廉价特征，只对优先级较高（预算模式下大概率会被评分）的片段推理
+
+        返回值可作为 score_speaker_audios 的 known_features / known_scores 传入
+
+        Args:
+            items: 音频文件路径或内存片段列表
+            min_priority: 提前评分的最低优先级（见 _cheap_features），0 表示全部评分
+
+        Returns:
+            ({片段key: 廉价特征}, {片段key: MOS分数})
+        """
+        features = {}
+        candidates = []
+        for item in items:
+            item_features = self._cheap_features(item)
+            if item_features is None:
+                continue
+            features[audio_key(item)] = item_features
+            if item_features['priority'] >= min_priority:
+                candidates.append(item)
+
+        scores = dict(self.score_audio_batch(candidates)) if candidates else {}
+        return features, scores
+
+    def _cheap_features(self, item: AudioInput) -> Optional[Dict[str, float]]:
+        """
+        计算排序用的廉价特征：时长、有效语音时长、语音占比、整体音量
+
+        Returns:
+            特征字典（含排序优先级 priority），无法读取时返回 None
+        """
+        try:
+            audio, sr = load_audio(item, sample_rate=16000)
+        except Exception as e:
+            print(f"[NISQA] 警告：无法读取音频 {audio_key(item)}: {e}")
+            return None
+
+        duration = len(audio) / sr if sr else 0.0
+        if duration <= 0:
+            return None
+
+        speech_segments = self.trimmer.detect_speech_segments(audio, sr)
+        speech_duration = sum(seg['end'] - seg['start'] for seg in speech_segments)
+        speech_ratio = speech_duration / duration
+        rms = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64))))
+        rms_db = 20 * np.log10(rms) if rms > 1e-10 else -100.0
+
+        # 有效语音越长、占比越高越优先（超过 8 秒不再加分）；音量过低的片段降低优先级
+        priority = min(speech_duration, 8.0) * (0.5 + 0.5 * speech_ratio)
+        if rms_db < -45.0:
+            priority *= 0.5
+
+        return {
+            'duration': duration,
+            'speech_duration': speech_duration,
+            'speech_ratio': speech_ratio,
+            'rms_db': rms_db,
+            'priority': priority
+        }
+
 
 # 向后兼容：保留旧的 MOSScorer 接口
 class MOSScorer(NISQAScorer):
@@ -60,6 +60,14 @@ class TaskPathManager:
         """获取说话人聚类数据路径"""
         return self.get_task_paths(task_id)["processed"] / "speaker_data.json"
 
+    def get_embedding_cache_path(self, task_id: str) -> Path:
+        """获取说话人嵌入缓存路径"""
+        return self.get_task_paths(task_id)["processed"] / "embedding_cache.npz"
+
+    def get_speaker_references_path(self, task_id: str) -> Path:
+        """获取说话人参考数据路径（参考音频与参考文本，所有语言共享）"""
+        return self.get_task_paths(task_id)["processed"] / "speaker_references.json"
+
     def get_diarization_dir(self, task_id: str) -> Path:
         """获取说话人分离数据目录（与processed目录相同）"""
         return self.get_task_paths(task_id)["processed"]
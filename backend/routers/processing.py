@@ -22,7 +22,9 @@ from models.task import Task
 from progress_manager import update_task_progress, mark_task_failed, mark_task_completed
 from path_utils import task_path_manager
 from running_task_tracker import running_task_tracker
+from speaker_reference_preparation import prepare_speaker_references, invalidate_speaker_references, get_prepared_reference
 from power_manager import prevent_sleep_enable, prevent_sleep_disable
+from audio_dsp import remove_silence_by_volume, apply_fade_in_out, replan_audio_timeline
 import shutil
 from pathlib import Path
 
@@ -185,6 +187,22 @@ class RegenerateSegmentRequest(BaseModel):
 
 # ==================== 说话人识别 API ====================
 
+def _nisqa_budget_seconds() -> Optional[float]:
+    """每个说话人的 NISQA 评分预算（有效语音秒数），NISQA_BUDGET_SECONDS=0 时评分全部片段"""
+    budget = float(os.environ.get("NISQA_BUDGET_SECONDS", "20"))
+    return budget if budget > 0 else None
+
+
+def _diarization_progress_reporter(task_id: str, loop: asyncio.AbstractEventLoop):
+    """返回可在工作线程中调用的说话人识别进度上报函数 (百分比, 描述)"""
+    def report(percent: int, message: str):
+        asyncio.run_coroutine_threadsafe(
+            update_task_progress(task_id, "default", "speaker_diarization", percent, message, "processing"),
+            loop
+        )
+    return report
+
+
 @router.post("/{task_id}/speaker-diarization")
 async def process_speaker_diarization(
     task_id: str,
@@ -405,7 +423,10 @@ async def save_speaker_labels(
         # 使用NISQA重新评分
         from nisqa_scorer import NISQAScorer
         mos_scorer = NISQAScorer()
-        scored_segments = mos_scorer.score_speaker_audios(str(segments_dir), speaker_segments)
+        scored_segments = mos_scorer.score_speaker_audios(
+            str(segments_dir), speaker_segments,
+            budget_seconds=_nisqa_budget_seconds()
+        )
 
         print(f"[保存说话人] MOS评分完成，共 {len(scored_segments)} 个说话人", flush=True)
 
@@ -416,6 +437,9 @@ async def save_speaker_labels(
         with open(speaker_data_path, 'w', encoding='utf-8') as f:
             json.dump(speaker_data, f, ensure_ascii=False, indent=2)
 
+        # 说话人分配已变化，参考数据在下次语音克隆时重新计算
+        invalidate_speaker_references(task_id)
+
         print(f"[保存说话人] ✅ 保存成功: {speaker_data_path}", flush=True)
 
         # 完成任务追踪
@@ -444,15 +468,16 @@ async def run_speaker_diarization_task(
     """
     后台执行说话人识别任务
 
-    完整流程包括:
-    1. 音频切分 (0-25%)
-    2. 说话人特征提取和聚类 (25-60%)
-    3. MOS 音频质量评分 (60-80%)
-    4. 性别识别 (80-100%)
+    完整流程包括（进度按各阶段实际完成的片段数计算）:
+    1. 音频切分 + 说话人特征提取 + NISQA 提前评分，流水线重叠执行 (5-55%)
+    2. 说话人聚类 (55-60%)
+    3. MOS 音频质量评分 (60-85%)
+    4. 性别识别 (85-95%)
     """
     import time
     import json
     start_time = time.time()
+    extractor = None
 
     try:
         print(f"\n========== 开始说话人识别任务: {task_id} ==========", flush=True)
@@ -466,96 +491,131 @@ async def run_speaker_diarization_task(
         from cluster_processor import SpeakerClusterer
         from srt_parser import SRTParser
 
-        # ==================== 任务1: 音频切分 (0-25%) ====================
+        # ==================== 任务1: 音频切分 + 特征提取 (5-55%) ====================
         await update_task_progress(
             task_id, "default", "speaker_diarization",
             5, "音频切分中...", "processing"
         )
+        from diarization_pipeline import DiarizationPipeline, StageProgress
+        report = _diarization_progress_reporter(task_id, asyncio.get_running_loop())
+
+        # 提取嵌入向量（启用嵌入缓存，重新识别时未改动的片段直接复用）
+        embedding_extractor = SpeakerEmbeddingExtractor(offline_mode=True)
+        global_cache_dir = os.environ.get("EMBEDDING_CACHE_DIR")
+        if global_cache_dir:
+            embedding_cache_path = Path(global_cache_dir) / "embedding_cache.npz"
+        else:
+            embedding_cache_path = task_path_manager.get_embedding_cache_path(task_id)
+        embedding_extractor.enable_cache(
+            str(embedding_cache_path),
+            max_entries=int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "20000"))
+        )
 
-        # 使用 AudioExtractor 直接从视频按字幕时间段提取音频
+        # NISQA 在嵌入提取的同时对候选片段提前评分（加载失败时在聚类后再报错）
+        from nisqa_scorer import NISQAScorer
+        mos_scorer = None
+        if os.environ.get("DIARIZATION_PRESCORE", "1") != "0":
+            try:
+                mos_scorer = NISQAScorer()
+            except Exception as e:
+                print(f"[说话人识别] NISQA 初始化失败，跳过提前评分: {e}", flush=True)
+
+        # 使用 AudioExtractor 直接从视频按字幕时间段提取内存音频片段，每切出一个片段就送入嵌入线程
+        # 片段文件仍写入 segments_dir，供编辑器界面和后续语音克隆使用；
+        # 特征提取、MOS评分、性别识别直接使用内存片段，不再重复读取文件
         segments_dir = task_path_manager.get_speaker_segments_dir(task_id)
         extractor = AudioExtractor(cache_dir=str(segments_dir))
-        audio_paths = extractor.extract_audio_segments(video_path, subtitle_path)
+        front_progress = StageProgress(report, 5, 55)
+        pipeline = DiarizationPipeline(
+            embedding_extractor,
+            prescorer=mos_scorer,
+            num_embed_workers=int(os.environ.get("DIARIZATION_EMBED_WORKERS", "1")),
+            progress_callback=lambda fraction, message: front_progress.update(fraction, 1.0, message)
+        )
+        segment_buffers, embeddings = await asyncio.to_thread(
+            pipeline.run,
+            lambda on_segment: extractor.extract_segment_buffers(
+                video_path, subtitle_path, write_files=True, on_segment=on_segment
+            )
+        )
+        audio_paths = [buffer.key for buffer in segment_buffers]
 
         print(f"[说话人识别] 提取了 {len(audio_paths)} 个音频片段", flush=True)
+        timings = extractor.last_timings
+        print(f"[说话人识别] 音频切分模式: {timings.get('mode')}, "
+              f"解码耗时 {timings.get('decode_seconds', 0.0):.2f}s, "
+              f"切片耗时 {timings.get('slice_seconds', 0.0):.2f}s", flush=True)
         print(f"[DEBUG-切分] audio_paths 长度: {len(audio_paths)}", flush=True)
-
-        # ==================== 任务2: 说话人特征提取和聚类 (25-60%) ====================
-        await update_task_progress(
-            task_id, "default", "speaker_diarization",
-            30, "说话人特征提取中...", "processing"
-        )
-
-        # 提取嵌入向量
-        embedding_extractor = SpeakerEmbeddingExtractor(offline_mode=True)
-        embeddings = embedding_extractor.extract_embeddings(audio_paths)
-
         print(f"[说话人识别] 提取了 {len([e for e in embeddings if e is not None])} 个有效特征", flush=True)
 
+        # ==================== 任务2: 说话人聚类 (55-60%) ====================
         await update_task_progress(
             task_id, "default", "speaker_diarization",
             55, "说话人聚类分析中...", "processing"
         )
 
-        # 获取视频时长以确定聚类数量
-        import subprocess
+        # 根据嵌入相似度矩阵自动估计说话人数量
+        from speaker_count_estimation import estimate_speaker_count
+        min_speakers = int(os.environ.get("SPEAKER_COUNT_MIN", "2"))
+        max_speakers = int(os.environ.get("SPEAKER_COUNT_MAX", "10"))
         try:
-            result = subprocess.run(
-                ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-                 '-of', 'default=noprint_wrappers=1:nokey=1', video_path],
-                capture_output=True, text=True, timeout=10
+            n_clusters, estimation_info = await asyncio.to_thread(
+                estimate_speaker_count,
+                embeddings,
+                min_speakers=min_speakers,
+                max_speakers=max_speakers,
+                method=os.environ.get("SPEAKER_COUNT_METHOD", "silhouette")
             )
-            video_duration = float(result.stdout.strip())
-            print(f"[说话人识别] 视频时长: {video_duration:.2f}秒 ({video_duration/60:.2f}分钟)", flush=True)
+            print(f"[说话人识别] 自动估计说话人数量: {n_clusters} "
+                  f"(方法: {estimation_info['method']}, 样本: {estimation_info['n_samples']}, "
+                  f"耗时: {estimation_info['elapsed']:.2f}秒)", flush=True)
         except Exception as e:
-            print(f"[说话人识别] 无法获取视频时长: {e}，使用默认聚类数 5", flush=True)
-            video_duration = 300  # 默认5分钟
-
-        # 根据视频时长计算说话人聚类数量
-        duration_minutes = video_duration / 60
-        if duration_minutes <= 1:
-            n_clusters = 4
-        elif duration_minutes <= 5:
+            print(f"[说话人识别] 说话人数量估计失败: {e}，使用默认聚类数 5", flush=True)
             n_clusters = 5
-        elif duration_minutes <= 10:
-            n_clusters = 6
-        elif duration_minutes <= 20:
-            n_clusters = 7
-        else:
-            n_clusters = 8
-
-        print(f"[说话人识别] 根据视频时长 {duration_minutes:.2f}分钟，设置聚类数量为 {n_clusters}", flush=True)
+            estimation_info = {'method': 'default', 'scores': {}, 'n_samples': 0, 'elapsed': 0.0}
 
-        # 聚类识别说话人
-        clusterer = SpeakerClusterer(n_clusters=n_clusters, distance_threshold=None)
-        speaker_labels = clusterer.cluster_embeddings(embeddings)
+        # 聚类识别说话人（提前评分在后台继续进行）
+        clusterer = SpeakerClusterer(
+            n_clusters=n_clusters,
+            distance_threshold=None,
+            scalable_threshold=int(os.environ.get("DIARIZATION_SCALABLE_THRESHOLD", "3000"))
+        )
+        speaker_labels = await asyncio.to_thread(clusterer.cluster_embeddings, embeddings)
         num_speakers = clusterer.get_unique_speakers_count(speaker_labels)
 
         print(f"[说话人识别] 识别到 {num_speakers} 个说话人", flush=True)
         print(f"[DEBUG-聚类] speaker_labels 长度: {len(speaker_labels)}", flush=True)
 
-        # ==================== 任务3: MOS音频质量评分 (60-80%) ====================
+        # ==================== 任务3: MOS音频质量评分 (60-85%) ====================
         await update_task_progress(
             task_id, "default", "speaker_diarization",
-            65, "音频质量评估中...", "processing"
+            60, "音频质量评估中...", "processing"
         )
 
         # 按说话人分组音频
         speaker_segments = {}
-        for audio_path, speaker_id in zip(audio_paths, speaker_labels):
+        for segment_buffer, speaker_id in zip(segment_buffers, speaker_labels):
             if speaker_id is not None:
                 if speaker_id not in speaker_segments:
                     speaker_segments[speaker_id] = []
-                speaker_segments[speaker_id].append(audio_path)
-
-        # 计算MOS分数（使用 NISQA）
-        from nisqa_scorer import NISQAScorer
-        mos_scorer = NISQAScorer()
-        scored_segments = mos_scorer.score_speaker_audios(str(segments_dir), speaker_segments)
+                speaker_segments[speaker_id].append(segment_buffer)
+
+        # 计算MOS分数（使用 NISQA），复用提前评分的结果
+        known_features, known_scores = await asyncio.to_thread(pipeline.wait_prescores)
+        if mos_scorer is None:
+            mos_scorer = NISQAScorer()
+        scored_segments = await asyncio.to_thread(
+            mos_scorer.score_speaker_audios,
+            str(segments_dir), speaker_segments,
+            budget_seconds=_nisqa_budget_seconds(),
+            known_scores=known_scores,
+            known_features=known_features,
+            progress_callback=StageProgress(report, 60, 85).callback("音频质量评估")
+        )
 
         print(f"[说话人识别] 已完成MOS评分（NISQA），共 {len(scored_segments)} 个说话人", flush=True)
 
-        # ==================== 任务4: 性别识别 (80-100%) ====================
+        # ==================== 任务4: 性别识别 (85-95%) ====================
         await update_task_progress(
             task_id, "default", "speaker_diarization",
             85, "性别识别分析中...", "processing"
@@ -566,14 +626,21 @@ async def run_speaker_diarization_task(
         gender_classifier = GenderClassifier()
 
         # 使用静音切割预处理，临时文件保存在segments_dir
-        gender_dict, gender_probs = gender_classifier.classify_speakers(
+        gender_dict, gender_probs = await asyncio.to_thread(
+            gender_classifier.classify_speakers,
             scored_segments,
             min_duration=2.0,
             use_silence_trimming=True,
             min_final_duration=1.5,
-            temp_dir=str(segments_dir)
+            temp_dir=str(segments_dir),
+            segment_buffers={buffer.key: buffer for buffer in segment_buffers},
+            progress_callback=StageProgress(report, 85, 95).callback("性别识别")
         )
 
+        # 内存片段使用完毕，释放整段音频的内存映射
+        segment_buffers = None
+        extractor.release_decoded_audio()
+
         # 根据性别和出现次数重新命名说话人
         print(f"[说话人识别] 根据性别和出现次数重新命名说话人...", flush=True)
         speaker_name_mapping, gender_stats = rename_speakers_by_gender(speaker_labels, gender_dict)
@@ -645,6 +712,12 @@ async def run_speaker_diarization_task(
             'segments': audio_segments,
             'speaker_labels': speaker_labels,
             'num_speakers': num_speakers,
+            'speaker_count_estimation': {
+                'method': estimation_info['method'],
+                'estimated': n_clusters,
+                'elapsed': estimation_info['elapsed'],
+                'scores': {str(k): v for k, v in estimation_info['scores'].items()}
+            },
             'scored_segments': scored_segments,
             'gender_dict': gender_dict,
             'speaker_name_mapping': speaker_name_mapping,
@@ -658,6 +731,19 @@ async def run_speaker_diarization_task(
         with open(speaker_data_path, 'w', encoding='utf-8') as f:
             json.dump(speaker_data, f, ensure_ascii=False, indent=2)
 
+        # 准备说话人参考数据（参考音频 + 参考文本），各语言语音克隆直接复用
+        # 片段已重新切分，即使 speaker_data 内容相同也要重新计算
+        invalidate_speaker_references(task_id)
+        await update_task_progress(
+            task_id, "default", "speaker_diarization",
+            97, "正在准备说话人参考音频...", "processing"
+        )
+        try:
+            await asyncio.to_thread(prepare_speaker_references, task_id)
+        except Exception as e:
+            # 失败不影响识别结果，语音克隆时会再次尝试
+            print(f"[说话人识别] ⚠️  准备说话人参考数据失败: {e}", flush=True)
+
         await mark_task_completed(task_id, "default", "speaker_diarization")
         # 完成时停止追踪
         prevent_sleep_disable()
@@ -675,6 +761,8 @@ async def run_speaker_diarization_task(
         print(f"[说话人识别] ⏱️  失败前耗时: {duration_str}", flush=True)
         import traceback
         traceback.print_exc()
+        if extractor is not None:
+            extractor.release_decoded_audio()
         await mark_task_failed(task_id, "default", "speaker_diarization", str(e))
         # 失败时停止追踪
         prevent_sleep_disable()
@@ -1010,7 +1098,9 @@ async def run_voice_cloning_task(
             extra_data={
                 "elapsed_time": result.get('total_duration', 0),
                 "total_items": result.get('total_segments', 0),
-                "successful_items": result.get('successful_segments', 0)
+                "successful_items": result.get('successful_segments', 0),
+                "reused_items": result.get('reused_segments', 0),
+                "generated_items": result.get('generated_segments', 0)
             }
         )
         # 完成时停止追踪
@@ -1019,6 +1109,7 @@ async def run_voice_cloning_task(
         print(f"[语音克隆] ✅ 任务完成: {task_id} -> {language}", flush=True)
         print(f"[语音克隆] 输出目录: {result['output_dir']}", flush=True)
         print(f"[语音克隆] 成功生成 {result.get('successful_segments', 0)}/{result.get('total_segments', 0)} 个音频", flush=True)
+        print(f"[语音克隆] 复用 {result.get('reused_segments', 0)} 个, 新生成 {result.get('generated_segments', 0)} 个", flush=True)
 
     except Exception as e:
         print(f"[语音克隆] ❌ 任务失败: {str(e)}", flush=True)
@@ -1358,195 +1449,6 @@ async def run_export_task(task_id: str, language: str):
 
 # ==================== 音频拼接 API ====================
 
-def _remove_silence_by_volume(
-    audio_data,
-    sample_rate: int,
-    window_ms: int = 50,
-    db_threshold: float = -50.0,
-    min_silence_windows: int = 2
-):
-    """
-    基于音量检测并移除静音段
-    """
-    import numpy as np
-
-    if len(audio_data) == 0:
-        return audio_data
-
-    window_samples = int(sample_rate * window_ms / 1000.0)
-
-    if window_samples == 0 or len(audio_data) < window_samples:
-        return audio_data
-
-    num_windows = len(audio_data) // window_samples
-    db_values = []
-
-    for i in range(num_windows):
-        start = i * window_samples
-        end = start + window_samples
-        window = audio_data[start:end]
-        rms = np.sqrt(np.mean(window ** 2))
-        if rms > 1e-10:
-            db = 20 * np.log10(rms)
-        else:
-            db = -100.0
-        db_values.append(db)
-
-    is_speech = []
-    for i in range(len(db_values)):
-        silence_count = 0
-        for j in range(min_silence_windows):
-            if i + j < len(db_values) and db_values[i + j] < db_threshold:
-                silence_count += 1
-        is_speech.append(silence_count < min_silence_windows)
-
-    speech_segments = []
-    for i, speech in enumerate(is_speech):
-        if speech:
-            start = i * window_samples
-            end = min((i + 1) * window_samples, len(audio_data))
-            speech_segments.append(audio_data[start:end])
-
-    remaining_start = num_windows * window_samples
-    if remaining_start < len(audio_data):
-        speech_segments.append(audio_data[remaining_start:])
-
-    if speech_segments:
-        result = np.concatenate(speech_segments)
-        reduction_ratio = (1 - len(result) / len(audio_data)) * 100
-        print(f"  [静音移除] 移除 {reduction_ratio:.1f}% 的静音段")
-        return result
-
-    return audio_data
-
-
-def _apply_fade_in_out(
-    audio_data,
-    sample_rate: int,
-    fade_ms: int = 10
-):
-    """
-    在音频首尾应用淡入淡出效果
-    """
-    import numpy as np
-
-    if len(audio_data) == 0:
-        return audio_data
-
-    fade_samples = int(sample_rate * fade_ms / 1000.0)
-    fade_samples = min(fade_samples, len(audio_data) // 2)
-
-    if fade_samples == 0:
-        return audio_data
-
-    result = audio_data.copy()
-    fade_in_curve = np.linspace(0, 1, fade_samples)
-    result[:fade_samples] *= fade_in_curve
-    fade_out_curve = np.linspace(1, 0, fade_samples)
-    result[-fade_samples:] *= fade_out_curve
-
-    return result
-
-
-def _replan_audio_timeline(
-    cloned_results: List[Dict],
-    cloned_audio_dir: str,
-    optimized_files: Dict[int, str]
-) -> Dict[int, Dict]:
-    """
-    重新规划音频时间轴，为超长片段借用相邻空闲时间
-    """
-    import soundfile as sf
-
-    replanned = {}
-    segments_info = []
-
-    for idx, result in enumerate(cloned_results):
-        if idx in optimized_files:
-            audio_file_path = optimized_files[idx]
-        else:
-            audio_filename = f"segment_{idx}.wav"
-            audio_file_path = os.path.join(cloned_audio_dir, audio_filename)
-
-        if not os.path.exists(audio_file_path):
-            continue
-
-        try:
-            audio_data, sr = sf.read(audio_file_path)
-            actual_duration = len(audio_data) / sr
-            start_time = result.get("start_time", 0)
-            end_time = result.get("end_time", 0)
-            target_duration = end_time - start_time
-
-            segments_info.append({
-                'index': idx,
-                'start_time': start_time,
-                'end_time': end_time,
-                'target_duration': target_duration,
-                'actual_duration': actual_duration,
-                'audio_file_path': audio_file_path,
-                'sr': sr
-            })
-        except Exception as e:
-            print(f"[时间轴规划] 读取片段 {idx} 失败: {e}")
-            continue
-
-    segments_info.sort(key=lambda x: x['start_time'])
-
-    for i, seg in enumerate(segments_info):
-        excess = seg['actual_duration'] - seg['target_duration']
-
-        if excess <= 0.001:
-            continue
-
-        idx = seg['index']
-        max_borrow = seg['target_duration'] * 0.5
-
-        gap_before = 0
-        if i > 0:
-            prev_seg = segments_info[i - 1]
-            gap_before = seg['start_time'] - prev_seg['end_time']
-
-        gap_after = 0
-        if i < len(segments_info) - 1:
-            next_seg = segments_info[i + 1]
-            gap_after = next_seg['start_time'] - seg['end_time']
-
-        half_excess = excess / 2
-        borrow_before = min(gap_before, max_borrow, half_excess)
-        borrow_after = min(gap_after, max_borrow, half_excess)
-
-        total_borrowed = borrow_before + borrow_after
-        if total_borrowed < excess:
-            remaining_needed = excess - total_borrowed
-            can_borrow_more_before = min(gap_before - borrow_before, max_borrow - borrow_before)
-            can_borrow_more_after = min(gap_after - borrow_after, max_borrow - borrow_after)
-
-            if can_borrow_more_before > 0:
-                extra_before = min(can_borrow_more_before, remaining_needed)
-                borrow_before += extra_before
-                remaining_needed -= extra_before
-
-            if remaining_needed > 0 and can_borrow_more_after > 0:
-                extra_after = min(can_borrow_more_after, remaining_needed)
-                borrow_after += extra_after
-
-        if borrow_before > 0.001 or borrow_after > 0.001:
-            actual_start = seg['start_time'] - borrow_before
-            actual_end = seg['end_time'] + borrow_after
-            replanned[idx] = {
-                'actual_start': actual_start,
-                'actual_end': actual_end,
-                'actual_duration': actual_end - actual_start,
-                'borrowed_before': borrow_before,
-                'borrowed_after': borrow_after,
-                'original_start': seg['start_time'],
-                'original_end': seg['end_time']
-            }
-
-    return replanned
-
-
 @router.post("/{task_id}/languages/{language}/stitch-audio")
 async def stitch_cloned_audio(
     task_id: str,
@@ -1657,7 +1559,7 @@ async def stitch_cloned_audio(
         )
 
         # 步骤2: 重新规划时间轴
-        replanned_segments = _replan_audio_timeline(
+        replanned_segments = replan_audio_timeline(
             cloned_results,
             str(cloned_audio_dir),
             optimized_files
@@ -1789,7 +1691,7 @@ async def stitch_cloned_audio(
             # 静音移除（跳过已优化的片段）
             if idx not in optimized_files and len(audio_data) / sample_rate > target_duration * 1.05:
                 original_duration = len(audio_data) / sample_rate
-                audio_data = _remove_silence_by_volume(
+                audio_data = remove_silence_by_volume(
                     audio_data, sample_rate,
                     window_ms=50, db_threshold=-50.0, min_silence_windows=2
                 )
@@ -1827,7 +1729,7 @@ async def stitch_cloned_audio(
                     processed_audio = np.pad(processed_audio, (0, diff), mode='constant', constant_values=0)
 
             # 应用淡入淡出
-            processed_audio = _apply_fade_in_out(processed_audio, sample_rate, fade_ms=10)
+            processed_audio = apply_fade_in_out(processed_audio, sample_rate, fade_ms=10, in_place=True)
 
             # 音量匹配
             if original_volume is not None and original_volume > 1e-6:
@@ -2186,6 +2088,7 @@ async def regenerate_segment(
         # 确定参考音频和参考文本
         ref_audio_path = None
         ref_text = ""
+        prepared_reference = None  # 任务级参考数据（与语音克隆使用的参考音频/文本一致）
         using_default_voice = False
         default_voice_npy_path = None  # 用于Fish-Speech的预编码NPY文件
 
@@ -2212,9 +2115,17 @@ async def regenerate_segment(
             # 否则使用 new_speaker_id 的参考音频
             ref_speaker_id = voice_source_speaker_id if voice_source_speaker_id is not None else new_speaker_id
 
+            # 优先复用已准备的说话人参考数据（未准备时会在此计算一次）
+            if speaker_data_path.exists():
+                prepared_reference = await asyncio.to_thread(get_prepared_reference, task_id, ref_speaker_id)
+
             # 获取参考音频路径 - 尝试多个可能的位置
             reference_output_dir = os.path.join(audio_dir, "references")
-            ref_audio_path = os.path.join(reference_output_dir, f"speaker_{ref_speaker_id}_reference.wav")
+            if prepared_reference is not None:
+                ref_audio_path = prepared_reference["reference_audio"]
+                print(f"[重新生成片段] 使用已准备的参考数据: {ref_audio_path}", flush=True)
+            else:
+                ref_audio_path = os.path.join(reference_output_dir, f"speaker_{ref_speaker_id}_reference.wav")
 
             if not os.path.exists(ref_audio_path):
                 # 尝试其他可能的路径
@@ -2251,7 +2162,9 @@ async def regenerate_segment(
                 print(f"[重新生成片段] 使用说话人 {voice_source_speaker_id} 的音色为说话人 {new_speaker_id} 生成语音", flush=True)
 
         # 获取参考文本（如果使用默认音色，已经在上面设置好了）
-        if not using_default_voice:
+        if not using_default_voice and prepared_reference is not None:
+            ref_text = prepared_reference["reference_text"]
+        elif not using_default_voice:
             from subtitle_text_extractor import SubtitleTextExtractor
             source_subtitle_path = task_path_manager.get_source_subtitle_path(task_id)
             text_extractor = SubtitleTextExtractor()
@@ -2390,6 +2303,18 @@ async def regenerate_segment(
             loop = asyncio.get_running_loop()
 
             def generate_with_fish_speech():
+                from tts_worker_client import tts_workers
+                if tts_workers.enabled:
+                    # 常驻进程已加载模型时无需再启动两个子进程（语义 token 生成 + 解码）
+                    from fish_simple_cloner import SimpleFishCloner
+                    generated = SimpleFishCloner(use_multiprocess=False).batch_generate_audio(
+                        [{"speaker_id": new_speaker_id, "segment_index": segment_index, "target_text": target_text}],
+                        {new_speaker_id: default_voice_npy_path},
+                        {new_speaker_id: {"reference_text": ref_text}},
+                        str(cloned_audio_dir)
+                    )
+                    return segment_index in generated
+
                 # 生成语义token
                 codes_path = cloner.generate_semantic_tokens(
                     target_text=target_text,
@@ -6,6 +6,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
+import asyncio
 import os
 import sys
 import time
@@ -13,6 +14,10 @@ import platform
 import psutil
 import subprocess
 
+from model_registry import model_registry
+from llm_residency import llm_residency
+from tts_worker_client import tts_workers
+
 router = APIRouter(prefix="/api/system", tags=["system"])
 
 # 记录系统启动时间
@@ -264,3 +269,68 @@ async def health_check():
     健康检查接口（用于前端检测服务是否在线）
     """
     return {"status": "ok", "timestamp": time.time()}
+
+
+@router.get("/models")
+async def get_model_registry_stats():
+    """
+    获取进程内共享模型的状态
+
+    返回：
+    - 已加载模型（设备、大小、加载耗时、命中次数、空闲时间）
+    - 内存/显存预算与占用
+    - 命中、加载、淘汰次数
+    """
+    return model_registry.stats()
+
+
+@router.post("/models/unload")
+async def unload_models(model_id: Optional[str] = None):
+    """
+    卸载共享模型（不指定 model_id 时卸载全部），释放内存/显存
+    """
+    unloaded = model_registry.unload(model_id)
+    return {"unloaded": unloaded}
+
+
+@router.get("/llm")
+async def get_llm_residency_stats():
+    """
+    获取翻译大模型（Ollama）的驻留状态
+
+    返回：
+    - 驻留中的模型（加载耗时、使用次数、空闲时间）
+    - 空闲 TTL
+    - 加载、复用、卸载、空闲过期次数和累计加载耗时
+    """
+    return llm_residency.stats()
+
+
+@router.post("/llm/release")
+async def release_llm(model: Optional[str] = None):
+    """
+    卸载翻译大模型（不指定 model 时卸载全部驻留模型），释放显存
+    """
+    released = await asyncio.to_thread(llm_residency.release, model, "手动卸载")
+    return {"released": released}
+
+
+@router.get("/tts-workers")
+async def get_tts_worker_stats():
+    """
+    获取 TTS 常驻工作进程的状态
+
+    返回：
+    - 各引擎/设备的工作进程（PID、是否存活、模型是否已加载、加载耗时、正在执行的任务）
+    - 启动、重启、任务、片段和回退到子进程的次数
+    """
+    return await asyncio.to_thread(tts_workers.stats)
+
+
+@router.post("/tts-workers/shutdown")
+async def shutdown_tts_workers(engine: Optional[str] = None):
+    """
+    关闭 TTS 常驻工作进程（不指定 engine 时关闭全部），释放显存
+    """
+    stopped = await asyncio.to_thread(tts_workers.shutdown, engine)
+    return {"stopped": stopped}
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+片段音频缓存 - 按内容寻址的语音克隆结果缓存
+
+译者修改少量台词后重新克隆时，未改动的片段不必重新生成。每个生成的片段按
+(引擎, 引擎版本, 参考音频哈希, 参考文本, 目标文本, 采样参数) 计算键并保存到缓存目录，
+再次克隆时键未变化的片段直接硬链接（跨磁盘时复制）到输出目录。
+
+缓存文件与输出文件可能是同一个硬链接，输出文件被原地覆盖（如编辑器中重新生成单个片段）时
+缓存文件内容也会改变；为此每个条目记录写入时的文件大小和修改时间，不一致的条目视为失效并删除。
+总大小超过上限时按最近使用时间淘汰。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+_backend_dir = os.path.dirname(os.path.abspath(__file__))
+# 默认放在 backend/cache/ 下（已加入 .gitignore），可用 SEGMENT_AUDIO_CACHE_DIR 改到其他磁盘
+DEFAULT_SEGMENT_AUDIO_CACHE_DIR = os.path.join(_backend_dir, "cache", "segment_audio")
+
+# 缓存键格式版本
+SEGMENT_CACHE_VERSION = 1
+
+# 各引擎的版本与固定采样参数，模型或生成脚本变化时修改以使旧片段失效
+# （采样参数需与对应的批量生成脚本保持一致）
+ENGINE_PROFILES: Dict[str, Dict] = {
+    "cosyvoice": {"version": "Fun-CosyVoice3-0.5B/cross_lingual/1", "params": {}},
+    "fish": {
+        "version": "openaudio-s1-mini/1",
+        "params": {"max_new_tokens": 1024, "top_p": 0.7, "temperature": 0.7, "repetition_penalty": 1.2}
+    },
+    "indonesian": {"version": "vits-tts-id/1", "params": {}},
+    "xtts": {"version": "xtts_v2/1", "params": {}},
+}
+
+
+class SegmentAudioCache:
+    """按内容寻址的片段音频缓存（线程安全）"""
+
+    def __init__(self, cache_dir: str = DEFAULT_SEGMENT_AUDIO_CACHE_DIR, max_bytes: int = 5 * 1024 ** 3):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节），0 表示不限制
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._reference_digests: Dict[Tuple, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.invalidated = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["SegmentAudioCache"]:
+        """
+        从环境变量创建：SEGMENT_AUDIO_CACHE_DIR（设为空字符串关闭缓存）、
+        SEGMENT_AUDIO_CACHE_MAX_MB（总大小上限）
+        """
+        cache_dir = os.environ.get("SEGMENT_AUDIO_CACHE_DIR", DEFAULT_SEGMENT_AUDIO_CACHE_DIR)
+        if not cache_dir:
+            return None
+        max_mb = int(os.environ.get("SEGMENT_AUDIO_CACHE_MAX_MB", "5120"))
+        return cls(cache_dir, max_bytes=max_mb * 1024 ** 2)
+
+    # ---------- 缓存键 ----------
+
+    def reference_digest(self, reference: Optional[str]) -> str:
+        """参考音频（或预置音色 npy）的内容哈希，按 (路径, 修改时间, 大小) 缓存；非文件时按字符串计算"""
+        if not reference:
+            return ""
+        try:
+            stat = os.stat(reference)
+        except OSError:
+            return "id:" + reference
+        file_key = (os.path.abspath(reference), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._reference_digests.get(file_key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(reference, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            with self._lock:
+                self._reference_digests[file_key] = digest
+        return digest
+
+    def segment_key(
+        self,
+        engine: str,
+        reference: Optional[str],
+        reference_text: str,
+        target_text: str,
+        params: Optional[Dict] = None
+    ) -> str:
+        """
+        计算片段缓存键
+
+        Args:
+            engine: 引擎名（cosyvoice / fish / indonesian / xtts）
+            reference: 参考音频或预置音色文件路径（没有参考音频的引擎传 None，音色放在 params 中）
+            reference_text: 参考文本
+            target_text: 目标文本
+            params: 影响生成结果的其他参数（目标语言、音色名等），与引擎固定采样参数合并
+        """
+        profile = ENGINE_PROFILES.get(engine, {"version": "unknown", "params": {}})
+        payload = {
+            "format": SEGMENT_CACHE_VERSION,
+            "engine": engine,
+            "engine_version": profile["version"],
+            "reference": self.reference_digest(reference),
+            "reference_text": reference_text or "",
+            "target_text": target_text or "",
+            "params": dict(profile["params"], **(params or {}))
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    # ---------- 读写 ----------
+
+    def _entry_paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + ".wav", base + ".json"
+
+    @staticmethod
+    def _place(source: str, destination: str):
+        """硬链接（失败时复制）source 到 destination，先删除已有文件以免写穿旧的硬链接"""
+        os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+        if os.path.exists(destination) and os.path.samefile(source, destination):
+            # 已经是同一个文件的硬链接（rename 对同一文件的两个链接不做任何操作，会留下临时文件）
+            return
+        temp = f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        try:
+            os.link(source, temp)
+        except OSError:
+            shutil.copy2(source, temp)
+        os.replace(temp, destination)
+
+    def _valid_entry(self, key: str) -> Optional[str]:
+        audio_path, meta_path = self._entry_paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            stat = os.stat(audio_path)
+        except (OSError, ValueError):
+            return None
+        if stat.st_size != meta.get("size") or stat.st_mtime_ns != meta.get("mtime_ns"):
+            # 输出文件经硬链接被原地覆盖，内容已不对应此键
+            self._remove_entry(key)
+            with self._lock:
+                self.invalidated += 1
+            return None
+        return audio_path
+
+    def _remove_entry(self, key: str):
+        for path in self._entry_paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def fetch(self, key: str, output_file: str) -> bool:
+        """命中时把缓存的片段放到 output_file，返回是否命中"""
+        audio_path = self._valid_entry(key)
+        if audio_path is not None:
+            try:
+                self._place(audio_path, output_file)
+                os.utime(self._entry_paths(key)[1])  # 记录最近使用时间
+                with self._lock:
+                    self.hits += 1
+                return True
+            except OSError:
+                pass
+        with self._lock:
+            self.misses += 1
+        return False
+
+    def store(self, key: str, audio_file: str) -> bool:
+        """保存生成的片段（空文件不保存）"""
+        try:
+            if os.path.getsize(audio_file) == 0:
+                return False
+            audio_path, meta_path = self._entry_paths(key)
+            self._place(audio_file, audio_path)
+            stat = os.stat(audio_path)
+            temp = f"{meta_path}.{os.getpid()}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "created_at": time.time()}, f)
+            os.replace(temp, meta_path)
+        except OSError as e:
+            print(f"[片段缓存] ⚠️ 保存失败 {audio_file}: {e}", flush=True)
+            return False
+        with self._lock:
+            self.stored += 1
+        return True
+
+    # ---------- 批量接口（语音克隆服务使用）----------
+
+    def reuse(
+        self,
+        tasks: List[Dict],
+        key_fn: Callable[[Dict], str],
+        output_fn: Callable[[Dict], str]
+    ) -> Tuple[Dict[int, str], List[Dict], Dict[int, str]]:
+        """
+        把任务分为可复用和需要生成两部分，可复用的片段直接放到输出位置
+
+        需要生成的片段会先删除已有的输出文件，避免生成脚本经硬链接覆盖缓存文件。
+
+        Args:
+            tasks: 片段任务列表（含 segment_index）
+            key_fn: 任务 -> 缓存键
+            output_fn: 任务 -> 输出文件路径
+
+        Returns:
+            (已复用的 {segment_index: 文件路径}, 需要生成的任务列表, 所有任务的 {segment_index: 缓存键})
+        """
+        reused: Dict[int, str] = {}
+        pending: List[Dict] = []
+        keys: Dict[int, str] = {}
+        for task in tasks:
+            index = task["segment_index"]
+            keys[index] = key_fn(task)
+            output_file = output_fn(task)
+            if self.fetch(keys[index], output_file):
+                reused[index] = output_file
+            else:
+                try:
+                    os.remove(output_file)
+                except OSError:
+                    pass
+                pending.append(task)
+        return reused, pending, keys
+
+    def store_generated(self, generated: Dict[int, str], keys: Dict[int, str]) -> int:
+        """保存新生成的片段，之后按大小上限淘汰，返回保存数量"""
+        stored = sum(1 for index, path in generated.items()
+                     if index in keys and path and self.store(keys[index], path))
+        self.prune()
+        return stored
+
+    def prune(self):
+        """总大小超过上限时删除最久未使用的条目"""
+        if self.max_bytes <= 0 or not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                key = name[:-5]
+                audio_path, meta_path = self._entry_paths(key)
+                try:
+                    size = os.path.getsize(audio_path)
+                    last_used = os.path.getmtime(meta_path)
+                except OSError:
+                    continue
+                entries.append((last_used, key, size))
+                total += size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, key, size in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove_entry(key)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        """本进程内的命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache_dir": self.cache_dir,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stored": self.stored,
+                "invalidated": self.invalidated,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+# 全局实例（SEGMENT_AUDIO_CACHE_DIR 为空时为 None）
+segment_audio_cache = SegmentAudioCache.from_env()
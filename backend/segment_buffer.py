@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+内存音频片段模块
+说话人识别流水线各阶段（切分、特征提取、NISQA评分、性别识别）之间直接传递的音频缓冲区，
+避免反复写入/读取大量小 WAV 文件
+"""
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import soundfile as sf
+
+
+@dataclass
+class SegmentBuffer:
+    """内存中的音频片段：音频数组 + 采样率 + 来源信息"""
+    audio: np.ndarray
+    sample_rate: int
+    index: int = -1  # 对应的字幕序号（从0开始），-1 表示未知
+    start_time: float = 0.0  # 在源视频中的开始时间（秒）
+    end_time: float = 0.0  # 在源视频中的结束时间（秒）
+    source: str = ""  # 源视频路径
+    path: Optional[str] = None  # 落盘路径（可选副产物，供编辑器界面使用）
+
+    @property
+    def duration(self) -> float:
+        """音频时长（秒）"""
+        if self.sample_rate <= 0:
+            return 0.0
+        return len(self.audio) / self.sample_rate
+
+    @property
+    def name(self) -> str:
+        """片段名称（有落盘文件时为文件名）"""
+        if self.path:
+            return os.path.basename(self.path)
+        return f"segment_{self.index + 1:03d}_{self.start_time:.3f}_{self.end_time:.3f}.wav"
+
+    @property
+    def key(self) -> str:
+        """片段的唯一标识，与原先基于路径的结果字典保持兼容"""
+        return self.path or self.name
+
+    def has_file(self) -> bool:
+        """是否已有落盘文件"""
+        return bool(self.path) and os.path.exists(self.path)
+
+    def write(self, path: str) -> str:
+        """
+        将音频写入磁盘，并记录落盘路径
+
+        Args:
+            path: 输出文件路径
+
+        Returns:
+            str: 输出文件路径
+        """
+        sf.write(str(path), self.audio, self.sample_rate)
+        self.path = str(path)
+        return self.path
+
+    def as_audio_file(self) -> Dict:
+        """
+        转换为 pyannote 风格的内存音频输入 {"waveform": (channel, time), "sample_rate": sr}
+        """
+        import torch
+
+        waveform = torch.from_numpy(np.ascontiguousarray(self.audio, dtype=np.float32))
+        return {"waveform": waveform.unsqueeze(0), "sample_rate": self.sample_rate}
+
+    @classmethod
+    def from_file(cls, path: str, sample_rate: int = 16000, index: int = -1) -> "SegmentBuffer":
+        """
+        从音频文件加载片段
+
+        Args:
+            path: 音频文件路径
+            sample_rate: 目标采样率
+            index: 字幕序号
+
+        Returns:
+            SegmentBuffer
+        """
+        import librosa
+
+        audio, sr = librosa.load(str(path), sr=sample_rate, mono=True)
+        return cls(audio=audio, sample_rate=sr, index=index, path=str(path))
+
+
+AudioInput = Union[str, SegmentBuffer]
+
+
+def load_audio(item: AudioInput, sample_rate: int = 16000) -> Tuple[np.ndarray, int]:
+    """
+    读取音频数据，同时接受文件路径和内存片段
+
+    Args:
+        item: 音频文件路径或 SegmentBuffer
+        sample_rate: 目标采样率
+
+    Returns:
+        (音频数据, 采样率)
+    """
+    if isinstance(item, SegmentBuffer):
+        if item.sample_rate == sample_rate:
+            return np.asarray(item.audio, dtype=np.float32), item.sample_rate
+
+        import librosa
+
+        audio = librosa.resample(
+            np.asarray(item.audio, dtype=np.float32),
+            orig_sr=item.sample_rate,
+            target_sr=sample_rate
+        )
+        return audio, sample_rate
+
+    import librosa
+
+    return librosa.load(str(item), sr=sample_rate)
+
+
+def audio_key(item: AudioInput) -> str:
+    """获取音频输入的标识（路径或片段 key）"""
+    if isinstance(item, SegmentBuffer):
+        return item.key
+    return str(item)
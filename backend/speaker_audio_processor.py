@@ -3,24 +3,26 @@
 用于筛选、拼接说话人音频片段
 """
 import numpy as np
-import librosa
 import soundfile as sf
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from mos_scorer import get_audio_duration
 from audio_silence_trimmer import AudioSilenceTrimmer
+from decoded_audio_cache import DecodedAudioCache, decoded_audio_cache
 
 
 class SpeakerAudioProcessor:
     """说话人音频处理器"""
 
-    def __init__(self, target_duration: float = 10.0, silence_duration: float = 1.0):
+    def __init__(self, target_duration: float = 10.0, silence_duration: float = 1.0,
+                 audio_cache: Optional[DecodedAudioCache] = None):
         """
         初始化音频处理器
 
         Args:
             target_duration: 目标音频总时长（秒），默认10秒
             silence_duration: 音频片段之间的静音间隔（秒），默认1.0秒
+            audio_cache: 解码音频缓存，默认使用进程内共享的缓存（筛选与拼接、各语言之间复用解码结果）
         """
         self.target_duration = target_duration
         self.silence_duration = silence_duration
@@ -32,6 +34,7 @@ class SpeakerAudioProcessor:
             frame_length_ms=25.0,
             hop_length_ms=10.0
         )
+        self.audio_cache = audio_cache if audio_cache is not None else decoded_audio_cache
 
     def select_best_segments(
         self,
@@ -55,11 +58,10 @@ class SpeakerAudioProcessor:
 
         for audio_path, mos_score in sorted_segments:
             try:
-                # 加载音频
-                audio_data, sr = librosa.load(audio_path, sr=self.sample_rate)
-
-                # 检测语音段
-                speech_segments = self.trimmer.detect_speech_segments(audio_data, sr)
+                # 加载音频并检测语音段（结果缓存，拼接时直接复用）
+                audio_data, speech_segments = self.audio_cache.load_with_speech(
+                    audio_path, self.sample_rate, self.trimmer
+                )
 
                 if not speech_segments:
                     print(f"  跳过片段 {Path(audio_path).name}：未检测到语音")
@@ -162,11 +164,11 @@ class SpeakerAudioProcessor:
 
         for i, (audio_path, _, _) in enumerate(segments):
             try:
-                # 加载音频并重采样到目标采样率
-                audio, sr = librosa.load(audio_path, sr=self.sample_rate)
-
-                # 检测语音段
-                speech_segments = self.trimmer.detect_speech_segments(audio, sr)
+                # 加载音频并检测语音段（通常已在筛选时缓存）
+                audio, speech_segments = self.audio_cache.load_with_speech(
+                    audio_path, self.sample_rate, self.trimmer
+                )
+                sr = self.sample_rate
 
                 if not speech_segments:
                     print(f"  警告: 片段 {Path(audio_path).name} 未检测到语音，使用原始音频")
@@ -258,6 +260,7 @@ class SpeakerAudioProcessor:
                 字典，key为说话人ID，value为(拼接后的音频路径, 选中的片段列表)
         """
         results = {}
+        decoded_before = self.audio_cache.misses
 
         for speaker_id, scored_segments in scored_segments_dict.items():
             try:
@@ -269,4 +272,8 @@ class SpeakerAudioProcessor:
                 print(f"处理说话人 {speaker_id} 时出错: {str(e)}")
                 continue
 
+        stats = self.audio_cache.stats()
+        print(f"[参考音频] 本次解码 {self.audio_cache.misses - decoded_before} 个片段文件，"
+              f"解码缓存命中率 {stats['hit_rate']:.1%} ({stats['entries']} 个片段, "
+              f"{stats['total_samples'] / self.sample_rate:.0f}s 音频)")
         return results
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+说话人参考数据准备 - 任务级产物，所有目标语言共享
+
+说话人参考音频（筛选 + 拼接）和参考文本只取决于说话人识别结果，与目标语言无关。
+首次使用时计算并保存到 processed/speaker_references.json，之后各语言的语音克隆和单片段重新生成
+直接复用；speaker_data.json 或原始字幕变化（如保存说话人分配）后自动重新计算。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from path_utils import task_path_manager
+
+# 产物格式版本，筛选/拼接逻辑变化时递增以使旧产物失效
+REFERENCE_PREPARATION_VERSION = 1
+
+# 进程内缓存：task_id -> (文件状态, 结果)，文件未变化时不再读取 JSON
+_prepared: Dict[str, Tuple[Tuple, Dict]] = {}
+_task_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _task_lock(task_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _task_locks.setdefault(task_id, threading.Lock())
+
+
+def _file_state(path: Path) -> Tuple:
+    """文件状态（不存在时为 None），用于判断输入是否变化"""
+    try:
+        stat = path.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return (None,)
+
+
+def _fingerprint(speaker_data: Dict, source_subtitle_path: Path) -> str:
+    """计算参考数据依赖的全部输入的指纹"""
+    payload = {
+        'version': REFERENCE_PREPARATION_VERSION,
+        'speaker_labels': speaker_data.get('speaker_labels'),
+        'scored_segments': speaker_data.get('scored_segments'),
+        'speaker_name_mapping': speaker_data.get('speaker_name_mapping'),
+        'gender_dict': speaker_data.get('gender_dict'),
+        'audio_dir': speaker_data.get('audio_dir'),
+        'source_subtitle': _file_state(source_subtitle_path)
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _references_exist(references: Dict[int, Dict]) -> bool:
+    return all(os.path.exists(ref.get('reference_audio', '')) for ref in references.values())
+
+
+def _to_int_key(speaker_id):
+    try:
+        return int(speaker_id)
+    except (ValueError, TypeError):
+        return speaker_id
+
+
+def _build_references(speaker_data: Dict, source_subtitle_path: Path) -> Dict[int, Dict]:
+    """筛选、拼接参考音频并提取参考文本（与语言无关的部分）"""
+    from speaker_audio_processor import SpeakerAudioProcessor
+    from subtitle_text_extractor import SubtitleTextExtractor
+
+    scored_segments = speaker_data['scored_segments']
+    gender_dict = speaker_data.get('gender_dict', {})
+    speaker_name_mapping = speaker_data.get('speaker_name_mapping', {})
+    audio_dir = speaker_data.get('audio_dir', '')
+
+    # 1. 筛选和拼接说话人参考音频
+    audio_processor = SpeakerAudioProcessor(target_duration=10.0, silence_duration=1.0)
+    reference_output_dir = os.path.join(audio_dir, "references")
+    os.makedirs(reference_output_dir, exist_ok=True)
+    speaker_audio_results = audio_processor.process_all_speakers(scored_segments, reference_output_dir)
+
+    # 2. 提取参考文本（键统一转换为整数类型）
+    speaker_segments_for_text = {
+        _to_int_key(speaker_id): selected_segments
+        for speaker_id, (_, selected_segments) in speaker_audio_results.items()
+    }
+    subtitle_indices = {
+        os.path.basename(segment['path']): segment['subtitle_index']
+        for segment in speaker_data.get('segments', [])
+        if 'path' in segment and 'subtitle_index' in segment
+    }
+    speaker_texts = SubtitleTextExtractor().process_all_speakers(
+        speaker_segments_for_text, str(source_subtitle_path), subtitle_indices
+    )
+
+    # 3. 构建说话人参考数据
+    references = {}
+    for speaker_id, (audio_path, selected_segments) in speaker_audio_results.items():
+        speaker_id_int = _to_int_key(speaker_id)
+        references[speaker_id_int] = {
+            "reference_audio": os.path.abspath(audio_path),
+            "reference_text": speaker_texts.get(speaker_id, speaker_texts.get(speaker_id_int, "")),
+            "speaker_name": speaker_name_mapping.get(str(speaker_id), f"说话人{speaker_id}"),
+            "gender": gender_dict.get(str(speaker_id), gender_dict.get(speaker_id, "unknown")),
+            "selected_segments": [list(segment) for segment in selected_segments]
+        }
+    return references
+
+
+def prepare_speaker_references(task_id: str, force: bool = False) -> Dict:
+    """
+    获取任务的说话人参考数据，必要时重新计算
+
+    输入（speaker_data.json、原始字幕）未变化且参考音频文件仍在时直接复用已保存的产物。
+    同一任务的并发调用会等待第一次计算完成。
+
+    Args:
+        task_id: 任务 ID
+        force: 是否忽略已有产物强制重新计算
+
+    Returns:
+        {
+            "speaker_data": speaker_data.json 内容,
+            "references": {speaker_id(int): {"reference_audio", "reference_text", "speaker_name", "gender", "selected_segments"}},
+            "fingerprint": str,
+            "reused": bool  # 是否复用了已有产物
+        }
+    """
+    speaker_data_path = task_path_manager.get_speaker_data_path(task_id)
+    source_subtitle_path = task_path_manager.get_source_subtitle_path(task_id)
+    artifact_path = task_path_manager.get_speaker_references_path(task_id)
+
+    with _task_lock(task_id):
+        if not speaker_data_path.exists():
+            raise FileNotFoundError(f"说话人数据不存在: {speaker_data_path}")
+
+        state = (_file_state(speaker_data_path), _file_state(source_subtitle_path), _file_state(artifact_path))
+        cached = _prepared.get(task_id)
+        if not force and cached is not None and cached[0] == state and _references_exist(cached[1]['references']):
+            return dict(cached[1], reused=True)
+
+        with open(speaker_data_path, 'r', encoding='utf-8') as f:
+            speaker_data = json.load(f)
+        fingerprint = _fingerprint(speaker_data, source_subtitle_path)
+
+        # 已保存的产物仍然有效时直接使用
+        if not force and artifact_path.exists():
+            try:
+                with open(artifact_path, 'r', encoding='utf-8') as f:
+                    artifact = json.load(f)
+                references = {_to_int_key(k): v for k, v in artifact.get('references', {}).items()}
+                if artifact.get('fingerprint') == fingerprint and references and _references_exist(references):
+                    print(f"[参考准备] 复用已准备的说话人参考数据: {len(references)} 个说话人", flush=True)
+                    result = {"speaker_data": speaker_data, "references": references, "fingerprint": fingerprint}
+                    _prepared[task_id] = (state, result)
+                    return dict(result, reused=True)
+            except Exception as e:
+                print(f"[参考准备] 读取已有产物失败，重新计算: {e}", flush=True)
+
+        print(f"[参考准备] 开始准备说话人参考数据: {task_id}", flush=True)
+        start = time.time()
+        references = _build_references(speaker_data, source_subtitle_path)
+        elapsed = time.time() - start
+
+        artifact = {
+            "version": REFERENCE_PREPARATION_VERSION,
+            "fingerprint": fingerprint,
+            "created_at": datetime.utcnow().isoformat(),
+            "elapsed": elapsed,
+            "references": {str(k): v for k, v in references.items()}
+        }
+        tmp_path = artifact_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(artifact, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, artifact_path)
+
+        print(f"[参考准备] 已准备 {len(references)} 个说话人的参考数据，耗时 {elapsed:.2f}秒", flush=True)
+
+        result = {"speaker_data": speaker_data, "references": references, "fingerprint": fingerprint}
+        state = (_file_state(speaker_data_path), _file_state(source_subtitle_path), _file_state(artifact_path))
+        _prepared[task_id] = (state, result)
+        return dict(result, reused=False)
+
+
+def invalidate_speaker_references(task_id: str):
+    """删除已准备的参考数据（说话人分配变化后调用），下次使用时重新计算"""
+    with _task_lock(task_id):
+        _prepared.pop(task_id, None)
+        artifact_path = task_path_manager.get_speaker_references_path(task_id)
+        if artifact_path.exists():
+            artifact_path.unlink()
+            print(f"[参考准备] 已清除说话人参考数据: {task_id}", flush=True)
+
+
+def get_prepared_reference(task_id: str, speaker_id) -> Optional[Dict]:
+    """
+    获取单个说话人的参考数据（供单片段重新生成使用），无法准备时返回 None
+    """
+    try:
+        references = prepare_speaker_references(task_id)['references']
+    except Exception as e:
+        print(f"[参考准备] 无法获取说话人参考数据: {e}", flush=True)
+        return None
+    return references.get(_to_int_key(speaker_id))
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+字幕区间索引 - 按时间快速查找字幕
+
+按开始时间排序建立一次索引，之后按时间容差查找、按时间范围查询均为 O(log n)（加命中数量），
+也支持按字幕序号直接获取。同一 SRT 文件的索引按 (路径, 修改时间, 大小) 缓存，文件变化后自动重建。
+"""
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
+
+from srt_parser import SRTParser
+
+
+class SubtitleIntervalIndex:
+    """字幕区间索引（字幕序号即解析后字幕列表中的位置，从 0 开始）"""
+
+    def __init__(self, subtitles: List[Dict]):
+        """
+        建立索引
+
+        Args:
+            subtitles: SRTParser.parse_srt 返回的字幕列表（需包含 start_time / end_time / text）
+        """
+        self.subtitles = subtitles
+        order = sorted(range(len(subtitles)), key=lambda i: (subtitles[i]['start_time'], i))
+        self._order = order
+        self._starts = [subtitles[i]['start_time'] for i in order]
+        self._ends = [subtitles[i]['end_time'] for i in order]
+        # 结束时间前缀最大值（单调不减），范围查询时用于跳过已结束的字幕，字幕时间重叠时仍然正确
+        self._max_ends = list(accumulate(self._ends, max))
+
+    @classmethod
+    def from_srt(cls, srt_path: str) -> "SubtitleIntervalIndex":
+        """解析 SRT 文件并建立索引（不使用缓存）"""
+        return cls(SRTParser().parse_srt(srt_path))
+
+    def __len__(self) -> int:
+        return len(self.subtitles)
+
+    def get(self, subtitle_index: int) -> Optional[Dict]:
+        """按字幕序号获取字幕，越界时返回 None"""
+        if 0 <= subtitle_index < len(self.subtitles):
+            return self.subtitles[subtitle_index]
+        return None
+
+    def find(self, start_time: float, end_time: float, tolerance: float = 0.1) -> Optional[int]:
+        """
+        查找开始、结束时间都在容差范围内的字幕
+
+        有多条字幕满足时返回时间偏差最小的一条（偏差相同取序号小的）
+
+        Args:
+            start_time: 开始时间
+            end_time: 结束时间
+            tolerance: 时间容差（秒）
+
+        Returns:
+            字幕序号，未找到时返回 None
+        """
+        lo = bisect_left(self._starts, start_time - tolerance)
+        hi = bisect_right(self._starts, start_time + tolerance)
+
+        best = None
+        best_key = None
+        for pos in range(lo, hi):
+            end_error = abs(self._ends[pos] - end_time)
+            if end_error > tolerance:
+                continue
+            key = (abs(self._starts[pos] - start_time) + end_error, self._order[pos])
+            if best_key is None or key < best_key:
+                best, best_key = self._order[pos], key
+        return best
+
+    def overlapping(self, start_time: float, end_time: float) -> List[int]:
+        """
+        查询与时间范围 [start_time, end_time] 相交的所有字幕（端点相接也算相交）
+
+        Returns:
+            按开始时间排序的字幕序号列表
+        """
+        hi = bisect_right(self._starts, end_time)
+        lo = bisect_left(self._max_ends, start_time)
+        return [self._order[pos] for pos in range(lo, hi) if self._ends[pos] >= start_time]
+
+    def at(self, time_point: float) -> List[int]:
+        """查询包含某个时间点的所有字幕"""
+        return self.overlapping(time_point, time_point)
+
+    def text(self, subtitle_index: Optional[int]) -> str:
+        """字幕序号对应的文本，序号无效时返回空字符串"""
+        subtitle = self.get(subtitle_index) if subtitle_index is not None else None
+        return subtitle['text'] if subtitle else ""
+
+
+_index_cache: "OrderedDict[Tuple, SubtitleIntervalIndex]" = OrderedDict()
+_index_cache_lock = threading.Lock()
+_INDEX_CACHE_SIZE = 16
+
+
+def load_subtitle_index(srt_path: str) -> SubtitleIntervalIndex:
+    """
+    获取 SRT 文件的字幕索引（缓存，文件修改后重建）
+
+    Args:
+        srt_path: SRT 字幕文件路径
+
+    Returns:
+        SubtitleIntervalIndex: 字幕索引
+    """
+    stat = os.stat(srt_path)
+    key = (os.path.abspath(srt_path), stat.st_mtime_ns, stat.st_size)
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+
+    index = SubtitleIntervalIndex.from_srt(srt_path)
+    with _index_cache_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
@@ -2,10 +2,12 @@
 字幕文本提取模块
 根据音频片段提取对应的字幕文本
 """
+import os
 import re
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional, Union
 from srt_parser import SRTParser
+from subtitle_index import SubtitleIntervalIndex, load_subtitle_index
 
 
 class SubtitleTextExtractor:
@@ -42,7 +44,7 @@ class SubtitleTextExtractor:
 
     def find_subtitle_by_time(
         self,
-        subtitles: List[Dict],
+        subtitles: Union[SubtitleIntervalIndex, List[Dict]],
         start_time: float,
         end_time: float,
         tolerance: float = 0.1
@@ -51,30 +53,23 @@ class SubtitleTextExtractor:
         根据时间范围查找对应的字幕文本
 
         Args:
-            subtitles: 字幕列表
+            subtitles: 字幕索引（传入字幕列表时临时建立索引，多次查找请先建立索引）
             start_time: 开始时间
             end_time: 结束时间
             tolerance: 时间容差（秒）
 
         Returns:
-            str: 对应的字幕文本
+            str: 对应的字幕文本，未找到时返回空字符串
         """
-        for subtitle in subtitles:
-            sub_start = subtitle['start_time']
-            sub_end = subtitle['end_time']
-
-            # 检查时间是否匹配（允许一定的容差）
-            if (abs(sub_start - start_time) <= tolerance and
-                abs(sub_end - end_time) <= tolerance):
-                return subtitle['text']
-
-        # 如果没有精确匹配，返回空字符串或警告
-        return ""
+        if not isinstance(subtitles, SubtitleIntervalIndex):
+            subtitles = SubtitleIntervalIndex(subtitles)
+        return subtitles.text(subtitles.find(start_time, end_time, tolerance))
 
     def extract_text_for_segments(
         self,
         audio_segments: List[Tuple[str, float, float]],
-        srt_path: str
+        srt_path: str,
+        subtitle_indices: Optional[Dict[str, int]] = None
     ) -> List[Tuple[str, str]]:
         """
         为音频片段提取对应的字幕文本
@@ -82,21 +77,25 @@ class SubtitleTextExtractor:
         Args:
             audio_segments: 音频片段列表，每个元素为(音频路径, MOS分数, 时长)
             srt_path: SRT字幕文件路径
+            subtitle_indices: 片段文件名到字幕序号的映射（来自 speaker_data 的 segments），
+                              有序号的片段直接按序号取字幕，其余按文件名中的时间查找
 
         Returns:
             List[Tuple[str, str]]: 列表，每个元素为(音频路径, 字幕文本)
         """
-        # 解析SRT文件
-        subtitles = self.srt_parser.parse_srt(srt_path)
+        # 字幕索引（同一 SRT 文件只解析一次）
+        subtitle_index = load_subtitle_index(srt_path)
+        subtitle_indices = subtitle_indices or {}
 
         results = []
-        for audio_path, _, _ in audio_segments:
+        for audio_path, *_ in audio_segments:
             try:
-                # 从文件名提取时间
-                start_time, end_time = self.extract_time_from_filename(audio_path)
-
-                # 查找对应的字幕文本
-                text = self.find_subtitle_by_time(subtitles, start_time, end_time)
+                position = subtitle_indices.get(os.path.basename(audio_path))
+                if position is None or subtitle_index.get(position) is None:
+                    # 没有字幕序号时从文件名提取时间查找
+                    start_time, end_time = self.extract_time_from_filename(audio_path)
+                    position = subtitle_index.find(start_time, end_time)
+                text = subtitle_index.text(position)
 
                 if text:
                     results.append((audio_path, text))
@@ -131,7 +130,8 @@ class SubtitleTextExtractor:
         self,
         speaker_id: int,
         audio_segments: List[Tuple[str, float, float]],
-        srt_path: str
+        srt_path: str,
+        subtitle_indices: Optional[Dict[str, int]] = None
     ) -> str:
         """
         处理单个说话人的文本：提取并拼接
@@ -140,6 +140,7 @@ class SubtitleTextExtractor:
             speaker_id: 说话人ID
             audio_segments: 音频片段列表
             srt_path: SRT字幕文件路径
+            subtitle_indices: 片段文件名到字幕序号的映射（可选）
 
         Returns:
             str: 拼接后的参考文本
@@ -147,7 +148,7 @@ class SubtitleTextExtractor:
         print(f"\n提取说话人 {speaker_id} 的参考文本...")
 
         # 提取文本
-        text_segments = self.extract_text_for_segments(audio_segments, srt_path)
+        text_segments = self.extract_text_for_segments(audio_segments, srt_path, subtitle_indices)
 
         if not text_segments:
             raise ValueError(f"说话人 {speaker_id} 没有可用的字幕文本")
@@ -163,7 +164,8 @@ class SubtitleTextExtractor:
     def process_all_speakers(
         self,
         speaker_segments_dict: Dict[int, List[Tuple[str, float, float]]],
-        srt_path: str
+        srt_path: str,
+        subtitle_indices: Optional[Dict[str, int]] = None
     ) -> Dict[int, str]:
         """
         处理所有说话人的文本
@@ -171,6 +173,7 @@ class SubtitleTextExtractor:
         Args:
             speaker_segments_dict: 字典，key为说话人ID，value为音频片段列表
             srt_path: SRT字幕文件路径
+            subtitle_indices: 片段文件名到字幕序号的映射（可选）
 
         Returns:
             Dict[int, str]: 字典，key为说话人ID，value为拼接后的参考文本
@@ -180,7 +183,7 @@ class SubtitleTextExtractor:
         for speaker_id, audio_segments in speaker_segments_dict.items():
             try:
                 reference_text = self.process_speaker_text(
-                    speaker_id, audio_segments, srt_path
+                    speaker_id, audio_segments, srt_path, subtitle_indices
                 )
                 results[speaker_id] = reference_text
             except Exception as e:
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+音频拼接信号处理函数测试脚本
+验证向量化静音移除与原逐窗口实现结果一致，以及淡入淡出和时间轴规划
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from audio_dsp import remove_silence_by_volume, apply_fade_in_out, replan_audio_timeline
+
+
+def _legacy_remove_silence(audio_data, sample_rate, window_ms=50, db_threshold=-50.0, min_silence_windows=2):
+    """原逐窗口循环实现（对照）"""
+    window_samples = int(sample_rate * window_ms / 1000.0)
+    if len(audio_data) < window_samples:
+        return audio_data
+    num_windows = len(audio_data) // window_samples
+    db_values = []
+    for i in range(num_windows):
+        window = audio_data[i * window_samples:(i + 1) * window_samples]
+        rms = np.sqrt(np.mean(window ** 2))
+        db_values.append(20 * np.log10(rms) if rms > 1e-10 else -100.0)
+
+    segments = []
+    for i in range(num_windows):
+        silence_count = sum(
+            1 for j in range(min_silence_windows)
+            if i + j < num_windows and db_values[i + j] < db_threshold
+        )
+        if silence_count < min_silence_windows:
+            segments.append(audio_data[i * window_samples:(i + 1) * window_samples])
+    if num_windows * window_samples < len(audio_data):
+        segments.append(audio_data[num_windows * window_samples:])
+    return np.concatenate(segments) if segments else audio_data
+
+
+def test_remove_silence_matches_legacy():
+    """静音移除与原实现一致"""
+    print("\n=== 测试: 静音移除与原实现一致 ===")
+    sr = 16000
+    rng = np.random.default_rng(0)
+    for trial in range(50):
+        pieces = []
+        for _ in range(int(rng.integers(1, 12))):
+            length = int(rng.integers(100, 6000))
+            amplitude = 0.3 if rng.random() < 0.5 else 0.0005
+            pieces.append(rng.standard_normal(length) * amplitude)
+        audio = np.concatenate(pieces).astype(np.float32)
+
+        for min_windows in (1, 2, 3):
+            expected = _legacy_remove_silence(audio, sr, min_silence_windows=min_windows)
+            actual = remove_silence_by_volume(audio, sr, min_silence_windows=min_windows)
+            assert np.array_equal(expected, actual), (trial, min_windows, len(expected), len(actual))
+
+    # 全静音：最后一个窗口之后不足 min_silence_windows 个窗口，按原实现保留
+    silent = np.zeros(sr, dtype=np.float32)
+    assert len(remove_silence_by_volume(silent, sr)) == 800
+
+
+def test_fade_in_out():
+    """淡入淡出：默认不修改原数组，in_place 时原地修改"""
+    print("\n=== 测试: 淡入淡出 ===")
+    audio = np.ones(1000, dtype=np.float32)
+    faded = apply_fade_in_out(audio, 16000, fade_ms=10)
+    assert faded is not audio and audio[0] == 1.0
+    assert faded[0] == 0.0 and faded[-1] == 0.0 and faded[500] == 1.0
+
+    in_place = apply_fade_in_out(audio, 16000, fade_ms=10, in_place=True)
+    assert in_place is audio and audio[0] == 0.0
+    assert np.allclose(in_place, faded)
+    assert in_place.dtype == np.float32
+
+
+def test_replan_audio_timeline():
+    """超长片段向相邻空闲时间借用"""
+    print("\n=== 测试: 时间轴重新规划 ===")
+    sr = 16000
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 片段1: 目标1s实际1.4s，前后各有1s空闲
+        durations = [1.0, 1.4, 1.0]
+        for idx, duration in enumerate(durations):
+            sf.write(os.path.join(work_dir, f"segment_{idx}.wav"), np.zeros(int(duration * sr)), sr)
+        cloned_results = [
+            {"start_time": 0.0, "end_time": 1.0},
+            {"start_time": 2.0, "end_time": 3.0},
+            {"start_time": 4.0, "end_time": 5.0},
+        ]
+        replanned = replan_audio_timeline(cloned_results, work_dir, {})
+
+    assert list(replanned) == [1]
+    assert abs(replanned[1]['borrowed_before'] - 0.2) < 1e-6
+    assert abs(replanned[1]['borrowed_after'] - 0.2) < 1e-6
+    assert abs(replanned[1]['actual_duration'] - 1.4) < 1e-6
+
+
+if __name__ == "__main__":
+    test_remove_silence_matches_legacy()
+    test_fade_in_out()
+    test_replan_audio_timeline()
+    print("\n所有测试通过")
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+批量说话人嵌入提取测试脚本
+使用假的嵌入模型验证分桶批量推理与逐个提取结果一致，且失败位置保持为 None
+"""
+import os
+import sys
+import types
+import tempfile
+
+import numpy as np
+import soundfile as sf
+import torch
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'speaker_diarization_processing'))
+
+
+class FakeEmbeddingModel(torch.nn.Module):
+    """按帧权重做加权统计池化的假模型，输出 (batch, 4)"""
+
+    def __init__(self):
+        super().__init__()
+        self.scale = torch.nn.Parameter(torch.ones(1))
+
+    def forward(self, waveforms, weights=None):
+        frames = waveforms[:, 0, :].unfold(-1, 160, 160)  # (batch, num_frames, 160)
+        energy = frames.abs().mean(dim=-1)
+        if weights is None:
+            weights = torch.ones_like(energy)
+        weights = weights[:, :energy.shape[1]]
+        total = weights.sum(dim=1, keepdim=True).clamp(min=1.0)
+        mean = (energy * weights).sum(dim=1, keepdim=True) / total
+        peak = (energy * weights).max(dim=1, keepdim=True).values
+        return torch.cat([mean, peak, mean * 2, total / 100.0], dim=1) * self.scale
+
+
+class FakeExtractor:
+    """模拟 emb_extractor 的提取器"""
+
+    def __init__(self):
+        self.model = FakeEmbeddingModel()
+        self.calls = 0
+
+    def extract_embedding(self, audio):
+        self.calls += 1
+        if isinstance(audio, dict):
+            waveform = audio["waveform"]
+        else:
+            data, _ = sf.read(audio, dtype='float32')
+            waveform = torch.from_numpy(data).unsqueeze(0)
+        with torch.no_grad():
+            return self.model(waveform.unsqueeze(0))[0].numpy()
+
+
+# embedding_extraction 导入时需要 emb_extractor 模块，测试中用假的替代
+sys.modules.setdefault("emb_extractor", types.SimpleNamespace(initialize_extractor=None))
+
+import embedding_extraction
+from model_registry import model_registry
+from embedding_extraction import SpeakerEmbeddingExtractor
+from segment_buffer import SegmentBuffer
+
+
+def _new_extractor(**kwargs) -> SpeakerEmbeddingExtractor:
+    """使用假提取器创建 SpeakerEmbeddingExtractor"""
+    model_registry.unload()  # 注册表会复用之前加载的提取器，每个测试使用新的假提取器
+    embedding_extraction.initialize_extractor = lambda api_key=None, offline_mode=True: FakeExtractor()
+    return SpeakerEmbeddingExtractor(**kwargs)
+
+
+def _make_buffers(durations):
+    rng = np.random.default_rng(0)
+    buffers = []
+    for i, duration in enumerate(durations):
+        audio = (rng.standard_normal(int(duration * 16000)) * 0.1).astype(np.float32)
+        buffers.append(SegmentBuffer(audio=audio, sample_rate=16000, index=i))
+    return buffers
+
+
+def test_batched_matches_sequential():
+    """批量推理结果与逐个提取一致"""
+    print("\n=== 测试: 批量与逐个提取一致 ===")
+    buffers = _make_buffers([1.0, 2.5, 0.8, 3.0, 1.2, 2.0])
+
+    batched = _new_extractor(max_batch_seconds=6.0)
+    sequential = _new_extractor(batch_mode=False)
+
+    batched_embeddings = batched.extract_embeddings(buffers)
+    sequential_embeddings = sequential.extract_embeddings(buffers)
+
+    assert len(batched_embeddings) == len(buffers)
+    for a, b in zip(batched_embeddings, sequential_embeddings):
+        assert np.allclose(a, b, atol=1e-5), (a, b)
+
+    # 批量模式只在首个批次校验时调用 extract_embedding（最短、最长各一次）
+    assert batched.extractor.calls == 2
+
+
+class NormalizingExtractor(FakeExtractor):
+    """extract_embedding 额外做 L2 归一化的提取器（批量路径直接调用底层模型会跳过这一步）"""
+
+    def extract_embedding(self, audio):
+        embedding = super().extract_embedding(audio)
+        return embedding / np.linalg.norm(embedding)
+
+
+def test_batch_falls_back_when_wrapper_differs():
+    """批量结果与提取器不一致时整次提取回退到提取器，不混用两种结果"""
+    print("\n=== 测试: 提取器有额外预处理 ===")
+    buffers = _make_buffers([1.0, 2.5, 0.8, 3.0, 1.2, 2.0])
+    model_registry.unload()
+    embedding_extraction.initialize_extractor = lambda api_key=None, offline_mode=True: NormalizingExtractor()
+    extractor = SpeakerEmbeddingExtractor(max_batch_seconds=6.0)
+
+    embeddings = extractor.extract_embeddings(buffers)
+    for embedding, buffer in zip(embeddings, buffers):
+        assert np.allclose(embedding, extractor.extractor.extract_embedding(buffer.as_audio_file()), atol=1e-6)
+    assert extractor._get_batch_model() is None
+
+
+def test_failed_bucket_falls_back_for_whole_run():
+    """任一批次推理失败时全部片段经提取器逐个提取"""
+    print("\n=== 测试: 批次失败整体回退 ===")
+    buffers = _make_buffers([1.0, 2.5, 0.8, 3.0, 1.2, 2.0])
+    extractor = _new_extractor(max_batch_seconds=3.0)
+    real_forward = extractor._forward_batch
+    forward_calls = []
+
+    def flaky_forward(model, audios):
+        forward_calls.append(len(audios))
+        if len(forward_calls) == 3:
+            raise RuntimeError("CUDA out of memory")
+        return real_forward(model, audios)
+
+    extractor._forward_batch = flaky_forward
+    embeddings = extractor.extract_embeddings(buffers)
+    assert all(embedding is not None for embedding in embeddings)
+    # 校验 2 次 + 回退后每个片段 1 次
+    assert extractor.extractor.calls == 2 + len(buffers)
+
+
+def test_failed_indices_stay_none():
+    """缺失文件和空片段保持为 None"""
+    print("\n=== 测试: 失败位置保持为 None ===")
+    buffers = _make_buffers([1.0, 2.0])
+    empty = SegmentBuffer(audio=np.zeros(0, dtype=np.float32), sample_rate=16000, index=2)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "segment_004_0.000_1.000.wav")
+        sf.write(path, buffers[0].audio, 16000, subtype='FLOAT')
+        inputs = [buffers[0], os.path.join(work_dir, "missing.wav"), empty, path, buffers[1]]
+
+        extractor = _new_extractor()
+        embeddings = extractor.extract_embeddings(inputs)
+
+    assert embeddings[1] is None
+    assert embeddings[2] is None
+    assert all(embeddings[i] is not None for i in (0, 3, 4))
+    assert np.allclose(embeddings[0], embeddings[3], atol=1e-5)
+
+
+def test_bucket_budget():
+    """分桶遵守 max_batch_seconds 和 max_batch_size"""
+    print("\n=== 测试: 分桶预算 ===")
+    extractor = _new_extractor(max_batch_seconds=10.0, max_batch_size=3)
+    durations = [1.0, 5.0, 2.0, 2.0, 1.5, 9.0, 0.5, 3.0]
+    buckets = extractor._build_buckets(durations)
+
+    assert sorted(i for bucket in buckets for i in bucket) == list(range(len(durations)))
+    for bucket in buckets:
+        assert len(bucket) <= 3
+        if len(bucket) > 1:
+            assert max(durations[i] for i in bucket) * len(bucket) <= 10.0
+    print(f"分桶结果: {buckets}")
+
+
+if __name__ == "__main__":
+    test_batched_matches_sequential()
+    test_batch_falls_back_when_wrapper_differs()
+    test_failed_bucket_falls_back_for_whole_run()
+    test_failed_indices_stay_none()
+    test_bucket_budget()
+    print("\n所有测试通过")
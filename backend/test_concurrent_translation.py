@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+并发翻译测试脚本
+使用本地 LLM 桩服务验证：结果按原顺序组装、并发数受限、吞吐随并发提升、失败重试与超时兜底
+"""
+import asyncio
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import batch_translate_ollama as bto
+from llm_stub_server import LLMStubServer
+
+
+def _make_groups(num_groups, group_size=3):
+    groups = []
+    for g in range(num_groups):
+        groups.append([
+            {"task_id": f"tr-{g * group_size + i}", "source": f"句子{g * group_size + i}", "target_language": "英语"}
+            for i in range(group_size)
+        ])
+    return groups
+
+
+def _run(server, groups, **kwargs):
+    """在桩服务上翻译（不使用全局翻译记忆）"""
+    with mock.patch.object(bto, "OLLAMA_API_URL", f"{server.base_url}/v1/chat/completions"), \
+            mock.patch.object(bto, "translation_memory", None):
+        return asyncio.run(bto.translate_groups_concurrently(groups, model="stub", **kwargs))
+
+
+def test_ordered_results_and_throughput():
+    """并发翻译结果与分组顺序一致，吞吐随并发数提升且不超过并发上限"""
+    print("\n=== 测试: 顺序组装与吞吐 ===")
+    groups = _make_groups(12)
+    timings = {}
+    for concurrency in (1, 4):
+        with LLMStubServer(latency=0.1, parallel=8) as server:
+            completed = []
+            start = time.time()
+            results = _run(server, groups, concurrency=concurrency,
+                           on_group_done=lambda idx, res: completed.append(idx))
+            timings[concurrency] = time.time() - start
+
+            assert server.max_active <= concurrency
+            assert sorted(completed) == list(range(len(groups)))
+            flat = [r for group in results for r in group]
+            assert [r["task_id"] for r in flat] == [f"tr-{i}" for i in range(36)]
+            assert all(r["success"] and r["translation"] == f"[英语]{r['source']}" for r in flat)
+
+    print(f"并发 1: {timings[1]:.2f}s，并发 4: {timings[4]:.2f}s")
+    assert timings[4] < timings[1] / 2.5
+
+
+def test_retry_with_backoff():
+    """失败请求重试后成功；重试耗尽后返回原文兜底"""
+    print("\n=== 测试: 失败重试 ===")
+    groups = _make_groups(1)
+    with LLMStubServer(latency=0.0, fail_first=2) as server:
+        results = _run(server, groups, max_retries=2, retry_backoff=0.01)
+        assert all(r["success"] for r in results[0])
+        assert len(server.chat_requests()) == 3
+
+    with LLMStubServer(latency=0.0, fail_first=5) as server:
+        results = _run(server, groups, max_retries=1, retry_backoff=0.01)
+        assert len(server.chat_requests()) == 2
+        assert all(not r["success"] and r["translation"] == r["source"] and "error" in r for r in results[0])
+        assert [r["task_id"] for r in results[0]] == ["tr-0", "tr-1", "tr-2"]
+
+
+def test_request_timeout():
+    """单次请求超时后重试，仍超时则兜底"""
+    print("\n=== 测试: 请求超时 ===")
+    with LLMStubServer(latency=0.5, parallel=4) as server:
+        start = time.time()
+        results = _run(server, _make_groups(2), timeout=0.1, max_retries=1, retry_backoff=0.01)
+        assert time.time() - start < 1.0
+        assert all(not r["success"] for group in results for r in group)
+
+
+if __name__ == "__main__":
+    test_ordered_results_and_throughput()
+    test_retry_with_backoff()
+    test_request_timeout()
+    print("\n所有测试通过")
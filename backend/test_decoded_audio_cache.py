@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+解码音频缓存测试脚本
+验证参考音频构建时每个片段文件只解码一次、文件修改后失效、按总样本数淘汰
+"""
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import decoded_audio_cache
+from decoded_audio_cache import DecodedAudioCache
+from speaker_audio_processor import SpeakerAudioProcessor
+
+
+def _write_segment(path, speech_seconds, sr=16000):
+    """语音（正弦波）前后各 0.3 秒静音"""
+    t = np.arange(int(speech_seconds * sr)) / sr
+    speech = 0.5 * np.sin(2 * np.pi * 220 * t)
+    silence = np.zeros(int(0.3 * sr))
+    sf.write(path, np.concatenate([silence, speech, silence]).astype(np.float32), sr)
+
+
+def test_reference_building_decodes_each_file_once():
+    """筛选与拼接共享解码结果，多次构建（多种语言）不再解码"""
+    print("\n=== 测试: 每个片段只解码一次 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        scored = {}
+        for speaker_id in range(2):
+            segments = []
+            for i in range(4):
+                path = os.path.join(work_dir, f"segment_{speaker_id}{i:02d}_{i:.3f}_{i + 1:.3f}.wav")
+                _write_segment(path, 2.0 + i * 0.5)
+                segments.append((path, 4.0 - i * 0.1))
+            scored[speaker_id] = segments
+
+        cache = DecodedAudioCache()
+        real_load = decoded_audio_cache.librosa.load
+        with mock.patch.object(decoded_audio_cache.librosa, "load", side_effect=real_load) as load:
+            for language in ("English", "Korean", "Japanese"):
+                processor = SpeakerAudioProcessor(target_duration=5.0, silence_duration=0.5, audio_cache=cache)
+                results = processor.process_all_speakers(scored, os.path.join(work_dir, language))
+                assert set(results) == {0, 1}
+            decoded_files = {call.args[0] for call in load.call_args_list}
+            assert load.call_count == len(decoded_files)
+
+        stats = cache.stats()
+        print(f"缓存统计: {stats}")
+        assert stats['misses'] == len(decoded_files)
+        assert stats['hits'] > stats['misses']
+
+        # 三种语言生成的参考音频完全一致
+        outputs = [sf.read(os.path.join(work_dir, lang, "speaker_0_reference.wav"))[0]
+                   for lang in ("English", "Korean", "Japanese")]
+        assert all(np.array_equal(outputs[0], other) for other in outputs[1:])
+
+
+def test_invalidated_when_file_changes():
+    """文件重新生成后重新解码"""
+    print("\n=== 测试: 文件修改后失效 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "segment.wav")
+        _write_segment(path, 1.0)
+        cache = DecodedAudioCache()
+        first = cache.load(path, 16000)
+        assert not first.flags.writeable
+
+        time.sleep(0.01)
+        _write_segment(path, 2.0)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10_000_000))
+        second = cache.load(path, 16000)
+        assert len(second) > len(first)
+        assert cache.stats()['misses'] == 2
+
+
+def test_bounded_by_total_samples():
+    """总样本数超过上限时淘汰最久未使用的条目"""
+    print("\n=== 测试: 按总样本数淘汰 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = []
+        for i in range(3):
+            path = os.path.join(work_dir, f"segment_{i}.wav")
+            sf.write(path, np.zeros(16000, dtype=np.float32), 16000)
+            paths.append(path)
+
+        cache = DecodedAudioCache(max_samples=2 * 16000)
+        cache.load_with_speech(paths[0], 16000, SpeakerAudioProcessor().trimmer)
+        cache.load(paths[1], 16000)
+        cache.load(paths[0], 16000)  # paths[0] 变为最近使用
+        cache.load(paths[2], 16000)
+
+        stats = cache.stats()
+        assert stats['entries'] == 2 and stats['evictions'] == 1
+        assert stats['total_samples'] == 2 * 16000
+        cache.load(paths[0], 16000)
+        assert cache.stats()['misses'] == 3  # paths[0] 仍在缓存中
+
+
+if __name__ == "__main__":
+    test_reference_building_decodes_each_file_once()
+    test_invalidated_when_file_changes()
+    test_bounded_by_total_samples()
+    print("\n所有测试通过")
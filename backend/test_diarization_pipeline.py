@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+说话人识别流水线测试脚本
+使用假的切分/嵌入/评分函数验证：结果与片段一一对应、各阶段重叠执行、进度单调递增、异常传递、
+非线程安全的嵌入提取器不会被并发调用
+"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from diarization_pipeline import DiarizationPipeline, StageProgress
+from segment_buffer import SegmentBuffer
+
+
+class FakeEmbedder:
+    """每个片段耗时固定，嵌入为片段均值"""
+
+    thread_safe = True
+
+    def __init__(self, seconds_per_item=0.002, fail=False):
+        self.seconds_per_item = seconds_per_item
+        self.fail = fail
+        self.cache = None
+        self.threads = set()
+
+    def extract_embeddings(self, buffers, save_cache=True):
+        self.threads.add(threading.current_thread().name)
+        if self.fail:
+            raise RuntimeError("embedding failed")
+        time.sleep(self.seconds_per_item * len(buffers))
+        return [np.array([buffer.audio.mean(), buffer.index], dtype=np.float32) for buffer in buffers]
+
+
+class StatefulEmbedder:
+    """
+    模拟 SpeakerEmbeddingExtractor：首次调用时延迟校验批量模型并修改共享状态，
+    记录同时进入 extract_embeddings 的调用数
+    """
+
+    def __init__(self):
+        self.cache = None
+        self._batch_verified = False
+        self.verifications = 0
+        self.active = 0
+        self.max_active = 0
+        self.threads = set()
+
+    def extract_embeddings(self, buffers, save_cache=True):
+        self.threads.add(threading.current_thread().name)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if not self._batch_verified:
+                time.sleep(0.01)  # 校验期间其他线程若能进入会重复校验
+                self.verifications += 1
+                self._batch_verified = True
+            time.sleep(0.001 * len(buffers))
+            return [np.array([buffer.index], dtype=np.float32) for buffer in buffers]
+        finally:
+            self.active -= 1
+
+
+class FakePrescorer:
+    """偶数序号的片段为高优先级并给出分数"""
+
+    def prescore_candidates(self, buffers, min_priority):
+        features = {b.key: {'speech_duration': 1.0, 'priority': float(b.index % 2 == 0)} for b in buffers}
+        scores = {b.key: 4.0 for b in buffers if b.index % 2 == 0}
+        return features, scores
+
+
+def _fake_extract(count, seconds_per_item=0.002):
+    def extract(on_segment):
+        buffers = []
+        for i in range(count):
+            time.sleep(seconds_per_item)
+            buffer = SegmentBuffer(audio=np.full(160, i, dtype=np.float32), sample_rate=16000,
+                                   index=i, start_time=float(i), end_time=i + 1.0)
+            buffers.append(buffer)
+            on_segment(buffer, count)
+        return buffers
+    return extract
+
+
+def test_results_match_segments_and_overlap():
+    """嵌入与片段顺序一致，切分与嵌入重叠执行"""
+    print("\n=== 测试: 流水线结果与重叠 ===")
+    count = 200
+    embedder = FakeEmbedder(seconds_per_item=0.004)
+    progress = []
+    pipeline = DiarizationPipeline(
+        embedder, prescorer=FakePrescorer(), num_embed_workers=3, chunk_size=8,
+        progress_callback=lambda fraction, message: progress.append(fraction)
+    )
+
+    start = time.time()
+    buffers, embeddings = pipeline.run(_fake_extract(count, seconds_per_item=0.002))
+    elapsed = time.time() - start
+
+    assert [b.index for b in buffers] == list(range(count))
+    assert all(int(e[1]) == i and e[0] == i for i, e in enumerate(embeddings))
+
+    # 顺序执行约 0.4s（切分）+ 0.8s（嵌入）；3 个嵌入线程与切分重叠后应明显更快
+    sequential = count * (0.002 + 0.004)
+    print(f"流水线耗时 {elapsed:.2f}s，顺序执行约 {sequential:.2f}s，嵌入线程 {sorted(embedder.threads)}")
+    assert elapsed < sequential * 0.8
+    assert len(embedder.threads) > 1
+
+    # 多个线程上报，顺序不保证（StageProgress 负责去除回退），最终到达 1.0
+    assert all(0.0 < p <= 1.0 for p in progress)
+    assert abs(max(progress) - 1.0) < 1e-9
+
+    features, scores = pipeline.wait_prescores()
+    assert len(features) == count
+    assert set(scores) == {b.key for b in buffers if b.index % 2 == 0}
+
+
+def test_embedding_error_is_raised():
+    """嵌入失败时切分不会卡住，异常在 run 中抛出"""
+    print("\n=== 测试: 异常传递 ===")
+    pipeline = DiarizationPipeline(FakeEmbedder(fail=True), num_embed_workers=2, queue_size=4)
+    try:
+        pipeline.run(_fake_extract(50, seconds_per_item=0.0))
+        assert False, "应抛出异常"
+    except RuntimeError as e:
+        assert "embedding failed" in str(e)
+
+
+def test_unsafe_embedder_is_not_called_concurrently():
+    """未声明线程安全的提取器在两个嵌入线程下串行调用，延迟校验只执行一次"""
+    print("\n=== 测试: 非线程安全的提取器 ===")
+    embedder = StatefulEmbedder()
+    pipeline = DiarizationPipeline(embedder, num_embed_workers=2, chunk_size=4)
+    buffers, embeddings = pipeline.run(_fake_extract(100, seconds_per_item=0.0))
+
+    assert [int(e[0]) for e in embeddings] == [b.index for b in buffers] == list(range(100))
+    assert len(embedder.threads) == 2
+    assert embedder.max_active == 1, f"同时进入提取器的调用数 {embedder.max_active}"
+    assert embedder.verifications == 1
+
+
+def test_stage_progress_is_monotonic():
+    """阶段进度映射到整体范围，只增不减"""
+    print("\n=== 测试: 阶段进度 ===")
+    reported = []
+    progress = StageProgress(lambda percent, message: reported.append((percent, message)), 60, 85)
+    callback = progress.callback("音频质量评估")
+    for done in (0, 2, 1, 5, 10, 10):
+        callback(done, 10)
+    assert [p for p, _ in reported] == [60, 65, 72, 85]
+    assert reported[-1][1] == "音频质量评估 10/10"
+
+
+if __name__ == "__main__":
+    test_results_match_segments_and_overlap()
+    test_embedding_error_is_raised()
+    test_unsafe_embedder_is_not_called_concurrently()
+    test_stage_progress_is_monotonic()
+    print("\n所有测试通过")
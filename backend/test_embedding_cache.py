@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+说话人嵌入缓存测试脚本
+验证内容寻址、持久化、LRU淘汰、多个任务共享缓存文件时并发保存，以及重新识别时只对变化的片段推理
+"""
+import os
+import sys
+import threading
+import types
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'speaker_diarization_processing'))
+
+
+class CountingExtractor:
+    """逐个提取的假提取器，记录推理次数"""
+
+    model_name = "fake-embedding-v1"
+
+    def __init__(self):
+        self.calls = 0
+
+    def extract_embedding(self, audio):
+        self.calls += 1
+        waveform = audio["waveform"].numpy()[0]
+        return np.array([waveform.mean(), waveform.std(), len(waveform) / 16000.0], dtype=np.float32)
+
+
+# embedding_extraction 导入时需要 emb_extractor 模块，测试中用假的替代
+sys.modules.setdefault("emb_extractor", types.SimpleNamespace(initialize_extractor=None))
+
+from embedding_cache import EmbeddingCache
+import embedding_extraction
+from model_registry import model_registry
+from embedding_extraction import SpeakerEmbeddingExtractor
+from segment_buffer import SegmentBuffer
+
+
+def _new_extractor(**kwargs) -> SpeakerEmbeddingExtractor:
+    """使用假提取器创建 SpeakerEmbeddingExtractor"""
+    model_registry.unload()  # 注册表会复用之前加载的提取器，每个测试使用新的假提取器
+    embedding_extraction.initialize_extractor = lambda api_key=None, offline_mode=True: CountingExtractor()
+    return SpeakerEmbeddingExtractor(**kwargs)
+
+
+def _make_buffers(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        SegmentBuffer(audio=(rng.standard_normal(8000 + i * 800) * 0.1).astype(np.float32),
+                      sample_rate=16000, index=i)
+        for i in range(count)
+    ]
+
+
+def test_rerun_only_recomputes_changed_segments():
+    """第二次运行只对变化的片段推理"""
+    print("\n=== 测试: 重新识别只推理变化的片段 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache_path = os.path.join(work_dir, "embedding_cache.npz")
+        buffers = _make_buffers(10)
+
+        first = _new_extractor(batch_mode=False)
+        first.enable_cache(cache_path)
+        first_embeddings = first.extract_embeddings(buffers)
+        assert first.extractor.calls == 10
+        assert os.path.exists(cache_path)
+
+        # 修改一条字幕对应的音频
+        changed = list(buffers)
+        changed[3] = _make_buffers(1, seed=42)[0]
+
+        second = _new_extractor(batch_mode=False)
+        cache = second.enable_cache(cache_path)
+        second_embeddings = second.extract_embeddings(changed)
+
+        print(f"第二次推理次数: {second.extractor.calls}, 统计: {cache.stats()}")
+        assert second.extractor.calls == 1
+        assert cache.stats()['hits'] == 9
+        for i in range(10):
+            if i != 3:
+                assert np.allclose(first_embeddings[i], second_embeddings[i])
+
+
+def test_lru_eviction_and_model_change():
+    """LRU淘汰，以及模型标识变化后缓存失效"""
+    print("\n=== 测试: LRU淘汰与模型失效 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache_path = os.path.join(work_dir, "cache.npz")
+        cache = EmbeddingCache(cache_path, model_id="model-a", max_entries=3)
+
+        for i in range(3):
+            cache.put(f"key{i}", np.full(4, i, dtype=np.float32))
+        assert cache.get("key0") is not None  # key0 变为最近使用
+        cache.put("key3", np.full(4, 3, dtype=np.float32))
+
+        assert cache.get("key1") is None  # key1 最久未使用，被淘汰
+        assert cache.get("key0") is not None
+        assert cache.stats()['evictions'] == 1
+        cache.save()
+
+        reloaded = EmbeddingCache(cache_path, model_id="model-a", max_entries=3)
+        assert reloaded.get("key3") is not None
+        assert reloaded.stats()['entries'] == 3
+
+        other_model = EmbeddingCache(cache_path, model_id="model-b", max_entries=3)
+        assert other_model.stats()['entries'] == 0
+
+
+def test_concurrent_saves_merge_entries():
+    """多个任务共享同一个缓存文件并发保存，互不覆盖对方的条目，不残留临时文件"""
+    print("\n=== 测试: 共享缓存并发保存 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache_path = os.path.join(work_dir, "embedding_cache.npz")
+        errors = []
+
+        def task(task_id):
+            try:
+                cache = EmbeddingCache(cache_path, model_id="model-a")
+                for i in range(30):
+                    cache.put(f"task{task_id}-{i}", np.full(192, task_id, dtype=np.float32))
+                    if i % 10 == 9:
+                        cache.save()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=task, args=(task_id,)) for task_id in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        reloaded = EmbeddingCache(cache_path, model_id="model-a")
+        assert reloaded.stats()['entries'] == 120
+        for task_id in range(4):
+            assert np.all(reloaded.get(f"task{task_id}-29") == task_id)
+        assert [name for name in os.listdir(work_dir) if name.endswith(".npz")] == ["embedding_cache.npz"]
+
+
+if __name__ == "__main__":
+    test_rerun_only_recomputes_changed_segments()
+    test_lru_eviction_and_model_change()
+    test_concurrent_saves_merge_entries()
+    print("\n所有测试通过")
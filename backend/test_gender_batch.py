@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+批量性别识别测试脚本
+使用假的分类模型验证：补零 + attention mask 的批量结果与逐条识别一致，阈值判定不变
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+from transformers import Wav2Vec2FeatureExtractor
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from gender_classifier import GenderClassifier
+
+
+class FakeGenderModel(torch.nn.Module):
+    """只使用有效样本计算 logits 的假模型：振幅越大越偏向 female"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def forward(self, input_values, attention_mask=None):
+        self.calls += 1
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_values)
+        mask = attention_mask.float()
+        energy = (input_values.abs() * mask).sum(dim=1) / mask.sum(dim=1)
+        length = mask.sum(dim=1) / 16000.0
+        logits = torch.stack([energy * 2 - 1 + length * 0.1, 1 - energy * 2], dim=1)
+        return SimpleNamespace(logits=logits)
+
+
+def _new_classifier(return_attention_mask=True):
+    classifier = GenderClassifier(model_path="fake-model")
+    classifier.model = FakeGenderModel()
+    classifier.processor = Wav2Vec2FeatureExtractor(
+        feature_size=1, sampling_rate=16000, padding_value=0.0,
+        do_normalize=False, return_attention_mask=return_attention_mask
+    )
+    return classifier
+
+
+def _make_clips():
+    rng = np.random.default_rng(0)
+    return [
+        (rng.standard_normal(int(seconds * 16000)) * amplitude).astype(np.float32)
+        for seconds, amplitude in [(2.0, 0.1), (3.5, 0.6), (1.2, 0.3), (5.0, 0.9), (2.7, 0.05)]
+    ]
+
+
+def test_batch_matches_single():
+    """批量结果与逐条 classify_audio 一致，且只做少量前向推理"""
+    print("\n=== 测试: 批量与逐条一致 ===")
+    clips = _make_clips()
+    classifier = _new_classifier()
+
+    batched = classifier.classify_audio_batch(clips)
+    assert classifier.model.calls == 1
+
+    for clip, prediction in zip(clips, batched):
+        single = classifier.classify_audio(clip)
+        assert abs(single["female"] - prediction["female"]) <= 0.001
+        assert abs(single["male"] - prediction["male"]) <= 0.001
+
+
+def test_buckets_without_mask_support():
+    """特征提取器不支持 attention mask 时逐条推理"""
+    print("\n=== 测试: 不支持 mask 时逐条推理 ===")
+    clips = _make_clips()
+    classifier = _new_classifier(return_attention_mask=False)
+    predictions = classifier.classify_audio_batch(clips)
+    assert classifier.model.calls == len(clips)
+    assert all(p is not None for p in predictions)
+
+
+def test_classify_speakers_threshold_and_failures():
+    """classify_speakers 使用 0.4 阈值，选择失败的说话人默认为 male"""
+    print("\n=== 测试: classify_speakers ===")
+    clips = _make_clips()
+    classifier = _new_classifier()
+    expected = classifier.classify_audio_batch(clips)
+    classifier.model.calls = 0
+
+    clip_by_key = {f"seg_{i}": clip for i, clip in enumerate(clips)}
+    classifier.select_best_audio_for_gender_classification = (
+        lambda scored_segments, min_duration: clip_by_key[scored_segments[0][0]]
+    )
+    scored = {i: [(f"seg_{i}", 4.0)] for i in range(len(clips))}
+    scored[99] = [("missing", 4.0)]
+
+    genders, probs = classifier.classify_speakers(scored, use_silence_trimming=False, auto_rebalance=False)
+
+    assert classifier.model.calls == 1
+    for i, prediction in enumerate(expected):
+        assert genders[i] == ("female" if prediction["female"] >= 0.4 else "male")
+    assert genders[99] == "male" and probs[99] == {"male": 0.5, "female": 0.5}
+
+
+if __name__ == "__main__":
+    test_batch_matches_single()
+    test_buckets_without_mask_support()
+    test_classify_speakers_threshold_and_failures()
+    print("\n所有测试通过")
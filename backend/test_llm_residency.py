@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 模型驻留管理测试脚本
+使用本地 LLM 桩服务验证：连续的 LLM 阶段复用已加载的模型、请求携带空闲 TTL、
+release() 发送卸载请求、空闲超时后重新加载，以及加载次数/耗时统计
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import batch_translate_ollama as bto
+import text_utils
+from llm_residency import LLMResidencyManager
+from llm_stub_server import LLMStubServer
+from translation_engine import TranslationEngine
+from translation_memory import TranslationMemory
+
+
+def _generate_requests(server):
+    return [r['payload'] for r in server.requests if r['path'] == '/api/generate']
+
+
+def test_acquire_reuses_resident_model():
+    """同一模型只加载一次，之后的 acquire 直接复用；release 发送 keep_alive=0"""
+    print("\n=== 测试: 驻留复用与卸载 ===")
+    with LLMStubServer(latency=0) as server:
+        manager = LLMResidencyManager(base_url=server.base_url, idle_ttl_seconds=600)
+
+        assert manager.acquire("stub") >= 0
+        for _ in range(5):
+            assert manager.acquire("stub") == 0.0
+        assert manager.is_resident("stub")
+
+        loads = _generate_requests(server)
+        assert len(loads) == 1 and loads[0]['keep_alive'] == "600s"
+
+        stats = manager.stats()
+        assert stats['loads'] == 1 and stats['reuses'] == 5
+        assert stats['models'][0]['uses'] == 6
+
+        assert manager.release(reason="测试") == 1
+        assert not manager.is_resident("stub")
+        assert _generate_requests(server)[-1]['keep_alive'] == 0
+        assert manager.stats()['releases'] == 1
+
+        # 卸载后再次使用需要重新加载
+        manager.acquire("stub")
+        assert manager.stats()['loads'] == 2
+        print(manager.stats())
+
+
+def test_idle_ttl_expiration():
+    """空闲超过 TTL 后视为已被 Ollama 卸载，下次使用重新加载；加载失败不记录为驻留"""
+    print("\n=== 测试: 空闲过期 ===")
+    with LLMStubServer(latency=0) as server:
+        manager = LLMResidencyManager(base_url=server.base_url, idle_ttl_seconds=0.2)
+        manager.acquire("stub")
+        time.sleep(0.3)
+        assert not manager.is_resident("stub")
+        manager.acquire("stub")
+
+        stats = manager.stats()
+        assert stats['loads'] == 2 and stats['idle_expirations'] == 1
+
+    def failing_loader():
+        raise ConnectionError("stub down")
+
+    manager = LLMResidencyManager(base_url="http://127.0.0.1:9", idle_ttl_seconds=600)
+    try:
+        manager.acquire("stub", loader=failing_loader)
+        assert False, "加载失败应抛出异常"
+    except ConnectionError:
+        pass
+    assert not manager.is_resident("stub") and manager.stats()['load_failures'] == 1
+
+    # TTL <= 0 时一直驻留
+    assert LLMResidencyManager(idle_ttl_seconds=0).keep_alive() == -1
+
+
+def test_before_load_hooks():
+    """加载模型前调用注册的回调（如关闭空闲的 TTS 常驻进程），复用已驻留的模型时不调用；回调失败不影响加载"""
+    with LLMStubServer(latency=0) as server:
+        manager = LLMResidencyManager(base_url=server.base_url, idle_ttl_seconds=600)
+        calls = []
+        manager.add_before_load_hook(lambda model: calls.append((model, len(_generate_requests(server)))))
+        manager.add_before_load_hook(lambda model: 1 / 0)
+
+        manager.acquire("stub")
+        manager.acquire("stub")
+        assert calls == [("stub", 0)], "回调应在加载请求之前、且只在真正加载时调用"
+        assert manager.is_resident("stub")
+
+        manager.release()
+        manager.acquire("stub")
+        assert len(calls) == 2
+
+
+def test_llm_phases_share_one_load():
+    """翻译、重新翻译和汉字替换连续执行时模型只加载一次，且各请求都不再立即卸载"""
+    print("\n=== 测试: 多个 LLM 阶段共享一次加载 ===")
+    manager = LLMResidencyManager(idle_ttl_seconds=600)
+    tasks = [{
+        "task_id": f"tr-{i}",
+        "source": f"句子{i}",
+        "target_language": "日语",
+        "start_time": f"00:00:{i:02d},000",
+        "end_time": f"00:00:{i:02d},800",
+        "index": i
+    } for i in range(8)]
+
+    with tempfile.TemporaryDirectory() as work_dir, LLMStubServer(latency=0.01, parallel=4) as server, \
+            mock.patch.object(manager, "base_url", server.base_url), \
+            mock.patch.object(bto, "OLLAMA_API_URL", f"{server.base_url}/v1/chat/completions"), \
+            mock.patch.object(bto, "llm_residency", manager), \
+            mock.patch("llm_residency.llm_residency", manager):
+
+        async def run_phases():
+            engine = TranslationEngine(model="stub", memory=TranslationMemory(os.path.join(work_dir, "tm.db")))
+            # 与翻译服务相同：每种语言翻译前热启动，最后做一次重新翻译
+            for language in ("日语", "韩语"):
+                assert await engine.ensure_ready()
+                async for _ in engine.translate([dict(t, target_language=language) for t in tasks]):
+                    pass
+            async for _ in engine.retranslate([{"task_id": "r-0", "source": "很长的句子", "target_language": "日语"}]):
+                pass
+
+        asyncio.run(run_phases())
+        with mock.patch.object(manager, "acquire", wraps=manager.acquire) as acquire:
+            text_utils._ollama_generate({'model': 'stub', 'prompt': '汉字', 'stream': False}, timeout=10)
+            assert acquire.call_count == 1
+
+        stats = manager.stats()
+        assert stats['loads'] == 1 and stats['reuses'] == 3
+        assert stats['releases'] == 0
+        keep_alives = [r['payload'].get('keep_alive') for r in server.requests]
+        assert all(value == "600s" for value in keep_alives), keep_alives
+        print(stats)
+
+
+if __name__ == "__main__":
+    test_acquire_reuses_resident_model()
+    test_idle_ttl_expiration()
+    test_before_load_hooks()
+    test_llm_phases_share_one_load()
+    print("\n所有测试通过")
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+混合音色克隆调度测试脚本
+使用按片段 sleep 的假引擎代替 CosyVoice3 / Fish-Speech，验证：两个引擎并发执行
+（总耗时约等于较慢的引擎）、MIXED_CLONE_MAX_ENGINES=1 时依次执行并在两个引擎之间关闭常驻进程、合并进度单调递增、
+结果结构与原先一致，以及重新克隆时只生成改动过的片段（片段音频缓存）
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import types
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import segment_audio_cache
+import tts_worker_client
+import voice_cloning_service as vcs
+from segment_audio_cache import SegmentAudioCache
+
+SEGMENT_SECONDS = 0.05
+
+
+class FakeEngine:
+    """逐片段 sleep 并上报进度的假克隆器，记录运行区间"""
+
+    def __init__(self, name, spans):
+        self.name = name
+        self.spans = spans
+
+    def _generate(self, tasks, output_dir, progress_callback):
+        begin = time.time()
+        results = {}
+        self.spans.setdefault("generated", []).extend(task["segment_index"] for task in tasks)
+        for i, task in enumerate(tasks):
+            time.sleep(SEGMENT_SECONDS)
+            output_file = os.path.join(output_dir, f"segment_{task['segment_index']}.wav")
+            with open(output_file, "w", encoding="utf-8") as f:
+                f.write(f"{self.name}:{task['target_text']}")
+            results[task["segment_index"]] = output_file
+            if progress_callback:
+                progress_callback(i + 1, len(tasks))
+        self.spans[self.name] = (begin, time.time())
+        return results
+
+
+class FakeCosyVoice(FakeEngine):
+    def batch_generate_audio(self, tasks, speaker_refs, output_dir, target_language=None, progress_callback=None):
+        return self._generate(tasks, output_dir, progress_callback)
+
+
+class FakeFish(FakeEngine):
+    def batch_generate_audio(self, tasks, npy_files, speaker_refs, output_dir, script_dir=None, progress_callback=None):
+        return self._generate(tasks, output_dir, progress_callback)
+
+
+def _run_mixed(work_dir, cosyvoice_segments, fish_segments, env=None, cache=None, edited=()):
+    spans = {}
+    progress = []
+
+    async def progress_callback(percent, message):
+        progress.append(percent)
+
+    total = cosyvoice_segments + fish_segments
+    speaker_labels = [0] * cosyvoice_segments + [1] * fish_segments
+    subtitles = [{"text": f"line {i}" + (" (edited)" if i in edited else ""), "start_time": i, "end_time": i + 1}
+                 for i in range(total)]
+    references = {0: {"reference_audio": "ref0.wav"}, 1: {"reference_audio": "ref1.wav"}}
+
+    fake_cosyvoice_module = types.SimpleNamespace(
+        get_cosyvoice_cloner=lambda **kwargs: FakeCosyVoice("CosyVoice", spans)
+    )
+    fake_fish_module = types.SimpleNamespace(SimpleFishCloner=lambda: FakeFish("Fish", spans))
+
+    async def run():
+        result = await vcs._clone_fish_speech_voices(
+            task_id="task", language="en",
+            target_subtitles=subtitles, speaker_labels=speaker_labels,
+            speaker_references=references,
+            speaker_voice_mapping={"0": "default", "1": "english_female"},
+            audio_dir=work_dir, cloned_audio_output_dir=os.path.join(work_dir, "cloned"),
+            progress_callback=progress_callback, start_time=time.time()
+        )
+        # 让线程中投递的进度回调执行完
+        await asyncio.sleep(0.05)
+        return result
+
+    with mock.patch.dict(sys.modules, {"cosyvoice_cloner": fake_cosyvoice_module,
+                                       "fish_simple_cloner": fake_fish_module}), \
+            mock.patch.dict(os.environ, env or {}), \
+            mock.patch.object(segment_audio_cache, "segment_audio_cache", cache):
+        result = asyncio.run(run())
+    return result, spans, progress
+
+
+def test_engines_run_concurrently():
+    """两个引擎的运行区间重叠，总耗时约等于较慢的引擎"""
+    print("\n=== 测试: 并发执行 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        result, spans, progress = _run_mixed(work_dir, 12, 6)
+
+    assert result["cosyvoice_segments"] == 12 and result["fish_segments"] == 6
+    assert [r["index"] for r in result["cloned_results"]] == list(range(18))
+    assert all(r["cloned_audio_path"] for r in result["cloned_results"])
+
+    cosyvoice_span, fish_span = spans["CosyVoice"], spans["Fish"]
+    assert fish_span[0] < cosyvoice_span[1] and cosyvoice_span[0] < fish_span[1], "两个引擎应重叠执行"
+    wall = max(cosyvoice_span[1], fish_span[1]) - min(cosyvoice_span[0], fish_span[0])
+    assert wall < 18 * SEGMENT_SECONDS * 0.9, f"总耗时 {wall:.2f}s 接近两者之和"
+
+    assert progress == sorted(progress), f"进度应单调递增: {progress}"
+    assert progress[-1] == 100
+    print(f"耗时 {wall:.2f}s, 进度 {progress}")
+
+
+def test_sequential_policy():
+    """MIXED_CLONE_MAX_ENGINES=1 时两个引擎依次执行，先结束的引擎的常驻进程在下一个引擎开始前关闭"""
+    print("\n=== 测试: 依次执行 ===")
+    shutdowns = []
+
+    def record_shutdown(engine=None):
+        shutdowns.append((engine, time.time()))
+        return 0
+
+    with tempfile.TemporaryDirectory() as work_dir, \
+            mock.patch.object(tts_worker_client.tts_workers, "shutdown", side_effect=record_shutdown):
+        result, spans, progress = _run_mixed(work_dir, 4, 4, env={"MIXED_CLONE_MAX_ENGINES": "1"})
+
+    first, second = sorted([spans["CosyVoice"], spans["Fish"]])
+    assert first[1] <= second[0], "限制为 1 个引擎时不应重叠"
+    assert result["successful_segments"] == 8
+    assert progress == sorted(progress)
+
+    assert sorted(engine for engine, _ in shutdowns) == ["cosyvoice", "fish"]
+    first_engine = "cosyvoice" if spans["CosyVoice"] == first else "fish"
+    released_at = dict(shutdowns)[first_engine]
+    assert first[1] <= released_at <= second[0], "下一个引擎应在前一个引擎的常驻进程关闭后开始"
+
+    # 允许两个引擎同时运行时不关闭常驻进程（保留给下次克隆复用）
+    shutdowns.clear()
+    with tempfile.TemporaryDirectory() as work_dir, \
+            mock.patch.object(tts_worker_client.tts_workers, "shutdown", side_effect=record_shutdown):
+        _run_mixed(work_dir, 2, 2)
+    assert shutdowns == []
+
+
+def test_rerun_regenerates_only_edited_segments():
+    """重新克隆时只生成改动过的台词，其余片段从缓存复用，结果结构不变"""
+    print("\n=== 测试: 增量克隆 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = SegmentAudioCache(os.path.join(work_dir, "cache"))
+
+        first, spans, _ = _run_mixed(work_dir, 6, 4, cache=cache)
+        assert first["reused_segments"] == 0 and first["generated_segments"] == 10
+        assert sorted(spans["generated"]) == list(range(10))
+
+        second, spans, _ = _run_mixed(work_dir, 6, 4, cache=cache, edited={2, 7})
+        assert sorted(spans["generated"]) == [2, 7]
+        assert second["reused_segments"] == 8 and second["generated_segments"] == 2
+        assert second["successful_segments"] == 10
+        assert [r["index"] for r in second["cloned_results"]] == list(range(10))
+        assert set(second["cloned_results"][0]) == set(first["cloned_results"][0])
+
+        cloned_dir = os.path.join(work_dir, "cloned")
+        with open(os.path.join(cloned_dir, "segment_2.wav"), encoding="utf-8") as f:
+            assert f.read() == "CosyVoice:line 2 (edited)"
+        with open(os.path.join(cloned_dir, "segment_8.wav"), encoding="utf-8") as f:
+            assert f.read() == "Fish:line 8"
+
+        # 恢复原文后旧片段仍在缓存中，无需生成
+        third, spans, _ = _run_mixed(work_dir, 6, 4, cache=cache)
+        assert "generated" not in spans and third["reused_segments"] == 10
+        with open(os.path.join(cloned_dir, "segment_2.wav"), encoding="utf-8") as f:
+            assert f.read() == "CosyVoice:line 2"
+
+
+def test_progress_weighted_by_work():
+    """合并进度按各引擎的工作量加权"""
+    progress = vcs._MixedCloneProgress(
+        {"A": [{"target_text": "x" * 30}] * 3, "B": [{"target_text": "x" * 10}]},
+        loop=None, progress_callback=None, start=0, end=100
+    )
+    progress.update("B", 1, 1)
+    assert progress._last_percent == 10
+    progress.update("A", 1, 3)
+    assert progress._last_percent == 40
+    progress.finish("A")
+    assert progress._last_percent == 100
+
+
+if __name__ == "__main__":
+    test_engines_run_concurrently()
+    test_sequential_policy()
+    test_rerun_regenerates_only_edited_segments()
+    test_progress_weighted_by_work()
+    print("\n✅ 所有测试通过")
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+模型注册表测试脚本
+验证懒加载复用、按预算 LRU 淘汰、空闲卸载和统计信息
+"""
+import os
+import sys
+import threading
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from model_registry import ModelRegistry, estimate_model_bytes
+
+
+def _linear_loader(in_features, out_features, calls):
+    def load():
+        calls.append(1)
+        return torch.nn.Linear(in_features, out_features)
+    return load
+
+
+def test_lazy_load_and_hits():
+    """同一模型只加载一次，之后命中缓存"""
+    print("\n=== 测试: 懒加载与命中 ===")
+    registry = ModelRegistry(idle_ttl_seconds=0)
+    calls = []
+    first = registry.get("m", _linear_loader(4, 4, calls), device="cpu")
+    second = registry.get("m", _linear_loader(4, 4, calls), device="cpu")
+    assert first is second and len(calls) == 1
+
+    # 同一模型不同设备视为不同条目
+    registry.get("m", _linear_loader(4, 4, calls), device="cuda")
+    assert len(calls) == 2
+
+    stats = registry.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2 and stats['loads'] == 2
+    assert {m['device'] for m in stats['models']} == {"cpu", "cuda"}
+
+
+def test_concurrent_get_loads_once():
+    """并发获取同一模型只加载一次"""
+    print("\n=== 测试: 并发加载 ===")
+    registry = ModelRegistry(idle_ttl_seconds=0)
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("slow", slow_loader, device="cpu")))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_lru_eviction_under_budget():
+    """超出预算时淘汰最久未使用的同类设备模型"""
+    print("\n=== 测试: LRU 淘汰 ===")
+    size = 400 * 1024  # 每个模型 400KB，预算 1MB 只能放两个
+    registry = ModelRegistry(ram_budget_mb=1, vram_budget_mb=0, idle_ttl_seconds=0)
+    unloaded = []
+
+    def unloader(model):
+        unloaded.append(model)
+
+    registry.get("a", lambda: "A", device="cpu", size_bytes=size, unloader=unloader)
+    registry.get("b", lambda: "B", device="cpu", size_bytes=size, unloader=unloader)
+    registry.get("gpu", lambda: "G", device="cuda", size_bytes=10 * size, unloader=unloader)
+    registry.get("a", lambda: "A2", device="cpu")  # a 变为最近使用
+    registry.get("c", lambda: "C", device="cpu", size_bytes=size, unloader=unloader)
+
+    loaded = {m['model_id'] for m in registry.stats()['models']}
+    assert loaded == {"a", "c", "gpu"}, loaded
+    assert unloaded == ["B"]
+    assert registry.stats()['evictions'] == 1
+
+    # 被淘汰的模型再次获取时重新加载
+    assert registry.get("b", lambda: "B2", device="cpu", size_bytes=size) == "B2"
+
+
+def test_idle_eviction():
+    """空闲超过 TTL 的模型被卸载"""
+    print("\n=== 测试: 空闲卸载 ===")
+    registry = ModelRegistry(idle_ttl_seconds=60)
+    registry.get("old", lambda: "O", device="cpu", size_bytes=1)
+    registry.get("new", lambda: "N", device="cpu", size_bytes=1)
+    registry._entries[("old", "cpu")].last_used -= 120
+
+    assert registry.evict_idle() == 1
+    stats = registry.stats()
+    assert [m['model_id'] for m in stats['models']] == ["new"]
+    assert stats['idle_unloads'] == 1
+
+    assert registry.unload() == 1
+    assert registry.stats()['models'] == []
+
+
+def test_load_failure_not_cached():
+    """加载失败不缓存，下次重新尝试"""
+    print("\n=== 测试: 加载失败 ===")
+    registry = ModelRegistry(idle_ttl_seconds=0)
+
+    def broken():
+        raise RuntimeError("missing weights")
+
+    try:
+        registry.get("broken", broken, device="cpu")
+        assert False, "应抛出异常"
+    except RuntimeError:
+        pass
+    assert registry.stats()['load_failures'] == 1
+    assert registry.get("broken", lambda: "ok", device="cpu") == "ok"
+
+
+def test_estimate_model_bytes():
+    """按参数估算模型大小，支持元组和包装对象"""
+    print("\n=== 测试: 模型大小估算 ===")
+    linear = torch.nn.Linear(10, 10)  # 110 个 float32 参数
+    assert estimate_model_bytes(linear) == 440
+
+    class Wrapper:
+        def __init__(self):
+            self.model = linear
+            self.name = "wrapper"
+
+    assert estimate_model_bytes((linear, "processor")) == 440
+    assert estimate_model_bytes(Wrapper()) == 440
+    assert estimate_model_bytes("not a model") == 0
+
+
+if __name__ == "__main__":
+    test_lazy_load_and_hits()
+    test_concurrent_get_loads_once()
+    test_lru_eviction_under_budget()
+    test_idle_eviction()
+    test_load_failure_not_cached()
+    test_estimate_model_bytes()
+    print("\n所有测试通过")
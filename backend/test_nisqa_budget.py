@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+NISQA 预算评分测试脚本
+使用假的批量评分函数验证：按廉价特征排序、预算满足后停止、未评分片段被标记
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from audio_silence_trimmer import AudioSilenceTrimmer
+from nisqa_scorer import NISQAScorer, UNSCORED_MOS
+from segment_buffer import SegmentBuffer
+
+
+class FakeScorer(NISQAScorer):
+    """不加载 NISQA 模型，按片段序号给出固定分数"""
+
+    def __init__(self):
+        self.trimmer = AudioSilenceTrimmer(threshold_db=-40.0, frame_length_ms=25.0, hop_length_ms=10.0)
+        self.last_budget_stats = None
+        self.batch_size = 16
+        self.scored_keys = []
+
+    def score_audio_batch(self, audio_paths, temp_dir=None):
+        self.scored_keys.extend(item.key for item in audio_paths)
+        return [(item.key, 4.0) for item in audio_paths]
+
+
+def _make_buffer(index, speech_seconds, silence_seconds, sr=16000):
+    """语音（正弦波）+ 静音，构造有效语音时长不同的片段"""
+    t = np.arange(int(speech_seconds * sr)) / sr
+    speech = 0.5 * np.sin(2 * np.pi * 220 * t)
+    audio = np.concatenate([speech, np.zeros(int(silence_seconds * sr))]).astype(np.float32)
+    return SegmentBuffer(audio=audio, sample_rate=sr, index=index, start_time=index, end_time=index + 1)
+
+
+def test_budget_stops_early_and_marks_unscored():
+    """预算满足后停止评分，未评分片段保留并标记"""
+    print("\n=== 测试: 预算模式提前停止 ===")
+    # 说话人0: 20个片段，有效语音 1~3 秒；说话人1: 3个片段
+    speaker_segments = {
+        0: [_make_buffer(i, 1.0 + (i % 3), 0.5) for i in range(20)],
+        1: [_make_buffer(100 + i, 2.0, 0.2) for i in range(3)],
+    }
+    scorer = FakeScorer()
+    results = scorer.score_speaker_audios(None, speaker_segments, budget_seconds=10.0, round_size=4)
+
+    stats = scorer.last_budget_stats
+    print(f"统计: {stats}")
+    assert stats['total'] == 23
+    assert stats['skipped'] > 0
+    assert stats['scored'] + stats['skipped'] == 23
+
+    # 输出契约不变：每个片段都在结果中，未评分的排在最后
+    assert len(results[0]) == 20 and len(results[1]) == 3
+    scores = [score for _, score in results[0]]
+    assert scores == sorted(scores, reverse=True)
+    assert UNSCORED_MOS in scores
+    assert all(score != UNSCORED_MOS for _, score in results[1])
+
+    # 预排序：优先评分有效语音最长的片段（3 秒语音）
+    first_round = scorer.scored_keys[:4]
+    durations = {b.key: 1.0 + (b.index % 3) for b in speaker_segments[0]}
+    assert all(durations[key] == 3.0 for key in first_round)
+
+
+def test_no_budget_scores_everything():
+    """不设预算时评分全部片段"""
+    print("\n=== 测试: 全量评分 ===")
+    speaker_segments = {0: [_make_buffer(i, 1.0, 0.1) for i in range(6)]}
+    scorer = FakeScorer()
+    results = scorer.score_speaker_audios(None, speaker_segments)
+    assert len(scorer.scored_keys) == 6
+    assert all(score == 4.0 for _, score in results[0])
+
+
+def test_known_scores_are_reused():
+    """提前评分的片段不再推理，进度回调最终到达总数"""
+    print("\n=== 测试: 复用提前评分 ===")
+    buffers = [_make_buffer(i, 1.0 + (i % 3), 0.5) for i in range(12)]
+    scorer = FakeScorer()
+    features, known = scorer.prescore_candidates(buffers, min_priority=2.5)
+    assert len(features) == 12
+    assert set(known) == {b.key for b in buffers if b.index % 3 == 2}
+
+    for budget in (None, 100.0):
+        scorer.scored_keys = []
+        progress = []
+        results = scorer.score_speaker_audios(
+            None, {0: buffers}, budget_seconds=budget, round_size=4,
+            known_scores=known, known_features=features,
+            progress_callback=lambda done, total: progress.append((done, total))
+        )
+        assert len(results[0]) == 12
+        assert not set(scorer.scored_keys) & set(known)
+        assert len(scorer.scored_keys) == 12 - len(known)
+        assert progress[-1] == (12, 12)
+        assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+
+
+if __name__ == "__main__":
+    test_budget_stops_early_and_marks_unscored()
+    test_no_budget_scores_everything()
+    test_known_scores_are_reused()
+    print("\n所有测试通过")
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+NISQA 进程内批量推理测试脚本
+使用假的 NISQA 网络验证：特征切分形状、批内补零不影响结果、输出顺序与输入一致
+"""
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+import soundfile as sf
+import torch
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from nisqa_scorer import NISQAScorer, compute_nisqa_features
+from segment_buffer import SegmentBuffer
+
+MODEL_ARGS = {
+    'ms_sr': 16000,
+    'ms_n_fft': 512,
+    'ms_hop_length': 0.01,
+    'ms_win_length': 0.02,
+    'ms_n_mels': 16,
+    'ms_fmax': 8000,
+    'ms_seg_length': 15,
+    'ms_seg_hop_length': 4,
+    'ms_max_segments': 1300,
+}
+
+
+class FakeNISQANetwork(torch.nn.Module):
+    """只对有效窗口取平均的假网络，输出 (batch, 1)"""
+
+    def forward(self, x, n_wins):
+        mask = (torch.arange(x.shape[1])[None, :] < n_wins[:, None]).float()
+        per_window = x.mean(dim=(2, 3, 4))
+        return ((per_window * mask).sum(dim=1) / n_wins.float()).unsqueeze(1)
+
+
+def _new_scorer(batch_size=4):
+    scorer = NISQAScorer.__new__(NISQAScorer)
+    scorer.batch_size = batch_size
+    scorer.num_workers = 0
+    scorer.pretrained_model = "fake.tar"
+    scorer._model = SimpleNamespace(args=MODEL_ARGS, model=FakeNISQANetwork(), dev="cpu")
+    return scorer
+
+
+def _make_arrays(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        (rng.standard_normal(int(rng.uniform(0.5, 3.0) * 16000)) * rng.uniform(0.01, 0.5)).astype(np.float32)
+        for _ in range(count)
+    ]
+
+
+def test_feature_windows():
+    """特征按 seg_length 切窗口，并按 seg_hop 抽取"""
+    print("\n=== 测试: 特征窗口 ===")
+    audio = _make_arrays(1)[0]
+    features, n_wins = compute_nisqa_features(audio, MODEL_ARGS)
+    frames = len(audio) // 160 + 1
+    assert features.shape == (n_wins, 1, 16, 15)
+    assert n_wins == int(np.ceil((frames - 14) / 4))
+
+    _, n_wins = compute_nisqa_features(np.zeros(800, dtype=np.float32), MODEL_ARGS)
+    assert n_wins == 0
+
+
+def test_batched_scores_match_single_and_keep_order():
+    """批量推理结果与逐个推理一致，顺序与输入一致"""
+    print("\n=== 测试: 批量与逐个一致 ===")
+    arrays = _make_arrays(7)
+    arrays.insert(3, np.zeros(800, dtype=np.float32))  # 过短，无法评分
+
+    batched = _new_scorer(batch_size=4).score_arrays(arrays, 16000)
+    single = _new_scorer(batch_size=1).score_arrays(arrays, 16000)
+
+    assert batched[3] is None
+    for a, b in zip(batched, single):
+        assert (a is None and b is None) or abs(a - b) < 1e-5
+
+
+def test_score_audio_batch_inputs():
+    """score_audio_batch 同时接受路径与内存片段，跳过不存在的文件"""
+    print("\n=== 测试: 路径与内存片段 ===")
+    arrays = _make_arrays(3, seed=1)
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "segment_001_0.000_1.000.wav")
+        sf.write(path, arrays[1], 16000, subtype='FLOAT')
+        buffer = SegmentBuffer(audio=arrays[0], sample_rate=16000, index=0)
+        inputs = [buffer, path, os.path.join(work_dir, "missing.wav")]
+
+        results = _new_scorer().score_audio_batch(inputs)
+
+    assert [key for key, _ in results] == [buffer.key, path]
+    expected = _new_scorer().score_arrays(arrays[:2], 16000)
+    assert np.allclose([score for _, score in results], expected, atol=1e-5)
+
+
+if __name__ == "__main__":
+    test_feature_windows()
+    test_batched_scores_match_single_and_keep_order()
+    test_score_audio_batch_inputs()
+    print("\n所有测试通过")
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+两阶段说话人聚类测试脚本
+在合成嵌入上验证两阶段聚类能恢复说话人，且与全量层次聚类结果一致
+"""
+import os
+import sys
+
+import numpy as np
+from sklearn.cluster import AgglomerativeClustering
+from sklearn.metrics import adjusted_rand_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'speaker_diarization_processing'))
+
+from scalable_clustering import two_stage_cluster, default_micro_cluster_count
+
+
+def _make_embeddings(n_samples, n_speakers, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_speakers, dim))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    labels = rng.integers(0, n_speakers, size=n_samples)
+    embeddings = centers[labels] + rng.standard_normal((n_samples, dim)) * 0.15
+    return embeddings.astype(np.float32), labels
+
+
+def test_two_stage_recovers_speakers():
+    """两阶段聚类恢复合成说话人，并与全量层次聚类一致"""
+    print("\n=== 测试: 两阶段聚类恢复说话人 ===")
+    embeddings, truth = _make_embeddings(2000, 6)
+
+    labels = two_stage_cluster(embeddings, n_clusters=6)
+    full_labels = AgglomerativeClustering(
+        n_clusters=6, metric='cosine', linkage='average'
+    ).fit_predict(embeddings)
+
+    assert labels.shape == (2000,)
+    assert len(np.unique(labels)) == 6
+    assert adjusted_rand_score(truth, labels) > 0.95
+    assert adjusted_rand_score(full_labels, labels) > 0.95
+
+
+def test_distance_threshold_and_small_input():
+    """支持距离阈值模式；微簇数不超过样本数"""
+    print("\n=== 测试: 距离阈值与小样本 ===")
+    embeddings, truth = _make_embeddings(300, 3, seed=1)
+
+    labels = two_stage_cluster(embeddings, distance_threshold=0.5, n_micro_clusters=50)
+    assert adjusted_rand_score(truth, labels) > 0.95
+
+    assert default_micro_cluster_count(50, 4) == 50
+    labels = two_stage_cluster(embeddings[:10], n_clusters=3)
+    assert labels.shape == (10,)
+
+
+if __name__ == "__main__":
+    test_two_stage_recovers_speakers()
+    test_distance_threshold_and_small_input()
+    print("\n所有测试通过")
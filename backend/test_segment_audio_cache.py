@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+片段音频缓存测试脚本
+验证：缓存键随引擎/参考音频内容/文本/参数变化、命中时硬链接到输出目录、
+输出文件经硬链接被原地覆盖后条目失效、按大小上限淘汰最久未使用的条目
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from segment_audio_cache import SegmentAudioCache
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_segment_key_inputs():
+    """键由引擎、参考音频内容、参考文本、目标文本、参数共同决定"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = SegmentAudioCache(os.path.join(work_dir, "cache"))
+        reference = os.path.join(work_dir, "ref.wav")
+        _write(reference, b"voice-a")
+
+        key = cache.segment_key("cosyvoice", reference, "ref text", "hello", {"target_language": "en"})
+        assert key == cache.segment_key("cosyvoice", reference, "ref text", "hello", {"target_language": "en"})
+        assert key != cache.segment_key("fish", reference, "ref text", "hello", {"target_language": "en"})
+        assert key != cache.segment_key("cosyvoice", reference, "other", "hello", {"target_language": "en"})
+        assert key != cache.segment_key("cosyvoice", reference, "ref text", "hello!", {"target_language": "en"})
+        assert key != cache.segment_key("cosyvoice", reference, "ref text", "hello", {"target_language": "ja"})
+
+        # 参考音频按内容计算：同内容的另一文件键相同，内容变化键不同
+        copy = os.path.join(work_dir, "copy.wav")
+        _write(copy, b"voice-a")
+        assert key == cache.segment_key("cosyvoice", copy, "ref text", "hello", {"target_language": "en"})
+        time.sleep(0.01)
+        _write(reference, b"voice-b")
+        assert key != cache.segment_key("cosyvoice", reference, "ref text", "hello", {"target_language": "en"})
+
+
+def test_reuse_links_and_detects_overwrite():
+    """命中时硬链接到输出位置；输出文件被原地覆盖后缓存条目失效"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = SegmentAudioCache(os.path.join(work_dir, "cache"))
+        output_dir = os.path.join(work_dir, "out")
+        tasks = [{"segment_index": i, "target_text": f"line {i}"} for i in range(3)]
+        key_fn = lambda task: cache.segment_key("dummy", None, "", task["target_text"])
+        output_fn = lambda task: os.path.join(output_dir, f"segment_{task['segment_index']}.wav")
+
+        reused, pending, keys = cache.reuse(tasks, key_fn, output_fn)
+        assert reused == {} and len(pending) == 3
+        generated = {}
+        for task in pending:
+            _write(output_fn(task), task["target_text"].encode())
+            generated[task["segment_index"]] = output_fn(task)
+        assert cache.store_generated(generated, keys) == 3
+
+        # 输出目录被清空后重新克隆：全部复用
+        for path in generated.values():
+            os.remove(path)
+        reused, pending, _ = cache.reuse(tasks, key_fn, output_fn)
+        assert sorted(reused) == [0, 1, 2] and pending == []
+        assert _read(output_fn(tasks[1])) == b"line 1"
+        assert os.stat(output_fn(tasks[1])).st_nlink >= 2
+
+        # 编辑器重新生成片段 1 时原地覆盖了输出文件（与缓存共享 inode）
+        time.sleep(0.01)
+        _write(output_fn(tasks[1]), b"regenerated with other text")
+        reused, pending, _ = cache.reuse(tasks, key_fn, output_fn)
+        assert sorted(reused) == [0, 2] and [t["segment_index"] for t in pending] == [1]
+        assert not os.path.exists(output_fn(tasks[1])), "需要生成的片段应先删除旧输出"
+        assert cache.stats()["invalidated"] == 1
+
+
+def test_repeated_fetch_into_linked_output():
+    """输出文件已是缓存条目的硬链接时再次取用：不留下临时文件，之后仍能命中"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = SegmentAudioCache(os.path.join(work_dir, "cache"))
+        output = os.path.join(work_dir, "out", "segment_0.wav")
+        _write(output, b"audio")
+        assert cache.store("00key", output)
+
+        for _ in range(3):
+            assert cache.fetch("00key", output)
+        assert os.listdir(os.path.dirname(output)) == ["segment_0.wav"]
+        assert _read(output) == b"audio" and cache.stats()["hits"] == 3
+
+
+def test_prune_evicts_least_recently_used():
+    """超过大小上限时删除最久未使用的条目"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = SegmentAudioCache(os.path.join(work_dir, "cache"), max_bytes=250)
+        for i in range(3):
+            path = os.path.join(work_dir, f"seg{i}.wav")
+            _write(path, b"x" * 100)
+            cache.store(f"{i:02d}key", path)
+            past = time.time() - 100 + i
+            os.utime(cache._entry_paths(f"{i:02d}key")[1], (past, past))
+
+        # 使用一次最早的条目，使其成为最近使用
+        assert cache.fetch("00key", os.path.join(work_dir, "out.wav"))
+        cache.prune()
+        assert cache._valid_entry("00key") and cache._valid_entry("02key")
+        assert cache._valid_entry("01key") is None
+        assert cache.stats()["evictions"] == 1
+
+
+if __name__ == "__main__":
+    test_segment_key_inputs()
+    test_reuse_links_and_detects_overwrite()
+    test_repeated_fetch_into_linked_output()
+    test_prune_evicts_least_recently_used()
+    print("\n✅ 所有测试通过")
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+内存音频片段测试脚本
+验证 SegmentBuffer 与内存版静音切割的结果和文件版一致
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from segment_buffer import SegmentBuffer, load_audio, audio_key
+from audio_silence_trimmer import AudioSilenceTrimmer
+
+
+def _make_speech(sr: int = 16000) -> np.ndarray:
+    """2秒静音 + 2秒语音 + 3秒静音 + 1秒语音"""
+    audio = np.full(int(8.0 * sr), 0.001, dtype=np.float32)
+    for start, end in [(2.0, 4.0), (7.0, 8.0)]:
+        t = np.arange(int((end - start) * sr)) / sr
+        audio[int(start * sr):int(start * sr) + len(t)] = 0.5 * np.sin(2 * np.pi * 220 * t)
+    return audio
+
+
+def test_segment_buffer_basics():
+    """SegmentBuffer 的时长、名称、落盘"""
+    print("\n=== 测试: SegmentBuffer 基本属性 ===")
+    buffer = SegmentBuffer(
+        audio=np.zeros(16000, dtype=np.float32),
+        sample_rate=16000,
+        index=4,
+        start_time=1.5,
+        end_time=2.5
+    )
+    assert abs(buffer.duration - 1.0) < 1e-9
+    assert buffer.name == "segment_005_1.500_2.500.wav"
+    assert buffer.key == buffer.name
+    assert not buffer.has_file()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, buffer.name)
+        buffer.write(path)
+        assert buffer.has_file()
+        assert audio_key(buffer) == path
+
+        audio, sr = load_audio(path, sample_rate=16000)
+        assert sr == 16000 and len(audio) == 16000
+
+
+def test_in_memory_trim_matches_file_trim():
+    """内存版静音切割与文件版结果一致"""
+    print("\n=== 测试: 内存切割与文件切割一致 ===")
+    sr = 16000
+    audio = _make_speech(sr)
+    trimmer = AudioSilenceTrimmer(threshold_db=-40.0, frame_length_ms=25.0, hop_length_ms=10.0)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "segment_001_0.000_8.000.wav")
+        sf.write(path, audio, sr, subtype='FLOAT')
+
+        file_result = trimmer.process_audio_for_gender_classification(path, 0.0, temp_dir=work_dir)
+        assert file_result is not None
+        file_audio, _ = sf.read(file_result[0], dtype='float32')
+
+        memory_audio = trimmer.trim_audio_for_gender_classification(
+            load_audio(SegmentBuffer(audio=audio, sample_rate=sr), sr)[0], sr, 0.0
+        )
+
+        print(f"文件版: {len(file_audio) / sr:.2f}s, 内存版: {len(memory_audio) / sr:.2f}s")
+        assert len(file_audio) == len(memory_audio)
+        # 文件版以 16bit 写出临时文件，允许量化误差
+        assert np.allclose(file_audio, memory_audio, atol=1e-4)
+
+
+if __name__ == "__main__":
+    test_segment_buffer_basics()
+    test_in_memory_trim_matches_file_trim()
+    print("\n所有测试通过")
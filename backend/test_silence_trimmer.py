@@ -277,6 +277,44 @@ def test_case_6_complete_workflow():
     os.rmdir(temp_dir)
 
 
+def test_case_7_vectorized_matches_legacy():
+    """
+    测试用例7: 游程编码实现与原逐帧循环实现结果完全一致（含预计算 rms_db）
+    """
+    print("\n=== 测试用例7: 游程编码与逐帧循环一致 ===")
+    from benchmark_silence_detection import legacy_detect_speech_segments
+
+    sr = 16000
+    rng = np.random.default_rng(0)
+    trimmer = AudioSilenceTrimmer(min_silence_duration=0.1, min_speech_duration=0.05)
+
+    patterns = [
+        np.array([]),
+        np.full(50, -60.0),
+        np.full(50, -10.0),
+    ]
+    for _ in range(300):
+        num_frames = int(rng.integers(1, 200))
+        # 随机长度的语音/静音游程
+        frames = []
+        while len(frames) < num_frames:
+            value = -10.0 if rng.random() < 0.5 else -60.0
+            frames.extend([value] * int(rng.integers(1, 25)))
+        patterns.append(np.array(frames[:num_frames]))
+
+    for rms_db in patterns:
+        expected = legacy_detect_speech_segments(trimmer, rms_db, sr, len(rms_db) * 160)
+        actual = trimmer.detect_speech_segments(None, sr, rms_db=rms_db)
+        assert actual == expected, (rms_db, actual, expected)
+
+    # 直接传入音频与预计算 rms_db 结果相同
+    audio = create_test_audio([(0.5, 1.5), (1.7, 2.5), (3.5, 4.0)], [(0.0, 0.5), (4.0, 5.0)])
+    rms_db = trimmer.compute_rms_db(audio, sr)
+    assert trimmer.detect_speech_segments(audio, sr) == trimmer.detect_speech_segments(None, sr, rms_db=rms_db)
+
+    print(f"✓ {len(patterns)} 个随机帧序列结果一致")
+
+
 if __name__ == "__main__":
     print("开始测试音频静音切割功能...")
 
@@ -287,6 +325,7 @@ if __name__ == "__main__":
         test_case_4_short_silence()
         test_case_5_duration_validation()
         test_case_6_complete_workflow()
+        test_case_7_vectorized_matches_legacy()
 
         print("\n" + "=" * 50)
         print("所有测试通过！✓")
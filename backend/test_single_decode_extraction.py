@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+单次解码音频提取测试脚本
+验证 AudioExtractor 单次解码模式的切片结果与文件命名（不依赖 ffmpeg）
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'speaker_diarization_processing'))
+
+from audio_extraction import AudioExtractor
+
+
+SRT_CONTENT = """1
+00:00:00,500 --> 00:00:01,500
+第一句
+
+2
+00:00:02,000 --> 00:00:03,250
+第二句
+
+3
+00:00:04,000 --> 00:00:09,000
+第三句
+"""
+
+
+def _make_extractor(work_dir: str, total_seconds: float = 10.0) -> AudioExtractor:
+    """创建一个用合成音频代替 ffmpeg 解码的提取器"""
+    extractor = AudioExtractor(cache_dir=os.path.join(work_dir, "segments"))
+    sr = extractor.sample_rate
+
+    # 每个采样点的值与它的时间（秒）成正比，便于校验切片位置
+    full_audio = (np.arange(int(total_seconds * sr), dtype=np.float32) / sr) * 0.1
+
+    def fake_decode(video_path, pcm_path: Path):
+        full_audio.tofile(str(pcm_path))
+        return np.memmap(str(pcm_path), dtype=np.float32, mode='r')
+
+    extractor._decode_full_audio = fake_decode
+    return extractor
+
+
+def test_single_decode_slicing():
+    """单次解码模式：文件命名与切片内容"""
+    print("\n=== 测试: 单次解码切片 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        srt_path = os.path.join(work_dir, "test.srt")
+        with open(srt_path, 'w', encoding='utf-8') as f:
+            f.write(SRT_CONTENT)
+
+        extractor = _make_extractor(work_dir)
+        audio_paths = extractor.extract_audio_segments("dummy.mp4", srt_path)
+
+        names = [os.path.basename(p) for p in audio_paths]
+        print(f"片段: {names}")
+        assert names == [
+            "segment_001_0.500_1.500.wav",
+            "segment_002_2.000_3.250.wav",
+            "segment_003_4.000_9.000.wav",
+        ]
+
+        audio, sr = sf.read(audio_paths[1], dtype='float32')
+        assert sr == 16000
+        assert len(audio) == int(1.25 * sr)
+        # 第一个采样点对应 2.0 秒
+        assert abs(audio[0] / 0.1 - 2.0) < 1e-2
+
+        timings = extractor.last_timings
+        print(f"耗时统计: {timings}")
+        assert timings['mode'] == 'single_decode'
+        assert timings['segments'] == 3
+        assert 'decode_seconds' in timings and 'slice_seconds' in timings
+
+
+def test_single_decode_long_segment():
+    """单次解码模式：超长片段仍会经过智能处理"""
+    print("\n=== 测试: 超长片段智能处理 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        srt_path = os.path.join(work_dir, "test.srt")
+        with open(srt_path, 'w', encoding='utf-8') as f:
+            f.write(SRT_CONTENT)
+
+        extractor = _make_extractor(work_dir)
+        audio_paths = extractor.extract_audio_segments("dummy.mp4", srt_path, max_duration=2.0)
+
+        audio, sr = sf.read(audio_paths[2], dtype='float32')
+        print(f"超长片段处理后时长: {len(audio) / sr:.2f}s")
+        assert len(audio) / sr <= 2.0 + 1e-6
+
+
+if __name__ == "__main__":
+    test_single_decode_slicing()
+    test_single_decode_long_segment()
+    print("\n所有测试通过")
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+说话人数量自动估计测试脚本
+在合成说话人嵌入上验证轮廓系数扫描与特征值间隔两种方法
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'speaker_diarization_processing'))
+
+from speaker_count_estimation import estimate_speaker_count
+
+
+def _make_embeddings(n_samples, n_speakers, dim=192, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_speakers, dim))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    weights = rng.dirichlet(np.ones(n_speakers) * 2.0)
+    labels = rng.choice(n_speakers, size=n_samples, p=weights)
+    embeddings = centers[labels] + rng.standard_normal((n_samples, dim)) * 0.06
+    return [emb.astype(np.float32) for emb in embeddings]
+
+
+def test_estimates_true_speaker_count():
+    """两种方法都能估计出合成数据的说话人数"""
+    print("\n=== 测试: 估计说话人数量 ===")
+    for true_k in (2, 4, 7):
+        embeddings = _make_embeddings(500, true_k, seed=true_k)
+        for method in ('silhouette', 'eigengap'):
+            n_speakers, info = estimate_speaker_count(embeddings, max_speakers=10, method=method)
+            print(f"真实 {true_k}, {method}: {n_speakers} (耗时 {info['elapsed']:.3f}s)")
+            assert n_speakers == true_k
+            assert info['elapsed'] >= 0
+
+
+def test_ignores_none_and_small_input():
+    """忽略 None，片段过少时直接返回片段数，下采样后仍能估计"""
+    print("\n=== 测试: 边界情况 ===")
+    embeddings = _make_embeddings(300, 3, seed=1)
+    with_none = embeddings[:150] + [None] * 20 + embeddings[150:]
+    n_speakers, info = estimate_speaker_count(with_none, max_samples=200)
+    assert n_speakers == 3
+    assert info['n_samples'] == 200
+
+    n_speakers, _ = estimate_speaker_count(embeddings[:2] + [None])
+    assert n_speakers == 2
+
+
+if __name__ == "__main__":
+    test_estimates_true_speaker_count()
+    test_ignores_none_and_small_input()
+    print("\n所有测试通过")
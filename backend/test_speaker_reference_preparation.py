@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+说话人参考数据准备测试脚本
+验证参考数据只计算一次并被复用、说话人分配变化后重新计算、清除后重新计算
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import speaker_reference_preparation as prep
+from path_utils import TaskPathManager
+
+
+def _setup_task(base_dir, task_id="task_1"):
+    """创建包含片段音频、原始字幕和 speaker_data.json 的任务目录"""
+    paths = TaskPathManager(base_dir)
+    processed = paths.get_task_paths(task_id)["processed"]
+    segments_dir = processed / "speaker_segments"
+    segments_dir.mkdir(parents=True)
+
+    sr = 16000
+    srt_lines = []
+    scored = {0: [], 1: []}
+    labels = []
+    for i in range(6):
+        start, end = i * 3.0, i * 3.0 + 2.5
+        path = segments_dir / f"segment_{i:03d}_{start:.3f}_{end:.3f}.wav"
+        t = np.arange(int(2.0 * sr)) / sr
+        sf.write(str(path), (0.5 * np.sin(2 * np.pi * (200 + 40 * i) * t)).astype(np.float32), sr)
+        speaker = i % 2
+        labels.append(speaker)
+        scored[speaker].append([str(path), 4.0 - i * 0.1])
+        srt_lines.append(f"{i + 1}\n00:00:{int(start):02d},000 --> 00:00:{int(end):02d},500\n第{i}句台词\n")
+
+    with open(paths.get_source_subtitle_path(task_id), "w", encoding="utf-8") as f:
+        f.write("\n".join(srt_lines))
+
+    speaker_data = {
+        "speaker_labels": labels,
+        "scored_segments": scored,
+        "gender_dict": {"0": "male", "1": "female"},
+        "speaker_name_mapping": {"0": "甲", "1": "乙"},
+        "audio_dir": str(segments_dir)
+    }
+    with open(paths.get_speaker_data_path(task_id), "w", encoding="utf-8") as f:
+        json.dump(speaker_data, f, ensure_ascii=False)
+    return paths, task_id
+
+
+def test_prepared_once_and_reused():
+    """第二次调用（另一种语言）不再重新计算，进程内缓存清空后从文件复用"""
+    print("\n=== 测试: 参考数据复用 ===")
+    with tempfile.TemporaryDirectory() as base_dir:
+        paths, task_id = _setup_task(base_dir)
+        with mock.patch.object(prep, "task_path_manager", paths), \
+                mock.patch.object(prep, "_build_references", side_effect=prep._build_references) as build:
+            first = prep.prepare_speaker_references(task_id)
+            assert not first["reused"]
+            assert set(first["references"]) == {0, 1}
+            ref = first["references"][1]
+            assert os.path.exists(ref["reference_audio"])
+            assert ref["speaker_name"] == "乙" and ref["gender"] == "female"
+            assert "第1句台词" in ref["reference_text"]
+
+            second = prep.prepare_speaker_references(task_id)
+            assert second["reused"] and second["references"] == first["references"]
+
+            prep._prepared.clear()
+            third = prep.prepare_speaker_references(task_id)
+            assert third["reused"] and third["references"] == first["references"]
+            assert build.call_count == 1
+            assert paths.get_speaker_references_path(task_id).exists()
+
+
+def test_recomputed_when_labels_change():
+    """speaker_data.json 变化（保存说话人分配）后重新计算"""
+    print("\n=== 测试: 说话人分配变化后重新计算 ===")
+    with tempfile.TemporaryDirectory() as base_dir:
+        paths, task_id = _setup_task(base_dir)
+        with mock.patch.object(prep, "task_path_manager", paths), \
+                mock.patch.object(prep, "_build_references", side_effect=prep._build_references) as build:
+            prep.prepare_speaker_references(task_id)
+
+            speaker_data_path = paths.get_speaker_data_path(task_id)
+            with open(speaker_data_path, "r", encoding="utf-8") as f:
+                speaker_data = json.load(f)
+            speaker_data["speaker_name_mapping"]["1"] = "丙"
+            speaker_data["scored_segments"]["0"] = speaker_data["scored_segments"]["0"][:1]
+            time.sleep(0.01)
+            with open(speaker_data_path, "w", encoding="utf-8") as f:
+                json.dump(speaker_data, f, ensure_ascii=False)
+
+            result = prep.prepare_speaker_references(task_id)
+            assert not result["reused"]
+            assert result["references"][1]["speaker_name"] == "丙"
+            assert len(result["references"][0]["selected_segments"]) == 1
+            assert build.call_count == 2
+
+
+def test_invalidate_removes_artifact():
+    """清除后删除产物，下次调用重新计算"""
+    print("\n=== 测试: 清除参考数据 ===")
+    with tempfile.TemporaryDirectory() as base_dir:
+        paths, task_id = _setup_task(base_dir)
+        with mock.patch.object(prep, "task_path_manager", paths):
+            prep.prepare_speaker_references(task_id)
+            prep.invalidate_speaker_references(task_id)
+            assert not paths.get_speaker_references_path(task_id).exists()
+
+            assert not prep.prepare_speaker_references(task_id)["reused"]
+            reference = prep.get_prepared_reference(task_id, "0")
+            assert reference is not None and reference["gender"] == "male"
+            assert prep.get_prepared_reference(task_id, 5) is None
+
+
+if __name__ == "__main__":
+    test_prepared_once_and_reused()
+    test_recomputed_when_labels_change()
+    test_invalidate_removes_artifact()
+    print("\n所有测试通过")
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+字幕区间索引测试脚本
+与线性扫描结果对比验证容差查找与范围查询，验证按字幕序号提取参考文本与 SRT 缓存失效
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from subtitle_index import SubtitleIntervalIndex, load_subtitle_index
+from subtitle_text_extractor import SubtitleTextExtractor
+
+
+def _random_subtitles(count, seed=0):
+    """随机字幕，时间允许重叠"""
+    rng = random.Random(seed)
+    subtitles = []
+    t = 0.0
+    for i in range(count):
+        t += rng.uniform(0.0, 3.0)
+        start = round(t, 3)
+        end = round(start + rng.uniform(0.2, 6.0), 3)
+        subtitles.append({'start_time': start, 'end_time': end, 'text': f"第{i}句"})
+    return subtitles
+
+
+def _write_srt(path, subtitles):
+    def fmt(seconds):
+        ms = int(round(seconds * 1000))
+        return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+    with open(path, "w", encoding="utf-8") as f:
+        for i, sub in enumerate(subtitles):
+            f.write(f"{i + 1}\n{fmt(sub['start_time'])} --> {fmt(sub['end_time'])}\n{sub['text']}\n\n")
+
+
+def test_matches_linear_scan():
+    """容差查找、范围查询与线性扫描一致"""
+    print("\n=== 测试: 与线性扫描一致 ===")
+    subtitles = _random_subtitles(2000)
+    index = SubtitleIntervalIndex(subtitles)
+    rng = random.Random(1)
+
+    for _ in range(500):
+        target = subtitles[rng.randrange(len(subtitles))]
+        start = target['start_time'] + rng.uniform(-0.15, 0.15)
+        end = target['end_time'] + rng.uniform(-0.15, 0.15)
+        expected = [i for i, s in enumerate(subtitles)
+                    if abs(s['start_time'] - start) <= 0.1 and abs(s['end_time'] - end) <= 0.1]
+        found = index.find(start, end, tolerance=0.1)
+        if expected:
+            assert found in expected
+        else:
+            assert found is None
+
+    for _ in range(500):
+        start = rng.uniform(0, subtitles[-1]['end_time'])
+        end = start + rng.uniform(0, 10)
+        expected = sorted(i for i, s in enumerate(subtitles)
+                          if s['start_time'] <= end and s['end_time'] >= start)
+        assert sorted(index.overlapping(start, end)) == expected
+
+    point = subtitles[10]['start_time'] + 0.1
+    assert 10 in index.at(point)
+    assert index.get(5) is subtitles[5] and index.get(len(subtitles)) is None
+
+
+def test_extractor_uses_subtitle_index():
+    """有字幕序号时直接取字幕，文件名时间不可用时也能找到；无序号时按时间查找"""
+    print("\n=== 测试: 按字幕序号提取参考文本 ===")
+    subtitles = _random_subtitles(50, seed=2)
+    with tempfile.TemporaryDirectory() as work_dir:
+        srt_path = os.path.join(work_dir, "source.srt")
+        _write_srt(srt_path, subtitles)
+
+        by_time = os.path.join(work_dir, f"segment_004_{subtitles[3]['start_time']:.3f}_{subtitles[3]['end_time']:.3f}.wav")
+        renamed = os.path.join(work_dir, "speaker_0_clip.wav")
+        segments = [(by_time, 4.0, 1.0), (renamed, 3.5, 1.0)]
+
+        extractor = SubtitleTextExtractor()
+        texts = extractor.extract_text_for_segments(segments, srt_path, {"speaker_0_clip.wav": 7})
+        assert texts == [(by_time, "第3句"), (renamed, "第7句")]
+
+        # 没有序号映射时，无法解析时间的片段被跳过
+        assert extractor.extract_text_for_segments(segments, srt_path) == [(by_time, "第3句")]
+
+        result = extractor.process_all_speakers({0: segments}, srt_path, {"speaker_0_clip.wav": 7})
+        assert result == {0: "第3句 第7句"}
+
+
+def test_srt_index_cached_until_file_changes():
+    """同一 SRT 只建立一次索引，文件修改后重建"""
+    print("\n=== 测试: 索引缓存 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        srt_path = os.path.join(work_dir, "source.srt")
+        _write_srt(srt_path, _random_subtitles(10))
+        first = load_subtitle_index(srt_path)
+        assert load_subtitle_index(srt_path) is first
+
+        _write_srt(srt_path, _random_subtitles(12, seed=3))
+        os.utime(srt_path, ns=(time.time_ns(), time.time_ns() + 10_000_000))
+        second = load_subtitle_index(srt_path)
+        assert second is not first and len(second) == 12
+
+
+if __name__ == "__main__":
+    test_matches_linear_scan()
+    test_extractor_uses_subtitle_index()
+    test_srt_index_cached_until_file_changes()
+    print("\n所有测试通过")
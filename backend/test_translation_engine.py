@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+进程内翻译引擎测试脚本
+使用本地 LLM 桩服务验证：翻译/重新翻译逐句产出结果、提前停止时取消剩余请求，
+以及翻译服务在进程内翻译、增量写入字幕并按句数推送进度
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import batch_translate_ollama as bto
+from llm_stub_server import LLMStubServer
+from translation_engine import TranslationEngine
+from translation_memory import TranslationMemory
+
+
+def _make_tasks(count):
+    return [{
+        "task_id": f"tr-{i}",
+        "source": f"句子{i}",
+        "target_language": "英语",
+        "start_time": f"00:00:{i:02d},000",
+        "end_time": f"00:00:{i:02d},800",
+        "index": i
+    } for i in range(count)]
+
+
+async def _collect(generator):
+    return [result async for result in generator]
+
+
+def test_translate_yields_lines():
+    """translate 逐句产出所有结果（带原 index），统计信息可用；提前停止时不再发送剩余请求"""
+    print("\n=== 测试: 逐句翻译 ===")
+    with tempfile.TemporaryDirectory() as work_dir, LLMStubServer(latency=0.05, parallel=4) as server, \
+            mock.patch.object(bto, "OLLAMA_API_URL", f"{server.base_url}/v1/chat/completions"):
+        engine = TranslationEngine(model="stub", memory=TranslationMemory(os.path.join(work_dir, "tm.db")))
+        results = asyncio.run(_collect(engine.translate(_make_tasks(30))))
+
+        assert sorted(r["index"] for r in results) == list(range(30))
+        assert all(r["success"] and r["translation"] == f"[英语]句子{r['index']}" for r in results)
+        assert engine.last_stats["requests"] == len(server.chat_requests())
+        print(bto.format_run_stats(engine.last_stats))
+
+    with tempfile.TemporaryDirectory() as work_dir, LLMStubServer(latency=0.1, parallel=1) as server, \
+            mock.patch.object(bto, "OLLAMA_API_URL", f"{server.base_url}/v1/chat/completions"), \
+            mock.patch.object(bto, "group_tasks_by_budget", lambda tasks: [tasks[i:i + 2] for i in range(0, len(tasks), 2)]):
+        engine = TranslationEngine(model="stub", concurrency=1, memory=TranslationMemory(os.path.join(work_dir, "tm.db")))
+
+        async def first_only():
+            async for result in engine.translate(_make_tasks(20)):
+                return result
+
+        # 每组 2 句、串行请求：拿到第一句后停止，剩余的组不应再请求
+        first = asyncio.run(first_only())
+        assert first["index"] == 0
+        assert len(server.chat_requests()) < 10
+
+
+def test_retranslate_with_memory():
+    """retranslate 逐句产出结果，第二次全部命中翻译记忆不发送请求"""
+    print("\n=== 测试: 重新翻译 ===")
+    tasks = [{"task_id": f"retrans-{i}", "source": f"很长的句子{i}", "target_language": "日语"} for i in range(6)]
+    with tempfile.TemporaryDirectory() as work_dir, LLMStubServer(latency=0.02, parallel=4) as server, \
+            mock.patch.object(bto, "OLLAMA_API_URL", f"{server.base_url}/v1/chat/completions"):
+        engine = TranslationEngine(model="stub", memory=TranslationMemory(os.path.join(work_dir, "tm.db")))
+
+        first = asyncio.run(_collect(engine.retranslate(tasks)))
+        assert sorted(r["task_id"] for r in first) == sorted(t["task_id"] for t in tasks)
+        assert all(r["success"] and r["translation"] == "[日语]" + r["source"] for r in first)
+        assert server.max_active <= engine.concurrency
+        assert len(server.chat_requests()) == 6
+
+        second = asyncio.run(_collect(engine.retranslate(tasks)))
+        assert all(r["cached"] for r in second)
+        assert len(server.chat_requests()) == 6
+
+
+def test_service_translates_in_process():
+    """翻译服务不再启动子进程：逐句推送进度并写出完整的译文字幕"""
+    print("\n=== 测试: 翻译服务 ===")
+    import translation_service
+
+    with tempfile.TemporaryDirectory() as work_dir, LLMStubServer(latency=0.01, parallel=4) as server, \
+            mock.patch.object(bto, "OLLAMA_API_URL", f"{server.base_url}/v1/chat/completions"), \
+            mock.patch.object(bto, "translation_memory", None), \
+            mock.patch("asyncio.create_subprocess_exec", side_effect=AssertionError("不应启动子进程")):
+        source_path = Path(work_dir) / "source.srt"
+        target_path = Path(work_dir) / "translated" / "target.srt"
+        with open(source_path, "w", encoding="utf-8") as f:
+            for i in range(12):
+                f.write(f"{i + 1}\n00:00:{i * 2:02d},000 --> 00:00:{i * 2 + 1:02d},500\n句子{i}\n\n")
+
+        progress = []
+
+        async def on_progress(value, message):
+            progress.append((value, message))
+
+        result = asyncio.run(translation_service.batch_translate_subtitles(source_path, target_path, "en", on_progress))
+
+        assert result["status"] == "completed" and result["total_items"] == 12
+        translated = [value for value, message in progress if message.startswith("正在翻译") and "/" in message]
+        assert translated and translated == sorted(translated) and translated[-1] == 80
+        assert any("12/12" in message for _, message in progress)
+
+        from srt_parser import SRTParser
+        subtitles = SRTParser().parse_srt(target_path)
+        assert len(subtitles) == 12
+        assert all(sub["text"] for sub in subtitles)
+
+
+if __name__ == "__main__":
+    test_translate_yields_lines()
+    test_retranslate_with_memory()
+    test_service_translates_in_process()
+    print("\n所有测试通过")
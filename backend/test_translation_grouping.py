@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+翻译分组测试脚本
+验证按 token 预算分组：保持顺序、遵守预算、场景切换处强制分组、优先在说话人切换处切分，
+以及在桩服务上与固定 5 句分组的请求数和耗时对比
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import batch_translate_ollama as bto
+from llm_stub_server import LLMStubServer
+from translation_memory import TranslationMemory
+
+
+def _ts(seconds):
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def _make_tasks(count, gap=0.2, duration=1.5, text="这是一句比较普通的对白台词", speakers=None):
+    tasks = []
+    t = 0.0
+    for i in range(count):
+        tasks.append({
+            "task_id": f"tr-{i}",
+            "source": f"{text}{i}",
+            "target_language": "英语",
+            "start_time": _ts(t),
+            "end_time": _ts(t + duration),
+            "index": i
+        })
+        if speakers is not None:
+            tasks[-1]["speaker"] = speakers[i]
+        t += duration + gap
+    return tasks
+
+
+def test_order_and_budget():
+    """分组保持原顺序，每组不超过预算；快速对白的请求数远少于固定 5 句分组"""
+    print("\n=== 测试: 顺序与预算 ===")
+    tasks = _make_tasks(120)
+    shuffled = list(reversed(tasks))
+    groups = bto.group_tasks_by_budget(shuffled, context_tokens=2048, max_output_tokens=300, max_group_size=40)
+
+    assert [t["index"] for g in groups for t in g] == list(range(120))
+    for group in groups:
+        assert len(group) <= 40
+        assert bto.estimate_group_tokens(group) <= 2048
+        assert sum(bto.estimate_task_tokens(t)[1] for t in group) <= 300
+
+    old_groups = bto.group_tasks_by_time(tasks, max_gap_seconds=1.0, max_group_size=5)
+    print(f"固定分组 {len(old_groups)} 组 -> 预算分组 {len(groups)} 组")
+    assert len(old_groups) == 24 and len(groups) < len(old_groups) / 2
+
+
+def test_scene_and_speaker_boundaries():
+    """场景切换（长间隔）处总是分组；预算用尽时在说话人切换处切分"""
+    print("\n=== 测试: 场景与说话人边界 ===")
+    tasks = _make_tasks(10)
+    # 第 6 句前插入 8 秒间隔（场景切换）
+    for task in tasks[5:]:
+        for key in ("start_time", "end_time"):
+            task[key] = _ts(bto.parse_time_to_seconds(task[key]) + 8.0)
+    groups = bto.group_tasks_by_budget(tasks, scene_gap_seconds=5.0)
+    assert [len(g) for g in groups] == [5, 5]
+
+    # 每组最多 8 句：第 7 句处说话人切换，应在此切分而不是在第 9 句处切断对话
+    speakers = [0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1]
+    tasks = _make_tasks(12, speakers=speakers)
+    groups = bto.group_tasks_by_budget(tasks, max_group_size=8)
+    assert [t["index"] for t in groups[0]] == list(range(6))
+    assert [t["index"] for g in groups for t in g] == list(range(12))
+
+    # 超出预算的单句单独成组
+    long_task = _make_tasks(1, text="长" * 500)
+    groups = bto.group_tasks_by_budget(_make_tasks(3) + [dict(long_task[0], index=3)], max_output_tokens=300)
+    assert [len(g) for g in groups] == [3, 1]
+
+
+def test_fewer_requests_on_stub_server():
+    """在有固定单次请求开销的桩服务上，预算分组请求数更少、总耗时更短，统计信息完整"""
+    print("\n=== 测试: 桩服务对比 ===")
+    tasks = _make_tasks(60)
+    results = {}
+    with LLMStubServer(latency=0.05, parallel=1) as server, \
+            mock.patch.object(bto, "OLLAMA_API_URL", f"{server.base_url}/v1/chat/completions"):
+        for name, groups in (("time", bto.group_tasks_by_time(tasks)), ("budget", bto.group_tasks_by_budget(tasks))):
+            with tempfile.TemporaryDirectory() as work_dir:
+                stats = {}
+                translated = asyncio.run(bto.translate_groups_concurrently(
+                    groups, model="stub", concurrency=1, stats=stats,
+                    memory=TranslationMemory(os.path.join(work_dir, "tm.db"))
+                ))
+                flat = [r for g in translated for r in g]
+                assert [r["task_id"] for r in flat] == [t["task_id"] for t in tasks]
+                assert all(r["success"] for r in flat)
+                results[name] = stats
+                print(f"{name}: {bto.format_run_stats(stats)}")
+
+    assert results["time"]["requests"] == 12
+    assert results["budget"]["requests"] < results["time"]["requests"] / 3
+    assert results["budget"]["elapsed"] < results["time"]["elapsed"]
+    assert results["budget"]["prompt_tokens"] > 0 and results["budget"]["estimated_tokens"] > 0
+
+
+if __name__ == "__main__":
+    test_order_and_budget()
+    test_scene_and_speaker_boundaries()
+    test_fewer_requests_on_stub_server()
+    print("\n所有测试通过")
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+翻译记忆测试脚本
+验证键的组成（规范化原文/上下文/语言/模型/提示词版本）、命中统计，以及翻译时只请求未命中的句子、
+全部命中的组不会发送到服务端
+"""
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import batch_translate_ollama as bto
+from llm_stub_server import LLMStubServer
+from translation_memory import TranslationMemory, context_fingerprint, neighbour_contexts
+
+
+def _sent_sentences(server):
+    """桩服务收到的所有待翻译句子"""
+    sentences = []
+    for request in server.chat_requests():
+        user = next(m['content'] for m in request['payload']['messages'] if m['role'] == 'user')
+        sentences.extend(re.findall(r'^\d+\. (.*)$', user, re.MULTILINE))
+    return sentences
+
+
+def test_memory_keys_and_stats():
+    """原文规范化后命中，上下文/语言/模型/提示词版本不同时不命中"""
+    print("\n=== 测试: 记忆键与统计 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        memory = TranslationMemory(os.path.join(work_dir, "tm.db"))
+        context = context_fingerprint(["上一句"], ["下一句"])
+        memory.store_many({memory.make_key("好的，谢谢", context, "英语", "m1", "v1"): "OK, thanks"})
+
+        assert memory.lookup(memory.make_key("  好的,谢谢 ", context, "英语", "m1", "v1")) == "OK, thanks"
+        assert memory.lookup(memory.make_key("好的，谢谢", "", "英语", "m1", "v1")) is None
+        assert memory.lookup(memory.make_key("好的，谢谢", context, "日语", "m1", "v1")) is None
+        assert memory.lookup(memory.make_key("好的，谢谢", context, "英语", "m2", "v1")) is None
+        assert memory.lookup(memory.make_key("好的，谢谢", context, "英语", "m1", "v2")) is None
+
+        stats = memory.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 4 and stats['entries'] == 1
+        assert abs(stats['hit_rate'] - 0.2) < 1e-9
+
+        # 重新打开后仍然可用
+        memory.close()
+        reopened = TranslationMemory(os.path.join(work_dir, "tm.db"))
+        assert reopened.lookup(memory.make_key("好的，谢谢", context, "英语", "m1", "v1")) == "OK, thanks"
+
+        assert neighbour_contexts(["a", "b", "c"], window=0) == ["", "", ""]
+        assert len(set(neighbour_contexts(["a", "b", "a", "b"]))) == 4
+
+
+def test_only_misses_reach_server():
+    """第二次翻译全部命中不发送请求；修改一句后只请求受影响的句子"""
+    print("\n=== 测试: 只请求未命中的句子 ===")
+    sources = [f"台词{i}" for i in range(9)]
+
+    def make_groups(texts):
+        tasks = [{"task_id": f"tr-{i}", "source": t, "target_language": "英语"} for i, t in enumerate(texts)]
+        return [tasks[i:i + 3] for i in range(0, len(tasks), 3)]
+
+    with tempfile.TemporaryDirectory() as work_dir, LLMStubServer(latency=0.0, parallel=4) as server:
+        memory = TranslationMemory(os.path.join(work_dir, "tm.db"))
+        with mock.patch.object(bto, "OLLAMA_API_URL", f"{server.base_url}/v1/chat/completions"):
+            def run(texts):
+                return asyncio.run(bto.translate_groups_concurrently(make_groups(texts), model="stub", memory=memory))
+
+            first = run(sources)
+            assert len(server.chat_requests()) == 3
+            assert not any(r.get("cached") for group in first for r in group)
+
+            second = run(sources)
+            assert len(server.chat_requests()) == 3
+            assert all(r["cached"] for group in second for r in group)
+            assert [[r["translation"] for r in g] for g in second] == [[r["translation"] for r in g] for g in first]
+            assert [r["task_id"] for g in second for r in g] == [f"tr-{i}" for i in range(9)]
+
+            # 修改第 5 句：该句及其前后相邻句的上下文变化，只有这三句被请求（分布在 1、2 组，第 0 组不请求）
+            changed = list(sources)
+            changed[4] = "新的台词"
+            before = len(_sent_sentences(server))
+            third = run(changed)
+            assert _sent_sentences(server)[before:] == ["台词3", "新的台词", "台词5"]
+            assert len(server.chat_requests()) == 4
+            assert [r["translation"] for r in third[1]] == ["[英语]台词3", "[英语]新的台词", "[英语]台词5"]
+            assert [bool(r.get("cached")) for r in third[1]] == [False, False, False]
+
+        assert memory.stats()['hits'] == 9 + 6
+
+
+def test_sync_group_all_hits_skips_request():
+    """translate_batch_group 全部命中时不发送请求，失败的结果不写入记忆"""
+    print("\n=== 测试: 单组翻译 ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        memory = TranslationMemory(os.path.join(work_dir, "tm.db"))
+        with LLMStubServer(latency=0.0, fail_first=1) as server, \
+                mock.patch.object(bto, "OLLAMA_API_URL", f"{server.base_url}/v1/chat/completions"):
+            failed = bto.translate_batch_group(["你好", "再见"], "英语", "g", model="stub", memory=memory)
+            assert not any(r["success"] for r in failed)
+            assert memory.stats()['entries'] == 0
+
+            ok = bto.translate_batch_group(["你好", "再见"], "英语", "g", model="stub", memory=memory)
+            assert all(r["success"] for r in ok)
+            requests_before = len(server.chat_requests())
+
+            again = bto.translate_batch_group(["你好", "再见"], "英语", "g", model="stub", memory=memory)
+            assert len(server.chat_requests()) == requests_before
+            assert [r["translation"] for r in again] == ["[英语]你好", "[英语]再见"]
+            assert [r["task_id"] for r in again] == ["g_0", "g_1"]
+
+
+if __name__ == "__main__":
+    test_memory_keys_and_stats()
+    test_only_misses_reach_server()
+    test_sync_group_all_hits_skips_request()
+    print("\n所有测试通过")
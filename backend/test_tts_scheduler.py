@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 任务调度测试脚本
+使用按文本长度 sleep 的假 worker 验证：按文字系统估算耗时、初始规划保持说话人局部性并拆分过大的说话人、
+动态调度比按任务数对半分更快结束、慢 worker 的任务被窃取、失败 worker 的任务交给其他 worker，
+以及通过 dummy 常驻进程执行
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from tts_scheduler import WorkStealingScheduler, estimate_cost, plan_assignments, run_distributed
+from tts_worker_client import TTSWorkerManager
+
+SECONDS_PER_CHAR = 0.002
+
+
+def _make_tasks(lengths, speakers=None, work_dir=""):
+    return [{
+        "segment_index": i,
+        "speaker_id": speakers[i] if speakers else 0,
+        "target_text": "x" * length,
+        "output_file": os.path.join(work_dir, f"segment_{i}.wav")
+    } for i, length in enumerate(lengths)]
+
+
+def _text_length(task):
+    return len(task["target_text"])
+
+
+def _sleep_worker(speed=1.0, fail_after=None, calls=None):
+    """按文本长度 sleep 的假 worker；fail_after 批之后抛出异常"""
+    state = {"batches": 0}
+
+    def run(batch, progress):
+        if fail_after is not None and state["batches"] >= fail_after:
+            raise RuntimeError("worker crashed")
+        state["batches"] += 1
+        if calls is not None:
+            calls.append([task["segment_index"] for task in batch])
+        results = {}
+        for i, task in enumerate(batch):
+            time.sleep(SECONDS_PER_CHAR * _text_length(task) * speed)
+            results[task["segment_index"]] = task["output_file"]
+            progress(i + 1, len(batch))
+        return results
+    return run
+
+
+def _static_makespan(assignments, speeds):
+    """每个 worker 在独立线程中顺序执行固定分配的任务，返回总耗时"""
+    start = time.time()
+    threads = [threading.Thread(target=_sleep_worker(speed), args=(tasks, lambda c, t: None))
+               for tasks, speed in zip(assignments, speeds)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.time() - start
+
+
+def test_estimate_cost_by_script():
+    """同样字数的中文比英文朗读时间长，空文本只有固定开销"""
+    chinese = estimate_cost({"target_text": "今天天气很好"})
+    english = estimate_cost({"target_text": "sunny!"})
+    empty = estimate_cost({"target_text": ""})
+    assert chinese > english > empty > 0
+    assert estimate_cost({"target_text": "a b c"}) == estimate_cost({"target_text": "abc"})
+
+
+def test_plan_keeps_speakers_and_splits_heavy_ones():
+    """说话人尽量整体分给一个 worker，超过平均负载的说话人拆开"""
+    # 说话人 0 占总工作量的一半以上，说话人 1、2 较小
+    speakers = [0] * 10 + [1] * 3 + [2] * 3
+    tasks = _make_tasks([10] * 16, speakers)
+    plan = plan_assignments(tasks, 3, cost_fn=_text_length)
+
+    assert sorted(t["segment_index"] for worker in plan for t in worker) == list(range(16))
+    owners = {}
+    for worker_id, worker_tasks in enumerate(plan):
+        for task in worker_tasks:
+            owners.setdefault(task["speaker_id"], set()).add(worker_id)
+    assert len(owners[0]) >= 2, "工作量过大的说话人应拆分"
+    assert len(owners[1]) == 1 and len(owners[2]) == 1, "小说话人应保持在同一个 worker"
+    loads = [sum(_text_length(t) for t in worker) for worker in plan]
+    assert max(loads) - min(loads) <= 20, loads
+
+    # 不允许拆分时按说话人整体分配
+    whole = plan_assignments(tasks, 3, cost_fn=_text_length, split_groups=False)
+    assert sum(1 for worker in whole if any(t["speaker_id"] == 0 for t in worker)) == 1
+
+
+def test_dynamic_beats_static_halves():
+    """长片段集中在前半部分时，按任务数对半分的耗时远高于动态调度"""
+    print("\n=== 测试: 动态调度 vs 对半分 ===")
+    tasks = _make_tasks([60] * 8 + [6] * 8, speakers=[0, 1] * 8)
+    half = len(tasks) // 2
+    static = _static_makespan([tasks[:half], tasks[half:]], [1.0, 1.0])
+
+    start = time.time()
+    results, report = run_distributed(
+        tasks, {"gpu0": _sleep_worker(), "gpu1": _sleep_worker()},
+        cost_fn=_text_length, batch_size=2
+    )
+    dynamic = time.time() - start
+
+    assert sorted(results) == list(range(16))
+    assert dynamic < static * 0.75, f"动态 {dynamic:.2f}s, 对半分 {static:.2f}s"
+    assert report["utilization"] > 0.8, report
+    print(f"对半分 {static:.2f}s, 动态 {dynamic:.2f}s, 利用率 {report['utilization']:.0%}")
+
+
+def test_idle_worker_steals_from_slow_worker():
+    """慢 worker 队列中的任务被快 worker 窃取；窃取按批且每批只含一个说话人"""
+    tasks = _make_tasks([20] * 24, speakers=[i // 6 for i in range(24)])
+    fast_calls, slow_calls = [], []
+    progress = []
+    results, report = run_distributed(
+        tasks,
+        {"fast": _sleep_worker(1.0, calls=fast_calls), "slow": _sleep_worker(4.0, calls=slow_calls)},
+        progress_callback=lambda c, t: progress.append(c),
+        cost_fn=_text_length, batch_size=2
+    )
+    assert sorted(results) == list(range(24))
+    assert report["workers"]["fast"]["steals"] > 0
+    assert report["workers"]["fast"]["tasks"] > report["workers"]["slow"]["tasks"]
+    for batch in fast_calls + slow_calls:
+        assert len({tasks[i]["speaker_id"] for i in batch}) == 1
+    assert progress == sorted(progress) and progress[-1] == 24
+    for item in report["workers"].values():
+        assert 0 <= item["utilization"] <= 1 and item["idle_seconds"] >= 0
+
+
+def test_failed_worker_tasks_move_to_others():
+    """一个 worker 失败后它的批次和队列由其他 worker 完成；全部失败时抛出异常"""
+    tasks = _make_tasks([10] * 12, speakers=[0, 1, 2] * 4)
+    progress = []
+    results, report = run_distributed(
+        tasks, {"good": _sleep_worker(), "bad": _sleep_worker(fail_after=1)},
+        progress_callback=lambda c, t: progress.append(c),
+        cost_fn=_text_length, batch_size=2
+    )
+    assert sorted(results) == list(range(12))
+    assert report["workers"]["bad"]["failed"] and report["workers"]["good"]["tasks"] >= 10
+    assert progress == sorted(progress)
+
+    try:
+        run_distributed(tasks, {"bad": _sleep_worker(fail_after=0)}, cost_fn=_text_length)
+    except RuntimeError as e:
+        assert "crashed" in str(e)
+    else:
+        raise AssertionError("所有 worker 失败时应抛出异常")
+
+
+def test_scheduler_whole_queue_batches():
+    """batch_size=0 时每个 worker 一次取走自己的整个队列（子进程方式每批都要加载模型）"""
+    tasks = _make_tasks([10] * 6, speakers=[0] * 6)
+    scheduler = WorkStealingScheduler(tasks, ["a", "b"], cost_fn=_text_length,
+                                      group_key=lambda task: 0, batch_size=0)
+    first = scheduler.next_batch("a")
+    second = scheduler.next_batch("b")
+    assert len(first) == 3 and len(second) == 3
+    scheduler.complete("a", first, 0.1)
+    scheduler.complete("b", second, 0.1)
+    assert scheduler.next_batch("a") == [] and scheduler.report()["steals"] == 0
+
+
+def test_batches_shrink_towards_the_end():
+    """批次耗时不超过剩余工作量的一部分，最后几批只含单个片段"""
+    tasks = _make_tasks([10] * 32, speakers=[0] * 32)
+    scheduler = WorkStealingScheduler(tasks, ["a", "b"], cost_fn=_text_length, batch_size=4)
+    sizes = []
+    while True:
+        batch = scheduler.next_batch("a")
+        if not batch:
+            break
+        sizes.append(len(batch))
+        scheduler.complete("a", batch, 0.0)
+    assert sum(sizes) == 32 and sizes[0] == 4 and sizes[-3:] == [1, 1, 1]
+    assert sizes == sorted(sizes, reverse=True)
+
+
+def test_distributed_over_dummy_daemons():
+    """通过两个 dummy 常驻进程（不同设备键）动态执行，结果合并并记录调度报告"""
+    print("\n=== 测试: 常驻进程 ===")
+    manager = TTSWorkerManager(idle_timeout=30)
+    options = {"seconds_per_char": SECONDS_PER_CHAR}
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            tasks = _make_tasks([40] * 6 + [5] * 6, speakers=[0, 1] * 6, work_dir=work_dir)
+
+            def daemon_runner(device):
+                def run(batch, progress):
+                    result = manager.run("dummy", sys.executable, batch, device=device,
+                                         options=options, progress_callback=progress)
+                    return result["results"]
+                return run
+
+            results, report = run_distributed(
+                tasks, {"worker0": daemon_runner("0"), "worker1": daemon_runner("1")},
+                cost_fn=_text_length, batch_size=2
+            )
+            assert sorted(results) == list(range(12))
+            assert all(os.path.exists(path) for path in results.values())
+            manager.record_schedule(report)
+            stats = manager.stats()
+            assert stats["starts"] == 2
+            assert stats["recent_schedules"][-1]["tasks"] == 12
+    finally:
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    test_estimate_cost_by_script()
+    test_plan_keeps_speakers_and_splits_heavy_ones()
+    test_dynamic_beats_static_halves()
+    test_idle_worker_steals_from_slow_worker()
+    test_failed_worker_tasks_move_to_others()
+    test_scheduler_whole_queue_batches()
+    test_batches_shrink_towards_the_end()
+    test_distributed_over_dummy_daemons()
+    print("\n✅ 所有测试通过")
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 常驻工作进程测试脚本
+使用 dummy 引擎（只 sleep、写静音 WAV）验证：模型只加载一次、逐片段进度、失败片段、取消、
+空闲退出后自动重启，以及克隆器通过常驻进程生成、常驻进程不可用时多 GPU 整体回退到子进程方式
+"""
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from tts_worker_client import TTSWorkerError, TTSWorkerManager
+
+
+def _make_tasks(work_dir, count, fail=()):
+    return [{
+        "segment_index": i,
+        "speaker_id": 0,
+        "target_text": ("FAIL " if i in fail else "") + f"text {i}",
+        "output_file": os.path.join(work_dir, f"segment_{i}.wav")
+    } for i in range(count)]
+
+
+def test_worker_reuses_loaded_model():
+    """第一次提交等待模型加载，之后的提交直接复用；进度逐片段回调，失败片段单独报告"""
+    print("\n=== 测试: 常驻进程复用 ===")
+    manager = TTSWorkerManager(idle_timeout=30)
+    options = {"load_seconds": 1.0, "latency": 0.01}
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            progress = []
+            start = time.time()
+            first = manager.run("dummy", sys.executable, _make_tasks(work_dir, 6, fail={3}),
+                                options=options, progress_callback=lambda c, t: progress.append((c, t)))
+            first_elapsed = time.time() - start
+
+            assert sorted(first["results"]) == [0, 1, 2, 4, 5]
+            assert first["failed"] == [3] and not first["cancelled"]
+            assert all(os.path.exists(path) for path in first["results"].values())
+            assert progress == [(i, 6) for i in range(1, 7)]
+
+            # 单片段重新生成：不再加载模型
+            start = time.time()
+            second = manager.run("dummy", sys.executable, _make_tasks(work_dir, 1), options=options)
+            second_elapsed = time.time() - start
+            assert second["results"] == {0: os.path.join(work_dir, "segment_0.wav")}
+            assert first_elapsed >= 1.0 and second_elapsed < 0.5, (first_elapsed, second_elapsed)
+
+            stats = manager.stats()
+            assert stats['starts'] == 1 and stats['jobs'] == 2
+            worker = stats['workers'][0]
+            assert worker['alive'] and worker['loaded'] and worker['load_seconds'] >= 1.0
+            print(stats)
+    finally:
+        manager.shutdown()
+    assert not manager.stats()['workers']
+
+
+def test_cancel_and_idle_restart():
+    """取消在当前片段完成后生效；空闲退出后下一次提交自动重启"""
+    print("\n=== 测试: 取消与空闲重启 ===")
+    manager = TTSWorkerManager(idle_timeout=1)
+    options = {"latency": 0.3}
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            progress = []
+            result = manager.run(
+                "dummy", sys.executable, _make_tasks(work_dir, 20), options=options,
+                progress_callback=lambda c, t: progress.append(c),
+                should_cancel=lambda: len(progress) >= 2
+            )
+            assert result["cancelled"]
+            assert 2 <= len(result["results"]) < 20
+
+            # 等待空闲退出
+            deadline = time.time() + 10
+            while manager.stats()['workers'][0]['alive'] and time.time() < deadline:
+                time.sleep(0.2)
+            assert not manager.stats()['workers'][0]['alive']
+
+            result = manager.run("dummy", sys.executable, _make_tasks(work_dir, 2), options=options)
+            assert sorted(result["results"]) == [0, 1]
+            assert manager.stats()['starts'] == 2
+    finally:
+        manager.shutdown()
+
+
+def test_restart_when_port_closed_before_exit():
+    """工作进程已关闭端口但尚未结束（空闲退出过程中）时，连接失败后重启并重试"""
+    manager = TTSWorkerManager(idle_timeout=30)
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            manager.run("dummy", sys.executable, _make_tasks(work_dir, 1))
+            worker = manager.get_worker("dummy", sys.executable)
+            # 模拟退出前的窗口：进程仍在运行，但端口已不再监听
+            probe = socket.socket()
+            probe.bind(("127.0.0.1", 0))
+            worker.port = probe.getsockname()[1]
+            probe.close()
+            assert worker.is_alive()
+
+            result = manager.run("dummy", sys.executable, _make_tasks(work_dir, 2))
+            assert sorted(result["results"]) == [0, 1]
+            assert manager.stats()['starts'] == 2
+            assert worker._proc.poll() is not None, "旧进程应被结束"
+    finally:
+        manager.shutdown()
+
+
+def test_release_idle_keeps_busy_workers():
+    """加载 LLM 前只关闭空闲的常驻进程，正在执行任务的进程不受影响"""
+    manager = TTSWorkerManager(idle_timeout=30)
+    options = {"latency": 0.2}
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            manager.run("dummy", sys.executable, _make_tasks(work_dir, 1), device="0", options=options)
+            busy_result = {}
+            progress = threading.Event()
+            thread = threading.Thread(target=lambda: busy_result.update(manager.run(
+                "dummy", sys.executable, _make_tasks(work_dir, 5), device="1", options=options,
+                progress_callback=lambda c, t: progress.set()
+            )))
+            thread.start()
+            assert progress.wait(10)
+
+            assert manager.release_idle("测试") == 1
+            thread.join()
+            assert sorted(busy_result["results"]) == [0, 1, 2, 3, 4]
+            workers = manager.stats()["workers"]
+            assert [(w["device"], w["alive"]) for w in workers] == [("1", True)]
+    finally:
+        manager.shutdown()
+
+
+def test_start_failure_raises():
+    """Python 环境不存在时抛出 TTSWorkerError（克隆器据此回退到子进程方式）"""
+    manager = TTSWorkerManager()
+    try:
+        manager.run("dummy", os.path.join(tempfile.gettempdir(), "no-such-python"), [])
+        assert False, "应抛出 TTSWorkerError"
+    except TTSWorkerError:
+        pass
+
+
+def test_cosyvoice_cloner_uses_worker():
+    """CosyVoice 克隆器通过常驻进程生成，返回 {片段索引: 文件路径}"""
+    print("\n=== 测试: 克隆器接入 ===")
+    import cosyvoice_cloner
+
+    manager = TTSWorkerManager(idle_timeout=30)
+    real_run = manager.run
+
+    def run_as_dummy(engine, python, tasks, **kwargs):
+        assert engine == "cosyvoice" and kwargs["env"] == {"CUDA_VISIBLE_DEVICES": "0"}
+        assert kwargs["job_options"] == {"target_language": "en"}
+        return real_run("dummy", sys.executable, tasks, device=kwargs["device"])
+
+    try:
+        with tempfile.TemporaryDirectory() as work_dir, \
+                mock.patch.object(cosyvoice_cloner, "tts_workers", manager), \
+                mock.patch.object(manager, "run", side_effect=run_as_dummy) as run:
+            reference = os.path.join(work_dir, "ref.wav")
+            open(reference, "wb").close()
+            cloner = cosyvoice_cloner.CosyVoiceCloner(cosyvoice_python=sys.executable, gpu_ids=[0])
+            result = cloner.batch_generate_audio(
+                [{"speaker_id": 1, "segment_index": i, "target_text": f"line {i}"} for i in range(3)],
+                {1: {"reference_audio": reference, "reference_text": "ref"}},
+                work_dir,
+                target_language="en"
+            )
+            assert sorted(result) == [0, 1, 2]
+            assert all(path.endswith(f"segment_{i}.wav") for i, path in result.items())
+            assert run.call_count == 1 and manager.stats()['fallbacks'] == 0
+    finally:
+        manager.shutdown()
+
+
+class FakePopen:
+    """代替 cosyvoice_batch_generate.py 子进程：读取配置，输出 {片段索引: 文件路径} 的 JSON 行"""
+
+    calls = []
+
+    def __init__(self, cmd, env=None, **kwargs):
+        import json
+        with open(cmd[2], encoding="utf-8") as f:
+            config = json.load(f)
+        FakePopen.calls.append((env["CUDA_VISIBLE_DEVICES"], [t["segment_index"] for t in config["tasks"]]))
+        results = {str(t["segment_index"]): t["output_file"] for t in config["tasks"]}
+        self.stdout = iter([json.dumps(results) + "\n"])
+        self.returncode = 0
+
+    def wait(self):
+        time.sleep(0.1)  # 模拟加载模型，两块 GPU 各自取走自己的队列
+        return 0
+
+
+def test_multi_gpu_falls_back_once_per_gpu():
+    """多 GPU 时常驻进程失败，剩余片段每个 GPU 只启动一次子进程，不再逐个小批次加载模型"""
+    print("\n=== 测试: 多 GPU 回退 ===")
+    import cosyvoice_cloner
+
+    for succeed_first in (0, 1):
+        manager = TTSWorkerManager()
+        worker_calls = []
+
+        def failing_run(engine, python, tasks, **kwargs):
+            worker_calls.append(len(tasks))
+            if len(worker_calls) <= succeed_first:
+                return {"results": {t["segment_index"]: t["output_file"] for t in tasks}, "elapsed": 0.0}
+            raise TTSWorkerError("worker died")
+
+        FakePopen.calls = []
+        with tempfile.TemporaryDirectory() as work_dir, \
+                mock.patch.object(cosyvoice_cloner, "tts_workers", manager), \
+                mock.patch.object(manager, "run", side_effect=failing_run), \
+                mock.patch.object(cosyvoice_cloner.subprocess, "Popen", FakePopen):
+            reference = os.path.join(work_dir, "ref.wav")
+            open(reference, "wb").close()
+            cloner = cosyvoice_cloner.CosyVoiceCloner(cosyvoice_python=sys.executable, gpu_ids=[0, 1])
+            progress = []
+            result = cloner.batch_generate_audio(
+                [{"speaker_id": i % 2, "segment_index": i, "target_text": f"line {i}"} for i in range(40)],
+                {0: {"reference_audio": reference, "reference_text": "ref"},
+                 1: {"reference_audio": reference, "reference_text": "ref"}},
+                work_dir,
+                target_language="en",
+                progress_callback=lambda current, total: progress.append((current, total))
+            )
+
+        assert sorted(result) == list(range(40))
+        assert len(FakePopen.calls) == 2, FakePopen.calls
+        assert sorted(device for device, _ in FakePopen.calls) == ["0", "1"]
+        regenerated = sorted(i for _, indices in FakePopen.calls for i in indices)
+        assert len(regenerated) == 40 - sum(worker_calls[:succeed_first])
+        assert manager.stats()['fallbacks'] == 1
+        assert progress[-1] == (40, 40)
+
+
+if __name__ == "__main__":
+    test_worker_reuses_loaded_model()
+    test_cancel_and_idle_restart()
+    test_restart_when_port_closed_before_exit()
+    test_release_idle_keeps_busy_workers()
+    test_start_failure_raises()
+    test_cosyvoice_cloner_uses_worker()
+    test_multi_gpu_falls_back_once_per_gpu()
+    print("\n所有测试通过")
@@ -390,6 +390,26 @@ def process_translations_digits(translations: list, language_code: str) -> list:
     return processed
 
 
+def _ollama_generate(payload: dict, timeout: float):
+    """
+    发送 Ollama 生成请求
+
+    模型驻留由 llm_residency 统一管理：请求前确保模型已加载（翻译阶段刚用过时直接复用），
+    请求携带空闲 TTL 作为 keep_alive，不再每次请求后立即卸载
+    """
+    import requests
+    from llm_residency import llm_residency
+
+    llm_residency.acquire(payload['model'])
+    response = requests.post(
+        f"{llm_residency.base_url}/api/generate",
+        json=dict(payload, keep_alive=llm_residency.keep_alive()),
+        timeout=timeout
+    )
+    llm_residency.touch(payload['model'])
+    return response
+
+
 def extract_and_replace_chinese(text: str, target_language: str, to_kana: bool = False) -> str:
     """
     提取文本中的中文部分并替换为目标语言
@@ -410,8 +430,6 @@ def extract_and_replace_chinese(text: str, target_language: str, to_kana: bool =
         >>> extract_and_replace_chinese("こんにちは世界", "日语", to_kana=True)
         "こんにちはせかい"
     """
-    import requests
-
     # 查找所有中文字符段落
     chinese_pattern = r'[\u4e00-\u9fff]+'
     chinese_segments = re.findall(chinese_pattern, text)
@@ -454,14 +472,11 @@ def translate_chinese_to_kana(chinese_text: str) -> str:
     Returns:
         str: 日语假名
     """
-    import requests
-
     try:
         # 使用 Ollama API 将中文转换为日语假名（平假名）
         # 使用更严格的prompt
-        response = requests.post(
-            'http://127.0.0.1:11434/api/generate',
-            json={
+        response = _ollama_generate(
+            {
                 'model': 'qwen2.5:32b',
                 'prompt': f'Convert this Chinese word to Japanese hiragana only. Return ONLY hiragana characters, no explanations, no kanji, no other text.\n\nChinese: {chinese_text}\nHiragana:',
                 'stream': False,
@@ -469,8 +484,7 @@ def translate_chinese_to_kana(chinese_text: str) -> str:
                     'temperature': 0.1,  # 降低温度，减少随机性
                     'num_predict': 20,   # 减少生成长度
                     'stop': ['\n', '注', '：', 'Note', '。', '、']  # 遇到这些字符就停止
-                },
-                'keep_alive': 0  # 立即释放GPU
+                }
             },
             timeout=30
         )
@@ -509,13 +523,10 @@ def translate_chinese_to_target(chinese_text: str, target_language: str) -> str:
     Returns:
         str: 翻译后的文本
     """
-    import requests
-
     try:
         # 使用 Ollama API 翻译，使用英文prompt提高准确性
-        response = requests.post(
-            'http://127.0.0.1:11434/api/generate',
-            json={
+        response = _ollama_generate(
+            {
                 'model': 'qwen2.5:32b',
                 'prompt': f'Translate this Chinese word to {target_language}. Return ONLY the translation, no explanations.\n\nChinese: {chinese_text}\n{target_language}:',
                 'stream': False,
@@ -523,8 +534,7 @@ def translate_chinese_to_target(chinese_text: str, target_language: str) -> str:
                     'temperature': 0.1,  # 降低温度
                     'num_predict': 30,   # 减少生成长度
                     'stop': ['\n', '注', '：', 'Note', '。']  # 停止标记
-                },
-                'keep_alive': 0  # 立即释放GPU
+                }
             },
             timeout=30
         )
@@ -562,8 +572,6 @@ def batch_translate_chinese_to_kana(chinese_texts: list) -> dict:
     Returns:
         dict: {中文: 假名} 的映射字典
     """
-    import requests
-
     if not chinese_texts:
         return {}
 
@@ -584,9 +592,8 @@ Chinese words:
 
 Hiragana:"""
 
-        response = requests.post(
-            'http://127.0.0.1:11434/api/generate',
-            json={
+        response = _ollama_generate(
+            {
                 'model': 'qwen2.5:32b',
                 'prompt': prompt,
                 'stream': False,
@@ -594,8 +601,7 @@ Hiragana:"""
                     'temperature': 0.1,
                     'num_predict': len(chinese_texts) * 30,  # 根据数量调整
                     'stop': ['\n\n', 'Note', '注']
-                },
-                'keep_alive': 0  # 完成后立即释放GPU
+                }
             },
             timeout=60
         )
@@ -648,8 +654,6 @@ def batch_translate_chinese_to_target(chinese_texts: list, target_language: str)
     Returns:
         dict: {中文: 译文} 的映射字典
     """
-    import requests
-
     if not chinese_texts:
         return {}
 
@@ -669,9 +673,8 @@ Chinese:
 
 {target_language}:"""
 
-        response = requests.post(
-            'http://127.0.0.1:11434/api/generate',
-            json={
+        response = _ollama_generate(
+            {
                 'model': 'qwen2.5:32b',
                 'prompt': prompt,
                 'stream': False,
@@ -679,8 +682,7 @@ Chinese:
                     'temperature': 0.1,
                     'num_predict': len(chinese_texts) * 40,
                     'stop': ['\n\n', 'Note', '注']
-                },
-                'keep_alive': 0  # 完成后立即释放GPU
+                }
             },
             timeout=60
         )
@@ -830,8 +832,6 @@ def batch_translate_english_to_kana(english_texts: list) -> dict:
     Returns:
         dict: {英文: 假名} 的映射字典
     """
-    import requests
-
     if not english_texts:
         return {}
 
@@ -853,9 +853,8 @@ English sentences:
 
 Japanese (hiragana/katakana ONLY):"""
 
-        response = requests.post(
-            'http://127.0.0.1:11434/api/generate',
-            json={
+        response = _ollama_generate(
+            {
                 'model': 'qwen2.5:32b',
                 'prompt': prompt,
                 'stream': False,
@@ -863,8 +862,7 @@ Japanese (hiragana/katakana ONLY):"""
                     'temperature': 0.1,
                     'num_predict': len(english_texts) * 50,
                     'stop': ['\n\n', 'Note', '注', 'English']
-                },
-                'keep_alive': 0  # 完成后立即释放GPU
+                }
             },
             timeout=60
         )
@@ -909,9 +907,8 @@ English: {text}
 
 Japanese (hiragana/katakana ONLY):"""
 
-                    retry_response = requests.post(
-                        'http://127.0.0.1:11434/api/generate',
-                        json={
+                    retry_response = _ollama_generate(
+                        {
                             'model': 'qwen2.5:32b',
                             'prompt': retry_prompt,
                             'stream': False,
@@ -919,8 +916,7 @@ Japanese (hiragana/katakana ONLY):"""
                                 'temperature': 0.2,
                                 'num_predict': 100,
                                 'stop': ['\n\n', 'Note', 'English']
-                            },
-                            'keep_alive': 0
+                            }
                         },
                         timeout=30
                     )
@@ -968,8 +964,6 @@ def batch_translate_english_to_korean(english_texts: list) -> dict:
     Returns:
         dict: {英文: 韩文} 的映射字典
     """
-    import requests
-
     if not english_texts:
         return {}
 
@@ -991,9 +985,8 @@ English sentences:
 
 Korean (Hangul ONLY):"""
 
-        response = requests.post(
-            'http://127.0.0.1:11434/api/generate',
-            json={
+        response = _ollama_generate(
+            {
                 'model': 'qwen2.5:32b',
                 'prompt': prompt,
                 'stream': False,
@@ -1001,8 +994,7 @@ Korean (Hangul ONLY):"""
                     'temperature': 0.1,
                     'num_predict': len(english_texts) * 50,
                     'stop': ['\n\n', 'Note', '注', 'English']
-                },
-                'keep_alive': 0  # 完成后立即释放GPU
+                }
             },
             timeout=60
         )
@@ -1048,9 +1040,8 @@ English: {text}
 
 Korean (Hangul ONLY):"""
 
-                    retry_response = requests.post(
-                        'http://127.0.0.1:11434/api/generate',
-                        json={
+                    retry_response = _ollama_generate(
+                        {
                             'model': 'qwen2.5:32b',
                             'prompt': retry_prompt,
                             'stream': False,
@@ -1058,8 +1049,7 @@ Korean (Hangul ONLY):"""
                                 'temperature': 0.2,
                                 'num_predict': 100,
                                 'stop': ['\n\n', 'Note', 'English']
-                            },
-                            'keep_alive': 0
+                            }
                         },
                         timeout=30
                     )
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+进程内异步翻译引擎
+
+此前翻译服务和语音克隆服务通过子进程运行 batch_translate_ollama.py / batch_retranslate_ollama.py，
+每次都要启动解释器、写临时配置文件、再用正则从标准输出中解析进度和结果。引擎直接在后端进程内
+调用相同的分组、并发、重试和翻译记忆逻辑，以异步生成器逐句产出结果，调用方可以边翻译边写字幕、
+按实际完成的句数推送进度。两个脚本保留为调用本引擎的命令行入口。
+"""
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import batch_translate_ollama
+import batch_retranslate_ollama
+from translation_memory import TranslationMemory
+
+DEFAULT_TRANSLATION_MODEL = "qwen2.5:32b"
+
+_DONE = object()
+
+
+class TranslationEngine:
+    """异步翻译引擎（翻译 / 重新翻译均以异步生成器逐句产出结果）"""
+
+    def __init__(
+        self,
+        model: str = DEFAULT_TRANSLATION_MODEL,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        memory: Optional[TranslationMemory] = None
+    ):
+        """
+        Args:
+            model: 模型名称
+            concurrency: 最大并发请求数（默认 TRANSLATION_CONCURRENCY）
+            timeout: 单次请求超时（默认 TRANSLATION_TIMEOUT）
+            max_retries: 批量翻译失败后最多重试次数（默认 TRANSLATION_MAX_RETRIES）
+            retry_backoff: 退避基数（默认 TRANSLATION_RETRY_BACKOFF）
+            memory: 翻译记忆（默认使用全局实例）
+        """
+        self.model = model
+        self.concurrency = concurrency or batch_translate_ollama.TRANSLATION_CONCURRENCY
+        self.timeout = timeout or batch_translate_ollama.TRANSLATION_TIMEOUT
+        self.max_retries = batch_translate_ollama.TRANSLATION_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = batch_translate_ollama.TRANSLATION_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        self.memory = memory
+        # 最近一次 translate() 的运行统计（见 batch_translate_ollama.format_run_stats）
+        self.last_stats: Dict[str, Any] = {}
+
+    def _memory(self) -> Optional[TranslationMemory]:
+        return self.memory or batch_translate_ollama.translation_memory
+
+    async def ensure_ready(self) -> bool:
+        """
+        热启动：确保 Ollama 已运行且模型已加载（Ollama 未启动时会自动启动）
+
+        模型由 llm_residency 管理驻留，翻译结束后不卸载；需要显存的阶段开始前调用 llm_residency.release()
+        """
+        try:
+            await asyncio.to_thread(batch_translate_ollama.warm_up, self.model)
+            return True
+        except Exception as e:
+            print(f"❌ 无法连接到 Ollama 服务器: {e}", flush=True)
+            return False
+
+    async def translate(self, tasks: List[Dict]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        按 token 预算分组并发翻译，每组完成后逐句产出结果（按完成顺序，组内按原顺序）
+
+        Args:
+            tasks: 任务列表（task_id / source / target_language，可选 start_time / end_time / index / speaker）
+
+        Yields:
+            单句结果：task_id / source / translation / success / elapsed，以及原任务的 index（如有），
+            翻译记忆命中时 cached 为 True，失败时 translation 为原文并带 error
+        """
+        task_groups = batch_translate_ollama.group_tasks_by_budget(tasks)
+        tasks_by_id = {task["task_id"]: task for task in tasks}
+        queue: asyncio.Queue = asyncio.Queue()
+        self.last_stats = {}
+
+        def on_group_done(group_idx: int, group_results: List[Dict[str, Any]]):
+            for result in group_results:
+                queue.put_nowait(result)
+
+        async def run():
+            try:
+                await batch_translate_ollama.translate_groups_concurrently(
+                    task_groups,
+                    model=self.model,
+                    concurrency=self.concurrency,
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    retry_backoff=self.retry_backoff,
+                    on_group_done=on_group_done,
+                    memory=self.memory,
+                    stats=self.last_stats
+                )
+            finally:
+                queue.put_nowait(_DONE)
+
+        runner = asyncio.create_task(run())
+        try:
+            while True:
+                result = await queue.get()
+                if result is _DONE:
+                    break
+                task = tasks_by_id.get(result["task_id"], {})
+                if "index" in task:
+                    result = dict(result, index=task["index"])
+                yield result
+            # 传播翻译过程中的异常
+            await runner
+        finally:
+            # 调用方提前停止迭代时取消尚未完成的请求
+            if not runner.done():
+                runner.cancel()
+                try:
+                    await runner
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    async def retranslate(self, tasks: List[Dict]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        逐句并发重新翻译（用于过长/异常译文），按完成顺序产出结果
+
+        先复用翻译记忆中此前成功的重新翻译结果（单句翻译，不区分上下文），只请求未命中的句子；
+        成功且与原文不同的新译文写回翻译记忆（未能提取译文时会回退为原文，不保存）。
+
+        Args:
+            tasks: 任务列表（task_id / source / target_language）
+
+        Yields:
+            单句结果：task_id / source / translation / success / elapsed（命中时 cached 为 True）
+        """
+        memory = self._memory()
+        keys = {}
+        found = {}
+        if memory is not None:
+            keys = {
+                task["task_id"]: memory.make_key(
+                    task["source"], "", task["target_language"], self.model,
+                    batch_retranslate_ollama.RETRANSLATE_PROMPT_VERSION
+                )
+                for task in tasks
+            }
+            found = await asyncio.to_thread(memory.lookup_many, list(keys.values()))
+            print(f"[翻译记忆] 命中 {len(found)}/{len(tasks)} 句", flush=True)
+
+        for task in tasks:
+            if keys.get(task["task_id"]) in found:
+                yield {
+                    "task_id": task["task_id"],
+                    "source": task["source"],
+                    "translation": found[keys[task["task_id"]]],
+                    "success": True,
+                    "elapsed": 0.0,
+                    "cached": True
+                }
+
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def run(task: Dict) -> Dict[str, Any]:
+            async with semaphore:
+                return await batch_retranslate_ollama.translate_sentence(
+                    task["source"], task["target_language"], task["task_id"], self.model, self.timeout
+                )
+
+        misses = [task for task in tasks if keys.get(task["task_id"]) not in found]
+        if misses:
+            # 通过驻留管理加载模型（已驻留时直接复用），之后需要显存的阶段才能将其卸载
+            await self.ensure_ready()
+        pending = [asyncio.ensure_future(run(task)) for task in misses]
+        try:
+            for future in asyncio.as_completed(pending):
+                result = await future
+                if memory is not None and result["success"] and result["translation"] != result["source"]:
+                    await asyncio.to_thread(memory.store_many, {keys[result["task_id"]]: result["translation"]})
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+翻译记忆 - 持久化（SQLite）的译文缓存
+
+同样的台词（"好的"、"谢谢"、口头禅、片头）在每一集、每种语言中都会重复翻译。译文按
+(规范化原文, 上下文指纹, 目标语言, 模型, 提示词版本) 保存，命中时不再请求 LLM。
+上下文指纹由前后相邻台词计算，保证同一句话在不同语境下分别翻译；提示词变化时递增版本即可使旧译文失效。
+数据库使用 WAL 模式，后端进程和翻译脚本子进程可同时读写。
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_backend_dir = os.path.dirname(os.path.abspath(__file__))
+# 默认放在 backend/cache/ 下（已加入 .gitignore，含 WAL 模式的 -wal/-shm 文件），可用 TRANSLATION_MEMORY_PATH 修改
+DEFAULT_TRANSLATION_MEMORY_PATH = os.path.join(_backend_dir, "cache", "translation_memory.db")
+
+# (规范化原文, 上下文指纹, 目标语言, 模型, 提示词版本)
+MemoryKey = Tuple[str, str, str, str, str]
+
+
+def normalize_source(text: str) -> str:
+    """规范化原文：全角/半角统一（NFKC）、去除首尾空白、合并连续空白"""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def context_fingerprint(previous: Iterable[str] = (), following: Iterable[str] = ()) -> str:
+    """根据前后相邻台词计算上下文指纹（无上下文时为空字符串）"""
+    previous = [normalize_source(t) for t in previous]
+    following = [normalize_source(t) for t in following]
+    if not previous and not following:
+        return ""
+    payload = "\x1f".join(previous) + "\x1e" + "\x1f".join(following)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def neighbour_contexts(sentences: List[str], window: int = 1) -> List[str]:
+    """为有序台词列表中的每一句计算上下文指纹（前后各 window 句）"""
+    if window <= 0:
+        return ["" for _ in sentences]
+    return [
+        context_fingerprint(sentences[max(0, i - window):i], sentences[i + 1:i + 1 + window])
+        for i in range(len(sentences))
+    ]
+
+
+class TranslationMemory:
+    """SQLite 翻译记忆（线程安全）"""
+
+    def __init__(self, db_path: str = DEFAULT_TRANSLATION_MEMORY_PATH, context_window: int = 1):
+        """
+        Args:
+            db_path: 数据库文件路径
+            context_window: 上下文指纹使用前后各多少句台词，0 表示不区分上下文
+        """
+        self.db_path = db_path
+        self.context_window = context_window
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["TranslationMemory"]:
+        """
+        从环境变量创建：TRANSLATION_MEMORY_PATH（设为空字符串关闭翻译记忆）、
+        TRANSLATION_MEMORY_CONTEXT（上下文窗口）
+        """
+        db_path = os.environ.get("TRANSLATION_MEMORY_PATH", DEFAULT_TRANSLATION_MEMORY_PATH)
+        if not db_path:
+            return None
+        return cls(db_path, context_window=int(os.environ.get("TRANSLATION_MEMORY_CONTEXT", "1")))
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS translations (
+                    source TEXT NOT NULL,
+                    context TEXT NOT NULL,
+                    target_language TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (source, context, target_language, model, prompt_version)
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def make_key(
+        self,
+        source: str,
+        context: str,
+        target_language: str,
+        model: str,
+        prompt_version: str
+    ) -> MemoryKey:
+        """构建记忆键（原文会被规范化）"""
+        return (normalize_source(source), context, target_language, model, prompt_version)
+
+    def lookup_many(self, keys: List[MemoryKey]) -> Dict[MemoryKey, str]:
+        """
+        批量查询译文
+
+        Returns:
+            命中的 {键: 译文}
+        """
+        if not keys:
+            return {}
+        unique_keys = list(dict.fromkeys(keys))
+        found: Dict[MemoryKey, str] = {}
+        with self._lock:
+            conn = self._connect()
+            for key in unique_keys:
+                row = conn.execute(
+                    "SELECT translation FROM translations WHERE source=? AND context=? AND "
+                    "target_language=? AND model=? AND prompt_version=?",
+                    key
+                ).fetchone()
+                if row is not None:
+                    found[key] = row[0]
+            if found:
+                conn.executemany(
+                    "UPDATE translations SET hit_count = hit_count + 1 WHERE source=? AND context=? AND "
+                    "target_language=? AND model=? AND prompt_version=?",
+                    list(found)
+                )
+                conn.commit()
+            hit_count = sum(1 for key in keys if key in found)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+        return found
+
+    def lookup(self, key: MemoryKey) -> Optional[str]:
+        """查询单条译文"""
+        return self.lookup_many([key]).get(key)
+
+    def store_many(self, entries: Dict[MemoryKey, str]):
+        """保存译文（空译文不保存）"""
+        rows = [key + (translation, time.time()) for key, translation in entries.items()
+                if translation and translation.strip()]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO translations "
+                "(source, context, target_language, model, prompt_version, translation, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+            self.stored += len(rows)
+
+    def stats(self) -> Dict:
+        """本进程内的命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = self._connect().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stored': self.stored,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全局实例（TRANSLATION_MEMORY_PATH 为空时为 None）
+translation_memory = TranslationMemory.from_env()
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 任务调度 - 按估算耗时在多个工作进程之间动态分配片段
+
+此前双 GPU 直接把任务对半分，多进程 Fish 按整个说话人分配给 worker，
+话多的说话人会让一个 worker 独自拖到最后。现在：
+- 每个片段按目标文本长度和文字（语言）估算生成耗时（estimate_cost）
+- 按说话人分组后以最长处理时间优先（LPT）规划各 worker 的初始队列，同一说话人尽量留在同一个 worker
+  （prompt 只需编码一次）；只有超过平均负载的说话人才拆开
+- 各 worker 从自己队列的头部取一小批任务（收尾阶段批次逐渐缩小），队列空了就从剩余工作量最大的 worker 队列尾部窃取
+- 统计每个 worker 的忙碌时间、空闲时间和利用率
+
+调度与引擎无关：worker 是执行一批任务并返回 {segment_index: 文件路径} 的函数，
+可以在 CPU 上用按文本长度 sleep 的假引擎做基准测试（见 benchmark_tts_scheduler.py）。
+"""
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# 每秒大约朗读的字符数（按文字系统区分语言），用于估算片段生成耗时
+CHARS_PER_SECOND = {
+    "han": 4.5,      # 中文（及日文汉字）
+    "kana": 7.0,     # 日文假名
+    "hangul": 5.0,   # 韩文
+    "other": 14.0    # 拉丁字母等
+}
+# 每个片段的固定开销（秒）：文本前端、写文件等
+TASK_OVERHEAD_SECONDS = 0.3
+
+
+def _script(char: str) -> str:
+    code = ord(char)
+    if 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF:
+        return "han"
+    if 0x3040 <= code <= 0x30FF:
+        return "kana"
+    if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF:
+        return "hangul"
+    return "other"
+
+
+def estimate_cost(task: Dict) -> float:
+    """估算片段的生成耗时（秒，相对值即可）：固定开销 + 按文字系统折算的朗读时长"""
+    text = (task.get("target_text") or "").strip()
+    seconds = TASK_OVERHEAD_SECONDS
+    for char in text:
+        if not char.isspace():
+            seconds += 1.0 / CHARS_PER_SECOND[_script(char)]
+    return seconds
+
+
+def speaker_of(task: Dict):
+    """默认的局部性分组：说话人"""
+    return task.get("speaker_id")
+
+
+def plan_assignments(
+    tasks: List[Dict],
+    num_workers: int,
+    cost_fn: Callable[[Dict], float] = estimate_cost,
+    group_key: Callable[[Dict], object] = speaker_of,
+    split_groups: bool = True
+) -> List[List[Dict]]:
+    """
+    规划各 worker 的初始任务队列（LPT 贪心，保持分组局部性）
+
+    1. 按 group_key 分组，组内按耗时降序
+    2. split_groups 时，总耗时超过平均负载的组拆成不超过平均负载的块
+    3. 块按总耗时降序，依次分配给当前负载最小的 worker
+
+    Args:
+        tasks: 片段任务列表
+        num_workers: worker 数量
+        cost_fn: 任务 -> 估算耗时
+        group_key: 任务 -> 分组（同组任务尽量分给同一个 worker）
+        split_groups: 是否允许拆分过大的组
+
+    Returns:
+        每个 worker 的任务列表（同组任务相邻，组内耗时降序）
+    """
+    num_workers = max(1, num_workers)
+    groups: Dict[object, List[Dict]] = {}
+    for task in tasks:
+        groups.setdefault(group_key(task), []).append(task)
+
+    total = sum(cost_fn(task) for task in tasks)
+    target = total / num_workers if num_workers > 1 else float("inf")
+
+    chunks: List[Tuple[float, List[Dict]]] = []
+    for group_tasks in groups.values():
+        group_tasks = sorted(group_tasks, key=cost_fn, reverse=True)
+        group_cost = sum(cost_fn(task) for task in group_tasks)
+        if not split_groups or group_cost <= target:
+            chunks.append((group_cost, group_tasks))
+            continue
+        # 拆成若干块，每块耗时接近平均负载（按耗时降序轮流放入当前最小的块）
+        pieces = max(2, int(group_cost // target) + (1 if group_cost % target else 0))
+        piece_tasks: List[List[Dict]] = [[] for _ in range(pieces)]
+        piece_costs = [0.0] * pieces
+        for task in group_tasks:
+            index = piece_costs.index(min(piece_costs))
+            piece_tasks[index].append(task)
+            piece_costs[index] += cost_fn(task)
+        chunks.extend((cost, chunk) for cost, chunk in zip(piece_costs, piece_tasks) if chunk)
+
+    assignments: List[List[Dict]] = [[] for _ in range(num_workers)]
+    loads = [0.0] * num_workers
+    for cost, chunk in sorted(chunks, key=lambda item: item[0], reverse=True):
+        index = loads.index(min(loads))
+        assignments[index].extend(chunk)
+        loads[index] += cost
+    return assignments
+
+
+class WorkStealingScheduler:
+    """
+    每个 worker 一个双端队列：自己从头部按批取任务，队列空了从其他 worker 的尾部窃取（线程安全）
+
+    头部是耗时最长的任务（LPT），尾部是最短的，窃取尾部的任务对被窃取者的影响最小、
+    也最适合填补收尾阶段的空闲。每批任务只包含同一分组，保证引擎端的 prompt 复用。
+    """
+
+    def __init__(
+        self,
+        tasks: List[Dict],
+        worker_ids: List[str],
+        cost_fn: Callable[[Dict], float] = estimate_cost,
+        group_key: Callable[[Dict], object] = speaker_of,
+        batch_size: int = 4
+    ):
+        """
+        Args:
+            tasks: 片段任务列表
+            worker_ids: worker 名称列表
+            cost_fn: 任务 -> 估算耗时
+            group_key: 任务 -> 分组（局部性）
+            batch_size: 每次取的任务数上限，0 表示一次取走整个队列（每批都要重新加载模型的执行方式使用）
+        """
+        self.cost_fn = cost_fn
+        self.group_key = group_key
+        self.batch_size = batch_size
+        self.total_tasks = len(tasks)
+        self._lock = threading.Condition()
+        plan = plan_assignments(tasks, len(worker_ids), cost_fn, group_key)
+        self._queues: Dict[str, Deque[Dict]] = {wid: deque(plan[i]) for i, wid in enumerate(worker_ids)}
+        self._retired = set()
+        self._active = set()
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._stats = {
+            wid: {
+                "planned_tasks": len(plan[i]),
+                "planned_cost": round(sum(cost_fn(t) for t in plan[i]), 2),
+                "tasks": 0,
+                "cost": 0.0,
+                "batches": 0,
+                "steals": 0,
+                "stolen_tasks": 0,
+                "group_switches": 0,
+                "busy_seconds": 0.0,
+                "finished_at": None,
+                "failed": False,
+                "_last_group": None
+            }
+            for i, wid in enumerate(worker_ids)
+        }
+
+    def _remaining_cost(self, worker_id: str) -> float:
+        return sum(self.cost_fn(task) for task in self._queues[worker_id])
+
+    def _take(self, queue: Deque[Dict], from_tail: bool) -> List[Dict]:
+        """
+        取一批同组任务
+
+        批次的估算耗时不超过剩余总工作量 / (2 × worker 数)：开始时按 batch_size 取，收尾阶段批次逐渐缩小到
+        单个片段，避免慢 worker 手里一整批未开始的任务无法被窃取
+        """
+        if self.batch_size <= 0:
+            budget = float("inf")
+        else:
+            remaining = sum(self._remaining_cost(wid) for wid in self._queues)
+            budget = remaining / (2 * len(self._queues))
+        pop = queue.pop if from_tail else queue.popleft
+        peek = (lambda: queue[-1]) if from_tail else (lambda: queue[0])
+        batch = [pop()]
+        group = self.group_key(batch[0])
+        cost = self.cost_fn(batch[0])
+        while queue and (self.batch_size <= 0 or len(batch) < self.batch_size) and self.group_key(peek()) == group:
+            if cost + self.cost_fn(peek()) > budget:
+                break
+            cost += self.cost_fn(peek())
+            batch.append(pop())
+        return batch
+
+    def next_batch(self, worker_id: str) -> List[Dict]:
+        """
+        取下一批任务：先取自己队列的头部，否则从剩余工作量最大的队列尾部窃取
+
+        没有可取的任务但其他 worker 仍在执行时等待（它们失败时任务会退回队列），全部结束后返回空列表
+        """
+        with self._lock:
+            stats = self._stats[worker_id]
+            while True:
+                queue = self._queues[worker_id]
+                if queue:
+                    batch = self._take(queue, from_tail=False)
+                    break
+                victims = [wid for wid, q in self._queues.items() if q and wid != worker_id]
+                if victims:
+                    victim = max(victims, key=self._remaining_cost)
+                    batch = self._take(self._queues[victim], from_tail=True)
+                    stats["steals"] += 1
+                    stats["stolen_tasks"] += len(batch)
+                    break
+                if not self._active:
+                    return []
+                self._lock.wait()
+            group = self.group_key(batch[0])
+            if stats["_last_group"] is not None and group != stats["_last_group"]:
+                stats["group_switches"] += 1
+            stats["_last_group"] = group
+            self._active.add(worker_id)
+            return batch
+
+    def complete(self, worker_id: str, batch: List[Dict], seconds: float):
+        """记录一批任务完成"""
+        with self._lock:
+            stats = self._stats[worker_id]
+            stats["tasks"] += len(batch)
+            stats["cost"] += sum(self.cost_fn(task) for task in batch)
+            stats["batches"] += 1
+            stats["busy_seconds"] += seconds
+            self._active.discard(worker_id)
+            self._lock.notify_all()
+
+    def retire(self, worker_id: str, unfinished: List[Dict], seconds: float = 0.0) -> bool:
+        """
+        worker 失败：未完成的批次退回它的队列，由其他 worker 窃取
+
+        Returns:
+            是否还有可用的 worker 接手
+        """
+        with self._lock:
+            stats = self._stats[worker_id]
+            stats["failed"] = True
+            stats["busy_seconds"] += seconds
+            self._retired.add(worker_id)
+            self._queues[worker_id].extendleft(reversed(unfinished))
+            self._active.discard(worker_id)
+            self._lock.notify_all()
+            return any(wid not in self._retired for wid in self._queues)
+
+    def finish_worker(self, worker_id: str):
+        with self._lock:
+            self._stats[worker_id]["finished_at"] = time.time()
+
+    def remaining_tasks(self) -> List[Dict]:
+        with self._lock:
+            return [task for queue in self._queues.values() for task in queue]
+
+    def report(self) -> Dict:
+        """每个 worker 的任务量、忙碌/空闲时间和利用率"""
+        with self._lock:
+            end = self.finished_at or time.time()
+            makespan = max(end - self.started_at, 1e-9)
+            workers = {}
+            for wid, stats in self._stats.items():
+                item = {k: v for k, v in stats.items() if not k.startswith("_") and k != "finished_at"}
+                item["cost"] = round(item["cost"], 2)
+                item["busy_seconds"] = round(stats["busy_seconds"], 3)
+                item["idle_seconds"] = round(max(0.0, makespan - stats["busy_seconds"]), 3)
+                item["utilization"] = round(min(1.0, stats["busy_seconds"] / makespan), 3)
+                if stats["finished_at"]:
+                    item["finished_after_seconds"] = round(stats["finished_at"] - self.started_at, 3)
+                workers[wid] = item
+            busy = [item["busy_seconds"] for item in workers.values()]
+            return {
+                "tasks": self.total_tasks,
+                "workers": workers,
+                "makespan_seconds": round(makespan, 3),
+                "utilization": round(sum(busy) / (makespan * len(busy)), 3) if busy else 0.0,
+                "steals": sum(item["steals"] for item in workers.values())
+            }
+
+
+def default_batch_size() -> int:
+    """常驻进程模式下每批任务数（TTS_SCHEDULER_BATCH_SIZE），越小负载越均衡，越大往返越少"""
+    return max(1, int(os.environ.get("TTS_SCHEDULER_BATCH_SIZE", "4")))
+
+
+def run_distributed(
+    tasks: List[Dict],
+    workers: Dict[str, Callable[[List[Dict], Callable[[int, int], None]], Dict[int, str]]],
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    cost_fn: Callable[[Dict], float] = estimate_cost,
+    group_key: Callable[[Dict], object] = speaker_of,
+    batch_size: Optional[int] = None,
+    label: str = "TTS"
+) -> Tuple[Dict[int, str], Dict]:
+    """
+    在多个 worker 上动态执行片段任务（每个 worker 一个线程）
+
+    Args:
+        tasks: 片段任务列表（含 segment_index / target_text，分组默认按 speaker_id）
+        workers: {worker 名称: run(batch, progress) -> {segment_index: 文件路径}}，
+                 progress(current, total) 报告本批进度
+        progress_callback: 总进度回调 callback(completed, total)
+        cost_fn: 任务 -> 估算耗时
+        group_key: 任务 -> 分组
+        batch_size: 每批任务数，None 使用 default_batch_size()，0 表示每个 worker 一次取走整个队列
+        label: 日志前缀
+
+    Returns:
+        (合并的 {segment_index: 文件路径}, 调度报告)
+
+    所有 worker 都失败且仍有任务未完成时抛出最后一个异常；单个 worker 失败时它的任务交给其他 worker。
+    """
+    if batch_size is None:
+        batch_size = default_batch_size()
+    scheduler = WorkStealingScheduler(tasks, list(workers), cost_fn, group_key, batch_size)
+    results: Dict[int, str] = {}
+    results_lock = threading.Lock()
+    completed = [0]
+    errors: List[BaseException] = []
+
+    in_flight: Dict[str, int] = {wid: 0 for wid in workers}
+    reported = [0]
+
+    def report_progress():
+        # 调用方持有 results_lock；worker 失败时它的批内进度作废，总进度不回退
+        reported[0] = max(reported[0], min(completed[0] + sum(in_flight.values()), len(tasks)))
+        if progress_callback:
+            progress_callback(reported[0], len(tasks))
+
+    def worker_loop(worker_id: str, run: Callable):
+        def batch_progress(current: int, total: int):
+            with results_lock:
+                in_flight[worker_id] = current
+                report_progress()
+
+        while True:
+            batch = scheduler.next_batch(worker_id)
+            if not batch:
+                break
+            begin = time.time()
+            try:
+                generated = run(batch, batch_progress)
+            except Exception as e:
+                print(f"[{label}] ❌ {worker_id} 执行失败，任务交给其他 worker: {e}", flush=True)
+                traceback.print_exc()
+                with results_lock:
+                    errors.append(e)
+                    in_flight[worker_id] = 0
+                scheduler.retire(worker_id, batch, time.time() - begin)
+                break
+            scheduler.complete(worker_id, batch, time.time() - begin)
+            with results_lock:
+                results.update(generated)
+                completed[0] += len(batch)
+                in_flight[worker_id] = 0
+                report_progress()
+        scheduler.finish_worker(worker_id)
+
+    threads = [
+        threading.Thread(target=worker_loop, args=(wid, run), name=f"{label}-{wid}", daemon=True)
+        for wid, run in workers.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.finished_at = time.time()
+
+    report = scheduler.report()
+    report["label"] = label
+    _print_report(label, report)
+
+    if errors and scheduler.remaining_tasks():
+        raise errors[-1]
+    return results, report
+
+
+def _print_report(label: str, report: Dict):
+    print(f"[{label}] 调度完成: {report['tasks']} 个片段, 耗时 {report['makespan_seconds']:.1f}s, "
+          f"平均利用率 {report['utilization']:.0%}, 窃取 {report['steals']} 次", flush=True)
+    for wid, item in report["workers"].items():
+        print(f"[{label}]   {wid}: {item['tasks']} 个片段 (计划 {item['planned_tasks']}), "
+              f"忙碌 {item['busy_seconds']:.1f}s, 空闲 {item['idle_seconds']:.1f}s, "
+              f"利用率 {item['utilization']:.0%}, 窃取 {item['steals']} 次"
+              + (" [失败]" if item["failed"] else ""), flush=True)
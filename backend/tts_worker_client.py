@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 常驻工作进程管理 - 启动、复用和关闭 tts_worker_daemon 进程
+
+- 每个 (引擎, 设备) 一个常驻进程，首次使用时在引擎自己的 Python 环境中启动，之后的生成任务直接复用已加载的模型
+- 提交前检查进程是否存活，已退出（空闲超时、崩溃）时自动重启
+- 任务进度逐片段回调，支持取消
+- TTS_WORKER_DAEMON=0 时不使用常驻进程，各克隆器回退到每次启动子进程的方式
+- 翻译等 LLM 阶段加载大模型前（llm_residency 加载前回调）关闭空闲的常驻进程，释放显存
+- 统计信息供 /api/system/tts-workers 查看
+"""
+
+import atexit
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from llm_residency import llm_residency
+
+DAEMON_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_worker_daemon.py")
+READY_PREFIX = "TTS_WORKER_READY "
+
+
+class TTSWorkerError(RuntimeError):
+    """常驻工作进程不可用（启动失败、模型加载失败、连接中断）"""
+
+
+class TTSWorkerConnectionError(TTSWorkerError):
+    """无法连接工作进程或连接在收到任何消息前中断（如进程正在空闲退出：已关闭端口但尚未结束）"""
+
+
+class TTSWorker:
+    """一个常驻工作进程"""
+
+    def __init__(
+        self,
+        engine: str,
+        python: str,
+        device: str = "0",
+        options: Optional[Dict] = None,
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[str] = None,
+        idle_timeout: float = 600,
+        start_timeout: float = 60
+    ):
+        """
+        Args:
+            engine: 引擎名称（cosyvoice / fish / xtts / indonesian / dummy）
+            python: 引擎环境的 Python 可执行文件
+            device: 设备标识（用于区分进程和日志）
+            options: 引擎参数，传给工作进程
+            env: 额外的环境变量（如 CUDA_VISIBLE_DEVICES）
+            cwd: 工作目录
+            idle_timeout: 工作进程空闲多少秒后自动退出
+            start_timeout: 等待工作进程启动（监听端口）的最长时间，不包括模型加载
+        """
+        self.engine = engine
+        self.python = python
+        self.device = str(device)
+        self.options = options or {}
+        self.env = env or {}
+        self.cwd = cwd
+        self.idle_timeout = idle_timeout
+        self.start_timeout = start_timeout
+        self.port: Optional[int] = None
+        self.started_at: Optional[float] = None
+        self.jobs = 0
+        self.segments = 0
+        self.active_jobs = 0
+        self._jobs_lock = threading.Lock()
+        self._proc: Optional[subprocess.Popen] = None
+        self._ready = threading.Event()
+        self._output_tail: List[str] = []
+
+    @property
+    def label(self) -> str:
+        return f"{self.engine}@{self.device}"
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._proc.pid if self._proc else None
+
+    def config_signature(self) -> Tuple:
+        """启动参数签名：参数变化时需要重启工作进程"""
+        return (self.python, json.dumps(self.options, sort_keys=True), json.dumps(self.env, sort_keys=True), self.cwd)
+
+    def is_alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None and self.port is not None
+
+    def start(self):
+        """启动工作进程并等待其开始监听（模型在后台加载）"""
+        cmd = [
+            self.python, DAEMON_SCRIPT,
+            "--engine", self.engine,
+            "--idle-timeout", str(self.idle_timeout),
+            "--options", json.dumps(self.options, ensure_ascii=False)
+        ]
+        env = os.environ.copy()
+        env.update(self.env)
+        env["PYTHONIOENCODING"] = "utf-8"
+
+        print(f"[TTSWorker] 启动常驻进程 {self.label}: {self.python}", flush=True)
+        self._ready.clear()
+        self.port = None
+        self._output_tail = []
+        try:
+            self._proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8',
+                errors='ignore',
+                bufsize=1,
+                env=env,
+                cwd=self.cwd
+            )
+        except OSError as e:
+            # Python 环境不存在等
+            raise TTSWorkerError(f"无法启动常驻进程 {self.label}: {e}")
+        threading.Thread(target=self._pump_output, args=(self._proc,), daemon=True).start()
+
+        deadline = time.time() + self.start_timeout
+        while not self._ready.wait(0.1):
+            if self._proc.poll() is not None or time.time() > deadline:
+                self.stop()
+                tail = "\n".join(self._output_tail[-10:])
+                raise TTSWorkerError(f"常驻进程 {self.label} 启动失败:\n{tail}")
+        self.started_at = time.time()
+
+    def _pump_output(self, proc: subprocess.Popen):
+        """持续读取工作进程输出（避免管道写满阻塞），识别启动完成行，其余转发到日志"""
+        for line in proc.stdout:
+            line = line.rstrip()
+            if not line:
+                continue
+            if READY_PREFIX in line:
+                try:
+                    self.port = json.loads(line.split(READY_PREFIX, 1)[1])["port"]
+                    self._ready.set()
+                except (ValueError, KeyError):
+                    pass
+                continue
+            self._output_tail = (self._output_tail + [line])[-50:]
+            print(f"[{self.label}] {line}", flush=True)
+
+    def _connect(self, timeout: float = 5) -> socket.socket:
+        if not self.is_alive():
+            raise TTSWorkerConnectionError(f"常驻进程 {self.label} 未运行")
+        try:
+            return socket.create_connection(("127.0.0.1", self.port), timeout=timeout)
+        except OSError as e:
+            raise TTSWorkerConnectionError(f"无法连接常驻进程 {self.label}: {e}")
+
+    @staticmethod
+    def _send(conn: socket.socket, message: Dict):
+        conn.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def ping(self, timeout: float = 5) -> Dict:
+        """健康检查，返回工作进程状态（是否已加载模型、正在执行的任务、统计）"""
+        with self._connect(timeout) as conn:
+            self._send(conn, {"op": "ping"})
+            line = conn.makefile("r", encoding="utf-8").readline()
+        if not line:
+            raise TTSWorkerError(f"常驻进程 {self.label} 无响应")
+        return json.loads(line)
+
+    def run_job(
+        self,
+        tasks: List[Dict],
+        options: Optional[Dict] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None
+    ) -> Dict:
+        """
+        提交任务并等待结果
+
+        Args:
+            tasks: 片段任务列表（字段由引擎决定，至少包含 segment_index / target_text / output_file）
+            options: 任务参数（如 target_language）
+            progress_callback: 进度回调 callback(current, total)
+            should_cancel: 返回 True 时取消任务（当前片段完成后停止）
+
+        Returns:
+            dict: {results: {segment_index(int): 文件路径}, failed: [...], cancelled: bool, elapsed: float}
+        """
+        job_id = uuid.uuid4().hex[:12]
+        # 连接前就计入执行中，避免 release_idle() 在提交前关闭进程
+        with self._jobs_lock:
+            self.active_jobs += 1
+        try:
+            conn = self._connect()
+        except TTSWorkerError:
+            with self._jobs_lock:
+                self.active_jobs -= 1
+            raise
+        try:
+            conn.settimeout(0.5)
+            self._send(conn, {"op": "submit", "job_id": job_id, "tasks": tasks, "options": options or {}})
+            self.jobs += 1
+
+            buffer = b""
+            received = False
+            cancel_sent = False
+            while True:
+                # 进度消息持续到达时 recv 不会超时，所以每轮都检查取消
+                if should_cancel and not cancel_sent and should_cancel():
+                    self._send(conn, {"op": "cancel", "job_id": job_id})
+                    cancel_sent = True
+                try:
+                    chunk = conn.recv(65536)
+                except socket.timeout:
+                    if not self.is_alive():
+                        raise TTSWorkerError(f"常驻进程 {self.label} 在执行任务时退出")
+                    continue
+                except OSError as e:
+                    chunk = b""
+                    if received:
+                        raise TTSWorkerError(f"常驻进程 {self.label} 连接中断: {e}")
+                if not chunk:
+                    error = TTSWorkerError if received else TTSWorkerConnectionError
+                    raise error(f"常驻进程 {self.label} 连接中断")
+                received = True
+                buffer += chunk
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    if not line.strip():
+                        continue
+                    message = json.loads(line.decode("utf-8"))
+                    kind = message.get("type")
+                    if kind == "progress" and progress_callback:
+                        progress_callback(message["current"], message["total"])
+                    elif kind == "error":
+                        raise TTSWorkerError(message.get("message", "unknown error"))
+                    elif kind == "result":
+                        results = {int(k): v for k, v in message.get("results", {}).items()}
+                        self.segments += len(results)
+                        return {
+                            "results": results,
+                            "failed": message.get("failed", []),
+                            "cancelled": message.get("cancelled", False),
+                            "elapsed": message.get("elapsed", 0)
+                        }
+        finally:
+            conn.close()
+            with self._jobs_lock:
+                self.active_jobs -= 1
+
+    def stop(self, timeout: float = 5):
+        """关闭工作进程（先请求退出，超时后强制结束）"""
+        proc = self._proc
+        if proc is None:
+            return
+        if proc.poll() is None and self.port is not None:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=2) as conn:
+                    self._send(conn, {"op": "shutdown"})
+            except OSError:
+                pass
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+        self.port = None
+
+
+class TTSWorkerManager:
+    """常驻工作进程管理（线程安全），按 (引擎, 设备) 复用"""
+
+    def __init__(self, enabled: bool = True, idle_timeout: float = 600, start_timeout: float = 60):
+        """
+        Args:
+            enabled: 是否使用常驻进程（False 时克隆器回退到每次启动子进程）
+            idle_timeout: 工作进程空闲多少秒后自动退出，<= 0 表示一直驻留
+            start_timeout: 等待工作进程启动的最长时间（秒）
+        """
+        self.enabled = enabled
+        self.idle_timeout = idle_timeout
+        self.start_timeout = start_timeout
+        self._workers: Dict[Tuple[str, str], TTSWorker] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._counters = {'starts': 0, 'restarts': 0, 'jobs': 0, 'segments': 0, 'fallbacks': 0}
+        self._schedules: Deque[Dict] = deque(maxlen=10)
+
+    @classmethod
+    def from_env(cls) -> "TTSWorkerManager":
+        """从环境变量创建：TTS_WORKER_DAEMON / TTS_WORKER_IDLE_SECONDS / TTS_WORKER_START_TIMEOUT"""
+        return cls(
+            enabled=os.environ.get("TTS_WORKER_DAEMON", "1").lower() not in ("0", "false", "no"),
+            idle_timeout=float(os.environ.get("TTS_WORKER_IDLE_SECONDS", "600")),
+            start_timeout=float(os.environ.get("TTS_WORKER_START_TIMEOUT", "60"))
+        )
+
+    def _key_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get_worker(
+        self,
+        engine: str,
+        python: str,
+        device: str = "0",
+        options: Optional[Dict] = None,
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[str] = None
+    ) -> TTSWorker:
+        """获取 (引擎, 设备) 的工作进程，未运行或启动参数变化时（重新）启动"""
+        key = (engine, str(device))
+        with self._key_lock(key):
+            with self._lock:
+                worker = self._workers.get(key)
+            candidate = TTSWorker(
+                engine, python, device, options, env, cwd,
+                idle_timeout=self.idle_timeout, start_timeout=self.start_timeout
+            )
+            if worker is not None and worker.is_alive() and worker.config_signature() == candidate.config_signature():
+                return worker
+            if worker is not None:
+                worker.stop()
+                with self._lock:
+                    self._counters['restarts'] += 1
+            candidate.start()
+            with self._lock:
+                self._workers[key] = candidate
+                self._counters['starts'] += 1
+            return candidate
+
+    def run(
+        self,
+        engine: str,
+        python: str,
+        tasks: List[Dict],
+        device: str = "0",
+        options: Optional[Dict] = None,
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[str] = None,
+        job_options: Optional[Dict] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None
+    ) -> Dict:
+        """
+        在 (引擎, 设备) 的常驻进程中执行一批片段
+
+        工作进程恰好空闲退出导致连接失败时重启一次（进程关闭端口后、结束前的短暂时间内仍在运行，
+        所以连接失败时先等待/强制结束旧进程再重启）；模型加载失败等错误抛出 TTSWorkerError
+
+        Returns:
+            dict: 同 TTSWorker.run_job
+        """
+        for attempt in range(2):
+            worker = self.get_worker(engine, python, device, options, env, cwd)
+            try:
+                result = worker.run_job(tasks, job_options, progress_callback, should_cancel)
+                break
+            except TTSWorkerError as e:
+                if attempt == 0 and (isinstance(e, TTSWorkerConnectionError) or not worker.is_alive()):
+                    print(f"[TTSWorker] {worker.label} 已退出或无法连接，重启后重试", flush=True)
+                    self._discard(worker)
+                    continue
+                # 状态未知（如模型加载失败）：关闭，下次使用时重新启动
+                self._discard(worker)
+                raise
+        with self._lock:
+            self._counters['jobs'] += 1
+            self._counters['segments'] += len(result["results"])
+        return result
+
+    def _discard(self, worker: TTSWorker):
+        key = (worker.engine, worker.device)
+        with self._lock:
+            if self._workers.get(key) is worker:
+                del self._workers[key]
+        worker.stop()
+
+    def record_fallback(self, engine: str, error: Exception):
+        """记录一次回退到子进程方式（常驻进程不可用）"""
+        with self._lock:
+            self._counters['fallbacks'] += 1
+        print(f"[TTSWorker] ⚠ {engine} 常驻进程不可用，回退到子进程方式: {error}", flush=True)
+
+    def record_schedule(self, report: Dict):
+        """保存最近的多 worker 调度报告（各 worker 利用率、空闲时间），供 /tts-workers 查看"""
+        with self._lock:
+            self._schedules.append(dict(report, finished_at=time.time()))
+
+    def shutdown(self, engine: Optional[str] = None) -> int:
+        """
+        关闭工作进程（释放显存）
+
+        Args:
+            engine: 只关闭该引擎的进程，None 表示全部
+
+        Returns:
+            int: 关闭的进程数
+        """
+        with self._lock:
+            keys = [key for key in self._workers if engine is None or key[0] == engine]
+            workers = [self._workers.pop(key) for key in keys]
+        stopped = 0
+        for worker in workers:
+            if worker.is_alive():
+                stopped += 1
+            worker.stop()
+        return stopped
+
+    def release_idle(self, reason: str = "") -> int:
+        """
+        关闭当前没有执行任务的工作进程（释放显存给其他模型，如翻译阶段加载的大模型）
+
+        Returns:
+            int: 关闭的进程数
+        """
+        with self._lock:
+            keys = [key for key, worker in self._workers.items() if worker.active_jobs == 0]
+            workers = [self._workers.pop(key) for key in keys]
+        stopped = 0
+        for worker in workers:
+            if worker.is_alive():
+                stopped += 1
+                print(f"[TTSWorker] 关闭空闲的常驻进程 {worker.label}{'（' + reason + '）' if reason else ''}", flush=True)
+            worker.stop()
+        return stopped
+
+    def stats(self) -> Dict:
+        """工作进程状态和计数器"""
+        with self._lock:
+            workers = list(self._workers.values())
+            counters = dict(self._counters)
+            schedules = list(self._schedules)
+        now = time.time()
+        items = []
+        for worker in workers:
+            item = {
+                'engine': worker.engine,
+                'device': worker.device,
+                'pid': worker.pid,
+                'alive': worker.is_alive(),
+                'jobs': worker.jobs,
+                'segments': worker.segments,
+                'started_seconds_ago': round(now - worker.started_at, 1) if worker.started_at else None
+            }
+            if item['alive']:
+                try:
+                    status = worker.ping(timeout=2)
+                    item.update({k: status.get(k) for k in ('loaded', 'load_error', 'load_seconds', 'running_job', 'idle_seconds')})
+                except (TTSWorkerError, OSError, ValueError):
+                    item['alive'] = False
+            items.append(item)
+        return {
+            'enabled': self.enabled,
+            'idle_timeout_seconds': self.idle_timeout,
+            'workers': items,
+            'recent_schedules': schedules,
+            **counters
+        }
+
+
+# 全局实例
+tts_workers = TTSWorkerManager.from_env()
+atexit.register(tts_workers.shutdown)
+# 翻译等 LLM 阶段加载大模型前关闭空闲的 TTS 常驻进程（与语音克隆前卸载 LLM 相对应）
+llm_residency.add_before_load_hook(lambda model: tts_workers.release_idle(f"加载 {model} 需要显存"))
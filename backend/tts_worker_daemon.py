@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 常驻工作进程 - 在引擎自己的 Python 环境中运行，模型只加载一次，通过本地 socket 接收生成任务
+
+此前每次生成（包括编辑器里重新生成单个片段）都要启动新的解释器并重新加载整个模型。
+现在每个引擎、每个设备一个常驻进程，由 tts_worker_client 启动和管理。
+
+协议：127.0.0.1 上的 TCP 连接，每行一个 JSON 消息
+- 客户端 -> 工作进程
+    {"op": "ping"}
+    {"op": "submit", "job_id": "...", "tasks": [...], "options": {...}}
+    {"op": "cancel", "job_id": "..."}
+    {"op": "shutdown"}
+- 工作进程 -> 客户端
+    {"type": "pong", ...状态}
+    {"type": "accepted", "job_id": "..."}
+    {"type": "progress", "job_id": "...", "current": 3, "total": 10, "segment_index": 5, "ok": true}
+    {"type": "result", "job_id": "...", "results": {"5": "path.wav"}, "failed": [6], "cancelled": false, "elapsed": 1.2}
+    {"type": "error", "job_id": "...", "message": "..."}
+
+启动后在 stdout 输出一行 "TTS_WORKER_READY {"port": ..., "pid": ...}"，之后的日志照常输出。
+同一进程内的任务串行执行（一个模型、一个设备）；空闲超过 --idle-timeout 秒或 stdin 关闭（父进程退出）时自动退出。
+
+用法: python tts_worker_daemon.py --engine cosyvoice [--idle-timeout 600] [--options '{"use_gpu": true}']
+引擎: cosyvoice / fish / xtts / indonesian / dummy（测试用，按文本长度 sleep 后写出静音 WAV）
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+READY_PREFIX = "TTS_WORKER_READY "
+
+# 引擎脚本（cosyvoice_batch_generate 等）与本文件在同一目录
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class DummyEngine:
+    """测试用引擎：加载和生成都只 sleep，输出静音 WAV（不依赖任何模型）"""
+
+    def __init__(self, options: Dict):
+        self.load_seconds = float(options.get("load_seconds", 0))
+        self.latency = float(options.get("latency", 0.01))
+        self.seconds_per_char = float(options.get("seconds_per_char", 0))
+        self.sample_rate = int(options.get("sample_rate", 16000))
+
+    def load(self):
+        time.sleep(self.load_seconds)
+
+    def generate(self, task: Dict, options: Dict) -> str:
+        import wave
+
+        text = task.get("target_text", "")
+        if "FAIL" in text:
+            raise RuntimeError("dummy failure")
+        time.sleep(self.latency + self.seconds_per_char * len(text))
+
+        output_file = task["output_file"]
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        with wave.open(output_file, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(b"\x00\x00" * max(1, len(text)) * (self.sample_rate // 100))
+        return output_file
+
+
+class CosyVoiceEngine:
+    """CosyVoice3 跨语言克隆（复用 cosyvoice_batch_generate 的加载和生成）"""
+
+    def __init__(self, options: Dict):
+        self.options = options
+        self.model = None
+
+    def load(self):
+        import cosyvoice_batch_generate as cbg
+
+        cosyvoice_dir = cbg.find_cosyvoice_dir()
+        if not cosyvoice_dir:
+            raise RuntimeError("找不到 CosyVoice 目录，请设置 COSYVOICE_DIR 环境变量")
+        self.model = cbg.load_model(cosyvoice_dir)
+
+    def generate(self, task: Dict, options: Dict) -> str:
+        import cosyvoice_batch_generate as cbg
+        return cbg.generate_segment(self.model, task, options.get("target_language") or "en")
+
+
+class FishEngine:
+    """Fish-Speech 生成（复用 fish_batch_generate），缓存最近使用的说话人 prompt tokens"""
+
+    MAX_PROMPTS = 16
+
+    def __init__(self, options: Dict):
+        self.options = options
+        self.models = None
+        self._prompts: "OrderedDict[str, object]" = OrderedDict()
+
+    def load(self):
+        import fish_batch_generate as fbg
+        self.models = fbg.load_models(
+            self.options["fish_speech_dir"],
+            self.options["checkpoint_dir"],
+            device=self.options.get("device")
+        )
+
+    def generate(self, task: Dict, options: Dict) -> str:
+        import fish_batch_generate as fbg
+
+        npy_file = task["npy_file"]
+        prompt_tokens = self._prompts.get(npy_file)
+        if prompt_tokens is None:
+            prompt_tokens = fbg.load_prompt_tokens(npy_file, self.models["device"])
+            self._prompts[npy_file] = prompt_tokens
+            while len(self._prompts) > self.MAX_PROMPTS:
+                self._prompts.popitem(last=False)
+        else:
+            self._prompts.move_to_end(npy_file)
+        return fbg.generate_segment(self.models, task, prompt_tokens)
+
+
+class XTTSEngine:
+    """XTTS-v2 克隆（复用 xtts_batch_generate）"""
+
+    def __init__(self, options: Dict):
+        self.options = options
+        self.model = None
+
+    def load(self):
+        import xtts_batch_generate as xbg
+        self.model = xbg.load_model(self.options.get("use_gpu", True))
+
+    def generate(self, task: Dict, options: Dict) -> str:
+        import xtts_batch_generate as xbg
+        return xbg.generate_segment(self.model, task, options.get("target_language") or "en")
+
+
+class IndonesianEngine:
+    """印尼语 VITS-TTS-ID（复用 indonesian_batch_tts）"""
+
+    def __init__(self, options: Dict):
+        self.options = options
+        self.synthesizer = None
+        self.device = None
+
+    def load(self):
+        import indonesian_batch_tts as ibt
+        self.device = ibt.get_device()
+        self.synthesizer = ibt.load_model(self.options["model_dir"], self.device)
+
+    def generate(self, task: Dict, options: Dict) -> str:
+        import indonesian_batch_tts as ibt
+        result = ibt.generate_segment(self.synthesizer, task, self.device)
+        if result["status"] != "success":
+            raise RuntimeError(result.get("error_message", "Unknown error"))
+        return result["output_file"]
+
+
+ENGINES: Dict[str, Callable[[Dict], object]] = {
+    "dummy": DummyEngine,
+    "cosyvoice": CosyVoiceEngine,
+    "fish": FishEngine,
+    "xtts": XTTSEngine,
+    "indonesian": IndonesianEngine,
+}
+
+
+def _log(message: str):
+    print(f"[TTSWorker] {message}", file=sys.stderr, flush=True)
+
+
+class WorkerDaemon:
+    """常驻工作进程：加载一次模型，串行执行提交的任务"""
+
+    def __init__(self, engine_name: str, engine, idle_timeout: float = 600):
+        self.engine_name = engine_name
+        self.engine = engine
+        self.idle_timeout = idle_timeout
+        self.started_at = time.time()
+        self._loaded = threading.Event()
+        self._load_error = None
+        self.load_seconds = 0.0
+        self._job_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._connections = 0
+        self._running_job = None
+        self._cancelled = set()
+        self._last_activity = time.time()
+        self._stopping = threading.Event()
+        self.jobs_completed = 0
+        self.segments_generated = 0
+        self.segments_failed = 0
+
+    # ---------- 生命周期 ----------
+
+    def _load(self):
+        start = time.time()
+        try:
+            self.engine.load()
+            self.load_seconds = time.time() - start
+            _log(f"{self.engine_name} 模型已加载，耗时 {self.load_seconds:.2f}s")
+        except Exception as e:
+            self._load_error = f"{type(e).__name__}: {e}"
+            _log(f"❌ {self.engine_name} 模型加载失败: {self._load_error}")
+            traceback.print_exc(file=sys.stderr)
+        finally:
+            self._loaded.set()
+
+    def _touch(self):
+        with self._state_lock:
+            self._last_activity = time.time()
+
+    def _watch_idle(self):
+        while not self._stopping.wait(1.0):
+            if self.idle_timeout <= 0:
+                continue
+            with self._state_lock:
+                busy = self._connections > 0 or self._running_job is not None
+                idle = time.time() - self._last_activity
+            if not busy and idle > self.idle_timeout:
+                _log(f"空闲 {idle:.0f}s，退出")
+                self.stop()
+
+    def _watch_stdin(self):
+        # 父进程退出时管道关闭，读到 EOF 后退出（跨平台，无需轮询父进程 PID）
+        try:
+            while sys.stdin.readline():
+                pass
+        except Exception:
+            pass
+        if not self._stopping.is_set():
+            _log("父进程已退出，退出")
+            self.stop()
+
+    def stop(self):
+        self._stopping.set()
+
+    def status(self) -> Dict:
+        with self._state_lock:
+            return {
+                "engine": self.engine_name,
+                "pid": os.getpid(),
+                "loaded": self._loaded.is_set() and self._load_error is None,
+                "load_error": self._load_error,
+                "load_seconds": round(self.load_seconds, 3),
+                "running_job": self._running_job,
+                "jobs_completed": self.jobs_completed,
+                "segments_generated": self.segments_generated,
+                "segments_failed": self.segments_failed,
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "idle_seconds": round(time.time() - self._last_activity, 1)
+            }
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0, watch_stdin: bool = True):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind((host, port))
+        server.listen(16)
+        server.settimeout(0.5)
+
+        # 先输出启动完成行，再开始加载模型（避免与加载日志交错在同一行）
+        print(READY_PREFIX + json.dumps({"port": server.getsockname()[1], "pid": os.getpid()}), flush=True)
+
+        threading.Thread(target=self._load, daemon=True).start()
+        threading.Thread(target=self._watch_idle, daemon=True).start()
+        if watch_stdin:
+            threading.Thread(target=self._watch_stdin, daemon=True).start()
+
+        try:
+            while not self._stopping.is_set():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+        finally:
+            server.close()
+
+    # ---------- 连接与任务 ----------
+
+    def _handle_connection(self, conn: socket.socket):
+        with self._state_lock:
+            self._connections += 1
+        write_lock = threading.Lock()
+
+        def send(message: Dict):
+            data = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+            with write_lock:
+                try:
+                    conn.sendall(data)
+                except OSError:
+                    pass
+
+        jobs: List[threading.Thread] = []
+        job_ids: List[str] = []
+        try:
+            reader = conn.makefile("r", encoding="utf-8")
+            for line in reader:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    send({"type": "error", "message": "invalid json"})
+                    continue
+
+                op = message.get("op")
+                if op != "ping":
+                    # 状态查询（ping）不算活动，否则监控轮询会让进程永远不空闲退出
+                    self._touch()
+                if op == "ping":
+                    send(dict(self.status(), type="pong"))
+                elif op == "submit":
+                    job_id = str(message.get("job_id") or f"job-{time.time_ns()}")
+                    job_ids.append(job_id)
+                    send({"type": "accepted", "job_id": job_id})
+                    thread = threading.Thread(
+                        target=self._run_job,
+                        args=(job_id, message.get("tasks") or [], message.get("options") or {}, send),
+                        daemon=True
+                    )
+                    thread.start()
+                    jobs.append(thread)
+                elif op == "cancel":
+                    with self._state_lock:
+                        self._cancelled.add(str(message.get("job_id")))
+                    send({"type": "cancelling", "job_id": message.get("job_id")})
+                elif op == "shutdown":
+                    send({"type": "bye"})
+                    self.stop()
+                    break
+                else:
+                    send({"type": "error", "message": f"unknown op: {op}"})
+        except OSError:
+            pass
+        finally:
+            # 客户端断开：取消该连接上尚未完成的任务
+            with self._state_lock:
+                self._cancelled.update(job_ids)
+            for thread in jobs:
+                thread.join()
+            with self._state_lock:
+                self._connections -= 1
+                self._cancelled.difference_update(job_ids)
+            if job_ids:
+                self._touch()
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _is_cancelled(self, job_id: str) -> bool:
+        with self._state_lock:
+            return job_id in self._cancelled
+
+    def _run_job(self, job_id: str, tasks: List[Dict], options: Dict, send: Callable[[Dict], None]):
+        self._loaded.wait()
+        if self._load_error:
+            send({"type": "error", "job_id": job_id, "message": f"模型加载失败: {self._load_error}"})
+            return
+
+        with self._job_lock:
+            with self._state_lock:
+                self._running_job = job_id
+            start = time.time()
+            results: Dict[str, str] = {}
+            failed = []
+            cancelled = False
+            total = len(tasks)
+            _log(f"任务 {job_id}: {total} 个片段")
+
+            try:
+                for idx, task in enumerate(tasks):
+                    if self._is_cancelled(job_id):
+                        cancelled = True
+                        _log(f"任务 {job_id} 已取消（完成 {idx}/{total}）")
+                        break
+
+                    segment_index = task.get("segment_index")
+                    ok = True
+                    try:
+                        output_file = self.engine.generate(task, options)
+                        results[str(segment_index)] = output_file
+                    except Exception as e:
+                        ok = False
+                        failed.append(segment_index)
+                        _log(f"❌ 片段 {segment_index} 失败: {e}")
+                        traceback.print_exc(file=sys.stderr)
+
+                    self._touch()
+                    send({
+                        "type": "progress",
+                        "job_id": job_id,
+                        "current": idx + 1,
+                        "total": total,
+                        "segment_index": segment_index,
+                        "ok": ok
+                    })
+            finally:
+                with self._state_lock:
+                    self._running_job = None
+                    self.jobs_completed += 1
+                    self.segments_generated += len(results)
+                    self.segments_failed += len(failed)
+                self._touch()
+
+            send({
+                "type": "result",
+                "job_id": job_id,
+                "results": results,
+                "failed": failed,
+                "cancelled": cancelled,
+                "elapsed": round(time.time() - start, 3)
+            })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS 常驻工作进程")
+    parser.add_argument("--engine", required=True, choices=sorted(ENGINES))
+    parser.add_argument("--idle-timeout", type=float, default=600, help="空闲多少秒后退出，<= 0 表示不自动退出")
+    parser.add_argument("--options", default="{}", help="引擎参数（JSON）")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--no-stdin-watch", action="store_true", help="不在 stdin 关闭时退出（手动启动调试用）")
+    args = parser.parse_args()
+
+    options = json.loads(args.options)
+    engine = ENGINES[args.engine](options)
+    daemon = WorkerDaemon(args.engine, engine, idle_timeout=args.idle_timeout)
+    daemon.serve(port=args.port, watch_stdin=not args.no_stdin_watch)
+    # 引擎库可能留下非守护线程，直接退出
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
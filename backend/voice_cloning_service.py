@@ -7,11 +7,12 @@
 
 import os
 import sys
-import json
 import time
 import asyncio
+import contextlib
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Tuple
 
 # 确保模块路径
 _backend_dir = os.path.dirname(os.path.abspath(__file__))
@@ -148,13 +149,11 @@ async def clone_voices_for_language(
         if progress_callback:
             await progress_callback(2, "正在加载说话人数据...")
 
-        # 1. 加载说话人数据
-        speaker_data_path = task_path_manager.get_speaker_data_path(task_id)
-        if not speaker_data_path.exists():
-            raise FileNotFoundError(f"说话人数据不存在: {speaker_data_path}")
+        # 1. 加载说话人数据和参考数据（任务级产物，说话人识别后只计算一次，各语言共享）
+        from speaker_reference_preparation import prepare_speaker_references
 
-        with open(speaker_data_path, 'r', encoding='utf-8') as f:
-            speaker_data = json.load(f)
+        prepared = await asyncio.to_thread(prepare_speaker_references, task_id)
+        speaker_data = prepared['speaker_data']
 
         # 提取所需数据
         speaker_labels = speaker_data['speaker_labels']
@@ -197,71 +196,27 @@ async def clone_voices_for_language(
             raise ValueError(error_msg)
 
         if progress_callback:
-            await progress_callback(8, "正在准备说话人参考音频...")
+            await progress_callback(10, "正在准备说话人参考数据...")
 
-        # 3. 筛选和拼接说话人参考音频
-        from speaker_audio_processor import SpeakerAudioProcessor
-        from subtitle_text_extractor import SubtitleTextExtractor
-
-        audio_processor = SpeakerAudioProcessor(target_duration=10.0, silence_duration=1.0)
-        reference_output_dir = os.path.join(audio_dir, "references")
-        os.makedirs(reference_output_dir, exist_ok=True)
-
-        speaker_audio_results = audio_processor.process_all_speakers(
-            scored_segments, reference_output_dir
-        )
-
-        print(f"[语音克隆服务] speaker_audio_results: {speaker_audio_results}", flush=True)
-        print(f"[语音克隆服务] speaker_audio_results 长度: {len(speaker_audio_results)}", flush=True)
-
-        if progress_callback:
-            await progress_callback(10, "正在提取参考文本...")
-
-        # 4. 提取参考文本（键统一转换为整数类型）
-        text_extractor = SubtitleTextExtractor()
-        speaker_segments_for_text = {}
-        for speaker_id, (_, selected_segments) in speaker_audio_results.items():
-            try:
-                speaker_id_int = int(speaker_id)
-            except (ValueError, TypeError):
-                speaker_id_int = speaker_id
-            speaker_segments_for_text[speaker_id_int] = selected_segments
-
-        speaker_texts = text_extractor.process_all_speakers(
-            speaker_segments_for_text, str(source_subtitle_path)
-        )
-        print(f"[DEBUG] speaker_texts keys: {list(speaker_texts.keys())}", flush=True)
-
-        # 5. 构建说话人参考数据（键统一转换为整数类型）
-        speaker_references = {}
-        for speaker_id in speaker_audio_results.keys():
-            # 将 speaker_id 转换为整数（JSON 解析后可能是字符串）
-            try:
-                speaker_id_int = int(speaker_id)
-            except (ValueError, TypeError):
-                speaker_id_int = speaker_id
-
-            audio_path, _ = speaker_audio_results[speaker_id]
-            audio_path = os.path.abspath(audio_path)
-            # speaker_texts 的键也可能是字符串，尝试两种方式获取
-            reference_text = speaker_texts.get(speaker_id, speaker_texts.get(speaker_id_int, ""))
-            speaker_name = speaker_name_mapping.get(str(speaker_id), f"说话人{speaker_id}")
-            gender = gender_dict.get(str(speaker_id), gender_dict.get(speaker_id, "unknown"))
-
-            # 使用整数键存储
-            speaker_references[speaker_id_int] = {
-                "reference_audio": audio_path,
-                "reference_text": reference_text,
+        # 3. 构建本语言的说话人参考数据（整数键）
+        speaker_references = {
+            speaker_id: {
+                "reference_audio": ref["reference_audio"],
+                "reference_text": ref["reference_text"],
                 "target_language": language,
-                "speaker_name": speaker_name,
-                "gender": gender
+                "speaker_name": ref["speaker_name"],
+                "gender": ref["gender"]
             }
+            for speaker_id, ref in prepared['references'].items()
+        }
 
+        reuse_note = "复用已准备的参考数据" if prepared['reused'] else "新计算"
+        print(f"[语音克隆服务] 参考数据来源: {reuse_note}", flush=True)
         print(f"[语音克隆服务] 已准备 {len(speaker_references)} 个说话人的参考数据", flush=True)
         print(f"[DEBUG] speaker_references keys: {list(speaker_references.keys())}", flush=True)
         print(f"[DEBUG] speaker_references keys types: {[type(k).__name__ for k in speaker_references.keys()]}", flush=True)
 
-        # 6. 执行译文质量检查（与翻译流程中相同的检查）
+        # 4. 执行译文质量检查（与翻译流程中相同的检查）
         if progress_callback:
             await progress_callback(12, "正在验证译文质量...")
 
@@ -269,14 +224,17 @@ async def clone_voices_for_language(
             target_subtitles,
             source_subtitles,
             language,
-            str(translated_subtitle_path),
-            audio_dir
+            str(translated_subtitle_path)
         )
 
+        # 译文检查是本语言最后一个 LLM 阶段：语音克隆需要显存，卸载驻留的翻译模型
+        from llm_residency import llm_residency
+        await asyncio.to_thread(llm_residency.release, None, "语音克隆需要显存")
+
         if progress_callback:
             await progress_callback(18, "译文验证完成，准备语音克隆...")
 
-        # 7. 检测是否为印尼语
+        # 5. 检测是否为印尼语
         is_indonesian = ('印尼' in language or
                          'indonesian' in language.lower() or
                          'indonesia' in language.lower() or
@@ -328,8 +286,7 @@ async def _validate_and_fix_translations(
     target_subtitles: List[Dict],
     source_subtitles: List[Dict],
     target_language: str,
-    target_subtitle_path: str,
-    audio_dir: str
+    target_subtitle_path: str
 ) -> List[Dict]:
     """
     验证并修复译文质量问题
@@ -401,8 +358,7 @@ async def _validate_and_fix_translations(
     if too_long_items:
         print(f"\n⚠️ 发现 {len(too_long_items)} 条超长译文，准备批量重新翻译...", flush=True)
         target_subtitles = await _retranslate_too_long_items(
-            too_long_items, target_subtitles, target_language,
-            target_subtitle_path, audio_dir
+            too_long_items, target_subtitles, target_language, target_subtitle_path
         )
 
     # 3. 中文替换
@@ -492,12 +448,11 @@ async def _retranslate_too_long_items(
     too_long_items: List[Dict],
     target_subtitles: List[Dict],
     target_language: str,
-    target_subtitle_path: str,
-    audio_dir: str
+    target_subtitle_path: str
 ) -> List[Dict]:
-    """重新翻译过长的文本"""
-    import subprocess
+    """重新翻译过长的文本（进程内翻译引擎）"""
     from srt_parser import SRTParser
+    from translation_engine import TranslationEngine
 
     srt_parser = SRTParser()
     target_language_name = get_language_name(target_language)
@@ -511,98 +466,22 @@ async def _retranslate_too_long_items(
             "target_language": target_language_name
         })
 
-    # 写入配置文件
-    config_file = os.path.join(audio_dir, "voice_clone_retranslate_config.json")
-    retranslate_config = {
-        "tasks": retranslate_tasks,
-        "num_processes": 1
-    }
-
-    with open(config_file, 'w', encoding='utf-8') as f:
-        json.dump(retranslate_config, f, ensure_ascii=False, indent=2)
-
-    # 获取 Python 环境
-    ui_env_python = os.environ.get("UI_PYTHON")
-    if not ui_env_python:
-        ui_env_python = sys.executable
-
-    batch_retranslate_script = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)),
-        "batch_retranslate_ollama.py"
-    )
-
-    if not os.path.exists(ui_env_python):
-        print(f"⚠️ UI Python 环境不存在: {ui_env_python}", flush=True)
-        return target_subtitles
-
-    if not os.path.exists(batch_retranslate_script):
-        print(f"⚠️ 重新翻译脚本不存在: {batch_retranslate_script}", flush=True)
-        return target_subtitles
-
+    engine = TranslationEngine()
     try:
-        print(f"[Retranslate] 启动批量重新翻译进程...", flush=True)
-
-        def run_retranslation_subprocess():
-            import time as _time
-            process = subprocess.Popen(
-                [ui_env_python, batch_retranslate_script, config_file],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                bufsize=1
-            )
+        print(f"[Retranslate] 开始批量重新翻译 {len(retranslate_tasks)} 条文本...", flush=True)
+
+        updated_count = 0
+        async for result_item in engine.retranslate(retranslate_tasks):
+            idx = int(result_item["task_id"].split('-')[1])
+            new_translation = result_item["translation"]
+            # 失败时引擎返回原文，保留原译文
+            if result_item["success"] and new_translation and new_translation.strip():
+                target_subtitles[idx]["text"] = new_translation
+                updated_count += 1
+                print(f"  [更新 {idx}] 新译文: '{new_translation}'", flush=True)
 
-            stdout_lines = []
-            start = _time.time()
-            timeout = 600
-
-            while True:
-                if _time.time() - start > timeout:
-                    process.kill()
-                    print("\n⚠️ 重新翻译超时", flush=True)
-                    break
-
-                line = process.stdout.readline()
-                if line:
-                    print(line, end='', flush=True)
-                    stdout_lines.append(line)
-                else:
-                    if process.poll() is not None:
-                        break
-                    _time.sleep(0.1)
-
-            remaining = process.stdout.read()
-            if remaining:
-                stdout_lines.append(remaining)
-
-            return process.wait(), ''.join(stdout_lines)
-
-        loop = asyncio.get_event_loop()
-        returncode, stdout = await loop.run_in_executor(None, run_retranslation_subprocess)
-
-        if returncode == 0 and stdout:
-            output_lines = stdout.strip().split('\n')
-            json_start = -1
-            for i in range(len(output_lines) - 1, -1, -1):
-                if output_lines[i].strip().startswith('['):
-                    json_start = i
-                    break
-
-            if json_start >= 0:
-                json_output = '\n'.join(output_lines[json_start:])
-                retranslate_results = json.loads(json_output)
-
-                for result_item in retranslate_results:
-                    idx = int(result_item["task_id"].split('-')[1])
-                    new_translation = result_item["translation"]
-                    if new_translation and new_translation.strip():
-                        target_subtitles[idx]["text"] = new_translation
-                        print(f"  [更新 {idx}] 新译文: '{new_translation}'", flush=True)
-
-                srt_parser.save_srt(target_subtitles, target_subtitle_path)
-                print(f"✅ 成功重新翻译 {len(retranslate_results)} 条文本", flush=True)
+        srt_parser.save_srt(target_subtitles, target_subtitle_path)
+        print(f"✅ 成功重新翻译 {updated_count}/{len(retranslate_tasks)} 条文本", flush=True)
 
     except Exception as e:
         print(f"⚠️ 重新翻译出错: {e}", flush=True)
@@ -665,47 +544,30 @@ async def _clone_indonesian_voices(
             "output_file": output_file
         })
 
-    print(f"\n[印尼语TTS] 准备生成 {len(indonesian_tasks)} 个音频片段", flush=True)
-
-    if progress_callback:
-        await progress_callback(25, f"正在生成 {len(indonesian_tasks)} 个印尼语音频...")
-
-    # 调用印尼语 TTS
-    from indonesian_tts_cloner import IndonesianTTSCloner
-
-    tts_id_env_python = os.environ.get("TTS_ID_PYTHON")
-    if not tts_id_env_python:
-        import platform
-        if platform.system() == "Windows":
-            tts_id_env_python = "C:/Users/7/miniconda3/envs/tts-id-py311/python.exe"
-        else:
-            tts_id_env_python = os.path.expanduser("~/miniconda3/envs/tts-id-py311/bin/python")
-
-    model_dir = os.environ.get("VITS_TTS_ID_MODEL_DIR")
-    if not model_dir:
-        backend_dir = os.path.dirname(os.path.abspath(__file__))
-        model_dir = os.path.join(backend_dir, "..", "..", "..", "models", "vits-tts-id")
-        model_dir = os.path.abspath(model_dir)
-
-    if not os.path.exists(tts_id_env_python):
-        raise FileNotFoundError(f"TTS-ID Python环境不存在: {tts_id_env_python}")
-
-    if not os.path.exists(model_dir):
-        raise FileNotFoundError(f"印尼语TTS模型不存在: {model_dir}")
+    # 复用未变化的片段（印尼语 TTS 没有参考音频，音色由 speaker_name 决定）
+    def indonesian_key(cache, task):
+        return cache.segment_key(
+            "indonesian", None, "", task["target_text"], {"speaker_name": task["speaker_name"]}
+        )
 
-    cloner = IndonesianTTSCloner(model_dir, tts_id_env_python)
+    segment_files, pending_tasks, cache_keys = await asyncio.to_thread(
+        _reuse_cached_segments, indonesian_tasks, cloned_audio_dir, indonesian_key
+    )
+    reused_count = len(segment_files)
+    if reused_count:
+        print(f"[印尼语TTS] ♻️ 复用未变化的片段 {reused_count} 个", flush=True)
 
-    def update_indonesian_progress(current, total):
-        if progress_callback:
-            progress = 25 + int((current / total) * 65)  # 25-90%
-            asyncio.create_task(progress_callback(progress, f"正在生成印尼语语音 ({current}/{total})..."))
+    print(f"\n[印尼语TTS] 准备生成 {len(pending_tasks)} 个音频片段", flush=True)
 
-    config_file = os.path.join(cloned_audio_dir, "indonesian_tts_config.json")
-    segment_files = cloner.batch_generate_audio(
-        indonesian_tasks, config_file, progress_callback=update_indonesian_progress
-    )
+    generated_files = {}
+    if pending_tasks:
+        generated_files = await _generate_indonesian_segments(
+            pending_tasks, cloned_audio_dir, progress_callback
+        )
+        segment_files.update(generated_files)
+        await asyncio.to_thread(_store_generated_segments, generated_files, cache_keys)
 
-    print(f"\n[印尼语TTS] ✅ 成功生成 {len(segment_files)} 个音频片段", flush=True)
+    print(f"\n[印尼语TTS] ✅ 成功生成 {len(generated_files)} 个音频片段（复用 {reused_count} 个）", flush=True)
 
     # 准备结果
     cloned_results = []
@@ -749,12 +611,178 @@ async def _clone_indonesian_voices(
         "output_dir": cloned_audio_dir,
         "total_segments": len(indonesian_tasks),
         "successful_segments": len(segment_files),
+        "reused_segments": reused_count,
+        "generated_segments": len(generated_files),
         "cloned_results": cloned_results,
         "total_duration": total_duration,
         "duration_str": duration_str
     }
 
 
+async def _generate_indonesian_segments(
+    tasks: List[Dict],
+    cloned_audio_dir: str,
+    progress_callback: Optional[Callable]
+) -> Dict[int, str]:
+    """调用印尼语 TTS 生成片段，返回 {segment_index: 文件路径}"""
+    if progress_callback:
+        await progress_callback(25, f"正在生成 {len(tasks)} 个印尼语音频...")
+
+    from indonesian_tts_cloner import IndonesianTTSCloner
+
+    tts_id_env_python = os.environ.get("TTS_ID_PYTHON")
+    if not tts_id_env_python:
+        import platform
+        if platform.system() == "Windows":
+            tts_id_env_python = "C:/Users/7/miniconda3/envs/tts-id-py311/python.exe"
+        else:
+            tts_id_env_python = os.path.expanduser("~/miniconda3/envs/tts-id-py311/bin/python")
+
+    model_dir = os.environ.get("VITS_TTS_ID_MODEL_DIR")
+    if not model_dir:
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        model_dir = os.path.join(backend_dir, "..", "..", "..", "models", "vits-tts-id")
+        model_dir = os.path.abspath(model_dir)
+
+    if not os.path.exists(tts_id_env_python):
+        raise FileNotFoundError(f"TTS-ID Python环境不存在: {tts_id_env_python}")
+
+    if not os.path.exists(model_dir):
+        raise FileNotFoundError(f"印尼语TTS模型不存在: {model_dir}")
+
+    cloner = IndonesianTTSCloner(model_dir, tts_id_env_python)
+
+    def update_indonesian_progress(current, total):
+        if progress_callback:
+            progress = 25 + int((current / total) * 65)  # 25-90%
+            asyncio.create_task(progress_callback(progress, f"正在生成印尼语语音 ({current}/{total})..."))
+
+    config_file = os.path.join(cloned_audio_dir, "indonesian_tts_config.json")
+    segment_files = cloner.batch_generate_audio(
+        tasks, config_file, progress_callback=update_indonesian_progress
+    )
+
+    return segment_files
+
+
+def _lookup_speaker(mapping: Dict, speaker_id):
+    """按说话人 ID 查找（兼容整数键和字符串键）"""
+    for key in (speaker_id, str(speaker_id)):
+        if key in mapping:
+            return mapping[key]
+    try:
+        return mapping.get(int(speaker_id))
+    except (ValueError, TypeError):
+        return None
+
+
+def _reuse_cached_segments(
+    tasks: List[Dict],
+    cloned_audio_dir: str,
+    key_fn: Callable
+) -> Tuple[Dict[int, str], List[Dict], Dict[int, str]]:
+    """
+    从片段音频缓存中复用键未变化的片段（文本、参考音色、引擎均相同）
+
+    Args:
+        tasks: 片段任务列表
+        cloned_audio_dir: 输出目录（片段文件名为 segment_{index}.wav）
+        key_fn: key_fn(cache, task) -> 缓存键
+
+    Returns:
+        (已复用的 {segment_index: 文件路径}, 需要生成的任务, {segment_index: 缓存键})；缓存关闭时全部需要生成
+    """
+    from segment_audio_cache import segment_audio_cache
+
+    if segment_audio_cache is None or not tasks:
+        return {}, list(tasks), {}
+    return segment_audio_cache.reuse(
+        tasks,
+        lambda task: key_fn(segment_audio_cache, task),
+        lambda task: os.path.join(cloned_audio_dir, f"segment_{task['segment_index']}.wav")
+    )
+
+
+def _store_generated_segments(generated: Dict[int, str], keys: Dict[int, str]):
+    """把新生成的片段保存到片段音频缓存"""
+    from segment_audio_cache import segment_audio_cache
+
+    if segment_audio_cache is not None and generated and keys:
+        segment_audio_cache.store_generated(generated, keys)
+
+
+def _mixed_clone_max_engines() -> int:
+    """
+    混合模式下同时运行的 TTS 引擎数（MIXED_CLONE_MAX_ENGINES，1 表示依次执行，适用于显存只够一个模型的机器；
+    此时引擎结束后关闭它的常驻进程，下一个引擎加载模型前显存已释放）
+    """
+    try:
+        return max(1, int(os.environ.get("MIXED_CLONE_MAX_ENGINES", "2")))
+    except ValueError:
+        return 2
+
+
+class _MixedCloneProgress:
+    """
+    合并多个引擎的生成进度
+
+    每个引擎按其片段的文本长度（估算的生成工作量）加权，
+    进度反映总工作量的完成比例，而不是按引擎固定分段。
+    回调可以在任意工作线程中调用。
+    """
+
+    def __init__(
+        self,
+        engine_tasks: Dict[str, List[Dict]],
+        loop: asyncio.AbstractEventLoop,
+        progress_callback: Optional[Callable],
+        start: int = 25,
+        end: int = 95
+    ):
+        self.loop = loop
+        self.progress_callback = progress_callback
+        self.start = start
+        self.end = end
+        self._lock = threading.Lock()
+        self._weights = {
+            name: sum(max(1, len(task.get("target_text") or "")) for task in tasks)
+            for name, tasks in engine_tasks.items() if tasks
+        }
+        self._counts = {name: (0, len(engine_tasks[name])) for name in self._weights}
+        self._fraction = {name: 0.0 for name in self._weights}
+        self._last_percent = start
+
+    def callback(self, engine: str) -> Callable[[int, int], None]:
+        """返回给克隆器使用的进度回调 callback(current, total)"""
+        def report(current: int, total: int):
+            self.update(engine, current, total)
+        return report
+
+    def finish(self, engine: str):
+        if engine in self._counts:
+            total = self._counts[engine][1]
+            self.update(engine, total, total)
+
+    def update(self, engine: str, current: int, total: int):
+        with self._lock:
+            if engine not in self._weights or total <= 0:
+                return
+            self._counts[engine] = (current, total)
+            self._fraction[engine] = min(1.0, current / total)
+            done = sum(self._weights[name] * self._fraction[name] for name in self._weights)
+            ratio = done / sum(self._weights.values())
+            # 进度只增不减（各引擎的回调交错到达）
+            percent = max(self._last_percent, self.start + int(ratio * (self.end - self.start)))
+            self._last_percent = percent
+            detail = " · ".join(f"{name} {c}/{t}" for name, (c, t) in self._counts.items())
+
+        if self.progress_callback:
+            asyncio.run_coroutine_threadsafe(
+                self.progress_callback(percent, f"生成中... ({detail})"),
+                self.loop
+            )
+
+
 async def _clone_fish_speech_voices(
     task_id: str,
     language: str,
@@ -772,6 +800,7 @@ async def _clone_fish_speech_voices(
 
     - 原音色 (default): 使用 CosyVoice3 直接克隆（支持双 GPU 并行）
     - 默认音色 (preset): 使用 Fish-Speech 预置 npy
+    - 两个引擎并发执行（MIXED_CLONE_MAX_ENGINES 控制），进度按剩余工作量合并
     """
     print("\n" + "=" * 70, flush=True)
     print("[语音克隆] 混合模式: CosyVoice3 (原音色) + Fish-Speech (默认音色)", flush=True)
@@ -874,104 +903,145 @@ async def _clone_fish_speech_voices(
     print(f"  Fish-Speech 任务: {len(fish_tasks)} 个片段", flush=True)
     print(f"  总计: {total_tasks} 个片段", flush=True)
 
-    generated_audio_files = {}
-    cosyvoice_completed = 0
-    fish_completed = 0
-
-    # ========== 第三步：CosyVoice3 生成（支持双 GPU 并行）==========
-    if cosyvoice_tasks:
-        print(f"\n🔊 [CosyVoice3] 开始生成 {len(cosyvoice_tasks)} 个原音色片段...", flush=True)
-
-        if progress_callback:
-            await progress_callback(25, f"正在初始化 CosyVoice3（双 GPU 模式）...")
-
-        from cosyvoice_cloner import get_cosyvoice_cloner
-        # 使用双 GPU：GPU 0 和 GPU 1
-        cosyvoice_cloner = get_cosyvoice_cloner(use_gpu=True, gpu_ids=[0, 1])
-
-        # 进度回调
-        def cosyvoice_progress_callback(current, total):
-            if progress_callback:
-                # CosyVoice 占用 25-60% 的进度
-                base_progress = 25
-                cosyvoice_ratio = len(cosyvoice_tasks) / total_tasks if total_tasks > 0 else 0.5
-                max_progress = 25 + int(70 * cosyvoice_ratio)
-                progress = base_progress + int((current / total) * (max_progress - base_progress))
-                asyncio.create_task(progress_callback(progress, f"[CosyVoice] 生成中... ({current}/{total})"))
-
-        # 转换 speaker_references 键为整数
-        cosyvoice_speaker_refs = {}
-        for k, v in speaker_references.items():
-            try:
-                cosyvoice_speaker_refs[int(k)] = v
-            except (ValueError, TypeError):
-                cosyvoice_speaker_refs[k] = v
-
-        # 在线程池中运行 CosyVoice 生成（双 GPU 并行）
-        def run_cosyvoice_generation():
-            return cosyvoice_cloner.batch_generate_audio(
-                cosyvoice_tasks,
-                cosyvoice_speaker_refs,
-                cloned_audio_dir,
-                target_language=language,
-                progress_callback=cosyvoice_progress_callback
-            )
-
-        loop = asyncio.get_event_loop()
-        cosyvoice_generated = await loop.run_in_executor(None, run_cosyvoice_generation)
-        generated_audio_files.update(cosyvoice_generated)
-        cosyvoice_completed = len(cosyvoice_generated)
-
-        print(f"✅ [CosyVoice3] 完成 {cosyvoice_completed}/{len(cosyvoice_tasks)} 个片段", flush=True)
-
-    # ========== 第四步：Fish-Speech 生成 ==========
-    if fish_tasks:
-        print(f"\n🐟 [Fish-Speech] 开始生成 {len(fish_tasks)} 个默认音色片段...", flush=True)
+    # ========== 第三步：复用未变化的片段 ==========
+    def cosyvoice_key(cache, task):
+        ref = _lookup_speaker(speaker_references, task["speaker_id"]) or {}
+        return cache.segment_key(
+            "cosyvoice", ref.get("reference_audio"), ref.get("reference_text", ""),
+            task["target_text"], {"target_language": language}
+        )
 
-        if progress_callback:
-            cosyvoice_ratio = len(cosyvoice_tasks) / total_tasks if total_tasks > 0 else 0
-            fish_start_progress = 25 + int(70 * cosyvoice_ratio)
-            await progress_callback(fish_start_progress, f"正在初始化 Fish-Speech...")
+    def fish_key(cache, task):
+        return cache.segment_key(
+            "fish", _lookup_speaker(fish_speakers, task["speaker_id"]),
+            _lookup_speaker(fish_ref_texts, task["speaker_id"]) or "", task["target_text"]
+        )
 
-        from fish_simple_cloner import SimpleFishCloner
-        fish_cloner = SimpleFishCloner()
+    cosyvoice_reused, cosyvoice_pending, cosyvoice_keys = await asyncio.to_thread(
+        _reuse_cached_segments, cosyvoice_tasks, cloned_audio_dir, cosyvoice_key
+    )
+    fish_reused, fish_pending, fish_keys = await asyncio.to_thread(
+        _reuse_cached_segments, fish_tasks, cloned_audio_dir, fish_key
+    )
+    reused_count = len(cosyvoice_reused) + len(fish_reused)
+    if reused_count:
+        print(f"♻️ 复用未变化的片段: CosyVoice3 {len(cosyvoice_reused)} 个, Fish-Speech {len(fish_reused)} 个", flush=True)
+
+    generated_audio_files = {**cosyvoice_reused, **fish_reused}
+    cosyvoice_completed = len(cosyvoice_reused)
+    fish_completed = len(fish_reused)
+    newly_generated = {}
+
+    # ========== 第四步：CosyVoice3 与 Fish-Speech 并发生成 ==========
+    # 两个引擎在各自的进程中运行，可以重叠执行；总耗时约等于较慢的引擎，而不是两者之和
+    loop = asyncio.get_running_loop()
+    progress = _MixedCloneProgress(
+        {"CosyVoice": cosyvoice_pending, "Fish": fish_pending},
+        loop, progress_callback, start=25, end=95
+    )
+    max_engines = _mixed_clone_max_engines()
+    engine_slots = asyncio.Semaphore(max_engines)
 
-        # 转换 fish_speakers 键为整数
-        fish_npy_files_int = {}
-        for k, v in fish_speakers.items():
+    @contextlib.asynccontextmanager
+    async def engine_slot(engine: str):
+        """占用一个引擎名额；只允许一个引擎时，交出名额前关闭该引擎的常驻进程（否则模型仍驻留在显存中）"""
+        async with engine_slots:
             try:
-                fish_npy_files_int[int(k)] = v
-            except (ValueError, TypeError):
-                fish_npy_files_int[k] = v
-
-        # 进度回调
-        def fish_progress_callback(current, total):
-            if progress_callback:
-                cosyvoice_ratio = len(cosyvoice_tasks) / total_tasks if total_tasks > 0 else 0
-                base_progress = 25 + int(70 * cosyvoice_ratio)
-                max_progress = 95
-                progress = base_progress + int((current / total) * (max_progress - base_progress))
-                asyncio.create_task(progress_callback(progress, f"[Fish] 生成中... ({current}/{total})"))
-
-        # 在线程池中运行 Fish-Speech 生成
-        script_dir = os.path.join(audio_dir, "scripts")
-
-        def run_fish_generation():
-            return fish_cloner.batch_generate_audio(
-                fish_tasks,
-                fish_npy_files_int,
-                speaker_references,
-                cloned_audio_dir,
-                script_dir=script_dir,
-                progress_callback=fish_progress_callback
-            )
-
-        loop = asyncio.get_event_loop()
-        fish_generated = await loop.run_in_executor(None, run_fish_generation)
-        generated_audio_files.update(fish_generated)
-        fish_completed = len(fish_generated)
+                yield
+            finally:
+                if max_engines == 1:
+                    from tts_worker_client import tts_workers
+                    stopped = await asyncio.to_thread(tts_workers.shutdown, engine)
+                    if stopped:
+                        print(f"[{engine}] 已关闭 {stopped} 个常驻进程，释放显存给下一个引擎", flush=True)
+
+    async def run_cosyvoice() -> Dict[int, str]:
+        async with engine_slot("cosyvoice"):
+            print(f"\n🔊 [CosyVoice3] 开始生成 {len(cosyvoice_pending)} 个原音色片段...", flush=True)
+
+            from cosyvoice_cloner import get_cosyvoice_cloner
+            # 使用双 GPU：GPU 0 和 GPU 1
+            cosyvoice_cloner = get_cosyvoice_cloner(use_gpu=True, gpu_ids=[0, 1])
+
+            # 转换 speaker_references 键为整数
+            cosyvoice_speaker_refs = {}
+            for k, v in speaker_references.items():
+                try:
+                    cosyvoice_speaker_refs[int(k)] = v
+                except (ValueError, TypeError):
+                    cosyvoice_speaker_refs[k] = v
+
+            # 在线程池中运行 CosyVoice 生成（双 GPU 并行）
+            def run_cosyvoice_generation():
+                return cosyvoice_cloner.batch_generate_audio(
+                    cosyvoice_pending,
+                    cosyvoice_speaker_refs,
+                    cloned_audio_dir,
+                    target_language=language,
+                    progress_callback=progress.callback("CosyVoice")
+                )
+
+            generated = await loop.run_in_executor(None, run_cosyvoice_generation)
+            progress.finish("CosyVoice")
+            print(f"✅ [CosyVoice3] 完成 {len(generated)}/{len(cosyvoice_pending)} 个片段", flush=True)
+            return generated
+
+    async def run_fish() -> Dict[int, str]:
+        async with engine_slot("fish"):
+            print(f"\n🐟 [Fish-Speech] 开始生成 {len(fish_pending)} 个默认音色片段...", flush=True)
+
+            from fish_simple_cloner import SimpleFishCloner
+            fish_cloner = SimpleFishCloner()
+
+            # 转换 fish_speakers 键为整数
+            fish_npy_files_int = {}
+            for k, v in fish_speakers.items():
+                try:
+                    fish_npy_files_int[int(k)] = v
+                except (ValueError, TypeError):
+                    fish_npy_files_int[k] = v
+
+            # 在线程池中运行 Fish-Speech 生成
+            script_dir = os.path.join(audio_dir, "scripts")
+
+            def run_fish_generation():
+                return fish_cloner.batch_generate_audio(
+                    fish_pending,
+                    fish_npy_files_int,
+                    speaker_references,
+                    cloned_audio_dir,
+                    script_dir=script_dir,
+                    progress_callback=progress.callback("Fish")
+                )
+
+            generated = await loop.run_in_executor(None, run_fish_generation)
+            progress.finish("Fish")
+            print(f"✅ [Fish-Speech] 完成 {len(generated)}/{len(fish_pending)} 个片段", flush=True)
+            return generated
+
+    engine_jobs = []
+    if cosyvoice_pending:
+        engine_jobs.append(("CosyVoice", run_cosyvoice()))
+    if fish_pending:
+        engine_jobs.append(("Fish", run_fish()))
+
+    if progress_callback and engine_jobs:
+        await progress_callback(25, f"正在初始化 {' + '.join(name for name, _ in engine_jobs)}...")
+
+    # 等待所有引擎结束后再处理异常，避免另一个引擎仍在线程池中写文件
+    engine_results = await asyncio.gather(*(job for _, job in engine_jobs), return_exceptions=True)
+    for (name, _), result in zip(engine_jobs, engine_results):
+        if isinstance(result, BaseException):
+            print(f"❌ [{name}] 生成失败: {result}", flush=True)
+            raise result
+        generated_audio_files.update(result)
+        newly_generated.update(result)
+        if name == "CosyVoice":
+            cosyvoice_completed += len(result)
+        else:
+            fish_completed += len(result)
 
-        print(f"✅ [Fish-Speech] 完成 {fish_completed}/{len(fish_tasks)} 个片段", flush=True)
+    await asyncio.to_thread(_store_generated_segments, newly_generated, {**cosyvoice_keys, **fish_keys})
 
     # ========== 第五步：整合结果 ==========
     all_tasks = cosyvoice_tasks + fish_tasks
@@ -1014,6 +1084,7 @@ async def _clone_fish_speech_voices(
     print(f"\n✅ 语音克隆任务 {task_id} 成功完成！", flush=True)
     print(f"  CosyVoice3: {cosyvoice_completed}/{len(cosyvoice_tasks)} 个片段", flush=True)
     print(f"  Fish-Speech: {fish_completed}/{len(fish_tasks)} 个片段", flush=True)
+    print(f"  复用: {reused_count} 个, 新生成: {len(newly_generated)} 个", flush=True)
     print(f"⏱️ 总耗时: {duration_str}", flush=True)
 
     return {
@@ -1023,6 +1094,8 @@ async def _clone_fish_speech_voices(
         "successful_segments": len(generated_audio_files),
         "cosyvoice_segments": cosyvoice_completed,
         "fish_segments": fish_completed,
+        "reused_segments": reused_count,
+        "generated_segments": len(newly_generated),
         "cloned_results": cloned_results,
         "total_duration": total_duration,
         "duration_str": duration_str
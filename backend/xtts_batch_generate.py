@@ -65,6 +65,61 @@ def map_language_code(language: str) -> str:
     return XTTS_LANGUAGE_MAP.get(lang_lower, "en")
 
 
+def load_model(use_gpu: bool = True):
+    """加载 XTTS-v2 模型（先修复 torchaudio）"""
+    print("[XTTS] 正在初始化...", flush=True)
+    patch_torchaudio()
+
+    print("[XTTS] 正在加载模型...", flush=True)
+    load_start = time.time()
+
+    from TTS.api import TTS
+    tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2", gpu=use_gpu)
+
+    load_time = time.time() - load_start
+    print(f"[XTTS] 模型加载完成，耗时: {load_time:.2f}s", flush=True)
+    return tts
+
+
+def generate_segment(tts, task: dict, target_language: str = "en") -> str:
+    """
+    生成一个片段，失败时抛出异常
+
+    Args:
+        tts: load_model 返回的模型
+        task: {segment_index, target_text, reference_audio, output_file, 可选 target_language}
+        target_language: 任务未指定语言时使用的目标语言
+
+    Returns:
+        str: 输出文件路径
+    """
+    import soundfile as sf
+
+    output_file = task["output_file"]
+
+    # 映射语言代码
+    xtts_lang = map_language_code(task.get("target_language") or target_language)
+
+    gen_start = time.time()
+
+    tts.tts_to_file(
+        text=task["target_text"],
+        file_path=output_file,
+        speaker_wav=task["reference_audio"],
+        language=xtts_lang
+    )
+
+    gen_time = time.time() - gen_start
+
+    # 计算音频时长
+    audio, sr = sf.read(output_file)
+    audio_duration = len(audio) / sr
+    rtf = gen_time / audio_duration if audio_duration > 0 else float('inf')
+
+    print(f"[XTTS]   → 耗时: {gen_time:.2f}s | 时长: {audio_duration:.2f}s | RTF: {rtf:.3f}", flush=True)
+    return output_file
+
+
 def main():
     if len(sys.argv) < 2:
         print("[XTTS] 错误: 需要提供配置文件路径", flush=True)
@@ -94,22 +149,9 @@ def main():
     # 确保输出目录存在
     os.makedirs(output_dir, exist_ok=True)
 
-    # 修复 torchaudio
-    print("[XTTS] 正在初始化...", flush=True)
-    patch_torchaudio()
-
-    # 加载模型
-    print("[XTTS] 正在加载模型...", flush=True)
-    load_start = time.time()
-
-    from TTS.api import TTS
-    tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2", gpu=use_gpu)
-
-    load_time = time.time() - load_start
-    print(f"[XTTS] 模型加载完成，耗时: {load_time:.2f}s", flush=True)
+    tts = load_model(use_gpu)
 
     # 处理任务
-    import soundfile as sf
     results = {}
     total = len(tasks)
     successful = 0
@@ -118,37 +160,13 @@ def main():
     for idx, task in enumerate(tasks):
         segment_index = task["segment_index"]
         target_text = task["target_text"]
-        reference_audio = task["reference_audio"]
-        lang = task.get("target_language", target_language)
-        output_file = task["output_file"]
-
-        # 映射语言代码
-        xtts_lang = map_language_code(lang)
 
         # 显示进度
         display_text = target_text[:40] + "..." if len(target_text) > 40 else target_text
         print(f"[XTTS] 进度: {idx+1}/{total} | 片段 {segment_index}: {display_text}", flush=True)
 
         try:
-            gen_start = time.time()
-
-            tts.tts_to_file(
-                text=target_text,
-                file_path=output_file,
-                speaker_wav=reference_audio,
-                language=xtts_lang
-            )
-
-            gen_time = time.time() - gen_start
-
-            # 计算音频时长
-            audio, sr = sf.read(output_file)
-            audio_duration = len(audio) / sr
-            rtf = gen_time / audio_duration if audio_duration > 0 else float('inf')
-
-            print(f"[XTTS]   → 耗时: {gen_time:.2f}s | 时长: {audio_duration:.2f}s | RTF: {rtf:.3f}", flush=True)
-
-            results[segment_index] = output_file
+            results[segment_index] = generate_segment(tts, task, target_language)
             successful += 1
 
         except Exception as e:
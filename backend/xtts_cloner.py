@@ -3,7 +3,8 @@
 XTTS-v2 语音克隆器
 基于 Coqui TTS XTTS-v2 模型，支持多语言语音克隆
 
-通过子进程调用 xtts 环境中的脚本，类似于 fish_simple_cloner
+通过 xtts 环境中的常驻工作进程生成（见 tts_worker_client），模型只加载一次；
+常驻进程不可用或 TTS_WORKER_DAEMON=0 时回退到每次调用脚本的子进程方式
 
 特点：
 - 无需预编码，直接使用参考音频
@@ -21,6 +22,8 @@ import platform
 from typing import Dict, List, Optional, Callable
 from loguru import logger
 
+from tts_worker_client import TTSWorkerError, tts_workers
+
 
 class XTTSCloner:
     """
@@ -132,6 +135,21 @@ class XTTSCloner:
             logger.warning("[XTTS] 没有有效的任务")
             return {}
 
+        if tts_workers.enabled:
+            try:
+                result = tts_workers.run(
+                    "xtts",
+                    self.xtts_python,
+                    generate_config["tasks"],
+                    options={"use_gpu": self.use_gpu},
+                    job_options={"target_language": target_language},
+                    progress_callback=progress_callback
+                )
+                logger.info(f"✅ [XTTS] 完成！生成 {len(result['results'])} 个音频文件（常驻进程）")
+                return result["results"]
+            except TTSWorkerError as e:
+                tts_workers.record_fallback("xtts", e)
+
         # 写入临时配置
         with tempfile.NamedTemporaryFile(
             mode='w',
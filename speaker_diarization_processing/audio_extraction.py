@@ -2,23 +2,30 @@
 音频提取工具 - 从视频中按SRT时间段提取音频片段
 """
 import os
+import shutil
 import subprocess
+import tempfile
+import time
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Dict, Tuple, Optional
 import numpy as np
 import librosa
 import soundfile as sf
 from srt_parser import SRTParser
 from audio_silence_trimmer import AudioSilenceTrimmer
+from segment_buffer import SegmentBuffer
 
 
 class AudioExtractor:
-    def __init__(self, cache_dir: str = "audio_segments"):
+    def __init__(self, cache_dir: str = "audio_segments", single_decode: bool = True):
         """
         初始化音频提取器
 
         Args:
             cache_dir (str): 音频缓存目录
+            single_decode (bool): 是否使用单次解码模式。开启时整段音轨只解码一次为
+                16kHz 单声道 PCM 并内存映射，各字幕片段直接切片；关闭时每条字幕
+                单独启动一次 ffmpeg（旧模式）
         """
         # 使用与上传文件不同的目录存储音频片段
         self.cache_dir = Path(cache_dir)
@@ -32,6 +39,14 @@ class AudioExtractor:
             hop_length_ms=10.0
         )
         self.sample_rate = 16000
+        self.single_decode = single_decode
+
+        # 最近一次提取的耗时统计（解码与切片分开统计）
+        self.last_timings: Dict[str, float] = {}
+
+        # 单次解码的整段 PCM（内存映射）及其临时目录
+        self._decoded_pcm: Optional[np.ndarray] = None
+        self._decode_dir: Optional[str] = None
 
     def _detect_speech_segments(self, audio_data: np.ndarray, sr: int) -> List[Dict]:
         """
@@ -182,24 +197,24 @@ class AudioExtractor:
             # 没有找到合适的静音，返回 None（强制硬切）
             return None
 
-    def _process_long_audio(self, audio_path: Path, max_duration: float = 30.0) -> Path:
+    def _process_long_audio_data(self, audio_data: np.ndarray, sr: int,
+                                 max_duration: float = 30.0) -> np.ndarray:
         """
-        处理长音频：去除长静音、智能切分
+        处理长音频数据：去除长静音、智能切分
 
         Args:
-            audio_path: 音频文件路径
+            audio_data: 音频数据
+            sr: 采样率
             max_duration: 最大时长（秒）
 
         Returns:
-            处理后的音频路径（原地覆盖）
+            处理后的音频数据
         """
-        # 1. 加载音频
-        audio_data, sr = librosa.load(str(audio_path), sr=self.sample_rate, mono=True)
         original_duration = len(audio_data) / sr
 
         print(f"  [智能处理] 原始时长: {original_duration:.2f}s")
 
-        # 2. 去除长静音（>2s），保留左侧0.5s
+        # 1. 去除长静音（>2s），保留左侧0.5s
         processed_audio, speech_segments = self._remove_long_silences(
             audio_data, sr,
             min_silence_duration=2.0,
@@ -209,7 +224,7 @@ class AudioExtractor:
         processed_duration = len(processed_audio) / sr
         print(f"  [智能处理] 去除长静音后: {processed_duration:.2f}s")
 
-        # 3. 如果还是超过 max_duration，智能切分
+        # 2. 如果还是超过 max_duration，智能切分
         if processed_duration > max_duration:
             split_point = self._find_split_point(processed_audio, sr, max_duration)
 
@@ -227,7 +242,26 @@ class AudioExtractor:
         final_duration = len(processed_audio) / sr
         print(f"  [智能处理] 最终时长: {final_duration:.2f}s")
 
-        # 4. 保存处理后的音频（覆盖原文件）
+        return processed_audio
+
+    def _process_long_audio(self, audio_path: Path, max_duration: float = 30.0) -> Path:
+        """
+        处理长音频：去除长静音、智能切分
+
+        Args:
+            audio_path: 音频文件路径
+            max_duration: 最大时长（秒）
+
+        Returns:
+            处理后的音频路径（原地覆盖）
+        """
+        # 1. 加载音频
+        audio_data, sr = librosa.load(str(audio_path), sr=self.sample_rate, mono=True)
+
+        # 2. 去除长静音、智能切分
+        processed_audio = self._process_long_audio_data(audio_data, sr, max_duration)
+
+        # 3. 保存处理后的音频（覆盖原文件）
         sf.write(str(audio_path), processed_audio, sr)
 
         return audio_path
@@ -244,10 +278,76 @@ class AudioExtractor:
         Returns:
             List[str]: 提取的音频文件路径列表
         """
+        try:
+            buffers = self.extract_segment_buffers(video_path, srt_path, max_duration, write_files=True)
+            audio_paths = [buffer.path for buffer in buffers]
+            # 先丢弃片段视图，再释放内存映射
+            buffers = None
+            return audio_paths
+        finally:
+            self.release_decoded_audio()
+
+    def extract_segment_buffers(self, video_path: str, srt_path: str, max_duration: float = 30.0,
+                                write_files: bool = True,
+                                on_segment: Optional[Callable[[SegmentBuffer, int], None]] = None
+                                ) -> List[SegmentBuffer]:
+        """
+        根据SRT文件的时间段提取内存音频片段
+
+        单次解码模式下返回的片段是整段 PCM 内存映射上的视图，使用完毕后需调用
+        release_decoded_audio() 释放
+
+        Args:
+            video_path (str): 视频文件路径
+            srt_path (str): SRT字幕文件路径
+            max_duration (float): 单个片段最大时长（秒）
+            write_files (bool): 是否同时写出 segment_XXX_start_end.wav（供编辑器界面使用）
+            on_segment: 每个片段提取完成后的回调 (片段, 片段总数)，用于流水线处理；
+                单次解码失败回退时，已回调过的片段会以相同 index 再次回调
+
+        Returns:
+            List[SegmentBuffer]: 与字幕一一对应的音频片段列表
+        """
         # 解析SRT文件
         subtitles = self.srt_parser.parse_srt(srt_path)
 
-        audio_paths = []
+        if self.single_decode:
+            try:
+                return self._extract_segments_single_decode(
+                    video_path, subtitles, max_duration, write_files, on_segment
+                )
+            except Exception as e:
+                # 单次解码失败时回退到逐条 ffmpeg 提取
+                print(f"[音频提取] 单次解码失败，回退到逐条提取模式: {e}")
+                self.release_decoded_audio()
+
+        return self._extract_segments_per_subtitle(video_path, subtitles, max_duration, on_segment)
+
+    def release_decoded_audio(self):
+        """释放单次解码的 PCM 内存映射并删除临时文件"""
+        self._decoded_pcm = None
+        if self._decode_dir is not None:
+            shutil.rmtree(self._decode_dir, ignore_errors=True)
+            self._decode_dir = None
+
+    def _extract_segments_per_subtitle(self, video_path: str, subtitles: List[Dict],
+                                       max_duration: float = 30.0,
+                                       on_segment: Optional[Callable[[SegmentBuffer, int], None]] = None
+                                       ) -> List[SegmentBuffer]:
+        """
+        逐条字幕启动 ffmpeg 提取音频片段（旧模式，总是写出文件）
+
+        Args:
+            video_path: 视频文件路径
+            subtitles: 解析后的字幕列表
+            max_duration: 单个片段最大时长（秒）
+            on_segment: 每个片段提取完成后的回调 (片段, 片段总数)
+
+        Returns:
+            List[SegmentBuffer]: 音频片段列表
+        """
+        slice_start = time.time()
+        buffers = []
 
         for i, subtitle in enumerate(subtitles):
             start_time = subtitle['start_time']
@@ -255,8 +355,7 @@ class AudioExtractor:
             duration = end_time - start_time
 
             # 文件名保持原始时间戳
-            audio_filename = f"segment_{i+1:03d}_{start_time:.3f}_{end_time:.3f}.wav"
-            audio_path = self.cache_dir / audio_filename
+            audio_path = self.cache_dir / self._segment_filename(i, start_time, end_time)
 
             # 如果片段超过最大时长，使用智能处理
             if duration > max_duration:
@@ -270,17 +369,191 @@ class AudioExtractor:
 
                 # 然后应用智能处理：去除长静音、智能切分
                 self._process_long_audio(audio_path, max_duration)
-
-                audio_paths.append(str(audio_path))
             else:
                 # 正常处理
                 self._extract_single_segment(
                     video_path, audio_path,
                     start_time, duration
                 )
-                audio_paths.append(str(audio_path))
 
-        return audio_paths
+            buffer = self._load_segment_buffer(audio_path, i, start_time, end_time, video_path)
+            buffers.append(buffer)
+            if on_segment is not None:
+                on_segment(buffer, len(subtitles))
+
+        self.last_timings = {
+            'mode': 'per_subtitle',
+            'decode_seconds': 0.0,
+            'slice_seconds': time.time() - slice_start,
+            'segments': len(buffers)
+        }
+        print(f"[音频提取] 逐条提取完成: {len(buffers)} 个片段, "
+              f"耗时 {self.last_timings['slice_seconds']:.2f}s")
+
+        return buffers
+
+    def _load_segment_buffer(self, audio_path: Path, index: int, start_time: float,
+                             end_time: float, video_path: str) -> SegmentBuffer:
+        """读取 ffmpeg 写出的片段文件为 SegmentBuffer（提取失败时为空音频）"""
+        try:
+            audio, _ = sf.read(str(audio_path), dtype='float32')
+        except Exception:
+            audio = np.zeros(0, dtype=np.float32)
+
+        return SegmentBuffer(
+            audio=audio,
+            sample_rate=self.sample_rate,
+            index=index,
+            start_time=start_time,
+            end_time=end_time,
+            source=video_path,
+            path=str(audio_path)
+        )
+
+    def _extract_segments_single_decode(self, video_path: str, subtitles: List[Dict],
+                                        max_duration: float = 30.0,
+                                        write_files: bool = True,
+                                        on_segment: Optional[Callable[[SegmentBuffer, int], None]] = None
+                                        ) -> List[SegmentBuffer]:
+        """
+        单次解码模式：整段音轨只解码一次，各字幕片段为内存映射数组上的零拷贝切片
+
+        Args:
+            video_path: 视频文件路径
+            subtitles: 解析后的字幕列表
+            max_duration: 单个片段最大时长（秒）
+            write_files: 是否写出片段文件
+            on_segment: 每个片段切片（及写出文件）完成后的回调 (片段, 片段总数)
+
+        Returns:
+            List[SegmentBuffer]: 音频片段列表
+        """
+        self.release_decoded_audio()
+        self._decode_dir = tempfile.mkdtemp(prefix="audio_decode_")
+
+        # 1. 整段解码
+        decode_start = time.time()
+        pcm = self._decode_full_audio(video_path, Path(self._decode_dir) / "full_audio.f32")
+        self._decoded_pcm = pcm
+        decode_seconds = time.time() - decode_start
+        print(f"[音频提取] 整段音轨解码完成: {len(pcm) / self.sample_rate:.2f}s 音频, "
+              f"解码耗时 {decode_seconds:.2f}s")
+
+        # 2. 按字幕切片
+        slice_start = time.time()
+        buffers = []
+
+        for i, subtitle in enumerate(subtitles):
+            start_time = subtitle['start_time']
+            end_time = subtitle['end_time']
+            duration = end_time - start_time
+
+            audio_filename = self._segment_filename(i, start_time, end_time)
+            audio_path = self.cache_dir / audio_filename
+
+            # 零拷贝切片（memmap 视图）
+            segment = self._slice_pcm(pcm, start_time, end_time)
+
+            # 如果片段超过最大时长，使用智能处理
+            if len(segment) > 0 and duration > max_duration:
+                print(f"[智能处理] 字幕 #{i+1} 时长过长 ({duration:.1f}秒)，应用智能切分")
+                segment = self._process_long_audio_data(
+                    np.asarray(segment, dtype=np.float32), self.sample_rate, max_duration
+                )
+
+            buffer = SegmentBuffer(
+                audio=segment,
+                sample_rate=self.sample_rate,
+                index=i,
+                start_time=start_time,
+                end_time=end_time,
+                source=video_path,
+                path=str(audio_path) if write_files else None
+            )
+
+            if len(segment) == 0:
+                print(f"提取音频片段失败: {audio_filename}")
+            elif write_files:
+                buffer.write(str(audio_path))
+
+            buffers.append(buffer)
+            if on_segment is not None:
+                on_segment(buffer, len(subtitles))
+
+        slice_seconds = time.time() - slice_start
+
+        self.last_timings = {
+            'mode': 'single_decode',
+            'decode_seconds': decode_seconds,
+            'slice_seconds': slice_seconds,
+            'segments': len(buffers)
+        }
+        print(f"[音频提取] 切片完成: {len(buffers)} 个片段, 切片耗时 {slice_seconds:.2f}s "
+              f"(解码 {decode_seconds:.2f}s)")
+
+        return buffers
+
+    def _decode_full_audio(self, video_path: str, pcm_path: Path) -> np.ndarray:
+        """
+        将视频音轨一次性解码为 16kHz 单声道 float32 PCM，并以内存映射方式打开
+
+        Args:
+            video_path: 视频文件路径
+            pcm_path: 原始 PCM 输出路径
+
+        Returns:
+            np.ndarray: 只读内存映射的音频数据
+        """
+        cmd = [
+            "ffmpeg",
+            "-i", video_path,
+            "-vn",
+            "-ac", "1",
+            "-ar", str(self.sample_rate),
+            "-f", "f32le",
+            "-acodec", "pcm_f32le",
+            "-y",
+            str(pcm_path)
+        ]
+
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='ignore'
+        )
+
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg 解码失败: {result.stderr[-500:]}")
+
+        if not pcm_path.exists() or pcm_path.stat().st_size == 0:
+            raise RuntimeError("ffmpeg 未输出任何音频数据")
+
+        return np.memmap(str(pcm_path), dtype=np.float32, mode='r')
+
+    def _slice_pcm(self, pcm: np.ndarray, start_time: float, end_time: float) -> np.ndarray:
+        """
+        按时间范围从整段 PCM 中取切片（不复制数据）
+
+        Args:
+            pcm: 整段音频数据
+            start_time: 开始时间（秒）
+            end_time: 结束时间（秒）
+
+        Returns:
+            np.ndarray: 音频切片视图
+        """
+        start_sample = max(0, int(round(start_time * self.sample_rate)))
+        end_sample = min(len(pcm), int(round(end_time * self.sample_rate)))
+        if end_sample <= start_sample:
+            return pcm[0:0]
+        return pcm[start_sample:end_sample]
+
+    @staticmethod
+    def _segment_filename(index: int, start_time: float, end_time: float) -> str:
+        """片段文件名：segment_XXX_START_END.wav（保持原始时间戳）"""
+        return f"segment_{index+1:03d}_{start_time:.3f}_{end_time:.3f}.wav"
 
     def _extract_single_segment(self, video_path: str, audio_path: Path, start_time: float, duration: float):
         """
@@ -0,0 +1,92 @@
+"""
+说话人聚类基准测试 - 比较全量层次聚类与两阶段聚类
+
+在合成嵌入上比较运行时间、峰值内存（tracemalloc）以及标签一致性（ARI）
+
+用法:
+    python benchmark_clustering.py --sizes 1000 3000 8000 --speakers 8 --dim 256
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.cluster import AgglomerativeClustering
+from sklearn.metrics import adjusted_rand_score
+
+from scalable_clustering import two_stage_cluster
+
+
+def make_synthetic_embeddings(n_samples: int, n_speakers: int, dim: int, noise: float = 0.35, seed: int = 0):
+    """
+    生成合成说话人嵌入：每个说话人一个随机中心，片段嵌入 = 中心 + 高斯噪声
+
+    Returns:
+        (embeddings, true_labels)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_speakers, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+    # 说话人出现次数不均衡（对话中常见主角占多数）
+    weights = rng.dirichlet(np.ones(n_speakers) * 2.0)
+    labels = rng.choice(n_speakers, size=n_samples, p=weights)
+
+    embeddings = centers[labels] + rng.standard_normal((n_samples, dim)).astype(np.float32) * noise / np.sqrt(dim) * 4
+    return embeddings.astype(np.float32), labels
+
+
+def full_agglomerative(embeddings: np.ndarray, n_clusters: int) -> np.ndarray:
+    """当前路径：对全部嵌入做余弦平均链接层次聚类"""
+    return AgglomerativeClustering(
+        n_clusters=n_clusters, metric='cosine', linkage='average'
+    ).fit_predict(embeddings)
+
+
+def measure(func, *args, **kwargs):
+    """运行并返回 (结果, 耗时秒, 峰值内存MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def run_benchmark(sizes, n_speakers: int, dim: int, skip_full_above: int):
+    print(f"{'片段数':>8} | {'全量耗时':>9} {'全量峰值':>10} | {'两阶段耗时':>10} {'两阶段峰值':>10} | "
+          f"{'ARI(两阶段,全量)':>16} {'ARI(两阶段,真值)':>16}")
+    print("-" * 100)
+
+    for n in sizes:
+        embeddings, truth = make_synthetic_embeddings(n, n_speakers, dim)
+
+        scalable_labels, scalable_time, scalable_peak = measure(
+            two_stage_cluster, embeddings, n_clusters=n_speakers
+        )
+
+        if n <= skip_full_above:
+            full_labels, full_time, full_peak = measure(full_agglomerative, embeddings, n_speakers)
+            agreement = adjusted_rand_score(full_labels, scalable_labels)
+            full_cols = f"{full_time:>8.2f}s {full_peak:>8.1f}MB"
+            agreement_col = f"{agreement:>16.3f}"
+        else:
+            full_cols = f"{'跳过':>9} {'-':>10}"
+            agreement_col = f"{'-':>16}"
+
+        truth_agreement = adjusted_rand_score(truth, scalable_labels)
+        print(f"{n:>8} | {full_cols} | {scalable_time:>9.2f}s {scalable_peak:>8.1f}MB | "
+              f"{agreement_col} {truth_agreement:>16.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="说话人聚类基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 3000, 6000])
+    parser.add_argument("--speakers", type=int, default=8)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--skip-full-above", type=int, default=12000,
+                        help="片段数超过该值时跳过全量层次聚类（避免内存不足）")
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.speakers, args.dim, args.skip_full_above)
@@ -3,8 +3,9 @@
 """
 import sys
 import os
+import time
 import numpy as np
-from typing import List
+from typing import List, Optional
 
 # 添加speaker_diarization目录到Python路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'speaker_diarization'))
@@ -16,9 +17,12 @@ except ImportError as e:
     print("请确保speaker_diarization目录中的文件存在")
     raise
 
+from scalable_clustering import two_stage_cluster
+
 
 class SpeakerClusterer:
-    def __init__(self, n_clusters=None, metric='cosine', linkage='average', distance_threshold=None):
+    def __init__(self, n_clusters=None, metric='cosine', linkage='average', distance_threshold=None,
+                 scalable_threshold: int = 3000, n_micro_clusters: Optional[int] = None):
         """
         初始化说话人聚类器
 
@@ -27,7 +31,15 @@ class SpeakerClusterer:
             metric (str): 距离度量方法
             linkage (str): 链接准则
             distance_threshold (float, optional): 距离阈值，用于确定聚类数量
+            scalable_threshold (int): 有效嵌入数超过该值时自动使用两阶段聚类
+            n_micro_clusters (int, optional): 两阶段聚类的微簇数量，默认按片段数估算
         """
+        self.n_clusters = n_clusters
+        self.linkage = linkage
+        self.distance_threshold = distance_threshold
+        self.scalable_threshold = scalable_threshold
+        self.n_micro_clusters = n_micro_clusters
+
         self.clusterer = original_initialize_clustering(
             n_clusters=n_clusters,
             metric=metric,
@@ -57,8 +69,20 @@ class SpeakerClusterer:
         if len(valid_embeddings) == 0:
             return [None] * len(embeddings)
         
-        # 执行聚类
-        cluster_labels = self.clusterer.cluster_embeddings(valid_embeddings)
+        # 执行聚类（片段数很多时使用两阶段聚类，避免 O(n²) 距离矩阵）
+        if len(valid_embeddings) > self.scalable_threshold:
+            start = time.time()
+            cluster_labels = two_stage_cluster(
+                np.stack(valid_embeddings),
+                n_clusters=self.n_clusters,
+                distance_threshold=self.distance_threshold,
+                linkage=self.linkage,
+                n_micro_clusters=self.n_micro_clusters
+            )
+            print(f"[说话人聚类] 片段数 {len(valid_embeddings)} > {self.scalable_threshold}，"
+                  f"使用两阶段聚类，耗时 {time.time() - start:.2f}s")
+        else:
+            cluster_labels = self.clusterer.cluster_embeddings(valid_embeddings)
         
         # 将聚类结果映射回原始索引
         result = [None] * len(embeddings)
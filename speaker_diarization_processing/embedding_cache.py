@@ -0,0 +1,206 @@
+"""
+说话人嵌入缓存 - 按音频内容寻址的持久化嵌入存储
+重新执行说话人识别时，未改动的字幕片段直接复用上次的嵌入向量
+"""
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+@contextmanager
+def _file_lock(lock_path: Path):
+    """跨进程互斥锁（多个任务共享 EMBEDDING_CACHE_DIR 时串行保存）"""
+    with open(lock_path, 'a+b') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class EmbeddingCache:
+    """
+    按内容寻址的嵌入缓存
+
+    key = hash(解码后的16kHz音频数据 + 采样率 + 嵌入模型标识)
+    以单个 .npz 文件保存：keys（索引）、vectors（float32 矩阵），按 LRU 顺序存储，
+    条目数超过 max_entries 时淘汰最久未使用的条目。
+    保存时持有文件锁并合并磁盘上其他任务写入的条目，多个任务可以共享同一个缓存文件
+    """
+
+    def __init__(self, cache_path: str, model_id: str = "", max_entries: int = 20000):
+        """
+        初始化嵌入缓存
+
+        Args:
+            cache_path: 缓存文件路径（.npz）
+            model_id: 嵌入模型标识，模型变化时缓存自动失效
+            max_entries: 最大条目数（LRU淘汰）
+        """
+        self.cache_path = Path(cache_path)
+        self.model_id = model_id
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load()
+
+    def make_key(self, audio: np.ndarray, sample_rate: int) -> str:
+        """
+        计算音频内容的缓存 key
+
+        Args:
+            audio: 解码后的音频数据
+            sample_rate: 采样率
+
+        Returns:
+            str: 十六进制 key
+        """
+        data = np.ascontiguousarray(audio, dtype=np.float32)
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self.model_id.encode('utf-8'))
+        h.update(str(sample_rate).encode('ascii'))
+        h.update(memoryview(data).cast('B'))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """查询缓存，命中时刷新 LRU 顺序"""
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._dirty = True
+            return vector.copy()
+
+    def put(self, key: str, vector: np.ndarray):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+
+    def save(self):
+        """
+        保存到磁盘
+
+        持有文件锁，先合并磁盘上其他任务保存的条目（本进程的条目更新、排在后面），
+        再写入唯一的临时文件并替换，避免中途失败或并发保存损坏缓存
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with _file_lock(self.cache_path.with_name(self.cache_path.name + ".lock")):
+                merged = self._read_file(quiet=True)
+                for key in self._entries:
+                    merged.pop(key, None)
+                merged.update(self._entries)
+                while len(merged) > self.max_entries:
+                    merged.popitem(last=False)
+                self._entries = merged
+
+                keys = list(self._entries.keys())
+                dims = {len(v) for v in self._entries.values()}
+                if len(dims) > 1:
+                    # 维度不一致（模型变化残留），只保留与最新条目维度一致的部分
+                    latest_dim = len(self._entries[keys[-1]])
+                    keys = [k for k in keys if len(self._entries[k]) == latest_dim]
+
+                vectors = (np.stack([self._entries[k] for k in keys]).astype(np.float32)
+                           if keys else np.zeros((0, 0), dtype=np.float32))
+
+                fd, tmp_path = tempfile.mkstemp(dir=str(self.cache_path.parent), suffix=".npz")
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        np.savez(
+                            f,
+                            keys=np.array(keys, dtype='U32'),
+                            vectors=vectors,
+                            model_id=np.array(self.model_id)
+                        )
+                    os.replace(tmp_path, str(self.cache_path))
+                except BaseException:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                    raise
+            self._dirty = False
+
+        print(f"[嵌入缓存] 已保存 {len(keys)} 条嵌入: {self.cache_path}")
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+    def _load(self):
+        """从磁盘加载缓存（文件损坏或模型不一致时忽略）"""
+        self._entries = self._read_file()
+        if self._entries:
+            print(f"[嵌入缓存] 已加载 {len(self._entries)} 条嵌入: {self.cache_path}")
+
+    def _read_file(self, quiet: bool = False) -> "OrderedDict[str, np.ndarray]":
+        """读取缓存文件中的条目（按 LRU 顺序），文件不存在、损坏或模型不一致时返回空"""
+        entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        if not self.cache_path.exists():
+            return entries
+
+        try:
+            with np.load(str(self.cache_path), allow_pickle=False) as data:
+                stored_model_id = str(data['model_id'])
+                if stored_model_id != self.model_id:
+                    if not quiet:
+                        print(f"[嵌入缓存] 模型标识变化（{stored_model_id} -> {self.model_id}），忽略旧缓存")
+                    return entries
+
+                keys = data['keys']
+                vectors = data['vectors']
+
+            # 文件中按 LRU 顺序保存（最久未使用在前）
+            for key, vector in zip(keys[-self.max_entries:], vectors[-self.max_entries:]):
+                entries[str(key)] = vector
+        except Exception as e:
+            print(f"[嵌入缓存] 加载缓存失败，忽略: {e}")
+            entries.clear()
+        return entries
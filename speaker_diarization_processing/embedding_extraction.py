@@ -3,8 +3,16 @@
 """
 import sys
 import os
+import time
+import inspect
 import numpy as np
-from typing import List
+import soundfile as sf
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from segment_buffer import SegmentBuffer, AudioInput, load_audio
+from embedding_cache import EmbeddingCache
+from model_registry import model_registry
 
 # 添加SpeakerDiarization目录到Python路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'SpeakerDiarization'))
@@ -18,48 +26,431 @@ except ImportError as e:
 
 
 class SpeakerEmbeddingExtractor:
-    def __init__(self, api_key=None, offline_mode=True):
+    def __init__(self, api_key=None, offline_mode=True, batch_mode=True,
+                 max_batch_seconds=120.0, max_batch_size=64, num_load_workers=4):
         """
         初始化说话人嵌入提取器
         
         Args:
             api_key (str, optional): Hugging Face API密钥
             offline_mode (bool): 是否使用离线模式
+            batch_mode (bool): 是否使用按时长分桶的批量推理
+            max_batch_seconds (float): 单个批次补齐后的音频总时长上限（秒），用于控制内存占用
+            max_batch_size (int): 单个批次的最大片段数
+            num_load_workers (int): 音频预加载线程数
         """
         try:
-            self.extractor = initialize_extractor(api_key=api_key, offline_mode=offline_mode)
+            # 通过模型注册表在进程内共享，多次识别任务不重复加载模型
+            self.extractor = model_registry.get(
+                f"speaker_embedding:{'offline' if offline_mode else 'online'}",
+                lambda: initialize_extractor(api_key=api_key, offline_mode=offline_mode)
+            )
         except Exception as e:
             print(f"初始化嵌入提取器失败: {e}")
             raise
 
-    def extract_embeddings(self, audio_paths: List[str]) -> List[np.ndarray]:
+        self.batch_mode = batch_mode
+        self.max_batch_seconds = max_batch_seconds
+        self.max_batch_size = max_batch_size
+        self.num_load_workers = num_load_workers
+        self.sample_rate = 16000
+
+        # 底层批量推理模型（首次使用时解析）
+        self._batch_model = None
+        self._batch_model_resolved = False
+        # 批量推理结果是否与 extractor.extract_embedding 一致（首个批次时校验，None 表示尚未校验）
+        self._batch_verified: Optional[bool] = None
+
+        # 持久化嵌入缓存（可选，通过 enable_cache 启用）
+        self.cache: Optional[EmbeddingCache] = None
+
+    @property
+    def model_id(self) -> str:
+        """嵌入模型标识，用于区分不同模型产生的缓存"""
+        extractor_type = type(self.extractor)
+        name = ""
+        for attr in ('model_name', 'model_path', 'model_id'):
+            value = getattr(self.extractor, attr, None)
+            if isinstance(value, str) and value:
+                name = value
+                break
+        return f"{extractor_type.__module__}.{extractor_type.__name__}:{name}"
+
+    def enable_cache(self, cache_path: str, max_entries: int = 20000) -> EmbeddingCache:
         """
-        从多个音频文件路径提取嵌入向量
-        
+        启用按内容寻址的持久化嵌入缓存
+
         Args:
-            audio_paths (List[str]): 音频文件路径列表
-            
+            cache_path: 缓存文件路径（.npz）
+            max_entries: 最大条目数（LRU淘汰）
+
         Returns:
-            List[np.ndarray]: 嵌入向量列表
+            EmbeddingCache: 缓存对象
         """
-        embeddings = []
-        
-        for audio_path in audio_paths:
-            if not os.path.exists(audio_path):
-                print(f"音频文件不存在: {audio_path}")
-                embeddings.append(None)  # 对应位置添加None，保持索引一致性
+        self.cache = EmbeddingCache(cache_path, model_id=self.model_id, max_entries=max_entries)
+        return self.cache
+
+    def extract_embeddings(self, audio_paths: List[AudioInput],
+                           save_cache: bool = True) -> List[Optional[np.ndarray]]:
+        """
+        从多个音频提取嵌入向量
+
+        Args:
+            audio_paths (List[AudioInput]): 音频文件路径或内存片段（SegmentBuffer）列表
+            save_cache (bool): 启用缓存时是否在提取后写回缓存文件；
+                流水线分块提取时传 False，全部完成后再调用 cache.save() 一次
+
+        Returns:
+            List[np.ndarray]: 嵌入向量列表，提取失败的位置为 None
+        """
+        if self.cache is not None:
+            return self._extract_embeddings_cached(audio_paths, save_cache)
+
+        return self._extract_embeddings_uncached(audio_paths)
+
+    def _extract_embeddings_cached(self, audio_paths: List[AudioInput],
+                                   save_cache: bool = True) -> List[Optional[np.ndarray]]:
+        """
+        先查询嵌入缓存，只对未命中的片段执行推理，并把新结果写回缓存
+        """
+        start = time.time()
+        embeddings: List[Optional[np.ndarray]] = [None] * len(audio_paths)
+
+        # 计算每个片段的内容 key（需要解码音频；内存片段无需读取）
+        with ThreadPoolExecutor(max_workers=max(1, self.num_load_workers)) as pool:
+            keys = list(pool.map(self._cache_key_for, audio_paths))
+
+        miss_indices = []
+        for i, key in enumerate(keys):
+            if key is None:
                 continue
-            
+            cached = self.cache.get(key)
+            if cached is not None:
+                embeddings[i] = cached
+            else:
+                miss_indices.append(i)
+
+        print(f"[嵌入缓存] 命中 {len(audio_paths) - len(miss_indices)}/{len(audio_paths)} 个片段，"
+              f"需要推理 {len(miss_indices)} 个")
+
+        if miss_indices:
+            miss_embeddings = self._extract_embeddings_uncached([audio_paths[i] for i in miss_indices])
+            for i, embedding in zip(miss_indices, miss_embeddings):
+                embeddings[i] = embedding
+                if embedding is not None:
+                    self.cache.put(keys[i], embedding)
+
+        if save_cache:
             try:
-                embedding = self.extractor.extract_embedding(audio_path)
-                embeddings.append(embedding)
-                print(f"成功提取音频嵌入: {os.path.basename(audio_path)}")
+                self.cache.save()
             except Exception as e:
-                print(f"提取音频嵌入失败 {audio_path}: {e}")
-                embeddings.append(None)
+                print(f"[嵌入缓存] 保存缓存失败: {e}")
+
+        stats = self.cache.stats()
+        print(f"[嵌入缓存] 条目 {stats['entries']}, 累计命中率 {stats['hit_rate']:.1%} "
+              f"(命中 {stats['hits']}, 未命中 {stats['misses']}, 淘汰 {stats['evictions']}), "
+              f"耗时 {time.time() - start:.2f}s")
+
+        return embeddings
+
+    def _cache_key_for(self, audio: AudioInput) -> Optional[str]:
+        """计算片段的缓存 key，无法读取时返回 None"""
+        data = self._load_for_embedding(audio)
+        if data is None or len(data) == 0:
+            return None
+        return self.cache.make_key(data, self.sample_rate)
+
+    def _extract_embeddings_uncached(self, audio_paths: List[AudioInput]) -> List[Optional[np.ndarray]]:
+        """不经过缓存直接提取嵌入向量"""
+        if self.batch_mode and self._get_batch_model() is not None:
+            return self.extract_embeddings_batched(audio_paths)
+
+        return self._extract_embeddings_sequential(audio_paths)
+
+    def _extract_embeddings_sequential(self, audio_paths: List[AudioInput]) -> List[Optional[np.ndarray]]:
+        """逐个片段提取嵌入向量"""
+        embeddings = []
+        
+        for audio in audio_paths:
+            embeddings.append(self._extract_one(audio))
         
         return embeddings
 
+    def _extract_one(self, audio: AudioInput) -> Optional[np.ndarray]:
+        """提取单个音频的嵌入向量，失败时返回 None"""
+        if isinstance(audio, SegmentBuffer):
+            return self._extract_buffer_embedding(audio)
+
+        audio_path = audio
+        if not os.path.exists(audio_path):
+            print(f"音频文件不存在: {audio_path}")
+            return None  # 对应位置返回None，保持索引一致性
+
+        try:
+            embedding = self.extractor.extract_embedding(audio_path)
+            print(f"成功提取音频嵌入: {os.path.basename(audio_path)}")
+            return embedding
+        except Exception as e:
+            print(f"提取音频嵌入失败 {audio_path}: {e}")
+            return None
+
+    def extract_embeddings_batched(self, audio_paths: List[AudioInput]) -> List[Optional[np.ndarray]]:
+        """
+        按时长分桶批量提取嵌入向量
+
+        1. 读取各片段时长，按时长排序后分桶（桶内补齐后的总时长不超过 max_batch_seconds）
+        2. 线程池预加载下一个桶的音频，同时对当前桶做一次前向推理
+        3. 批量推理直接调用底层模型，跳过了提取器自身的预处理（裁剪、重采样、归一化等）；
+           首个批次先与 extract_embedding 的结果比对，不一致时整批回退到逐个提取
+        4. 任一批次推理失败时同样整批回退到逐个提取（同一次提取的嵌入来自同一条处理路径，
+           缓存中也不会混入两种结果），失败位置保持为 None
+
+        Args:
+            audio_paths (List[AudioInput]): 音频文件路径或内存片段列表
+
+        Returns:
+            List[Optional[np.ndarray]]: 与输入一一对应的嵌入向量列表
+        """
+        model = self._get_batch_model()
+        if model is None:
+            return self._extract_embeddings_sequential(audio_paths)
+
+        start = time.time()
+        embeddings: List[Optional[np.ndarray]] = [None] * len(audio_paths)
+
+        # 1. 时长分桶
+        durations = [self._get_duration(audio) for audio in audio_paths]
+        buckets = self._build_buckets(durations)
+
+        print(f"[嵌入提取] 批量模式: {len(audio_paths)} 个片段, {len(buckets)} 个批次 "
+              f"(每批上限 {self.max_batch_seconds:.0f}s / {self.max_batch_size} 个)")
+
+        # 2. 预加载 + 逐桶推理
+        with ThreadPoolExecutor(max_workers=max(1, self.num_load_workers)) as pool:
+            def submit(bucket):
+                return [pool.submit(self._load_for_embedding, audio_paths[i]) for i in bucket]
+
+            pending = submit(buckets[0]) if buckets else []
+            for bucket_idx, bucket in enumerate(buckets):
+                futures = pending
+                # 提前提交下一个桶的加载任务
+                if bucket_idx + 1 < len(buckets):
+                    pending = submit(buckets[bucket_idx + 1])
+
+                loaded = [(i, future.result()) for i, future in zip(bucket, futures)]
+                valid = [(i, audio) for i, audio in loaded if audio is not None and len(audio) > 0]
+
+                for i, audio in loaded:
+                    if audio is None or len(audio) == 0:
+                        print(f"音频片段为空或无法读取: {self._describe(audio_paths[i])}")
+
+                if not valid:
+                    continue
+
+                try:
+                    if self._batch_verified is None:
+                        self._batch_verified = self._verify_batch_model(model, audio_paths, valid)
+                    if not self._batch_verified:
+                        break
+                    batch_embeddings = self._forward_batch(model, [audio for _, audio in valid])
+                    for (i, _), embedding in zip(valid, batch_embeddings):
+                        embeddings[i] = embedding
+                except Exception as e:
+                    print(f"[嵌入提取] 批次 {bucket_idx + 1} 批量推理失败，全部回退到逐个提取: {e}")
+                    self._batch_verified = False
+                    break
+
+        if self._batch_verified is False:
+            # 不与批量结果混用，本次全部经提取器逐个提取；之后的提取也不再使用批量模式
+            self._batch_model = None
+            return self._extract_embeddings_sequential(audio_paths)
+
+        valid_count = len([e for e in embeddings if e is not None])
+        print(f"[嵌入提取] 批量提取完成: {valid_count}/{len(audio_paths)} 个有效嵌入, "
+              f"耗时 {time.time() - start:.2f}s")
+
+        return embeddings
+
+    def _verify_batch_model(self, model, audio_paths: List[AudioInput], valid) -> bool:
+        """
+        校验批量推理与 extractor.extract_embedding 结果一致
+
+        取首个批次中最短和最长的片段一起做一次批量前向（覆盖补齐），与经提取器逐个提取的结果比较
+
+        Args:
+            model: 底层嵌入模型
+            audio_paths: 全部输入
+            valid: 首个批次中 (原始索引, 已加载音频) 列表（按时长升序）
+
+        Returns:
+            bool: 是否一致
+        """
+        probes = [valid[0], valid[-1]] if len(valid) > 1 else [valid[0]]
+        batched = self._forward_batch(model, [audio for _, audio in probes])
+        for (i, _), embedding in zip(probes, batched):
+            reference = self._extract_one(audio_paths[i])
+            if reference is None:
+                continue
+            reference = np.asarray(reference, dtype=np.float32).reshape(-1)
+            embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+            scale = max(float(np.abs(reference).max()), 1e-6)
+            if embedding.shape != reference.shape or not np.allclose(embedding, reference, rtol=1e-3, atol=1e-3 * scale):
+                print("[嵌入提取] 批量推理结果与提取器不一致（提取器有额外的预处理），使用逐个提取模式")
+                return False
+        return True
+
+    def _build_buckets(self, durations: List[float]) -> List[List[int]]:
+        """
+        按时长排序后贪心分桶，桶内补齐到最长片段后的总时长不超过 max_batch_seconds
+
+        Args:
+            durations: 各片段时长（秒），无法读取的片段为 0
+
+        Returns:
+            List[List[int]]: 每个桶包含的原始索引
+        """
+        order = sorted(range(len(durations)), key=lambda i: durations[i])
+
+        buckets = []
+        current = []
+        for i in order:
+            # 排序后当前片段就是桶内最长的片段
+            padded_seconds = durations[i] * (len(current) + 1)
+            if current and (padded_seconds > self.max_batch_seconds or len(current) >= self.max_batch_size):
+                buckets.append(current)
+                current = []
+            current.append(i)
+
+        if current:
+            buckets.append(current)
+
+        return buckets
+
+    def _forward_batch(self, model, audios: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        对一个桶做补齐并执行一次前向推理
+
+        Args:
+            model: 嵌入模型（torch.nn.Module，输入 (batch, channel, samples)）
+            audios: 同一桶内的音频数据
+
+        Returns:
+            List[np.ndarray]: 每个片段的嵌入向量
+        """
+        import torch
+
+        max_len = max(len(audio) for audio in audios)
+        waveforms = np.zeros((len(audios), 1, max_len), dtype=np.float32)
+        mask = np.zeros((len(audios), max_len), dtype=np.float32)
+        for row, audio in enumerate(audios):
+            waveforms[row, 0, :len(audio)] = audio
+            mask[row, :len(audio)] = 1.0
+
+        device = next(model.parameters()).device
+        inputs = torch.from_numpy(waveforms).to(device)
+
+        with torch.inference_mode():
+            if self._accepts_weights(model):
+                # 以帧级权重屏蔽补齐部分（按 10ms 帧下采样，模型内部会插值到特征帧数）
+                hop = self.sample_rate // 100
+                frame_mask = mask[:, ::hop]
+                outputs = model(inputs, weights=torch.from_numpy(np.ascontiguousarray(frame_mask)).to(device))
+            else:
+                outputs = model(inputs)
+
+        outputs = outputs.detach().cpu().numpy()
+        return [outputs[row] for row in range(len(audios))]
+
+    def _get_batch_model(self):
+        """查找可直接批量前向的底层 torch 模型，找不到时返回 None"""
+        if self._batch_model_resolved:
+            return self._batch_model
+
+        self._batch_model_resolved = True
+        try:
+            import torch
+        except ImportError:
+            return None
+
+        for owner in (self.extractor, getattr(self.extractor, 'inference', None)):
+            model = getattr(owner, 'model', None) if owner is not None else None
+            if isinstance(model, torch.nn.Module):
+                model.eval()
+                self._batch_model = model
+                break
+
+        if self._batch_model is None:
+            print("[嵌入提取] 底层提取器不支持批量推理，使用逐个提取模式")
+
+        return self._batch_model
+
+    @staticmethod
+    def _accepts_weights(model) -> bool:
+        """模型 forward 是否支持 weights 参数（pyannote 嵌入模型支持）"""
+        try:
+            return 'weights' in inspect.signature(model.forward).parameters
+        except (TypeError, ValueError):
+            return False
+
+    def _get_duration(self, audio: AudioInput) -> float:
+        """读取片段时长（秒），不解码音频"""
+        if isinstance(audio, SegmentBuffer):
+            return audio.duration
+        try:
+            return sf.info(str(audio)).duration
+        except Exception:
+            return 0.0
+
+    def _load_for_embedding(self, audio: AudioInput) -> Optional[np.ndarray]:
+        """加载片段为 16kHz 单声道 float32（线程池中执行）"""
+        try:
+            if not isinstance(audio, SegmentBuffer) and not os.path.exists(audio):
+                return None
+            data, _ = load_audio(audio, sample_rate=self.sample_rate)
+            return np.asarray(data, dtype=np.float32)
+        except Exception as e:
+            print(f"加载音频失败 {self._describe(audio)}: {e}")
+            return None
+
+    @staticmethod
+    def _describe(audio: AudioInput) -> str:
+        """用于日志的片段名称"""
+        return audio.name if isinstance(audio, SegmentBuffer) else os.path.basename(str(audio))
+
+    def _extract_buffer_embedding(self, buffer: SegmentBuffer) -> Optional[np.ndarray]:
+        """
+        从内存片段提取嵌入向量
+
+        优先以内存波形 {"waveform", "sample_rate"} 调用提取器；提取器不支持内存输入时，
+        如果片段已落盘则回退到文件路径
+
+        Args:
+            buffer: 内存音频片段
+
+        Returns:
+            Optional[np.ndarray]: 嵌入向量，失败时为 None
+        """
+        if len(buffer.audio) == 0:
+            print(f"音频片段为空: {buffer.name}")
+            return None
+
+        try:
+            embedding = self.extractor.extract_embedding(buffer.as_audio_file())
+            print(f"成功提取音频嵌入: {buffer.name}")
+            return embedding
+        except Exception as e:
+            if not buffer.has_file():
+                print(f"提取音频嵌入失败 {buffer.name}: {e}")
+                return None
+
+        try:
+            embedding = self.extractor.extract_embedding(buffer.path)
+            print(f"成功提取音频嵌入: {buffer.name}")
+            return embedding
+        except Exception as e:
+            print(f"提取音频嵌入失败 {buffer.path}: {e}")
+            return None
+
     def extract_single_embedding(self, audio_path: str) -> np.ndarray:
         """
         从单个音频文件路径提取嵌入向量
@@ -0,0 +1,157 @@
+"""
+说话人数量自动估计 - 基于嵌入的余弦相似度矩阵
+
+提供两种估计方法，均只计算一次相似度/距离矩阵并在所有候选 k 之间复用：
+1. silhouette: 对距离矩阵做一次平均链接层次聚类，在 [min_k, max_k] 范围内逐个切分树并计算轮廓系数，
+   与后续 SpeakerClusterer 使用的余弦平均链接聚类保持一致
+2. eigengap: 对稀疏化后的相似度矩阵求归一化拉普拉斯矩阵特征值，取最大特征值间隔
+"""
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial.distance import squareform
+from sklearn.metrics import silhouette_score
+
+
+def cosine_similarity_matrix(embeddings: np.ndarray) -> np.ndarray:
+    """
+    计算余弦相似度矩阵
+
+    Args:
+        embeddings: 嵌入矩阵 (n_samples, dim)
+
+    Returns:
+        np.ndarray: 相似度矩阵 (n_samples, n_samples)，取值 [-1, 1]
+    """
+    X = np.asarray(embeddings, dtype=np.float64)
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    X = X / np.maximum(norms, 1e-12)
+    return np.clip(X @ X.T, -1.0, 1.0)
+
+
+def estimate_by_silhouette(similarity: np.ndarray, min_k: int, max_k: int) -> Tuple[int, Dict[int, float]]:
+    """
+    轮廓系数扫描：一次层次聚类，多次切分
+
+    Args:
+        similarity: 余弦相似度矩阵
+        min_k: 最少说话人数
+        max_k: 最多说话人数
+
+    Returns:
+        (最佳说话人数, {k: 轮廓系数})
+    """
+    distance = 1.0 - similarity
+    np.fill_diagonal(distance, 0.0)
+    distance = np.maximum(distance, 0.0)
+    distance = (distance + distance.T) / 2
+
+    tree = linkage(squareform(distance, checks=False), method='average')
+
+    scores = {}
+    for k in range(min_k, max_k + 1):
+        labels = fcluster(tree, k, criterion='maxclust')
+        # 切分结果不足 k 类（存在距离相同的合并）时跳过
+        if len(np.unique(labels)) != k:
+            continue
+        scores[k] = float(silhouette_score(distance, labels, metric='precomputed'))
+
+    if not scores:
+        return min_k, scores
+    return max(scores, key=scores.get), scores
+
+
+def estimate_by_eigengap(similarity: np.ndarray, min_k: int, max_k: int,
+                         pruning_ratio: float = 0.1) -> Tuple[int, Dict[int, float]]:
+    """
+    特征值间隔估计：对每行只保留最相似的若干邻居，再求归一化拉普拉斯矩阵的最小特征值
+
+    Args:
+        similarity: 余弦相似度矩阵
+        min_k: 最少说话人数
+        max_k: 最多说话人数
+        pruning_ratio: 每行保留的邻居比例
+
+    Returns:
+        (最佳说话人数, {k: 第k个特征值间隔})
+    """
+    n = len(similarity)
+    affinity = np.maximum(similarity, 0.0)
+    np.fill_diagonal(affinity, 0.0)
+
+    # 行稀疏化：每行只保留 top-p 相似度，抑制跨说话人的弱连接
+    keep = min(n - 1, max(2, int(math.ceil(n * pruning_ratio))))
+    if keep < n - 1:
+        threshold = np.partition(affinity, n - keep, axis=1)[:, n - keep][:, None]
+        affinity = np.where(affinity >= threshold, affinity, 0.0)
+    affinity = (affinity + affinity.T) / 2
+
+    degree = affinity.sum(axis=1)
+    inv_sqrt = 1.0 / np.sqrt(np.maximum(degree, 1e-12))
+    laplacian = np.eye(n) - inv_sqrt[:, None] * affinity * inv_sqrt[None, :]
+
+    eigenvalues = np.linalg.eigvalsh(laplacian)[:max_k + 1]
+    gaps = np.diff(eigenvalues)
+
+    # gaps[k-1] = λ_k - λ_{k-1}，对应 k 个簇
+    scores = {k: float(gaps[k - 1]) for k in range(min_k, min(max_k, len(gaps)) + 1)}
+    if not scores:
+        return min_k, scores
+    return max(scores, key=scores.get), scores
+
+
+def estimate_speaker_count(
+    embeddings: List[Optional[np.ndarray]],
+    min_speakers: int = 2,
+    max_speakers: int = 10,
+    method: str = 'silhouette',
+    max_samples: int = 2000,
+    random_state: int = 0
+) -> Tuple[int, Dict]:
+    """
+    根据嵌入自动估计说话人数量
+
+    Args:
+        embeddings: 嵌入向量列表（None 会被忽略）
+        min_speakers: 最少说话人数
+        max_speakers: 最多说话人数
+        method: 估计方法，'silhouette' 或 'eigengap'
+        max_samples: 参与估计的最大片段数，超过时随机下采样（相似度矩阵为 O(n²)）
+        random_state: 下采样随机种子
+
+    Returns:
+        (说话人数量, 估计信息字典：method/scores/n_samples/elapsed)
+    """
+    if method not in ('silhouette', 'eigengap'):
+        raise ValueError(f"未知的说话人数量估计方法: {method}")
+
+    start = time.time()
+    valid = [emb for emb in embeddings if emb is not None]
+    n_samples = len(valid)
+    info = {'method': method, 'scores': {}, 'n_samples': n_samples, 'elapsed': 0.0}
+
+    if n_samples <= min_speakers:
+        info['elapsed'] = time.time() - start
+        return max(n_samples, 1), info
+
+    X = np.stack(valid)
+    if n_samples > max_samples:
+        rng = np.random.default_rng(random_state)
+        X = X[rng.choice(n_samples, size=max_samples, replace=False)]
+        info['n_samples'] = max_samples
+
+    max_k = min(max_speakers, len(X) - 1)
+    min_k = min(min_speakers, max_k)
+
+    similarity = cosine_similarity_matrix(X)
+    if method == 'eigengap':
+        n_speakers, scores = estimate_by_eigengap(similarity, min_k, max_k)
+    else:
+        n_speakers, scores = estimate_by_silhouette(similarity, min_k, max_k)
+
+    info['scores'] = scores
+    info['elapsed'] = time.time() - start
+    return n_speakers, info